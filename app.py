@@ -12,6 +12,7 @@ import sys
 import os
 from pathlib import Path
 import json
+from datetime import datetime
 from typing import Optional
 
 
@@ -21,6 +22,8 @@ sys.path.insert(0, str(Path(__file__).parent))
 from chatbot import chatbot, ChatbotError, ConfigurationError, APIError
 from config import get_config, set_config
 from memory import MemoryManager
+from query_gate import retrieve_if_needed
+from retrieval import QueryFilters
 
 # Try to import memory and RAG modules
 try:
@@ -31,7 +34,9 @@ except Exception as e:
     memory = None
 
 try:
-    from chromadb_rag import get_rag
+    from chromadb_rag import get_rag, start_warm_up
+    from rag_settings import get_rag_top_k
+    start_warm_up() # Once per process: loads the index in the background for the first query
     rag = get_rag()
 except Exception as e:
     logging.warning(f"RAG module not available: {e}")
@@ -254,6 +259,36 @@ if "user_name" not in st.session_state:
     st.session_state.user_name = config.get("USER_NAME", "User")
 if "user_persona" not in st.session_state:
     st.session_state.user_persona = config.get("USER_PERSONA", "")
+if "rag_filters" not in st.session_state:
+    st.session_state.rag_filters = QueryFilters()
+if "last_retrieval" not in st.session_state:
+    st.session_state.last_retrieval = None
+
+# Route RAG to the collection of the current session
+if rag is not None and memory and st.session_state.session_id:
+    from chromadb_rag import get_rag_for_session
+    rag = get_rag_for_session(memory.get_session(st.session_state.session_id)) or rag
+
+def _show_ingest_jobs():
+    """Show recent RAG import jobs and their progress"""
+    from ingest_jobs import get_ingest_queue
+    jobs = get_ingest_queue().list_jobs(limit=5)
+    if not jobs:
+        return
+    st.markdown("##### Import Jobs")
+    status_icons = {"queued": "⏳", "running": "🔄", "done": "✅", "failed": "❌"}
+    for job in jobs:
+        line = f"{status_icons.get(job['status'], '')} {job['source']}: {job['status']}, {job['chunks_done']} chunks"
+        if job["error"]:
+            line += f" ({job['error']})"
+        st.caption(line)
+
+
+# Poll job status without blocking the rest of the page (fragments need Streamlit 1.37+)
+if hasattr(st, "fragment"):
+    render_ingest_jobs = st.fragment(run_every=2)(_show_ingest_jobs)
+else:
+    render_ingest_jobs = _show_ingest_jobs
 
 # Header
 st.markdown('<div class="main-title">🤖 PIXELLA</div>', unsafe_allow_html=True)
@@ -392,6 +427,7 @@ with st.sidebar:
                     if loaded_session:
                         st.session_state.session_id = loaded_session.session_id
                         st.session_state.messages = [{"role": m.role, "content": m.content} for m in loaded_session.messages]
+                        st.session_state.last_retrieval = None # Belongs to the previous session
                         st.session_state.user_name = loaded_session.user_name
                         st.session_state.user_persona = loaded_session.user_persona
                         st.success(f"Session '{selected_session_id}' loaded!")
@@ -411,6 +447,7 @@ with st.sidebar:
                             if st.session_state.session_id == session_to_delete:
                                 st.session_state.session_id = None
                                 st.session_state.messages = []
+                                st.session_state.last_retrieval = None
                             st.rerun()
                         else:
                             st.error(f"Failed to delete session '{session_to_delete}'. It might not exist.")
@@ -427,6 +464,7 @@ with st.sidebar:
                         memory.clear_all()
                         st.session_state.session_id = None
                         st.session_state.messages = []
+                        st.session_state.last_retrieval = None
                         st.success("All memory cleared!")
                         st.rerun()
         else:
@@ -490,6 +528,35 @@ with st.sidebar:
         st.markdown("#### RAG Settings")
         
         if rag:
+            # Collection used by this session
+            st.markdown("##### Collection")
+            from chromadb_rag import get_rag, list_rag_collections
+            collection_names = [entry["name"] for entry in list_rag_collections()]
+            if rag.collection_name not in collection_names:
+                collection_names.insert(0, rag.collection_name)
+            selected_collection = st.selectbox(
+                "Search and import into:",
+                collection_names,
+                index=collection_names.index(rag.collection_name)
+            )
+            new_collection = st.text_input("Or create a new collection:", placeholder="e.g. project-notes")
+            target_collection = new_collection.strip() or selected_collection
+            if target_collection != rag.collection_name and st.button("Use Collection", use_container_width=True):
+                new_rag = get_rag(target_collection)
+                if new_rag:
+                    if memory and st.session_state.session_id:
+                        session = memory.get_session(st.session_state.session_id)
+                        if session:
+                            session.context["rag_collection"] = new_rag.collection_name
+                            memory.save_session(session)
+                    st.session_state.rag_filters = QueryFilters()
+                    st.session_state.last_retrieval = None
+                    st.rerun()
+                else:
+                    st.error(f"Could not open collection '{target_collection}'.")
+
+            st.divider()
+
             st.markdown("##### Import Documents to RAG")
             with st.expander("Click to import RAG documents"):
                 uploaded_rag_file = st.file_uploader(
@@ -501,15 +568,57 @@ with st.sidebar:
                 if uploaded_rag_file is not None:
                     if st.button("📥 Import to RAG", use_container_width=True):
                         try:
-                            with st.spinner("Processing..."):
-                                # Streamlit's file_uploader reads the file into a BytesIO object
-                                # We need to read its content
-                                file_content = uploaded_rag_file.read().decode('utf-8')
-                                count = rag.add_text(file_content, source=uploaded_rag_file.name)
-                                st.success(f"✓ Added {count} chunks from {uploaded_rag_file.name} to RAG.")
+                            # Embedding runs in a background job so the UI stays responsive
+                            from ingest_jobs import get_ingest_queue
+                            job_id = get_ingest_queue().submit_upload(
+                                uploaded_rag_file.name,
+                                uploaded_rag_file.getvalue(),
+                                collection=rag.collection_name
+                            )
+                            st.success(f"✓ Queued {uploaded_rag_file.name} for import (job {job_id}).")
                         except Exception as e:
                             st.error(f"Error importing to RAG: {e}")
+
+            render_ingest_jobs()
             
+            st.divider()
+
+            # Search scope, pushed down into the RAG search as metadata filters
+            st.markdown("##### Search Scope")
+            rag_sources = list(rag.list_sources().keys())
+            current_filters = st.session_state.rag_filters
+            scope_sources = st.multiselect(
+                "Only search these documents:",
+                rag_sources,
+                default=[s for s in current_filters.sources if s in rag_sources],
+                help="Leave empty to search all documents."
+            )
+            type_options = ["any", "file", "user_text"]
+            scope_type = st.selectbox(
+                "Document type:",
+                type_options,
+                index=type_options.index(current_filters.doc_type) if current_filters.doc_type in type_options else 0
+            )
+            scope_path = st.text_input("File path starts with:", value=current_filters.path_prefix or "")
+            use_dates = st.checkbox(
+                "Filter by import date",
+                value=current_filters.ingested_after is not None or current_filters.ingested_before is not None
+            )
+            ingested_after = ingested_before = None
+            if use_dates:
+                date_range = st.date_input("Imported between:", value=[])
+                if len(date_range) == 2:
+                    ingested_after = datetime.combine(date_range[0], datetime.min.time()).timestamp()
+                    ingested_before = datetime.combine(date_range[1], datetime.max.time()).timestamp()
+            st.session_state.rag_filters = QueryFilters(
+                sources=scope_sources,
+                doc_type=None if scope_type == "any" else scope_type,
+                path_prefix=scope_path or None,
+                ingested_after=ingested_after,
+                ingested_before=ingested_before
+            )
+            st.caption(f"Searching: {st.session_state.rag_filters.describe()}")
+
             st.divider()
             
             # RAG info
@@ -519,6 +628,14 @@ with st.sidebar:
                 st.metric("Documents in RAG", info.get("count", 0))
                 st.write(f"Collection Name: {info.get('name', 'N/A')}")
                 st.write(f"Storage Path: {info.get('db_path', 'N/A')}")
+                cache_stats = info.get("query_cache", {})
+                st.write(f"Query Cache: {cache_stats.get('hits', 0)} hits, {cache_stats.get('misses', 0)} misses")
+                warm_up = info.get("warm_up")
+                if warm_up and warm_up["state"] == "done":
+                    st.write(f"Index Warm-up: {warm_up['seconds']:.2f}s")
+                if info.get("reembedding"):
+                    from reembed import format_reembed_status
+                    st.write(f"Re-embedding: {format_reembed_status(info['reembedding'])}")
             
             if st.button("🗑️ Clear RAG Collection", use_container_width=True):
                 if st.warning("Are you sure you want to clear the RAG collection? This cannot be undone."):
@@ -557,6 +674,7 @@ if st.session_state.creating_new_session:
             session = memory.create_session(session_id=new_session_name)
             st.session_state.session_id = session.session_id
             st.session_state.messages = []
+            st.session_state.last_retrieval = None
             st.session_state.creating_new_session = False
             st.success(f"New session '{session.session_id}' created!")
             st.rerun()
@@ -606,9 +724,14 @@ else:
                 # Get RAG context if available
                 rag_context = ""
                 if rag:
-                    results = rag.query(user_input, top_k=2)
-                    if results:
-                        rag_context = rag.query_with_context(user_input, top_k=2)
+                    retrieval, gate = retrieve_if_needed(
+                        rag, user_input, st.session_state.last_retrieval,
+                        top_k=get_rag_top_k(), filters=st.session_state.rag_filters
+                    )
+                    if retrieval is not None:
+                        rag_context = retrieval.context
+                        st.session_state.last_retrieval = retrieval
+                        logger.debug(f"RAG retrieval ({gate.action}): {retrieval.describe_timings()}")
                 
                 # Add to memory if available
                 if memory and st.session_state.session_id:
@@ -618,7 +741,8 @@ else:
                 bot_response = chatbot.chat(
                     user_input,
                     user_name=st.session_state.user_name,
-                    user_persona=st.session_state.user_persona
+                    user_persona=st.session_state.user_persona,
+                    rag_context=rag_context
                 )
                 st.session_state.messages.append({"role": "assistant", "content": bot_response})
                 
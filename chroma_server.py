@@ -0,0 +1,167 @@
+"""
+Chroma Server Module
+
+Client/server mode for the RAG store. Instead of every CLI invocation and
+Streamlit worker opening its own PersistentClient on DB_PATH, a single
+local Chroma server (`pixella rag serve`) keeps the index loaded and all
+processes connect to it over HTTP. Clients are reused per server URL and
+health-checked with a heartbeat before use.
+
+"""
+
+import time
+import shutil
+import logging
+import threading
+import subprocess
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlparse
+
+import chromadb
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SERVER_HOST = "localhost"
+DEFAULT_SERVER_PORT = 8000
+# Seconds a successful heartbeat is trusted before the server is checked again
+HEALTH_CHECK_INTERVAL = 30.0
+
+
+def parse_server_url(url: str) -> Tuple[str, int, bool]:
+    """
+    Split a server URL into host, port and whether to use TLS
+
+    Args:
+        url: e.g. 'http://localhost:8000' or 'localhost:8000'
+
+    Returns:
+        Tuple of (host, port, ssl)
+
+    Raises:
+        ValueError: If the URL has no host
+    """
+    parsed = urlparse(url if "://" in url else f"http://{url}")
+    if not parsed.hostname:
+        raise ValueError(f"Invalid Chroma server URL '{url}'")
+    ssl = parsed.scheme == "https"
+    return parsed.hostname, parsed.port or (443 if ssl else DEFAULT_SERVER_PORT), ssl
+
+
+class ServerConnection:
+    """
+    A reusable HTTP client for one Chroma server, with throttled health checks
+    """
+
+    def __init__(self, url: str):
+        """
+        Initialize the connection (the server is contacted on first use)
+
+        Args:
+            url: Server URL
+        """
+        self.url = url
+        self.host, self.port, self.ssl = parse_server_url(url)
+        self._client: Optional[Any] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> Any:
+        return chromadb.HttpClient(host=self.host, port=self.port, ssl=self.ssl)
+
+    def client(self) -> Any:
+        """
+        Get the client, checking the server's heartbeat if it was not seen recently.
+        A failed check reconnects once before giving up.
+
+        Returns:
+            ChromaDB HttpClient
+
+        Raises:
+            ConnectionError: If the server does not respond
+        """
+        with self._lock:
+            if self._client is not None and time.monotonic() - self._checked_at < HEALTH_CHECK_INTERVAL:
+                return self._client
+            for attempt in range(2):
+                try:
+                    if self._client is None or attempt:
+                        self._client = self._connect()
+                    self._client.heartbeat()
+                    self._checked_at = time.monotonic()
+                    return self._client
+                except Exception as exc: # Catching specific exception
+                    logger.debug("Chroma server heartbeat failed (attempt %d): %s", attempt + 1, exc)
+                    error = exc
+            self._client = None
+            raise ConnectionError(
+                f"Chroma server at {self.url} is not reachable ({error}); start it with 'pixella rag serve'"
+            )
+
+
+_CONNECTIONS: Dict[str, ServerConnection] = {}
+_CONNECTIONS_LOCK = threading.Lock()
+
+
+def get_server_client(url: str) -> Any:
+    """
+    Get the shared, health-checked client for a Chroma server
+
+    Args:
+        url: Server URL
+
+    Returns:
+        ChromaDB HttpClient
+
+    Raises:
+        ConnectionError: If the server does not respond
+    """
+    with _CONNECTIONS_LOCK:
+        if url not in _CONNECTIONS:
+            _CONNECTIONS[url] = ServerConnection(url)
+        connection = _CONNECTIONS[url]
+    return connection.client()
+
+
+def check_server(url: str) -> Optional[float]:
+    """
+    Measure a server's heartbeat round trip
+
+    Args:
+        url: Server URL
+
+    Returns:
+        Round trip in milliseconds, or None if the server does not respond
+    """
+    try:
+        host, port, ssl = parse_server_url(url)
+        started = time.perf_counter()
+        chromadb.HttpClient(host=host, port=port, ssl=ssl).heartbeat()
+        return (time.perf_counter() - started) * 1000
+    except Exception as exc: # Catching specific exception
+        logger.debug("Chroma server %s not reachable: %s", url, exc)
+        return None
+
+
+def serve(db_path: str, host: str = DEFAULT_SERVER_HOST, port: int = DEFAULT_SERVER_PORT) -> int:
+    """
+    Run a Chroma server on the RAG store in the foreground
+
+    Args:
+        db_path: Directory holding the RAG data
+        host: Interface to listen on
+        port: Port to listen on
+
+    Returns:
+        The server's exit code
+
+    Raises:
+        RuntimeError: If the chroma command is not installed
+    """
+    executable = shutil.which("chroma")
+    if not executable:
+        raise RuntimeError("The 'chroma' command was not found; install chromadb in this environment")
+    logger.info("Starting Chroma server for %s on %s:%d", db_path, host, port)
+    try:
+        return subprocess.call([executable, "run", "--path", db_path, "--host", host, "--port", str(port)])
+    except KeyboardInterrupt:
+        return 0
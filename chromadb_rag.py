@@ -10,21 +10,80 @@ Google Generative AI for generating document embeddings.
 """
 
 import os
+import time
 import logging
 import hashlib
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Dict, Optional, Any, TypedDict, cast
+from typing import List, Dict, Optional, Any, Callable, Iterable, Iterator, TypedDict, cast
 import json
-import chromadb
 from chromadb.api.types import Embedding
-from pydantic import SecretStr
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from langchain_text_splitters import TextSplitter
+from chunking import select_profile
+from embeddings import LOCAL_EMBEDDING_MODELS, create_embeddings, embed_queries, is_local_model
+from collection_io import detect_export_format, export_collection_pages, import_collection
+from collection_registry import CollectionRegistry, sanitize_collection_name
 from config import ENV_PATH, get_config, set_config
+from lexical_index import LexicalIndex, query_coverage
+from query_cache import QueryCache
+from query_expansion import ExpansionCache, llm_variants, rule_variants
+from query_gate import GATE_MODEL_FILE, QueryGate
+from rag_settings import (
+    DEFAULT_COLLECTION,
+    get_chunking_profile,
+    get_context_settings,
+    get_default_collection_name,
+    get_ivf_settings,
+    get_max_open_collections,
+    get_mmr_lambda,
+    get_query_cache_settings,
+    get_query_expansion_settings,
+    get_query_gate_mode,
+    get_reembed_settings,
+    get_rerank_settings,
+    get_search_mode,
+    get_server_url,
+    get_shard_count,
+    get_vector_index_settings,
+    get_vector_storage_settings,
+)
+from reembed import cancel_reembedding, ensure_embedding_model, reembed_status, refresh_alias
+from retrieval import (
+    QueryFilters,
+    RetrievalPipeline,
+    RetrievalResult,
+    fuse_results,
+    merge_adjacent_chunks,
+    mmr_select,
+)
+from chroma_server import get_server_client
+from context_packing import NeighborRequests, pack_context
+from sharding import open_client
+from store_lock import hold_store
+from reranking import load_scorer, rerank
+from vector_index import VectorIndex, VectorIndexManager
 
 
 logger = logging.getLogger(__name__)
 
+# Characters read per block when streaming a file into the collection
+FILE_READ_BLOCK_SIZE = 1024 * 1024
+# Characters of unsplit text carried over between blocks before it is cut by force
+MAX_CARRY_OVER = 64 * 1024
+# Size of the pieces a record or line longer than MAX_CARRY_OVER is cut into
+HARD_SPLIT_SIZE = 2000
+# Maximum number of chunks embedded and written per batch
+EMBED_BATCH_SIZE = 100
+# Candidates fetched from each ranking before hybrid fusion, per requested result
+HYBRID_FETCH_FACTOR = 3
+# Candidates fetched per requested result when MMR diversification is enabled
+MMR_FETCH_FACTOR = 4
+# Page size used when walking the whole collection
+COLLECTION_PAGE_SIZE = 1000
+
+SEARCH_MODES = ("auto", "hybrid", "vector", "lexical")
+
 class DocumentInput(TypedDict):
     content: str
     source: Optional[str]
@@ -36,68 +95,137 @@ class ChromaDBRAG:
     Retrieval-Augmented Generation using ChromaDB for document storage and retrieval
     """
 
-    def __init__(self, db_path: str = "./db/chroma", collection_name: str = "pixella"):
+    def __init__(
+        self,
+        db_path: str = "./db/chroma",
+        collection_name: str = DEFAULT_COLLECTION,
+        embeddings: Optional[Any] = None
+    ):
         """
         Initialize ChromaDB RAG system
         
         Args:
             db_path: Path to store ChromaDB data
             collection_name: Name of the collection to use
+            embeddings: Embedding provider to use instead of creating one for the configured model
         """
         self.db_path = db_path
         self.collection_name = collection_name
 
         # Create db directory if it doesn't exist
         Path(db_path).mkdir(parents=True, exist_ok=True)
+        hold_store(db_path) # Maintenance must not compact the store while it is open
 
-        # Initialize ChromaDB client
+        # Initialize ChromaDB client: a shared Chroma server if configured, else the local store
+        self.server_url = get_server_url()
         try:
-            self.client = chromadb.PersistentClient(path=self.db_path)
-            logger.debug("ChromaDB client initialized at %s", self.db_path)
+            if self.server_url:
+                self.client = get_server_client(self.server_url)
+                logger.debug("ChromaDB client connected to %s", self.server_url)
+            else:
+                self.client = open_client(self.db_path, get_shard_count())
+                logger.debug("ChromaDB client initialized at %s", self.db_path)
         except Exception as exc: # Catching specific exception
             logger.error("Failed to initialize ChromaDB: %s", exc)
             raise
 
-        # Initialize embeddings model (using Google Generative AI)
-        try:
-            config = get_config()
-            google_api_key = config.get("GOOGLE_API_KEY")
-            current_embedding_model = get_current_embedding_model()
-            
-            if not google_api_key:
-                raise ValueError("GOOGLE_API_KEY not found in config.")
-
-            self.embeddings = GoogleGenerativeAIEmbeddings(
-                model=current_embedding_model,
-                google_api_key=SecretStr(google_api_key)
-            )
-            logger.debug("Google Generative AI embeddings model: %s", current_embedding_model)
-        except Exception as exc: # Catching specific exception
-            logger.warning("Failed to initialize embeddings: %s", exc)
-            self.embeddings = None
+        # The name may be served by a versioned physical collection after a model change;
+        # its embeddings always come from the model recorded for that collection
+        self.registry = CollectionRegistry(db_path)
+        alias = self.registry.get_alias(collection_name)
+        self.physical_name = alias["physical_name"] if alias else collection_name
+        self.collection_version = alias["version"] if alias else 1
+        current_embedding_model = (alias and alias["embedding_model"]) or get_current_embedding_model()
+        if embeddings is not None:
+            current_embedding_model = getattr(embeddings, "model", None) or current_embedding_model
+        self.reembed_worker: Optional[Any] = None
+        self.alias_version = -1 # Collection version the registry alias was last read at
+        self.write_lock = threading.RLock()
+
+        # Initialize embeddings model (Google Generative AI, or a local/ provider)
+        if embeddings is not None:
+            self.embeddings = embeddings
+        else:
+            try:
+                config = get_config()
+                self.embeddings = create_embeddings(current_embedding_model, config.get("GOOGLE_API_KEY"))
+                logger.debug("Embeddings model: %s", current_embedding_model)
+            except Exception as exc: # Catching specific exception
+                logger.warning("Failed to initialize embeddings: %s", exc)
+                self.embeddings = None
 
         # Get or create collection
         try:
             self.collection = self.client.get_or_create_collection(
-                name=collection_name,
+                name=self.physical_name,
                 metadata={"hnsw:space": "cosine"}
             )
+            if not alias:
+                self.registry.set_alias(
+                    collection_name, self.physical_name, current_embedding_model, self.collection_version
+                )
             logger.debug("Collection '%s' initialized", collection_name)
         except Exception as exc: # Catching specific exception
             logger.error("Failed to get/create collection: %s", exc)
             raise
 
-        # Text splitter for chunking documents
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,
-            chunk_overlap=50,
-            separators=["\n\n", "\n", " ", ""]
+        # Chunking profile: 'auto' picks markdown/code/records/prose splitting per file type
+        self.chunking_profile = get_chunking_profile()
+
+        # Result cache, invalidated through the collection version on every write
+        cache_size, cache_persistent = get_query_cache_settings()
+        if self.server_url:
+            # Clients on other machines write to the server without bumping the versions kept in DB_PATH
+            cache_size, cache_persistent = 0, False
+        self.query_cache = QueryCache(db_path, max_entries=cache_size, persistent=cache_persistent)
+
+        # Trade-off between relevance and diversity of retrieved chunks (1.0 disables MMR)
+        self.mmr_lambda = get_mmr_lambda()
+
+        # Cheap local reranker applied to an over-fetched candidate set before selection
+        self.reranker_name, self.rerank_candidates = get_rerank_settings()
+        try:
+            self.reranker = load_scorer(self.reranker_name)
+        except ValueError as exc:
+            logger.warning("%s, reranking disabled", exc)
+            self.reranker_name, self.reranker = "none", None
+
+        # Alternative phrasings searched together with the query ('off', 'rules' or 'llm')
+        self.query_expansion, self.expansion_variants = get_query_expansion_settings()
+        self.expansion_cache = ExpansionCache(db_path) if self.query_expansion == "llm" else None
+
+        # Decides per chat message whether retrieval is needed at all
+        self.query_gate = QueryGate(get_query_gate_mode(), str(Path(db_path) / GATE_MODEL_FILE))
+
+        # Token budget of the prompt context, filled with hits and their neighbouring chunks
+        self.context_tokens, self.context_neighbors = get_context_settings()
+
+        # In-process vector index: exact NumPy search for small and medium collections,
+        # IVF cells for very large ones, ChromaDB's HNSW in between; optionally
+        # storing a compact encoding of the vectors instead of float32
+        index_mode, numpy_max_chunks = get_vector_index_settings()
+        nlist, nprobe, ivf_min_chunks = get_ivf_settings()
+        reduction, precision = get_vector_storage_settings()
+        if self.server_url:
+            # The server keeps the index loaded for every process; a private copy would bypass it
+            index_mode = "chroma"
+        self.vector_indexes = VectorIndexManager(
+            self, index_mode, numpy_max_chunks, nlist, nprobe, ivf_min_chunks, reduction, precision
         )
 
+        # Keyword index over the same chunks, kept in sync on add/delete
+        self.lexical_index = LexicalIndex(db_path)
+        try:
+            if self.lexical_index.count(collection_name) == 0 and self.collection.count() > 0:
+                self.rebuild_lexical_index()
+        except Exception as exc: # Catching specific exception
+            logger.warning("Failed to backfill lexical index: %s", exc)
+
     def add_documents(self, documents: List[DocumentInput]) -> int:
         """
         Add documents to the collection.
-        Uses batching for efficiency and falls back to individual adds on error.
+        Chunks are produced lazily and embedded/written in bounded batches,
+        falling back to individual adds when a batch fails.
         
         Args:
             documents: List of dicts with 'content' and optional 'metadata' keys
@@ -113,32 +241,201 @@ class ChromaDBRAG:
             logger.error("Embeddings model not initialized. Please ensure GOOGLE_API_KEY is set in your .env file and a valid EMBEDDING_MODEL is selected.")
             return 0
 
-        chunks_to_add = []
-        for idx, doc in enumerate(documents):
-            content = doc.get("content", "")
-            if not content:
-                logger.warning("Document %d has no content, skipping.", idx)
-                continue
+        def iter_records():
+            for idx, doc in enumerate(documents):
+                content = doc.get("content", "")
+                if not content:
+                    logger.warning("Document %d has no content, skipping.", idx)
+                    continue
+                source = doc.get("source") or "unknown"
+                profile = select_profile(source, self.chunking_profile)
+                yield from self._iter_chunk_records(
+                    profile.create_splitter(source, content).split_text(content),
+                    source=source,
+                    metadata={**(doc.get("metadata") or {}), "chunking": profile.name},
+                )
 
-            chunks = self.text_splitter.split_text(content)
-            for chunk_idx, chunk in enumerate(chunks):
-                chunk_hash = hashlib.sha256(chunk.encode('utf-8')).hexdigest()
-                doc_id = f"doc_{chunk_hash}"
-
-                chunks_to_add.append({
-                    "id": doc_id,
-                    "document": chunk,
-                    "metadata": {
-                        **(doc.get("metadata") or {}),
-                        "source": doc.get("source", "unknown"),
-                        "chunk_index": chunk_idx,
-                    }
-                })
+        return self.add_chunk_records(iter_records())
+
+    def _iter_file_blocks(self, file_path: str, block_size: int = FILE_READ_BLOCK_SIZE) -> Iterator[str]:
+        """
+        Read a text file in fixed-size blocks
+        
+        Args:
+            file_path: Path to the file
+            block_size: Number of characters to read per block
+        
+        Yields:
+            Consecutive blocks of the file's text
+        """
+        with open(file_path, 'r', encoding='utf-8') as f:
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    break
+                yield block
+
+    def _split_stream(self, blocks: Iterable[str], splitter: Optional[TextSplitter] = None) -> Iterator[str]:
+        """
+        Split a stream of text blocks into chunks without holding the whole text.
+        The last chunk of every block may have been cut at the block boundary,
+        so its text is carried over and re-split together with the next block.
+        Text the splitter can't cut (a single huge record or line) is cut into
+        HARD_SPLIT_SIZE pieces once it passes MAX_CARRY_OVER, so memory stays bounded.
+        
+        Args:
+            blocks: Iterable of consecutive text blocks
+            splitter: Splitter to use (defaults to the prose profile)
+        
+        Yields:
+            Text chunks in document order
+        """
+        if splitter is None:
+            splitter = select_profile(None, self.chunking_profile).create_splitter()
+        # Splitters that parse their records (JSON) report the unparsed text themselves
+        split_partial = getattr(splitter, "split_partial", None)
+        buffer = ""
+        for block in blocks:
+            buffer += block
+            if split_partial is not None:
+                chunks, buffer = split_partial(buffer)
+                yield from chunks
+            else:
+                chunks = splitter.split_text(buffer)
+                if len(chunks) > 1:
+                    yield from chunks[:-1]
+                    tail_start = buffer.rfind(chunks[-1])
+                    if tail_start != -1:
+                        buffer = buffer[tail_start:]
+                    else:
+                        # The splitter rewrote the chunk (e.g. added a CSV header); keep the
+                        # trailing line break so the next block does not glue two lines together
+                        buffer = chunks[-1] + buffer[len(buffer.rstrip()):]
+                    continue
+
+            if len(buffer) > MAX_CARRY_OVER:
+                cut = len(buffer) - len(buffer) % HARD_SPLIT_SIZE
+                for start in range(0, cut, HARD_SPLIT_SIZE):
+                    yield buffer[start:start + HARD_SPLIT_SIZE]
+                buffer = buffer[cut:]
+
+        if buffer.strip():
+            yield from splitter.split_text(buffer)
+
+    def _iter_chunk_records(
+        self,
+        chunks: Iterable[str],
+        source: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        start_chunk: int = 0,
+        ingested_at: Optional[float] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Turn text chunks into collection records (id, document, metadata)
+        
+        Args:
+            chunks: Text chunks of a single document, in order
+            source: Source/label of the document
+            metadata: Extra metadata stored with every chunk
+            start_chunk: Index of the first chunk to yield (earlier ones were added before)
+            ingested_at: Ingestion time of the document (defaults to now)
+        
+        Yields:
+            Record dicts ready to be embedded and added
+        """
+        if ingested_at is None:
+            ingested_at = time.time()
+        # Chunks of two uploads with the same name, or two pasted texts, must never be taken for neighbours
+        doc_id = hashlib.sha256(
+            f"{source}\0{(metadata or {}).get('path', '')}\0{ingested_at!r}".encode("utf-8")
+        ).hexdigest()[:16]
+        for chunk_idx, chunk in enumerate(chunks):
+            if chunk_idx < start_chunk:
+                continue
+            chunk_hash = hashlib.sha256(chunk.encode('utf-8')).hexdigest()
+            yield {
+                "id": f"doc_{chunk_hash}",
+                "document": chunk,
+                "metadata": {
+                    **(metadata or {}),
+                    "source": source,
+                    "doc_id": doc_id,
+                    "chunk_index": chunk_idx,
+                    "ingested_at": ingested_at,
+                }
+            }
 
-        if not chunks_to_add:
+    def add_chunk_records(
+        self,
+        records: Iterable[Dict[str, Any]],
+        batch_size: int = EMBED_BATCH_SIZE,
+        progress_callback: Optional[Callable[[int], None]] = None
+    ) -> int:
+        """
+        Embed and add records in batches of at most `batch_size`,
+        so peak memory does not depend on the total number of chunks.
+        
+        Args:
+            records: Iterable of dicts with 'id', 'document' and 'metadata' (see `_iter_chunk_records`)
+            batch_size: Maximum number of chunks per embedding request
+            progress_callback: Called after every batch with the number of records it
+                               consumed, so the total is the offset of the next record
+        
+        Returns:
+            Number of chunks added
+        """
+        self.refresh_alias()
+        added_count = 0
+        batch: List[Dict[str, Any]] = []
+        batch_ids = set()
+
+        consumed = 0
+        for record in records:
+            consumed += 1
+            # Identical chunks hash to the same id; Chroma rejects duplicates within one add
+            if record["id"] in batch_ids:
+                continue
+            batch.append(record)
+            batch_ids.add(record["id"])
+            if len(batch) >= batch_size:
+                with self.write_lock:
+                    added_count += self._add_batch(batch)
+                if progress_callback:
+                    progress_callback(consumed)
+                consumed = 0
+                batch = []
+                batch_ids = set()
+
+        if batch or consumed:
+            if batch:
+                with self.write_lock:
+                    added_count += self._add_batch(batch)
+            if progress_callback:
+                progress_callback(consumed)
+
+        logger.info("Successfully added %d document chunks to collection.", added_count)
+        return added_count
+
+    def _add_batch(self, chunks_to_add: List[Dict[str, Any]]) -> int:
+        """
+        Embed and add a single batch of records, skipping those already stored.
+        Falls back to individual adds if the batch fails.
+        
+        Args:
+            chunks_to_add: Record dicts to add
+        
+        Returns:
+            Number of chunks added
+        """
+        if not self.embeddings:
             return 0
 
         try:
+            # Ids are content hashes: chunks stored already are neither embedded again nor a write
+            stored = set(self.collection.get(ids=[c["id"] for c in chunks_to_add], include=[])["ids"])
+            chunks_to_add = [c for c in chunks_to_add if c["id"] not in stored]
+            if not chunks_to_add:
+                return 0
             ids = [c["id"] for c in chunks_to_add]
             docs = [c["document"] for c in chunks_to_add]
             metadatas = [c["metadata"] for c in chunks_to_add]
@@ -151,17 +448,19 @@ class ChromaDBRAG:
                 documents=docs,
                 metadatas=metadatas
             )
+            self.lexical_index.add(self.collection_name, chunks_to_add)
+            self.vector_indexes.commit_write(upserted=(ids, embeddings))
 
-            added_count = len(ids)
-            logger.info("Successfully added %d document chunks to collection.", added_count)
-            return added_count
+            logger.debug("Added batch of %d document chunks.", len(ids))
+            return len(ids)
 
         except Exception as exc: # Catching specific exception
             logger.error(
                 "Batch add failed: %s. Falling back to individual additions.", exc
             )
             # Fallback to adding one by one for resilience
-            added_count = 0
+            added_ids: List[str] = []
+            added_embeddings: List[Any] = []
             for chunk_data in chunks_to_add:
                 try:
                     embedding = self.embeddings.embed_query(chunk_data["document"])
@@ -171,15 +470,19 @@ class ChromaDBRAG:
                         documents=[chunk_data["document"]],
                         metadatas=[chunk_data["metadata"]]
                     )
-                    added_count += 1
+                    self.lexical_index.add(self.collection_name, [chunk_data])
+                    added_ids.append(chunk_data["id"])
+                    added_embeddings.append(embedding)
                 except Exception as inner_exc: # Catching specific exception
                     # Log error for the specific chunk and continue
                     logger.error(
                         "Failed to add individual chunk %s: %s", chunk_data['id'],
                           inner_exc)
 
-            logger.info("Individually added %d chunks after batch failure.", added_count)
-            return added_count
+            if added_ids:
+                self.vector_indexes.commit_write(upserted=(added_ids, added_embeddings))
+            logger.info("Individually added %d chunks after batch failure.", len(added_ids))
+            return len(added_ids)
 
     def add_text(self, text: str, source: str = "user_input") -> int:
         """
@@ -198,37 +501,76 @@ class ChromaDBRAG:
             "metadata": {"type": "user_text"}
         }])
 
-    def add_file(self, file_path: str) -> int:
+    def add_file(
+        self,
+        file_path: str,
+        source: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        progress_callback: Optional[Callable[[int], None]] = None,
+        raise_errors: bool = False,
+        start_chunk: int = 0,
+        ingested_at: Optional[float] = None
+    ) -> int:
         """
-        Add contents of a file to the collection
+        Add contents of a file to the collection.
+        The file is streamed in blocks, so large files are never fully loaded.
         
         Args:
             file_path: Path to the file
+            source: Source label (defaults to the file name)
+            metadata: Metadata stored with every chunk (defaults to type 'file' and the path)
+            progress_callback: Called after every batch with the number of chunks it consumed
+            raise_errors: Raise read/embedding errors instead of logging them and returning 0
+            start_chunk: Skip the chunks before this index, to resume an interrupted ingestion
+            ingested_at: Ingestion time recorded on the chunks (defaults to now; pass the
+                         first run's time when resuming, so the chunks stay one document)
         
         Returns:
             Number of chunks added
         """
+        if not self.embeddings:
+            logger.error("Embeddings model not initialized. Please ensure GOOGLE_API_KEY is set in your .env file and a valid EMBEDDING_MODEL is selected.")
+            return 0
+
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-
-            return self.add_documents([{
-                "content": content,
-                "source": os.path.basename(file_path),
-                "metadata": {"type": "file", "path": file_path}
-            }])
+            blocks = self._iter_file_blocks(file_path)
+            first_block = next(blocks, "")
+            profile = select_profile(file_path, self.chunking_profile)
+            splitter = profile.create_splitter(file_path, first_block)
+
+            def all_blocks() -> Iterator[str]:
+                if first_block:
+                    yield first_block
+                    yield from blocks
+
+            chunks = self._split_stream(all_blocks(), splitter)
+            # The absolute path identifies the file whatever directory maintenance runs from
+            path = str(Path(file_path).expanduser().resolve())
+            return self.add_chunk_records(self._iter_chunk_records(
+                chunks,
+                source=source or os.path.basename(file_path),
+                metadata={**(metadata or {"type": "file", "path": path}), "chunking": profile.name},
+                start_chunk=start_chunk,
+                ingested_at=ingested_at
+            ), progress_callback=progress_callback)
         except FileNotFoundError:
             logger.error(f"Error adding file {file_path}: File not found.")
+            if raise_errors:
+                raise
             return 0
         except Exception as exc: # Catching specific exception
             logger.error(f"Error reading file {file_path}: {exc}")
+            if raise_errors:
+                raise
             return 0
 
     def query(
         self,
         query_text: str,
         top_k: int = 3,
-        threshold: float = 0.5
+        threshold: float = 0.5,
+        mode: Optional[str] = None,
+        filters: Optional[QueryFilters] = None
     ) -> List[Dict[str, Any]]:
         """
         Query the collection for similar documents
@@ -236,96 +578,661 @@ class ChromaDBRAG:
         Args:
             query_text: Text to query
             top_k: Number of top results to return
-            threshold: Similarity threshold (0-1)
+            threshold: Similarity threshold (0-1), applied to vector matches
+            mode: Search mode: 'vector', 'lexical', 'hybrid' (both, fused by rank)
+                  or 'auto' (lexical only for keyword-like queries, otherwise hybrid).
+                  Defaults to RAG_SEARCH_MODE from config.
+            filters: Metadata filters (sources, type, path prefix, ingestion dates),
+                     applied inside ChromaDB before scoring
         
         Returns:
             List of similar documents with metadata and distance
         """
+        return self.retrieve(query_text, top_k, threshold, mode, filters).hits
+
+    def retrieve(
+        self,
+        query_text: str,
+        top_k: int = 3,
+        threshold: float = 0.5,
+        mode: Optional[str] = None,
+        filters: Optional[QueryFilters] = None,
+        context_tokens: Optional[int] = None
+    ) -> RetrievalResult:
+        """
+        Run the retrieval pipeline once, returning hits, formatted context
+        and per-stage timings
+        
+        Args:
+            query_text: Text to query
+            top_k: Number of top results to return
+            threshold: Similarity threshold (0-1), applied to vector matches
+            mode: Search mode (see `query`)
+            filters: Metadata filters (see `query`)
+            context_tokens: Token budget of the context (defaults to RAG_CONTEXT_TOKENS, 0 is unlimited)
+        
+        Returns:
+            RetrievalResult for the query
+        """
+        # Read once per query: it also tells whether the collection may have been swapped
+        version = self.query_cache.get_version(self.collection_name)
+        self.refresh_alias(version)
+        return RetrievalPipeline(self).run(query_text, top_k, threshold, mode, filters, context_tokens, version)
+
+    def resolve_search_mode(self, mode: Optional[str] = None) -> str:
+        """
+        Resolve a requested search mode, falling back to the configured default
+        
+        Args:
+            mode: Requested mode or None
+        
+        Returns:
+            One of SEARCH_MODES
+        """
+        mode = (mode or get_search_mode()).lower()
+        if mode not in SEARCH_MODES:
+            logger.warning("Unknown search mode '%s', using 'hybrid'.", mode)
+            mode = "hybrid"
+        return mode
+
+    def candidate_count(self, top_k: int, mode: str) -> int:
+        """
+        Number of candidates to fetch from the indexes for a final top_k
+        
+        Args:
+            top_k: Number of results wanted
+            mode: Resolved search mode
+        
+        Returns:
+            Number of candidates to search for
+        """
+        factor = HYBRID_FETCH_FACTOR if mode in ("hybrid", "auto") else 1
+        if self.mmr_lambda < 1.0:
+            factor = max(factor, MMR_FETCH_FACTOR)
+        if self.reranker:
+            return max(top_k * factor, self.rerank_candidates)
+        return top_k * factor
+
+    def embed_query(self, query_text: str) -> Optional[List[float]]:
+        """
+        Embed a query
+        
+        Args:
+            query_text: Text to embed
+        
+        Returns:
+            The query embedding, or None if embeddings are unavailable
+        """
         if not self.embeddings:
             logger.error("Embeddings model not initialized. Please ensure GOOGLE_API_KEY is set in your .env file and a valid EMBEDDING_MODEL is selected.")
-            return []
+            return None
 
         try:
-            # Generate query embedding
-            query_embedding = self.embeddings.embed_query(query_text)
+            return self.embeddings.embed_query(query_text)
+        except Exception as exc: # Catching specific exception
+            logger.error("Error embedding query: %s", exc)
+            return None
+
+    def expand_query(self, query_text: str) -> List[str]:
+        """
+        Generate variants of a query for multi-query search
+        
+        Args:
+            query_text: Text to query
+        
+        Returns:
+            The query followed by its variants (only the query when expansion is off)
+        """
+        if self.query_expansion == "rules":
+            return rule_variants(query_text, self.expansion_variants)
+        if self.query_expansion == "llm":
+            return llm_variants(query_text, self.expansion_variants, self.expansion_cache)
+        return [query_text]
+
+    def embed_queries(self, query_texts: List[str]) -> Optional[List[List[float]]]:
+        """
+        Embed several queries in one batched request, as queries rather than documents
+        
+        Args:
+            query_texts: Texts to embed
+        
+        Returns:
+            One embedding per text, or None if embeddings are unavailable
+        """
+        if not self.embeddings:
+            logger.error("Embeddings model not initialized. Please ensure GOOGLE_API_KEY is set in your .env file and a valid EMBEDDING_MODEL is selected.")
+            return None
+
+        try:
+            return embed_queries(self.embeddings, query_texts)
+        except Exception as exc: # Catching specific exception
+            logger.error("Error embedding queries: %s", exc)
+            return None
+
+    def search_candidates(
+        self,
+        query_text: str,
+        query_embedding: Optional[List[float]],
+        fetch_k: int,
+        mode: str,
+        filters: Optional[QueryFilters] = None,
+        variant_embeddings: Optional[List[List[float]]] = None,
+        version: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search the indexes for candidate results
+        
+        Args:
+            query_text: Text to query
+            query_embedding: Query embedding (None skips the vector search)
+            fetch_k: Number of candidates to fetch per index
+            mode: Resolved search mode
+            filters: Metadata filters restricting the searched chunks
+            variant_embeddings: Embeddings of expanded query variants, searched in
+                                the same call as the query and fused by rank
+            version: Collection version read for this query (read again if None)
+        
+        Returns:
+            Candidates ordered best first, each tagged with the 'retriever' that found it
+        """
+        filters = filters or QueryFilters()
+        if mode == "lexical":
+            return self._lexical_search(query_text, fetch_k, filters)
+
+        vector_rankings: List[List[Dict[str, Any]]] = [[]]
+        if query_embedding is not None:
+            where = self.build_where(filters)
+            if where is not None:
+                query_embeddings = [query_embedding] + list(variant_embeddings or [])
+                vector_rankings = self._vector_search_many(query_embeddings, fetch_k, where or None, version)
+        if mode == "vector":
+            return vector_rankings[0] if len(vector_rankings) == 1 else fuse_results(vector_rankings)
+
+        lexical_results = self._lexical_search(query_text, fetch_k, filters)
+        return fuse_results(vector_rankings + [lexical_results])
+
+    def build_where(self, filters: QueryFilters) -> Optional[Dict[str, Any]]:
+        """
+        Translate filters into a ChromaDB `where` clause.
+        Chroma has no string prefix operator, so a path prefix is resolved to
+        the matching paths through the lexical index and pushed down as `$in`.
+        
+        Args:
+            filters: Metadata filters
+        
+        Returns:
+            The where clause ({} when unfiltered), or None if nothing can match
+        """
+        clauses: List[Dict[str, Any]] = []
+        if filters.sources:
+            clauses.append({"source": {"$in": list(filters.sources)}})
+        if filters.doc_type:
+            clauses.append({"type": {"$eq": filters.doc_type}})
+        if filters.path_prefix:
+            paths = self.lexical_index.list_paths(self.collection_name, filters.path_prefix)
+            if not paths:
+                return None
+            clauses.append({"path": {"$in": paths}})
+        if filters.ingested_after is not None:
+            clauses.append({"ingested_at": {"$gte": filters.ingested_after}})
+        if filters.ingested_before is not None:
+            clauses.append({"ingested_at": {"$lte": filters.ingested_before}})
+
+        if not clauses:
+            return {}
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def list_sources(self) -> Dict[str, int]:
+        """
+        List document sources in the collection
+        
+        Returns:
+            Dictionary of source to number of chunks
+        """
+        return self.lexical_index.list_sources(self.collection_name)
+
+    def rerank_results(
+        self,
+        query_text: str,
+        candidates: List[Dict[str, Any]],
+        top_k: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Select the final results from the filtered candidates.
+        Rescores the candidates with the local reranker (if enabled), then
+        picks top_k chunks with maximal marginal relevance, so near-duplicate
+        chunks don't crowd out distinct evidence, then merges chunks that are
+        neighbours in the same source into single passages.
+        
+        Args:
+            query_text: Text that was queried
+            candidates: Filtered candidates, best first
+            top_k: Number of chunks to select
+        
+        Returns:
+            Final results (at most top_k passages)
+        """
+        if self.reranker and len(candidates) > 1:
+            candidates = rerank(query_text, candidates, self.reranker)
+
+        selected = candidates[:top_k]
+        if self.mmr_lambda < 1.0 and len(candidates) > top_k:
+            embeddings = self._candidate_embeddings(candidates)
+            if embeddings is not None:
+                selected = mmr_select(candidates, embeddings, top_k, self.mmr_lambda)
+
+        passages = merge_adjacent_chunks(selected)
+        for passage in passages:
+            passage.pop("embedding", None)
+            passage.pop("rerank_score", None)
+        return passages
+
+    def _candidate_embeddings(self, candidates: List[Dict[str, Any]]) -> Optional[List[List[float]]]:
+        """
+        Collect the stored embedding of every candidate.
+        Keyword matches don't carry one, so those are fetched from ChromaDB in one call.
+        
+        Args:
+            candidates: Candidate results
+        
+        Returns:
+            One embedding per candidate, or None if any is unavailable
+        """
+        missing = [c["id"] for c in candidates if c.get("embedding") is None]
+        fetched: Dict[str, Any] = {}
+        if missing:
+            try:
+                stored = self.collection.get(ids=missing, include=["embeddings"])
+                stored_embeddings = stored.get("embeddings")
+                if stored_embeddings is not None:
+                    fetched = dict(zip(stored.get("ids") or [], stored_embeddings))
+            except Exception as exc: # Catching specific exception
+                logger.warning("Could not fetch candidate embeddings for MMR: %s", exc)
+                return None
+
+        embeddings = []
+        for candidate in candidates:
+            embedding = candidate.get("embedding")
+            if embedding is None:
+                embedding = fetched.get(candidate["id"])
+            if embedding is None:
+                return None
+            embeddings.append(embedding)
+        return embeddings
+
+    def _vector_search(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Embedding similarity search
+        
+        Args:
+            query_embedding: The query embedding
+            top_k: Number of top results to return
+            where: Optional ChromaDB metadata filter
+        
+        Returns:
+            List of results ordered by similarity
+        """
+        return self._vector_search_many([query_embedding], top_k, where)[0]
+
+    def _vector_search_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int,
+        where: Optional[Dict[str, Any]] = None,
+        version: Optional[int] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Embedding similarity search for several queries at once.
+        Unfiltered searches are answered by the in-process index when one serves
+        this collection; filtered searches go to ChromaDB.
+        
+        Args:
+            query_embeddings: The query embeddings
+            top_k: Number of top results per query
+            where: Optional ChromaDB metadata filter
+            version: Collection version read for this query (read again if None)
+        
+        Returns:
+            One list of results per query, ordered by similarity
+        """
+        if not where:
+            try:
+                index = self.vector_indexes.get(version=version)
+                if index is not None:
+                    return self._index_search(index, query_embeddings, top_k)
+            except Exception as exc: # Catching specific exception
+                logger.warning("Vector index search failed, falling back to ChromaDB: %s", exc)
+        return self._chroma_search(query_embeddings, top_k, where)
+
+    def _index_search(
+        self,
+        index: VectorIndex,
+        query_embeddings: List[List[float]],
+        top_k: int
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search an in-process index and load the documents of the hits from ChromaDB in one call
+        
+        Args:
+            index: The vector index
+            query_embeddings: The query embeddings
+            top_k: Number of top results per query
+        
+        Returns:
+            One list of results per query, ordered by similarity
+        """
+        hits_per_query = index.search(query_embeddings, top_k)
+        hit_ids = list(dict.fromkeys(hit[0] for hits in hits_per_query for hit in hits))
+        records: Dict[str, tuple] = {}
+        if hit_ids:
+            stored = self.collection.get(ids=hit_ids, include=["documents", "metadatas"])
+            stored_ids = stored.get("ids") or []
+            documents = stored.get("documents") or [None] * len(stored_ids)
+            metadatas = stored.get("metadatas") or [None] * len(stored_ids)
+            records = {
+                chunk_id: (doc, meta) for chunk_id, doc, meta in zip(stored_ids, documents, metadatas)
+            }
 
+        results = []
+        for hits in hits_per_query:
+            formatted_results = []
+            for chunk_id, similarity, vector in hits:
+                if chunk_id not in records:
+                    continue # Deleted since the index was last synced
+                doc, metadata = records[chunk_id]
+                formatted_results.append({
+                    "id": chunk_id,
+                    "content": doc,
+                    "similarity": similarity,
+                    "distance": 1 - similarity,
+                    "metadata": metadata or {},
+                    "retriever": "vector",
+                    "embedding": vector
+                })
+            results.append(formatted_results)
+        return results
+
+    def _chroma_search(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int,
+        where: Optional[Dict[str, Any]] = None,
+        version: Optional[int] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Embedding similarity search in ChromaDB
+        
+        Args:
+            query_embeddings: The query embeddings
+            top_k: Number of top results per query
+            where: Optional ChromaDB metadata filter
+        
+        Returns:
+            One list of results per query, ordered by similarity
+        """
+        try:
             # Query the collection
             results = self.collection.query(
-                query_embeddings=[query_embedding],
+                query_embeddings=query_embeddings,
                 n_results=top_k,
-                include=["distances", "documents", "metadatas"]
+                where=where,
+                include=["distances", "documents", "metadatas", "embeddings"]
             )
 
             # Safely extract documents, distances, and metadatas
+            ids = results.get("ids")
+            embeddings = results.get("embeddings")
             documents = results.get("documents")
             distances = results.get("distances")
             metadatas = results.get("metadatas")
 
-            if not documents or not documents[0]:
-                logger.debug("No results found for query or documents are empty.")
-                return []
-
-            # Format results
-            formatted_results = []
-            for i, doc in enumerate(documents[0]):
-                # Safely get distance
-                distance = (
-                    distances[0][i]
-                    if distances and distances[0] and len(distances[0]) > i
-                    else 0.0
-                )
-                similarity = 1 - distance  # Convert distance to similarity
-
-                # Skip if below threshold
-                if similarity < threshold:
-                    logger.debug("Skipping result with similarity %f", similarity)
+            all_results = []
+            for q in range(len(query_embeddings)):
+                if not documents or len(documents) <= q or not documents[q]:
+                    logger.debug("No results found for query or documents are empty.")
+                    all_results.append([])
                     continue
 
-                # Safely get metadata
-                metadata = (
-                    metadatas[0][i]
-                    if metadatas and metadatas[0] and len(metadatas[0]) > i
-                    else {}
-                )
+                # Format results
+                formatted_results = []
+                for i, doc in enumerate(documents[q]):
+                    # Safely get distance
+                    distance = (
+                        distances[q][i]
+                        if distances and distances[q] and len(distances[q]) > i
+                        else 0.0
+                    )
+                    similarity = 1 - distance  # Convert distance to similarity
 
-                formatted_results.append({
-                    "content": doc,
-                    "similarity": similarity,
-                    "distance": distance,
-                    "metadata": metadata
-                })
+                    # Safely get metadata
+                    metadata = (
+                        metadatas[q][i]
+                        if metadatas and metadatas[q] and len(metadatas[q]) > i
+                        else {}
+                    )
 
-            logger.debug("Found %d results for query", len(formatted_results))
-            return formatted_results
+                    formatted_results.append({
+                        "id": ids[q][i] if ids and ids[q] else None,
+                        "content": doc,
+                        "similarity": similarity,
+                        "distance": distance,
+                        "metadata": metadata,
+                        "retriever": "vector",
+                        "embedding": embeddings[q][i] if embeddings is not None and len(embeddings[q]) > i else None
+                    })
+
+                logger.debug("Found %d results for query", len(formatted_results))
+                all_results.append(formatted_results)
+            return all_results
 
         except Exception as exc: # Catching specific exception
             logger.error("Error querying collection: %s", exc)
+            return [[] for _ in query_embeddings]
+
+    def warm_up(self) -> float:
+        """
+        Load everything the first query needs: the vector index (in-process and
+        ChromaDB's), the keyword index and, for local models, the embedding model.
+        Remote embedding APIs are not called, so warming up costs no quota.
+        
+        Returns:
+            Seconds spent warming up
+        """
+        started = time.perf_counter()
+        try:
+            sample = self.collection.get(limit=1, include=["embeddings"])
+            embeddings = sample.get("embeddings")
+            if embeddings is not None and len(embeddings):
+                probe = [list(map(float, embeddings[0]))]
+                self._vector_search_many(probe, 1) # Maps the in-process index, or starts building it in the background
+                if self.vector_indexes.index is not None:
+                    self._chroma_search(probe, 1, None) # Filtered searches still use ChromaDB's index
+            self.lexical_index.search(self.collection_name, "warm up", 1)
+            if self.embeddings and is_local_model(self.embedding_model or ""):
+                self.embeddings.embed_query("warm up")
+        except Exception as exc: # Catching specific exception
+            logger.warning("RAG warm-up of '%s' incomplete: %s", self.collection_name, exc)
+        return time.perf_counter() - started
+
+    def _lexical_search(
+        self,
+        query_text: str,
+        top_k: int,
+        filters: Optional[QueryFilters] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        BM25 keyword search in the lexical index
+        
+        Args:
+            query_text: Text to query
+            top_k: Number of top results to return
+            filters: Metadata filters restricting the searched chunks
+        
+        Returns:
+            List of results in the same format as vector results
+        """
+        filters = filters or QueryFilters()
+        hits = self.lexical_index.search(
+            self.collection_name, query_text, top_k,
+            sources=filters.sources,
+            doc_type=filters.doc_type,
+            path_prefix=filters.path_prefix,
+            ingested_after=filters.ingested_after,
+            ingested_before=filters.ingested_before
+        )
+        formatted_results = []
+        for hit in hits:
+            similarity = query_coverage(query_text, hit["content"])
+            formatted_results.append({
+                "id": hit["id"],
+                "content": hit["content"],
+                "similarity": similarity,
+                "distance": 1 - similarity,
+                "coverage": similarity,
+                "metadata": hit["metadata"],
+                "retriever": "lexical"
+            })
+        return formatted_results
+
+    def pack_context(self, hits: List[Dict[str, Any]], budget: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Fit hits into the context token budget, extended with their neighbouring chunks
+        
+        Args:
+            hits: Retrieved passages, best first
+            budget: Token budget (defaults to RAG_CONTEXT_TOKENS, 0 is unlimited)
+        
+        Returns:
+            Passages to put into the prompt
+        """
+        budget = self.context_tokens if budget is None else budget
+        return pack_context(hits, budget, self.fetch_neighbor_chunks, self.context_neighbors)
+
+    def fetch_neighbor_chunks(self, requests: NeighborRequests) -> List[Dict[str, Any]]:
+        """
+        Look up chunks by document and chunk index in a single ChromaDB call
+        
+        Args:
+            requests: Chunk indexes wanted per document (see retrieval.document_key)
+        
+        Returns:
+            The chunks found, as results without a similarity
+        """
+        clauses: List[Dict[str, Any]] = []
+        for key, indices in requests.items():
+            conditions: List[Dict[str, Any]] = [{name: {"$eq": value}} for name, value in key]
+            conditions.append({"chunk_index": {"$in": sorted(indices)}})
+            clauses.append({"$and": conditions})
+        if not clauses:
+            return []
+
+        try:
+            page = self.collection.get(
+                where=clauses[0] if len(clauses) == 1 else {"$or": clauses},
+                include=["documents", "metadatas"]
+            )
+        except Exception as exc: # Catching specific exception
+            logger.warning("Could not fetch neighbouring chunks: %s", exc)
             return []
 
-    def query_with_context(self, query_text: str, top_k: int = 3) -> str:
+        ids = page.get("ids") or []
+        documents = page.get("documents") or [""] * len(ids)
+        metadatas = page.get("metadatas") or [{}] * len(ids)
+        return [
+            {
+                "id": chunk_id,
+                "content": document,
+                "similarity": 0.0,
+                "distance": 1.0,
+                "metadata": metadata or {},
+                "retriever": "neighbor"
+            }
+            for chunk_id, document, metadata in zip(ids, documents, metadatas)
+        ]
+
+    def query_with_context(self, query_text: str, top_k: int = 3, max_tokens: Optional[int] = None) -> str:
         """
         Query and return formatted context for LLM
         
         Args:
             query_text: Text to query
             top_k: Number of top results
+            max_tokens: Token budget of the context (defaults to RAG_CONTEXT_TOKENS, 0 is unlimited)
         
         Returns:
             Formatted context string for use with LLM
         """
-        results = self.query(query_text, top_k)
+        return self.retrieve(query_text, top_k, context_tokens=max_tokens).context
+
+    def import_collection(self, input_path: str, reembed: bool = False) -> int:
+        """
+        Load an export (JSONL, Parquet or the original JSON format) into this collection,
+        writing stored embeddings directly (see collection_io.import_collection)
+        
+        Args:
+            input_path: Export file to load
+            reembed: Re-embed the chunks when the export has no usable embeddings
+                instead of failing
+        
+        Returns:
+            Number of chunks loaded
+        
+        Raises:
+            ValueError: If the export is invalid, or its embeddings do not match
+                this collection and `reembed` is False
+        """
+        return import_collection(self, input_path, reembed=reembed)
 
-        if not results:
-            return ""
+    @property
+    def embedding_model(self) -> Optional[str]:
+        """Name of the embedding model that produced this collection's vectors"""
+        alias = self.registry.get_alias(self.collection_name)
+        if alias and alias["embedding_model"]:
+            return alias["embedding_model"]
+        return getattr(self.embeddings, "model", None) if self.embeddings else None
 
-        context = "## Retrieved Context:\n\n"
-        for i, result in enumerate(results, 1):
-            source = result.get("metadata", {}).get("source", "unknown")
-            similarity = result.get("similarity", 0)
-            context += f"### Source {i}: {source} (Relevance: {similarity:.2%})\n"
-            context += f"{result['content']}\n\n"
+    def ensure_embedding_model(self, model_name: str) -> bool:
+        """
+        Move the collection to another embedding model, re-embedding it in
+        the background if it has documents (see reembed.ensure_embedding_model)
+        
+        Args:
+            model_name: The embedding model to use
+        
+        Returns:
+            True if a background re-embedding is running for the model
+        
+        Raises:
+            ValueError: If the model cannot be initialized (e.g. missing API key)
+        """
+        batch_size, delay = get_reembed_settings()
+        return ensure_embedding_model(self, model_name, batch_size=batch_size, delay=delay)
 
-        return context
+    def refresh_alias(self, version: Optional[int] = None) -> bool:
+        """
+        Follow a collection swap made by another process
+        
+        Args:
+            version: Collection version just read, to skip the registry when it hasn't changed
+        
+        Returns:
+            True if the collection was reopened
+        """
+        return refresh_alias(self, version)
+
+    def reembed_status(self) -> Optional[Dict[str, Any]]:
+        """
+        Get the progress of the background re-embedding, if any
+        
+        Returns:
+            Job dict with target_model, position, total and status, or None
+        """
+        return reembed_status(self)
 
     def get_collection_info(self) -> Dict:
         """
@@ -337,10 +1244,20 @@ class ChromaDBRAG:
         try:
             count = self.collection.count()
             metadata = self.collection.metadata
+            index = self.vector_indexes.index
 
             return {
                 "name": self.collection_name,
                 "count": count,
+                "lexical_count": self.lexical_index.count(self.collection_name),
+                "version": self.query_cache.get_version(self.collection_name),
+                "query_cache": self.query_cache.stats(),
+                "embedding_model": self.embedding_model,
+                "physical_name": self.physical_name,
+                "server": self.server_url,
+                "vector_index": index.index_dir.name if index is not None else "chroma",
+                "reembedding": self.reembed_status(),
+                "warm_up": get_warm_up_status(self.collection_name),
                 "metadata": metadata,
                 "db_path": self.db_path
             }
@@ -348,6 +1265,32 @@ class ChromaDBRAG:
             logger.error("Error getting collection info: %s", exc)
             return {}
 
+    def delete_chunks(self, ids: List[str]) -> int:
+        """
+        Delete chunks from the collection and the keyword index
+        
+        Args:
+            ids: Chunk ids to delete
+        
+        Returns:
+            Number of chunks deleted (ids that are not stored are ignored)
+        """
+        if not ids:
+            return 0
+        batch_size = self.client.get_max_batch_size()
+        deleted: List[str] = []
+        with self.write_lock:
+            for start in range(0, len(ids), batch_size):
+                batch = self.collection.get(ids=ids[start:start + batch_size], include=[])["ids"]
+                if batch:
+                    self.collection.delete(ids=batch)
+                    self.lexical_index.delete(self.collection_name, batch)
+                    deleted.extend(batch)
+            if deleted:
+                self.vector_indexes.commit_write(deleted=deleted)
+        logger.info("Deleted %d chunks from '%s'", len(deleted), self.collection_name)
+        return len(deleted)
+
     def delete_collection(self) -> bool:
         """
         Delete the current collection
@@ -356,12 +1299,16 @@ class ChromaDBRAG:
             True if successful, False otherwise
         """
         try:
-            self.client.delete_collection(name=self.collection_name)
+            cancel_reembedding(self)
+            self.client.delete_collection(name=self.physical_name)
+            self.lexical_index.clear(self.collection_name)
+            self.vector_indexes.remove()
+            self.query_cache.bump_version(self.collection_name)
             logger.info("Deleted collection '%s'", self.collection_name)
 
             # Re-create empty collection
             self.collection = self.client.get_or_create_collection(
-                name=self.collection_name,
+                name=self.physical_name,
                 metadata={"hnsw:space": "cosine"}
             )
             return True
@@ -383,16 +1330,73 @@ class ChromaDBRAG:
             logger.error("Error clearing database: %s", exc)
             return False
 
-    def export_collection(self, output_path: str) -> bool:
+    def rebuild_lexical_index(self) -> int:
         """
-        Export collection data to a file
+        Rebuild the lexical index from the documents stored in ChromaDB
+        
+        Returns:
+            Number of chunks indexed
+        """
+        self.lexical_index.clear(self.collection_name)
+        indexed = 0
+        offset = 0
+        while True:
+            page = self.collection.get(
+                limit=COLLECTION_PAGE_SIZE,
+                offset=offset,
+                include=["documents", "metadatas"]
+            )
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            documents = page.get("documents") or [None] * len(ids)
+            metadatas = page.get("metadatas") or [None] * len(ids)
+            indexed += self.lexical_index.add(self.collection_name, [
+                {"id": chunk_id, "document": doc, "metadata": meta}
+                for chunk_id, doc, meta in zip(ids, documents, metadatas)
+            ])
+            offset += len(ids)
+
+        self.vector_indexes.commit_write()
+        logger.info("Rebuilt lexical index with %d chunks", indexed)
+        return indexed
+
+    def export_collection(
+        self,
+        output_path: str,
+        export_format: Optional[str] = None,
+        include_embeddings: bool = False
+    ) -> bool:
+        """
+        Export collection data to a file.
+        .json files use the original single-document format; .jsonl and
+        .parquet files are streamed page by page in constant memory.
         
         Args:
             output_path: Path to export to
+            export_format: 'json', 'jsonl' or 'parquet' (guessed from the file name if None)
+            include_embeddings: Also export the stored embeddings (jsonl/parquet only)
         
         Returns:
             True if successful, False otherwise
         """
+        if export_format is None and Path(output_path).suffix.lower() != ".json":
+            export_format = detect_export_format(output_path)
+        if export_format and export_format != "json":
+            try:
+                export_collection_pages(
+                    self.collection,
+                    output_path,
+                    embedding_model=self.embedding_model,
+                    export_format=export_format,
+                    include_embeddings=include_embeddings,
+                    page_size=COLLECTION_PAGE_SIZE
+                )
+                return True
+            except Exception as exc: # Catching specific exception
+                logger.error("Error exporting collection: %s", exc)
+                return False
+
         try:
             # Get all documents in collection
             all_docs = self.collection.get()
@@ -417,39 +1421,164 @@ class ChromaDBRAG:
             return False
 
 
-# Global RAG instance
-_RAG_INSTANCE = None # Renamed to conform to UPPER_CASE naming style
+# Open RAG instances by collection name, least recently used first
+_RAG_INSTANCES: "OrderedDict[str, ChromaDBRAG]" = OrderedDict()
+_RAG_LOCK = threading.RLock()
+_REGISTRY: Optional[CollectionRegistry] = None
 
 
-def get_rag() -> Optional[ChromaDBRAG]:
+def get_rag(collection_name: Optional[str] = None) -> Optional[ChromaDBRAG]:
     """
-    Get or create the global RAG instance
+    Get or lazily open the RAG instance of a collection.
+    Open instances are kept in an LRU of at most RAG_MAX_OPEN_COLLECTIONS handles.
+    
+    Args:
+        collection_name: Collection to open (defaults to RAG_COLLECTION from config)
     
     Returns:
         ChromaDBRAG instance or None if initialization fails
     """
-    global _RAG_INSTANCE # Use the renamed global variable
-
     try:
-        if _RAG_INSTANCE is None:
-            config = get_config()
+        config = get_config()
+        name = sanitize_collection_name(collection_name or get_default_collection_name())
+
+        with _RAG_LOCK:
+            if name in _RAG_INSTANCES:
+                if _RAG_INSTANCES[name].server_url:
+                    get_server_client(_RAG_INSTANCES[name].server_url) # Raises if the server went away
+                _RAG_INSTANCES.move_to_end(name)
+                return _RAG_INSTANCES[name]
+
             google_api_key = config.get("GOOGLE_API_KEY")
-            if not google_api_key:
+            if not google_api_key and not is_local_model(get_current_embedding_model()):
                 logger.error("GOOGLE_API_KEY not found in config. RAG cannot be initialized without an API key.")
                 return None
             db_path = config.get("DB_PATH", "./db/chroma")
-            _RAG_INSTANCE = ChromaDBRAG(db_path)
-        return _RAG_INSTANCE
+            rag = ChromaDBRAG(db_path, collection_name=name)
+            get_collection_registry().touch(name)
+            try:
+                # Starts or resumes re-embedding if the model changed since this collection was built
+                rag.ensure_embedding_model(get_current_embedding_model())
+            except Exception as exc: # Catching specific exception
+                logger.warning("Could not move collection '%s' to the current embedding model: %s", name, exc)
+
+            _RAG_INSTANCES[name] = rag
+            # Collections that are re-embedding stay open until their swap is done
+            evictable = [
+                key for key, instance in _RAG_INSTANCES.items()
+                if instance.reembed_worker is None or not instance.reembed_worker.is_alive()
+            ]
+            while len(_RAG_INSTANCES) > get_max_open_collections() and evictable:
+                evicted = evictable.pop(0)
+                del _RAG_INSTANCES[evicted]
+                logger.debug("Closed RAG collection handle '%s'", evicted)
+            return rag
     except Exception as exc: # Catching specific exception
         logger.error("Failed to initialize RAG: %s", exc)
         return None
 
 
+_WARM_UPS: Dict[str, Dict[str, Any]] = {}
+
+
+def start_warm_up(collection_name: Optional[str] = None) -> None:
+    """
+    Open a collection and warm its indexes in a background thread, so the
+    first real query runs at steady-state latency. Runs once per process
+    and collection; queries issued meanwhile wait for the collection to open.
+    
+    Args:
+        collection_name: Collection to warm (defaults to RAG_COLLECTION from config)
+    """
+    name = sanitize_collection_name(collection_name or get_default_collection_name())
+    with _RAG_LOCK:
+        if name in _WARM_UPS:
+            return
+        _WARM_UPS[name] = {"state": "running", "seconds": None}
+
+    def run() -> None:
+        started = time.perf_counter()
+        rag = get_rag(name)
+        if rag is None:
+            _WARM_UPS[name] = {"state": "failed", "seconds": time.perf_counter() - started}
+            return
+        rag.warm_up()
+        seconds = time.perf_counter() - started
+        _WARM_UPS[name] = {"state": "done", "seconds": seconds}
+        logger.info("RAG collection '%s' warmed up in %.2fs", name, seconds)
+
+    threading.Thread(target=run, name=f"rag-warm-up-{name}", daemon=True).start()
+
+
+def get_warm_up_status(collection_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Get the state of a collection's background warm-up
+    
+    Args:
+        collection_name: Collection name (defaults to RAG_COLLECTION from config)
+    
+    Returns:
+        Dict with 'state' (running, done or failed) and 'seconds', or None if it was not warmed up
+    """
+    name = sanitize_collection_name(collection_name or get_default_collection_name())
+    return _WARM_UPS.get(name)
+
+
+def get_rag_for_session(session: Optional[Any]) -> Optional[ChromaDBRAG]:
+    """
+    Get the RAG instance a chat session is routed to.
+    Sessions store their collection under context['rag_collection'];
+    sessions without one use the default collection.
+    
+    Args:
+        session: A memory Session (or None)
+    
+    Returns:
+        ChromaDBRAG instance or None if initialization fails
+    """
+    collection_name = None
+    if session is not None:
+        collection_name = (getattr(session, "context", None) or {}).get("rag_collection")
+    return get_rag(collection_name)
+
+
+def list_rag_collections() -> List[Dict[str, Any]]:
+    """
+    List known RAG collections
+    
+    Returns:
+        Registry entries, each with an 'open' flag for collections with a live handle
+    """
+    with _RAG_LOCK:
+        open_names = set(_RAG_INSTANCES)
+    entries = get_collection_registry().list()
+    for entry in entries:
+        entry["open"] = entry["name"] in open_names
+    return entries
+
+
+def get_collection_registry() -> CollectionRegistry:
+    """
+    Get or create the global collection registry
+    
+    Returns:
+        CollectionRegistry for DB_PATH
+    """
+    global _REGISTRY
+    with _RAG_LOCK:
+        if _REGISTRY is None:
+            config = get_config()
+            _REGISTRY = CollectionRegistry(config.get("DB_PATH", "./db/chroma"))
+        return _REGISTRY
+
+
 def reset_rag():
-    """Reset the global RAG instance"""
+    """Reset all open RAG instances"""
 
-    global _RAG_INSTANCE # Use the renamed global variable
-    _RAG_INSTANCE = None
+    global _REGISTRY
+    with _RAG_LOCK:
+        _RAG_INSTANCES.clear()
+        _REGISTRY = None
 
 
 def list_available_embedding_models() -> dict[str, str]:
@@ -462,6 +1591,7 @@ def list_available_embedding_models() -> dict[str, str]:
     return {
         "models/embedding-001": "Google's default embedding model.",
         "models/text-embedding-004": "Google's latest, optimized embedding model.",
+        **LOCAL_EMBEDDING_MODELS,
     }
 
 
@@ -478,21 +1608,19 @@ def get_current_embedding_model() -> str:
 
 def set_embedding_model(model_name: str) -> None:
     """
-    Set the embedding model in the config.
+    Set the embedding model in the config and move open collections to it.
     
     Args:
         model_name: The name of the model to set
     """
+    # Fail before touching the config if the model cannot be used
+    create_embeddings(model_name, get_config().get("GOOGLE_API_KEY"))
     set_config("EMBEDDING_MODEL", model_name)
-    if _RAG_INSTANCE: # Use the renamed global variable
-        config = get_config()
-        google_api_key = config.get("GOOGLE_API_KEY")
-        if not google_api_key:
-            raise ValueError("GOOGLE_API_KEY not found in config.")
-
-        _RAG_INSTANCE.embeddings = GoogleGenerativeAIEmbeddings(
-            model=model_name,
-            google_api_key=SecretStr(google_api_key)
-        )
-        logger.info("RAG embedding model changed to: %s", model_name)
+    with _RAG_LOCK:
+        open_instances = list(_RAG_INSTANCES.values())
+    # Existing vectors come from the old model: each collection is re-embedded in
+    # the background and swapped over when done. Closed collections follow on next open.
+    for rag in open_instances:
+        rag.ensure_embedding_model(model_name)
+    logger.info("RAG embedding model changed to: %s", model_name)
 
@@ -0,0 +1,403 @@
+"""
+Chunking Module
+
+Per-type chunking profiles for the RAG system. Markdown is split along
+headings, code along class and function definitions, CSV and JSON Lines
+along lines, JSON along the records of its top-level array or object, and
+prose (shell scripts included) by (approximate) token count, so chunks
+follow the structure of each document instead of a fixed character window.
+The profile is chosen from the file extension, or can be forced in config.
+
+"""
+
+import re
+import json
+import time
+import shutil
+import logging
+import tempfile
+from pathlib import Path
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from langchain_text_splitters import Language, RecursiveCharacterTextSplitter, TextSplitter
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+CODE_EXTENSIONS: Dict[str, Language] = {
+    ".py": Language.PYTHON,
+    ".js": Language.JS,
+    ".jsx": Language.JS,
+    ".mjs": Language.JS,
+    ".ts": Language.TS,
+    ".tsx": Language.TS,
+    ".java": Language.JAVA,
+    ".kt": Language.KOTLIN,
+    ".go": Language.GO,
+    ".rs": Language.RUST,
+    ".rb": Language.RUBY,
+    ".php": Language.PHP,
+    ".c": Language.C,
+    ".h": Language.C,
+    ".cpp": Language.CPP,
+    ".hpp": Language.CPP,
+    ".cs": Language.CSHARP,
+    ".swift": Language.SWIFT,
+    ".scala": Language.SCALA,
+    ".lua": Language.LUA,
+}
+MARKDOWN_EXTENSIONS = {".md", ".markdown", ".mdx", ".rst"}
+RECORD_EXTENSIONS = {".csv", ".tsv", ".json", ".jsonl", ".ndjson"}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate the number of model tokens in a text (words plus punctuation)
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Estimated token count
+    """
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut a text after its first max_tokens (approximate) tokens
+
+    Args:
+        text: Text to cut
+        max_tokens: Number of tokens to keep
+
+    Returns:
+        The leading part of the text
+    """
+    if max_tokens <= 0:
+        return ""
+    for count, match in enumerate(_TOKEN_PATTERN.finditer(text), 1):
+        if count == max_tokens:
+            return text[:match.end()]
+    return text
+
+
+class RecordTextSplitter(TextSplitter):
+    """
+    Packs whole records (lines) into chunks, never cutting a record in two.
+    For CSV the header line is repeated at the top of every chunk so each
+    chunk stays self-describing.
+    """
+
+    def __init__(self, header: Optional[str] = None, **kwargs: Any):
+        """
+        Initialize the splitter
+
+        Args:
+            header: Line to prefix every chunk with (e.g. a CSV header)
+            **kwargs: TextSplitter options (chunk_size, length_function, ...)
+        """
+        kwargs.setdefault("chunk_overlap", 0)
+        super().__init__(**kwargs)
+        self.header = header.rstrip("\n") if header else None
+
+    def split_text(self, text: str) -> List[str]:
+        records = [line for line in text.splitlines() if line.strip()]
+        if self.header and records and records[0] == self.header:
+            records = records[1:]
+        return [self._join(records[start:end]) for start, end in self._pack(records)]
+
+    def _pack(self, records: List[str]) -> List[Tuple[int, int]]:
+        """Group consecutive records into chunks of at most chunk_size, as (start, end) index ranges"""
+        groups: List[Tuple[int, int]] = []
+        start = 0
+        size = self._length_function(self.header) if self.header else 0
+        base_size = size
+        for index, record in enumerate(records):
+            record_size = self._length_function(record) + 1
+            if index > start and size + record_size > self._chunk_size:
+                groups.append((start, index))
+                start, size = index, base_size
+            size += record_size
+        if start < len(records):
+            groups.append((start, len(records)))
+        return groups
+
+    def _join(self, records: List[str]) -> str:
+        return "\n".join([self.header, *records] if self.header else records)
+
+
+class JsonRecordSplitter(RecordTextSplitter):
+    """
+    Packs the records of a JSON document into chunks: the items of its
+    top-level array, or the key/value pairs of its top-level object, each
+    serialized on one line. The document is parsed incrementally, so it can
+    be split while it streams in (see `split_partial`); text that is not
+    valid JSON is split by lines.
+    """
+
+    def __init__(self, container: str = "[", **kwargs: Any):
+        """
+        Initialize the splitter
+
+        Args:
+            container: First character of the document, '[' or '{'
+            **kwargs: TextSplitter options (chunk_size, length_function, ...)
+        """
+        super().__init__(**kwargs)
+        self.opener = container
+        self.closer = "}" if container == "{" else "]"
+        self._decoder = json.JSONDecoder()
+
+    def split_text(self, text: str) -> List[str]:
+        records, starts, rest = self._parse(text)
+        chunks = [self._join(records[start:end]) for start, end in self._pack(records)]
+        leftover = text[rest:].strip().rstrip(self.closer).strip()
+        if leftover:
+            chunks.extend(super().split_text(leftover))
+        return chunks
+
+    def split_partial(self, text: str) -> Tuple[List[str], str]:
+        """
+        Split the records completed so far in a document read in blocks.
+        The last chunk may still have room for the next records, so it is
+        left unsplit together with the text that is not parsed yet.
+
+        Args:
+            text: Unsplit text, from the start of the document or from where the previous call stopped
+
+        Returns:
+            Tuple of (chunks, text to split again once the next block is appended to it)
+        """
+        records, starts, _ = self._parse(text)
+        groups = self._pack(records)
+        if len(groups) <= 1:
+            return [], text
+        chunks = [self._join(records[start:end]) for start, end in groups[:-1]]
+        return chunks, text[starts[groups[-1][0]]:]
+
+    def _parse(self, text: str) -> Tuple[List[str], List[int], int]:
+        """
+        Parse the complete records of a document's text. Text returned by
+        `split_partial` starts at the separator before its first record, so
+        only the start of the document begins with the opening bracket.
+
+        Returns:
+            Tuple of (serialized records, offset each record's text starts at, offset parsing stopped at)
+        """
+        records: List[str] = []
+        starts: List[int] = []
+        end = len(text)
+        pos = self._skip_space(text, 0)
+        expect_separator = True
+        if text.startswith(self.opener, pos):
+            pos, expect_separator = pos + 1, False
+        parsed = 0
+        while True:
+            pos = self._skip_space(text, pos)
+            if pos >= end or text[pos] == self.closer:
+                break
+            if expect_separator:
+                if text[pos] != ",":
+                    break # Not JSON, left to the line splitter
+                pos = self._skip_space(text, pos + 1)
+            try:
+                if self.opener == "{":
+                    key, pos = self._decoder.raw_decode(text, pos)
+                    pos = self._skip_space(text, pos)
+                    if not isinstance(key, str) or not text.startswith(":", pos):
+                        break
+                    value, pos = self._decoder.raw_decode(text, self._skip_space(text, pos + 1))
+                    record = {key: value}
+                else:
+                    record, pos = self._decoder.raw_decode(text, pos)
+            except ValueError:
+                break # Incomplete, the rest of the record is in the next block
+            if self._skip_space(text, pos) >= end:
+                break # A number at the end of the text may go on in the next block
+            records.append(json.dumps(record, ensure_ascii=False))
+            starts.append(parsed)
+            parsed, expect_separator = pos, True
+        return records, starts, parsed
+
+    @staticmethod
+    def _skip_space(text: str, pos: int) -> int:
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        return pos
+
+
+@dataclass
+class ChunkingProfile:
+    """A named way of splitting one kind of document"""
+
+    name: str
+    description: str
+    factory: Callable[[Optional[str], str], TextSplitter]
+
+    def create_splitter(self, source: Optional[str] = None, first_block: str = "") -> TextSplitter:
+        """
+        Create a splitter for one document
+
+        Args:
+            source: File name or label of the document (selects the code language)
+            first_block: Start of the document (used to read a CSV header)
+
+        Returns:
+            A text splitter
+        """
+        return self.factory(source, first_block)
+
+
+def _legacy_splitter(source: Optional[str], first_block: str) -> TextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=500,
+        chunk_overlap=50,
+        separators=["\n\n", "\n", " ", ""]
+    )
+
+
+def _prose_splitter(source: Optional[str], first_block: str) -> TextSplitter:
+    # ~256 tokens per chunk, measured in tokens rather than characters
+    return RecursiveCharacterTextSplitter(
+        chunk_size=256,
+        chunk_overlap=24,
+        length_function=estimate_tokens,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+
+
+def _markdown_splitter(source: Optional[str], first_block: str) -> TextSplitter:
+    return RecursiveCharacterTextSplitter.from_language(
+        Language.MARKDOWN,
+        chunk_size=384,
+        chunk_overlap=24,
+        length_function=estimate_tokens
+    )
+
+
+def _code_splitter(source: Optional[str], first_block: str) -> TextSplitter:
+    language = CODE_EXTENSIONS.get(Path(source or "").suffix.lower(), Language.PYTHON)
+    return RecursiveCharacterTextSplitter.from_language(
+        language,
+        chunk_size=512,
+        chunk_overlap=0,
+        length_function=estimate_tokens
+    )
+
+
+def _records_splitter(source: Optional[str], first_block: str) -> TextSplitter:
+    suffix = Path(source or "").suffix.lower()
+    container = first_block.lstrip()[:1]
+    if suffix == ".json" and container in ("[", "{"):
+        return JsonRecordSplitter(container, chunk_size=384, length_function=estimate_tokens)
+    header = None
+    if suffix in (".csv", ".tsv") and first_block:
+        header = first_block.split("\n", 1)[0]
+    return RecordTextSplitter(header=header, chunk_size=384, length_function=estimate_tokens)
+
+
+CHUNKING_PROFILES: Dict[str, ChunkingProfile] = {
+    "prose": ChunkingProfile("prose", "Paragraphs and sentences, ~256 tokens per chunk", _prose_splitter),
+    "markdown": ChunkingProfile("markdown", "Split along headings, ~384 tokens per chunk", _markdown_splitter),
+    "code": ChunkingProfile("code", "Split along class and function definitions", _code_splitter),
+    "records": ChunkingProfile("records", "Whole CSV/JSON records, CSV header repeated per chunk", _records_splitter),
+    "legacy": ChunkingProfile("legacy", "Fixed 500-character windows with 50 overlap", _legacy_splitter),
+}
+
+
+def select_profile(source: Optional[str] = None, override: Optional[str] = None) -> ChunkingProfile:
+    """
+    Pick the chunking profile for a document
+
+    Args:
+        source: File name or label of the document
+        override: Profile name forced by config; 'auto' or None selects by extension
+
+    Returns:
+        The chunking profile
+    """
+    if override and override != "auto":
+        if override in CHUNKING_PROFILES:
+            return CHUNKING_PROFILES[override]
+        logger.warning("Unknown chunking profile '%s', selecting by file type", override)
+
+    suffix = Path(source or "").suffix.lower()
+    if suffix in MARKDOWN_EXTENSIONS:
+        return CHUNKING_PROFILES["markdown"]
+    if suffix in CODE_EXTENSIONS:
+        return CHUNKING_PROFILES["code"]
+    if suffix in RECORD_EXTENSIONS:
+        return CHUNKING_PROFILES["records"]
+    return CHUNKING_PROFILES["prose"]
+
+
+def compare_profiles(
+    files: List[str],
+    queries: Optional[List[str]] = None,
+    profiles: Optional[List[str]] = None,
+    repeats: int = 3
+) -> List[Dict[str, Any]]:
+    """
+    Compare chunking profiles on a set of files: chunk counts and sizes, and
+    ingestion and retrieval latency. Each profile is indexed into a throwaway
+    collection with the offline hashing embeddings, so no API calls are made.
+
+    Args:
+        files: Files to chunk and index
+        queries: Queries to time (defaults to the first line of every file)
+        profiles: Profile names to compare ('auto' picks per file; defaults to auto and legacy)
+        repeats: Times each query is run (timings are averaged)
+
+    Returns:
+        One row per profile with chunks, avg_tokens, max_tokens, ingest_seconds
+        and query_ms
+    """
+    from chromadb_rag import ChromaDBRAG
+    from embeddings import HashingEmbeddings
+
+    profiles = profiles or ["auto", "legacy"]
+    if not queries:
+        queries = []
+        for file_path in files:
+            with open(file_path, "r", encoding="utf-8") as f:
+                first_line = f.readline().strip(" #\n")
+            if first_line:
+                queries.append(first_line[:200])
+
+    rows = []
+    for profile_name in profiles:
+        db_path = tempfile.mkdtemp(prefix="pixella_chunking_")
+        try:
+            rag = ChromaDBRAG(db_path, collection_name="chunking_report", embeddings=HashingEmbeddings())
+            rag.chunking_profile = profile_name
+            rag.query_cache.max_entries = 0 # Time real searches, not cache hits
+
+            started = time.perf_counter()
+            for file_path in files:
+                rag.add_file(file_path)
+            ingest_seconds = time.perf_counter() - started
+
+            documents = rag.collection.get(include=["documents"]).get("documents") or []
+            token_counts = [estimate_tokens(doc) for doc in documents]
+
+            latencies = []
+            for _ in range(max(repeats, 1)):
+                for query_text in queries:
+                    started = time.perf_counter()
+                    rag.query(query_text, top_k=3, threshold=0.0, mode="vector")
+                    latencies.append((time.perf_counter() - started) * 1000)
+
+            rows.append({
+                "profile": profile_name,
+                "chunks": len(documents),
+                "avg_tokens": sum(token_counts) / len(token_counts) if token_counts else 0.0,
+                "max_tokens": max(token_counts, default=0),
+                "ingest_seconds": ingest_seconds,
+                "query_ms": sum(latencies) / len(latencies) if latencies else 0.0,
+            })
+        finally:
+            shutil.rmtree(db_path, ignore_errors=True)
+    return rows
@@ -10,7 +10,7 @@ from httpx import get
 import typer
 import logging
 import sys
-from typing import Optional
+from typing import Dict, Optional
 from pathlib import Path
 from rich.console import Console
 from rich.panel import Panel
@@ -35,8 +35,12 @@ from chromadb_rag import (
     list_available_embedding_models,
     get_current_embedding_model,
     set_embedding_model,
+    start_warm_up,
 )
 from config import get_config, set_config
+from query_gate import retrieve_if_needed
+from rag_settings import get_rag_top_k
+from retrieval import QueryFilters
 
 logger = logging.getLogger(__name__)
 
@@ -217,6 +221,8 @@ def interactive(
     
     Type 'exit', 'quit', or press Ctrl+C to end the session.
     """
+    # Open and warm the RAG index while the session starts, off the first query's path
+    start_warm_up()
     print_header()
     
     if chatbot is None:
@@ -227,22 +233,24 @@ def interactive(
     memory = None
     rag = None
     session = None
+    rag_filters = QueryFilters() # Metadata scope for RAG retrieval
+    last_retrieval = None # Reused by the query gate for follow-ups such as "shorter please"
     debug_mode = debug # Track debug mode state
     should_exit = False
 
     try:
         from memory import get_memory
-        from chromadb_rag import get_rag
+        from chromadb_rag import get_rag_for_session
         
         config = get_config()
         memory_path = config.get("MEMORY_PATH", "./data/memory")
         db_path = config.get("DB_PATH", "./db/chroma")
 
         memory = get_memory()
-        rag = get_rag()
         
         # Create a new session
         session = memory.create_session() if memory else None
+        rag = get_rag_for_session(session)
     except Exception as e:
         logger.warning(f"Could not initialize memory/RAG: {e}")
     
@@ -283,9 +291,23 @@ def interactive(
     get_cli_console().print(quota_warning)
     get_cli_console().print()
     
+    pending_jobs: Dict[str, str] = {} # Ingestion job ID -> file name, reported when finished
+
     try:
         while not should_exit:
             try:
+                # Report background imports that finished since the last prompt
+                if pending_jobs:
+                    from ingest_jobs import get_ingest_queue
+                    for job_id, job_name in list(pending_jobs.items()):
+                        job = get_ingest_queue().get_job(job_id)
+                        if not job or job["status"] == "done":
+                            get_cli_console().print(f"[green]✓ Imported {job['chunks_done'] if job else 0} chunks from {job_name} to RAG.[/green]")
+                            del pending_jobs[job_id]
+                        elif job["status"] == "failed":
+                            get_cli_console().print(f"[red]RAG import of {job_name} failed: {job['error']}[/red]")
+                            del pending_jobs[job_id]
+
                 user_input = Prompt.ask(
                     f"[bold green]{user_name} ({session.session_id if session else 'no session'})[/bold green]",
                     console=get_cli_console()
@@ -336,6 +358,8 @@ def interactive(
                                user_name = config.get("USER_NAME", "User")
                                user_persona = config.get("USER_PERSONA", "")
                                message_count = 0
+                               rag = get_rag_for_session(session)
+                               last_retrieval = None # Belongs to the previous session
                                get_cli_console().print(f"[green]✓ New session created: {session.session_id}[/green]\n")
                             elif subcommand == "name":
                                 if len(session_command_parts) > 1:
@@ -369,6 +393,8 @@ def interactive(
                                        get_cli_console().print(f"[green]✓ Session '{session_id_to_delete}' deleted.[/green]\n")
                                        if session and session.session_id == session_id_to_delete:
                                           session = memory.create_session() # Start a new temporary session
+                                          rag = get_rag_for_session(session)
+                                          last_retrieval = None
                                           get_cli_console().print(f"[yellow]Current session deleted. New temporary session '{session.session_id}' created.[/yellow]\n")
                                        else:
                                           get_cli_console().print(f"[red]Failed to delete session '{session_id_to_delete}'. It might not exist.[/red]\n")
@@ -384,6 +410,8 @@ def interactive(
                                        user_name = config.get("USER_NAME", "User")
                                        user_persona = config.get("USER_PERSONA", "")
                                        message_count = len(session.messages)
+                                       rag = get_rag_for_session(session)
+                                       last_retrieval = None
                                        get_cli_console().print(f"[green]✓ Session loaded: {session.session_id}[/green]\n")
                                     else:
                                        get_cli_console().print(f"[red]Session not found: {session_id_to_load}[/red]\n")
@@ -428,7 +456,7 @@ def interactive(
                             # 2. Unescape spaces (e.g., "doc\ path.doc" -> "doc path.doc")
                             file_path_str = file_path_str.replace('\\ ', ' ')
 
-                            file_path = Path(file_path_str).expanduser()
+                            file_path = Path(file_path_str).expanduser().resolve()
                             
                             if not file_path.exists():
                                 get_cli_console().print(f"[red]File not found: {file_path_str}[/red]\n")
@@ -437,12 +465,25 @@ def interactive(
                             if import_type.lower() == "rag":
                                 if rag:
                                     try:
-                                        count = rag.add_file(str(file_path))
-                                        get_cli_console().print(f"[green]✓ Imported {count} chunks from {file_path.name} to RAG.[/green]\n")
+                                        from ingest_jobs import get_ingest_queue
+                                        job_id = get_ingest_queue().submit_file(str(file_path), collection=rag.collection_name)
+                                        pending_jobs[job_id] = file_path.name
+                                        get_cli_console().print(f"[green]✓ Importing {file_path.name} in the background (job {job_id}). Use /jobs to check progress.[/green]\n")
                                     except Exception as e:
                                         get_cli_console().print(f"[red]RAG import error: {e}[/red]\n")
                                 else:
                                     get_cli_console().print("[yellow]RAG not available for import.[/yellow]\n")
+                            elif import_type.lower() == "restore":
+                                if rag:
+                                    try:
+                                        count = rag.import_collection(str(file_path))
+                                        get_cli_console().print(f"[green]✓ Restored {count} chunks from {file_path.name} into '{rag.collection_name}'.[/green]\n")
+                                    except ValueError as e:
+                                        get_cli_console().print(f"[red]Cannot restore export: {e}[/red]\n[dim]Exports need --embeddings from the same embedding model.[/dim]\n")
+                                    except Exception as e:
+                                        get_cli_console().print(f"[red]RAG restore error: {e}[/red]\n")
+                                else:
+                                    get_cli_console().print("[yellow]RAG not available for import.[/yellow]\n")
                             elif import_type.lower() == "doc":
                                 if chatbot:
                                     try:
@@ -453,11 +494,30 @@ def interactive(
                                 else:
                                     get_cli_console().print("[yellow]Chatbot not available for document import.[/yellow]\n")
                             else:
-                                get_cli_console().print("[red]Invalid import type. Use 'rag' or 'doc'.[/red]\n")
+                                get_cli_console().print("[red]Invalid import type. Use 'rag', 'doc' or 'restore'.[/red]\n")
                         else:
-                            get_cli_console().print("[yellow]Usage: /import [rag|doc] <file_path>[/yellow]\n")
+                            get_cli_console().print("[yellow]Usage: /import [rag|doc|restore] <file_path>[/yellow]\n")
                         continue
                     
+                    # Ingestion jobs command
+                    elif command in ["/jobs", "/j"]:
+                        from ingest_jobs import get_ingest_queue
+                        jobs = get_ingest_queue().list_jobs(limit=10)
+                        if jobs:
+                            table = Table(title="📥 RAG Import Jobs", box=box.ROUNDED, border_style="blue")
+                            table.add_column("Job", style="cyan")
+                            table.add_column("File", style="white")
+                            table.add_column("Collection", style="white")
+                            table.add_column("Status", style="yellow")
+                            table.add_column("Chunks", style="green")
+                            for job in jobs:
+                                status = job["status"] if not job["error"] else f"{job['status']}: {job['error']}"
+                                table.add_row(job["id"], job["source"] or "", job["collection"] or "", status, str(job["chunks_done"]))
+                            get_cli_console().print(table)
+                        else:
+                            get_cli_console().print("[dim]No import jobs yet[/dim]\n")
+                        continue
+
                     # Name command (for user_name)
                     elif command in ["/name", "/n"]:
                         if args:
@@ -470,18 +530,105 @@ def interactive(
                     
                     # RAG info command
                     elif command in ["/rag", "/ra"]:
-                        if rag:
+                        rag_parts = args.split(None, 1)
+                        rag_subcommand = rag_parts[0].lower() if rag_parts else ""
+                        rag_args = rag_parts[1] if len(rag_parts) > 1 else ""
+                        if rag_subcommand == "use":
+                            from chromadb_rag import get_rag
+                            from collection_registry import session_collection_name
+                            if not rag_args:
+                                get_cli_console().print("[yellow]Usage: /rag use <collection|session|default>[/yellow]\n")
+                                continue
+                            if rag_args.lower() == "session":
+                                collection_name = session_collection_name(session.session_id) if session else None
+                            elif rag_args.lower() == "default":
+                                collection_name = None
+                            else:
+                                collection_name = rag_args
+                            new_rag = get_rag(collection_name)
+                            if not new_rag:
+                                get_cli_console().print("[red]Could not open RAG collection[/red]\n")
+                                continue
+                            rag = new_rag
+                            rag_filters = QueryFilters() # Sources differ between collections
+                            last_retrieval = None
+                            if session and memory:
+                                if collection_name:
+                                    session.context["rag_collection"] = rag.collection_name
+                                else:
+                                    session.context.pop("rag_collection", None)
+                                memory.save_session(session)
+                            get_cli_console().print(f"[green]✓ Using RAG collection: {rag.collection_name}[/green]\n")
+                        elif rag_subcommand == "collections":
+                            from chromadb_rag import list_rag_collections
+                            collections = list_rag_collections()
+                            if collections:
+                                table = Table(title="📚 RAG Collections", box=box.ROUNDED, border_style="blue")
+                                table.add_column("Collection", style="cyan")
+                                table.add_column("Last Used", style="green")
+                                table.add_column("Status", style="yellow")
+                                for entry in collections:
+                                    status = "active" if rag and entry["name"] == rag.collection_name else ("open" if entry["open"] else "")
+                                    table.add_row(entry["name"], (entry["last_used_at"] or "")[:19], status)
+                                get_cli_console().print(table)
+                            else:
+                                get_cli_console().print("[dim]No RAG collections yet[/dim]\n")
+                        elif not rag:
+                            get_cli_console().print("[yellow]RAG not available[/yellow]\n")
+                        elif rag_subcommand == "scope":
+                            if rag_args.lower() in ["clear", "all", "none"]:
+                                rag_filters = QueryFilters()
+                                last_retrieval = None # Retrieved under the previous scope
+                                get_cli_console().print("[green]✓ RAG scope cleared, searching all documents[/green]\n")
+                            elif rag_args:
+                                try:
+                                    rag_filters = QueryFilters.parse(rag_args)
+                                    last_retrieval = None
+                                    get_cli_console().print(f"[green]✓ RAG scope set to {rag_filters.describe()}[/green]\n")
+                                except ValueError as e:
+                                    get_cli_console().print(f"[red]Invalid scope: {e}[/red]\n[dim]Dates use YYYY-MM-DD[/dim]\n")
+                            else:
+                                get_cli_console().print(f"[dim]Current RAG scope: {rag_filters.describe()}[/dim]\n")
+                        elif rag_subcommand == "sources":
+                            sources = rag.list_sources()
+                            if sources:
+                                table = Table(title="📄 RAG Sources", box=box.ROUNDED, border_style="blue")
+                                table.add_column("Source", style="cyan")
+                                table.add_column("Chunks", style="green")
+                                for source_name, chunk_count in sources.items():
+                                    table.add_row(source_name, str(chunk_count))
+                                get_cli_console().print(table)
+                            else:
+                                get_cli_console().print("[dim]No documents in RAG[/dim]\n")
+                        elif rag_subcommand:
+                            get_cli_console().print(f"[red]Unknown RAG command: {rag_subcommand}[/red]\n[dim]Usage: /rag [scope|sources|use|collections][/dim]\n")
+                        else:
+                            from reembed import format_reembed_status
                             info = rag.get_collection_info()
+                            reembed_line = ""
+                            if info.get("reembedding"):
+                                reembed_line = f"[cyan]Re-embedding:[/cyan] {format_reembed_status(info['reembedding'])}\n"
+                            warm_up_line = ""
+                            warm_up = info.get("warm_up")
+                            if warm_up and warm_up["state"] == "done":
+                                warm_up_line = f"[cyan]Warm-up:[/cyan] {warm_up['seconds']:.2f}s\n"
+                            elif warm_up:
+                                warm_up_line = f"[cyan]Warm-up:[/cyan] {warm_up['state']}\n"
                             rag_panel = Panel(
                                 f"[cyan]Collection:[/cyan] {info.get('name', 'unknown')}\n"
                                 f"[cyan]Documents:[/cyan] {info.get('count', 0)}\n"
-                                f"[cyan]Path:[/cyan] {info.get('db_path', 'unknown')}",
+                                f"[cyan]Keyword index:[/cyan] {info.get('lexical_count', 0)} chunks\n"
+                                f"[cyan]Query cache:[/cyan] {info.get('query_cache', {}).get('hits', 0)} hits, "
+                                f"{info.get('query_cache', {}).get('misses', 0)} misses\n"
+                                f"[cyan]Embedding model:[/cyan] {info.get('embedding_model', 'unknown')}\n"
+                                f"{reembed_line}"
+                                f"{warm_up_line}"
+                                f"[cyan]Scope:[/cyan] {rag_filters.describe()}\n"
+                                f"[cyan]Path:[/cyan] {info.get('server') or info.get('db_path', 'unknown')}",
                                 title="📚 RAG Status",
                                 border_style="blue"
                             )
                             get_cli_console().print(rag_panel)
-                        else:
-                            get_cli_console().print("[yellow]RAG not available[/yellow]\n")
                         continue
                     
                     # Models command
@@ -529,7 +676,11 @@ def interactive(
                             elif model_type == "embedding":
                                 try:
                                     set_embedding_model(model_name)
-                                    get_cli_console().print(f"[cyan]🧬 Embedding model set to: {model_name}[/cyan]\n")
+                                    get_cli_console().print(f"[cyan]🧬 Embedding model set to: {model_name}[/cyan]")
+                                    if rag and rag.reembed_status():
+                                        get_cli_console().print("[dim]Existing documents are being re-embedded in the background; see /rag for progress.[/dim]\n")
+                                    else:
+                                        get_cli_console().print()
                                 except Exception as e:
                                     handle_error(e, "model switch")
                             else:
@@ -541,17 +692,22 @@ def interactive(
 
                     # Export command
                     elif command in ["/export", "/ex"]:
-                        if args:
+                        export_parts = args.split()
+                        include_embeddings = "--embeddings" in export_parts
+                        export_path = " ".join(part for part in export_parts if part != "--embeddings")
+                        if export_path:
                             try:
                                 if rag:
-                                    rag.export_collection(args)
-                                    get_cli_console().print(f"[green]✓ RAG exported to {args}[/green]\n")
+                                    if rag.export_collection(export_path, include_embeddings=include_embeddings):
+                                        get_cli_console().print(f"[green]✓ RAG exported to {export_path}[/green]\n")
+                                    else:
+                                        get_cli_console().print("[red]Export failed, see logs for details[/red]\n")
                                 else:
                                     get_cli_console().print("[yellow]RAG not available[/yellow]\n")
                             except Exception as e:
                                 get_cli_console().print(f"[red]Export error: {e}[/red]\n")
                         else:
-                            get_cli_console().print("[yellow]Usage: /export <file_path>[/yellow]\n")
+                            get_cli_console().print("[yellow]Usage: /export <file.jsonl|file.parquet|file.json> [--embeddings][/yellow]\n")
                         continue
                     
                     # Stats command
@@ -580,6 +736,7 @@ def interactive(
                     elif command in ["/clear", "/c"]:
                         if session and memory:
                             if memory.clear_session_messages(session.session_id):
+                                last_retrieval = None
                                 get_cli_console().print("[green]✓ Conversation cleared[/green]\n")
                             else:
                                 get_cli_console().print("[red]Failed to clear conversation.[/red]\n")
@@ -607,8 +764,13 @@ def interactive(
 
 [bold cyan]RAG & Documents[/bold cyan]
 [yellow]/rag, /ra[/yellow]            - Show RAG status
-[yellow]/import, /i [type] [file][/yellow] - Import documents (type: rag, doc)
-[yellow]/export, /ex [file][/yellow]  - Export RAG data
+[yellow]/rag scope [filters][/yellow]  - Limit RAG to sources (e.g., notes.md type:file path:/docs since:2024-01-01), 'clear' to reset
+[yellow]/rag sources[/yellow]         - List documents in RAG
+[yellow]/jobs, /j[/yellow]            - Show background RAG import jobs
+[yellow]/rag use <name>[/yellow]      - Switch RAG collection for this session ('session' for a private one, 'default' to reset)
+[yellow]/rag collections[/yellow]     - List RAG collections
+[yellow]/import, /i [type] [file][/yellow] - Import documents (type: rag, doc, restore for RAG exports)
+[yellow]/export, /ex [file][/yellow]  - Export RAG data (.jsonl or .parquet stream in pages, add --embeddings to include vectors)
 
 [bold cyan]System[/bold cyan]
 [yellow]/debug, /d[/yellow]           - Toggle debug mode
@@ -641,9 +803,13 @@ def interactive(
                     # Get RAG context if available
                     rag_context = ""
                     if rag:
-                        results = rag.query(user_input, top_k=2)
-                        if results:
-                            rag_context = rag.query_with_context(user_input, top_k=2)
+                        retrieval, gate = retrieve_if_needed(
+                            rag, user_input, last_retrieval, top_k=get_rag_top_k(), filters=rag_filters
+                        )
+                        if retrieval is not None:
+                            rag_context = retrieval.context
+                            last_retrieval = retrieval
+                            logger.debug(f"RAG retrieval ({gate.action}): {retrieval.describe_timings()}")
                     
                     # Get conversation history
                     history = []
@@ -0,0 +1,423 @@
+"""
+Collection Import/Export Module
+
+Streaming export of RAG collections. The collection is read in pages of
+`limit`/`offset`, and each page is written out before the next is fetched,
+so memory use stays constant regardless of collection size. Exports are
+JSONL (one header line followed by one record per chunk) or Parquet (one
+row group per page, header stored in the schema metadata).
+
+Exports that carry embeddings can be read back in large batches and
+loaded straight into a collection, so restoring or moving an index costs
+disk I/O instead of embedding API calls.
+
+"""
+
+import json
+import time
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMAT = "pixella-rag-export"
+EXPORT_VERSION = 1
+EXPORT_FORMATS = ("jsonl", "parquet")
+DEFAULT_PAGE_SIZE = 1000
+# Chunks per write when loading exports with stored embeddings
+IMPORT_BATCH_SIZE = 5000
+
+# Key of the export header in the Parquet schema metadata
+PARQUET_HEADER_KEY = b"pixella_export"
+
+
+def detect_export_format(path: str) -> str:
+    """
+    Guess the export format from a file name
+
+    Args:
+        path: Export file path
+
+    Returns:
+        'parquet' for .parquet/.pq files, 'jsonl' otherwise
+    """
+    return "parquet" if Path(path).suffix.lower() in (".parquet", ".pq") else "jsonl"
+
+
+def iter_collection_pages(
+    collection: Any,
+    include_embeddings: bool = False,
+    page_size: int = DEFAULT_PAGE_SIZE
+) -> Iterator[Dict[str, List[Any]]]:
+    """
+    Walk a ChromaDB collection page by page
+
+    Args:
+        collection: ChromaDB collection
+        include_embeddings: Also fetch the stored embeddings
+        page_size: Number of chunks per page
+
+    Yields:
+        Dicts with 'ids', 'documents', 'metadatas' and, if requested, 'embeddings'
+    """
+    include = ["documents", "metadatas"]
+    if include_embeddings:
+        include.append("embeddings")
+
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=include)
+        ids = page.get("ids") or []
+        if not ids:
+            return
+        embeddings = page.get("embeddings") if include_embeddings else None
+        yield {
+            "ids": ids,
+            "documents": page.get("documents") or [None] * len(ids),
+            "metadatas": page.get("metadatas") or [None] * len(ids),
+            "embeddings": embeddings if embeddings is not None else [None] * len(ids),
+        }
+        offset += len(ids)
+
+
+def build_export_header(
+    collection_name: str,
+    count: int,
+    embedding_model: Optional[str],
+    dimension: Optional[int],
+    include_embeddings: bool
+) -> Dict[str, Any]:
+    """
+    Build the header written at the start of every export
+
+    Args:
+        collection_name: Name of the exported collection
+        count: Number of chunks in the collection
+        embedding_model: Model that produced the stored embeddings
+        dimension: Embedding dimension (None if no embeddings were found)
+        include_embeddings: Whether the records carry embeddings
+
+    Returns:
+        Header dictionary
+    """
+    return {
+        "format": EXPORT_FORMAT,
+        "version": EXPORT_VERSION,
+        "collection": collection_name,
+        "count": count,
+        "embedding_model": embedding_model,
+        "dimension": dimension,
+        "include_embeddings": include_embeddings,
+        "exported_at": time.time(),
+    }
+
+
+def _first_dimension(page: Dict[str, List[Any]]) -> Optional[int]:
+    for embedding in page["embeddings"]:
+        if embedding is not None:
+            return len(embedding)
+    return None
+
+
+def export_collection_pages(
+    collection: Any,
+    output_path: str,
+    embedding_model: Optional[str] = None,
+    export_format: Optional[str] = None,
+    include_embeddings: bool = False,
+    page_size: int = DEFAULT_PAGE_SIZE
+) -> int:
+    """
+    Stream a collection to a JSONL or Parquet file
+
+    Args:
+        collection: ChromaDB collection
+        output_path: File to write
+        embedding_model: Model that produced the stored embeddings (recorded in the header)
+        export_format: 'jsonl' or 'parquet' (guessed from the file name if None)
+        include_embeddings: Write embeddings as float32 vectors
+        page_size: Number of chunks fetched and written at a time
+
+    Returns:
+        Number of chunks exported
+
+    Raises:
+        ValueError: If the format is unknown
+        ImportError: If Parquet is requested and pyarrow is not installed
+    """
+    export_format = export_format or detect_export_format(output_path)
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+
+    pages = iter_collection_pages(collection, include_embeddings, page_size)
+    # The header needs the embedding dimension, so look at the first page up front
+    first_page = next(pages, None)
+    dimension = _first_dimension(first_page) if first_page and include_embeddings else None
+    header = build_export_header(
+        collection.name, collection.count(), embedding_model, dimension, include_embeddings
+    )
+
+    def all_pages() -> Iterator[Dict[str, List[Any]]]:
+        if first_page:
+            yield first_page
+            yield from pages
+
+    if export_format == "parquet":
+        exported = _write_parquet(output_path, header, all_pages())
+    else:
+        exported = _write_jsonl(output_path, header, all_pages())
+    logger.info("Exported %d chunks of '%s' to %s", exported, collection.name, output_path)
+    return exported
+
+
+def _write_jsonl(output_path: str, header: Dict[str, Any], pages: Iterator[Dict[str, List[Any]]]) -> int:
+    exported = 0
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"type": "header", **header}) + "\n")
+        for page in pages:
+            lines = []
+            for chunk_id, document, metadata, embedding in zip(
+                page["ids"], page["documents"], page["metadatas"], page["embeddings"]
+            ):
+                record: Dict[str, Any] = {"id": chunk_id, "document": document, "metadata": metadata}
+                if header["include_embeddings"] and embedding is not None:
+                    record["embedding"] = [float(value) for value in embedding]
+                lines.append(json.dumps(record))
+            f.write("\n".join(lines) + "\n")
+            exported += len(lines)
+    return exported
+
+
+def _write_parquet(output_path: str, header: Dict[str, Any], pages: Iterator[Dict[str, List[Any]]]) -> int:
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    fields = [
+        pa.field("id", pa.string()),
+        pa.field("document", pa.string()),
+        # Chroma metadata differs per chunk, so it is kept as a JSON string
+        pa.field("metadata", pa.string()),
+    ]
+    dimension = header["dimension"]
+    if header["include_embeddings"] and dimension:
+        fields.append(pa.field("embedding", pa.list_(pa.float32(), dimension)))
+    schema = pa.schema(fields, metadata={PARQUET_HEADER_KEY: json.dumps(header).encode("utf-8")})
+
+    exported = 0
+    with pq.ParquetWriter(output_path, schema) as writer:
+        for page in pages:
+            columns = [
+                pa.array(page["ids"], pa.string()),
+                pa.array(page["documents"], pa.string()),
+                pa.array([json.dumps(meta) if meta is not None else None for meta in page["metadatas"]], pa.string()),
+            ]
+            if len(fields) == 4:
+                flat = np.asarray(page["embeddings"], dtype=np.float32).reshape(-1)
+                columns.append(pa.FixedSizeListArray.from_arrays(pa.array(flat, pa.float32()), dimension))
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            exported += len(page["ids"])
+    return exported
+
+
+def read_export_header(path: str) -> Dict[str, Any]:
+    """
+    Read the header of an export file
+
+    Args:
+        path: Export file (.jsonl, .parquet or the original .json format)
+
+    Returns:
+        Header dictionary; the original .json format gets a synthesized
+        header without embeddings
+
+    Raises:
+        ValueError: If the file is not a Pixella export
+    """
+    if Path(path).suffix.lower() == ".json":
+        # The original format has no header and no embeddings
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if "documents" not in data:
+            raise ValueError(f"{path} is not a RAG export")
+        return build_export_header(data.get("collection", ""), data.get("count", 0), None, None, False)
+
+    if detect_export_format(path) == "parquet":
+        import pyarrow.parquet as pq
+        metadata = pq.read_schema(path).metadata or {}
+        if PARQUET_HEADER_KEY not in metadata:
+            raise ValueError(f"{path} is not a RAG export")
+        header = json.loads(metadata[PARQUET_HEADER_KEY])
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+
+    if header.get("format") != EXPORT_FORMAT:
+        raise ValueError(f"{path} is not a RAG export")
+    if header.get("version", 0) > EXPORT_VERSION:
+        raise ValueError(f"Export version {header.get('version')} is newer than supported ({EXPORT_VERSION})")
+    return header
+
+
+def validate_export_header(
+    header: Dict[str, Any],
+    embedding_model: Optional[str],
+    dimension: Optional[int] = None
+) -> None:
+    """
+    Check that the embeddings of an export can be loaded as they are
+
+    Args:
+        header: Header from `read_export_header`
+        embedding_model: Embedding model of the target collection
+        dimension: Embedding dimension of the target collection, if known
+
+    Raises:
+        ValueError: If the export has no embeddings, or they come from a
+            different model or have a different dimension
+    """
+    if not header.get("include_embeddings") or not header.get("dimension"):
+        raise ValueError("Export has no stored embeddings")
+    if embedding_model and header.get("embedding_model") != embedding_model:
+        raise ValueError(
+            f"Export was embedded with {header.get('embedding_model')}, "
+            f"but the collection uses {embedding_model}"
+        )
+    if dimension and header["dimension"] != dimension:
+        raise ValueError(
+            f"Export embeddings have {header['dimension']} dimensions, "
+            f"but the collection uses {dimension}"
+        )
+
+
+def iter_export_batches(path: str, batch_size: int = DEFAULT_PAGE_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Read the records of an export in batches
+
+    Args:
+        path: Export file (.jsonl, .parquet or the original .json format)
+        batch_size: Number of records per batch
+
+    Yields:
+        Lists of record dicts with 'id', 'document', 'metadata' and,
+        when stored, 'embedding'
+    """
+    if Path(path).suffix.lower() == ".json":
+        with open(path, "r", encoding="utf-8") as f:
+            documents = json.load(f)["documents"]
+        records = [
+            {"id": chunk_id, "document": document, "metadata": metadata}
+            for chunk_id, document, metadata in zip(
+                documents.get("ids", []), documents.get("documents", []), documents.get("metadatas", [])
+            )
+        ]
+        for start in range(0, len(records), batch_size):
+            yield records[start:start + batch_size]
+        return
+
+    if detect_export_format(path) == "parquet":
+        yield from _iter_parquet_batches(path, batch_size)
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        f.readline() # Header
+        batch: List[Dict[str, Any]] = []
+        for line in f:
+            if not line.strip():
+                continue
+            batch.append(json.loads(line))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def _iter_parquet_batches(path: str, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    for record_batch in parquet_file.iter_batches(batch_size=batch_size):
+        columns = record_batch.schema.names
+        ids = record_batch.column(columns.index("id")).to_pylist()
+        documents = record_batch.column(columns.index("document")).to_pylist()
+        metadatas = record_batch.column(columns.index("metadata")).to_pylist()
+        embeddings: List[Any] = [None] * len(ids)
+        if "embedding" in columns:
+            embedding_column = record_batch.column(columns.index("embedding"))
+            dimension = embedding_column.type.list_size
+            # One contiguous float32 matrix per batch instead of a Python list per value
+            embeddings = list(embedding_column.flatten().to_numpy().reshape(-1, dimension))
+        yield [
+            {
+                "id": chunk_id,
+                "document": document,
+                "metadata": json.loads(metadata) if metadata else None,
+                "embedding": embedding,
+            }
+            for chunk_id, document, metadata, embedding in zip(ids, documents, metadatas, embeddings)
+        ]
+
+
+def import_collection(rag: Any, input_path: str, reembed: bool = False) -> int:
+    """
+    Load an export (JSONL, Parquet or the original JSON format) into a collection.
+    Stored embeddings are written directly in large batches, without embedding calls;
+    the export header must name the same embedding model and dimension.
+
+    Args:
+        rag: The ChromaDBRAG instance of the collection
+        input_path: Export file to load
+        reembed: Re-embed the chunks when the export has no usable embeddings
+            instead of failing
+
+    Returns:
+        Number of chunks loaded
+
+    Raises:
+        ValueError: If the export is invalid, or its embeddings do not match
+            the collection and `reembed` is False
+    """
+    header = read_export_header(input_path)
+    dimension = None
+    if rag.collection.count():
+        sample = rag.collection.get(limit=1, include=["embeddings"])
+        sample_embeddings = sample.get("embeddings")
+        if sample_embeddings is not None and len(sample_embeddings):
+            dimension = len(sample_embeddings[0])
+
+    try:
+        validate_export_header(header, rag.embedding_model, dimension)
+    except ValueError as exc:
+        if not reembed:
+            raise
+        if not rag.embeddings:
+            raise ValueError("Embeddings model not initialized, cannot re-embed the export") from exc
+        logger.info("Re-embedding export %s: %s", input_path, exc)
+        records = (
+            record for batch in iter_export_batches(input_path) for record in batch
+        )
+        return rag.add_chunk_records(
+            {"id": r["id"], "document": r["document"], "metadata": r["metadata"]} for r in records
+        )
+
+    batch_size = min(IMPORT_BATCH_SIZE, rag.client.get_max_batch_size())
+    loaded = 0
+    for batch in iter_export_batches(input_path, batch_size):
+        ids = [record["id"] for record in batch]
+        embeddings = [record["embedding"] for record in batch]
+        with rag.write_lock:
+            rag.collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                documents=[record["document"] for record in batch],
+                metadatas=[record["metadata"] for record in batch]
+            )
+            rag.lexical_index.add(rag.collection_name, batch)
+            rag.vector_indexes.commit_write(upserted=(ids, embeddings))
+        loaded += len(batch)
+        logger.debug("Loaded %d/%d chunks from %s", loaded, header.get("count", 0), input_path)
+
+    logger.info("Imported %d chunks from %s", loaded, input_path)
+    return loaded
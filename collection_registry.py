@@ -0,0 +1,337 @@
+"""
+Collection Registry Module
+
+Names of the RAG collections (per project, user or session) and the
+registry recording them next to the ChromaDB data. The registry also maps
+each collection name to the versioned physical ChromaDB collection and
+embedding model serving it, and tracks background re-embedding jobs.
+
+"""
+
+import re
+import time
+import sqlite3
+import logging
+from pathlib import Path
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def sanitize_collection_name(name: str) -> str:
+    """
+    Turn an arbitrary label into a valid ChromaDB collection name
+    (3-512 characters of [a-zA-Z0-9._-], starting and ending alphanumeric).
+    
+    Args:
+        name: Requested name (project, user or session label)
+    
+    Returns:
+        A valid collection name
+    """
+    cleaned = re.sub(r"[^a-zA-Z0-9._-]+", "_", name.strip())
+    cleaned = re.sub(r"^[^a-zA-Z0-9]+|[^a-zA-Z0-9]+$", "", cleaned)[:512]
+    if len(cleaned) < 3:
+        cleaned = f"col_{cleaned or 'default'}"
+    return cleaned
+
+
+def session_collection_name(session_id: str) -> str:
+    """
+    Name of the private RAG namespace of a chat session
+    
+    Args:
+        session_id: The session ID
+    
+    Returns:
+        Collection name for the session
+    """
+    return sanitize_collection_name(f"session_{session_id}")
+
+
+class CollectionRegistry:
+    """
+    Registry of named RAG collections (per project, user or session),
+    stored next to the ChromaDB data. It also maps each collection name to
+    the physical ChromaDB collection and embedding model currently serving
+    it, and tracks background re-embedding jobs.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Initialize the registry
+        
+        Args:
+            db_path: Directory holding the RAG data
+        """
+        Path(db_path).mkdir(parents=True, exist_ok=True)
+        self.db_path = Path(db_path) / "collections.db"
+        self._init_database()
+
+    def _init_database(self):
+        """Create the registry table"""
+        try:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS collections (
+                    name TEXT PRIMARY KEY,
+                    description TEXT,
+                    created_at TEXT,
+                    last_used_at TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS collection_aliases (
+                    name TEXT PRIMARY KEY,
+                    physical_name TEXT NOT NULL,
+                    embedding_model TEXT,
+                    version INTEGER NOT NULL,
+                    updated_at TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS reembed_jobs (
+                    name TEXT PRIMARY KEY,
+                    target_name TEXT NOT NULL,
+                    target_model TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    total INTEGER,
+                    status TEXT,
+                    error TEXT,
+                    updated_at TEXT,
+                    owner TEXT,
+                    heartbeat REAL
+                )
+            """)
+            # Registries created before jobs had an owner lease
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(reembed_jobs)")}
+            for column, column_type in (("owner", "TEXT"), ("heartbeat", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE reembed_jobs ADD COLUMN {column} {column_type}")
+            conn.commit()
+            conn.close()
+        except Exception as exc: # Catching specific exception
+            logger.error("Error initializing collection registry: %s", exc)
+            raise
+
+    def touch(self, name: str, description: str = "") -> None:
+        """
+        Register a collection, or mark an existing one as used
+        
+        Args:
+            name: Collection name
+            description: Description stored on first registration
+        """
+        now = datetime.now().isoformat()
+        try:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("""
+                INSERT INTO collections (name, description, created_at, last_used_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET last_used_at = excluded.last_used_at
+            """, (name, description, now, now))
+            conn.commit()
+            conn.close()
+        except Exception as exc: # Catching specific exception
+            logger.error("Error registering collection %s: %s", name, exc)
+
+    def remove(self, name: str) -> None:
+        """
+        Remove a collection from the registry
+        
+        Args:
+            name: Collection name
+        """
+        try:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("DELETE FROM collections WHERE name = ?", (name,))
+            conn.commit()
+            conn.close()
+        except Exception as exc: # Catching specific exception
+            logger.error("Error removing collection %s from registry: %s", name, exc)
+
+    def get_alias(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the physical collection serving a collection name
+        
+        Args:
+            name: Collection name
+        
+        Returns:
+            Dict with physical_name, embedding_model and version, or None if not recorded
+        """
+        try:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            row = conn.execute("""
+                SELECT physical_name, embedding_model, version FROM collection_aliases WHERE name = ?
+            """, (name,)).fetchone()
+            conn.close()
+        except Exception as exc: # Catching specific exception
+            logger.error("Error reading alias of collection %s: %s", name, exc)
+            return None
+        if not row:
+            return None
+        return {"physical_name": row[0], "embedding_model": row[1], "version": row[2]}
+
+    def set_alias(self, name: str, physical_name: str, embedding_model: Optional[str], version: int) -> None:
+        """
+        Point a collection name at a physical collection (a single atomic write)
+        
+        Args:
+            name: Collection name
+            physical_name: ChromaDB collection now serving the name
+            embedding_model: Model that produced its embeddings
+            version: Version number of the physical collection
+        """
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        try:
+            conn.execute("""
+                INSERT OR REPLACE INTO collection_aliases (name, physical_name, embedding_model, version, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (name, physical_name, embedding_model, version, datetime.now().isoformat()))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_reembed_job(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the re-embedding job of a collection
+        
+        Args:
+            name: Collection name
+        
+        Returns:
+            Job dict, or None if no job is recorded
+        """
+        try:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM reembed_jobs WHERE name = ?", (name,)).fetchone()
+            conn.close()
+        except Exception as exc: # Catching specific exception
+            logger.error("Error reading re-embedding job of %s: %s", name, exc)
+            return None
+        return dict(row) if row else None
+
+    def claim_reembed_job(self, job: Dict[str, Any], owner: str, lease_seconds: float) -> bool:
+        """
+        Take the lease of a collection's re-embedding job, recording the job
+        if none exists. Only one process at a time may work on a job; a lease
+        whose heartbeat is older than `lease_seconds` belongs to a dead process.
+        
+        Args:
+            job: Job dict with the reembed_jobs columns, stored only if no job is recorded
+            owner: Identifier of the claiming worker
+            lease_seconds: Age after which another owner's lease can be taken over
+        
+        Returns:
+            True if the caller now holds the lease
+        """
+        now = time.time()
+        try:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            cursor = conn.execute("""
+                INSERT INTO reembed_jobs
+                    (name, target_name, target_model, version, position, total, status, error, updated_at, owner, heartbeat)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, heartbeat = excluded.heartbeat
+                WHERE reembed_jobs.owner IS NULL OR reembed_jobs.owner = excluded.owner
+                    OR reembed_jobs.heartbeat IS NULL OR reembed_jobs.heartbeat < ?
+            """, (
+                job["name"], job["target_name"], job["target_model"], job["version"], job["position"],
+                job.get("total"), job.get("status"), job.get("error"), datetime.now().isoformat(), owner, now,
+                now - lease_seconds
+            ))
+            claimed = cursor.rowcount == 1
+            conn.commit()
+            conn.close()
+            return claimed
+        except Exception as exc: # Catching specific exception
+            logger.error("Error claiming re-embedding job of %s: %s", job.get("name"), exc)
+            return False
+
+    def save_reembed_job(self, job: Dict[str, Any]) -> bool:
+        """
+        Update a re-embedding job and renew its lease, if the job's owner still holds it
+        
+        Args:
+            job: Job dict with the reembed_jobs columns, including the 'owner' holding the lease
+        
+        Returns:
+            False if the lease was lost to another process
+        """
+        try:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            cursor = conn.execute("""
+                UPDATE reembed_jobs SET target_name = ?, target_model = ?, version = ?, position = ?,
+                    total = ?, status = ?, error = ?, updated_at = ?, heartbeat = ?
+                WHERE name = ? AND owner = ?
+            """, (
+                job["target_name"], job["target_model"], job["version"], job["position"], job.get("total"),
+                job.get("status"), job.get("error"), datetime.now().isoformat(), time.time(),
+                job["name"], job["owner"]
+            ))
+            saved = cursor.rowcount == 1
+            conn.commit()
+            conn.close()
+            return saved
+        except Exception as exc: # Catching specific exception
+            logger.error("Error saving re-embedding job of %s: %s", job.get("name"), exc)
+            return True # Keep working; the next save renews the lease
+
+    def release_reembed_job(self, name: str, owner: str) -> None:
+        """
+        Give up the lease of a re-embedding job, so any process can resume it
+        
+        Args:
+            name: Collection name
+            owner: Identifier of the worker holding the lease
+        """
+        try:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute(
+                "UPDATE reembed_jobs SET owner = NULL, heartbeat = NULL WHERE name = ? AND owner = ?", (name, owner)
+            )
+            conn.commit()
+            conn.close()
+        except Exception as exc: # Catching specific exception
+            logger.error("Error releasing re-embedding job of %s: %s", name, exc)
+
+    def delete_reembed_job(self, name: str) -> None:
+        """
+        Remove the re-embedding job of a collection
+        
+        Args:
+            name: Collection name
+        """
+        try:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("DELETE FROM reembed_jobs WHERE name = ?", (name,))
+            conn.commit()
+            conn.close()
+        except Exception as exc: # Catching specific exception
+            logger.error("Error deleting re-embedding job of %s: %s", name, exc)
+
+    def list(self) -> List[Dict[str, Any]]:
+        """
+        List registered collections, most recently used first
+        
+        Returns:
+            List of dicts with name, description, created_at and last_used_at
+        """
+        try:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            rows = conn.execute("""
+                SELECT name, description, created_at, last_used_at
+                FROM collections ORDER BY last_used_at DESC
+            """).fetchall()
+            conn.close()
+        except Exception as exc: # Catching specific exception
+            logger.error("Error listing collections: %s", exc)
+            return []
+        return [
+            {"name": row[0], "description": row[1], "created_at": row[2], "last_used_at": row[3]}
+            for row in rows
+        ]
@@ -87,6 +87,162 @@ CONFIG_TEMPLATE = {
         "default": "models/embedding-001",
         "required": False
     },
+    "rag_chunking_profile": {
+        "env_name": "RAG_CHUNKING_PROFILE",
+        "description": "RAG chunking: auto (by file type), prose, markdown, code, records or legacy",
+        "default": "legacy",
+        "required": False
+    },
+    "rag_search_mode": {
+        "env_name": "RAG_SEARCH_MODE",
+        "description": "RAG search mode: auto, hybrid, vector or lexical",
+        "default": "vector",
+        "required": False
+    },
+    "rag_query_cache_size": {
+        "env_name": "RAG_QUERY_CACHE_SIZE",
+        "description": "Number of RAG query results to cache (0 disables the cache)",
+        "default": "256",
+        "required": False
+    },
+    "rag_query_cache_persist": {
+        "env_name": "RAG_QUERY_CACHE_PERSIST",
+        "description": "Keep cached RAG query results on disk across restarts",
+        "default": "false",
+        "required": False
+    },
+    "rag_mmr_lambda": {
+        "env_name": "RAG_MMR_LAMBDA",
+        "description": "RAG relevance vs. diversity trade-off (0-1, 1 disables diversification)",
+        "default": "1.0",
+        "required": False
+    },
+    "rag_top_k": {
+        "env_name": "RAG_TOP_K",
+        "description": "Number of RAG chunks put into the prompt",
+        "default": "2",
+        "required": False
+    },
+    "rag_query_expansion": {
+        "env_name": "RAG_QUERY_EXPANSION",
+        "description": "Search rephrased variants of each RAG query too (off, rules or llm)",
+        "default": "off",
+        "required": False
+    },
+    "rag_expansion_variants": {
+        "env_name": "RAG_EXPANSION_VARIANTS",
+        "description": "Number of queries searched per RAG query when expansion is on, including the original",
+        "default": "3",
+        "required": False
+    },
+    "rag_query_gate": {
+        "env_name": "RAG_QUERY_GATE",
+        "description": "Skip or reuse RAG retrieval for messages that don't need it (heuristic, classifier or off)",
+        "default": "off",
+        "required": False
+    },
+    "rag_context_tokens": {
+        "env_name": "RAG_CONTEXT_TOKENS",
+        "description": "Token budget of the RAG context put into the prompt (0 for unlimited)",
+        "default": "1500",
+        "required": False
+    },
+    "rag_context_neighbors": {
+        "env_name": "RAG_CONTEXT_NEIGHBORS",
+        "description": "Neighbouring chunks added on each side of a retrieved chunk when the budget allows",
+        "default": "1",
+        "required": False
+    },
+    "rag_reranker": {
+        "env_name": "RAG_RERANKER",
+        "description": "Local reranker for retrieved chunks (bm25, overlap, none or module:function)",
+        "default": "none",
+        "required": False
+    },
+    "rag_rerank_candidates": {
+        "env_name": "RAG_RERANK_CANDIDATES",
+        "description": "Number of RAG candidates fetched and reranked before the best are kept",
+        "default": "20",
+        "required": False
+    },
+    "rag_vector_index": {
+        "env_name": "RAG_VECTOR_INDEX",
+        "description": "RAG vector search backend (auto, chroma, numpy or ivf)",
+        "default": "chroma",
+        "required": False
+    },
+    "rag_numpy_index_max_chunks": {
+        "env_name": "RAG_NUMPY_INDEX_MAX_CHUNKS",
+        "description": "Largest collection searched with the in-process NumPy index in auto mode",
+        "default": "100000",
+        "required": False
+    },
+    "rag_vector_reduction": {
+        "env_name": "RAG_VECTOR_REDUCTION",
+        "description": "Dimensionality reduction of the vectors stored by the NumPy and IVF indexes (none, pca:N or truncate:N)",
+        "default": "none",
+        "required": False
+    },
+    "rag_vector_precision": {
+        "env_name": "RAG_VECTOR_PRECISION",
+        "description": "Precision of the vectors stored by the NumPy and IVF indexes (float32, float16 or int8)",
+        "default": "float32",
+        "required": False
+    },
+    "rag_ivf_nlist": {
+        "env_name": "RAG_IVF_NLIST",
+        "description": "Number of k-means cells of the IVF index (0 picks one from the collection size)",
+        "default": "0",
+        "required": False
+    },
+    "rag_ivf_nprobe": {
+        "env_name": "RAG_IVF_NPROBE",
+        "description": "IVF cells scanned per query (higher is slower but finds more)",
+        "default": "8",
+        "required": False
+    },
+    "rag_ivf_min_chunks": {
+        "env_name": "RAG_IVF_MIN_CHUNKS",
+        "description": "Smallest collection searched with the IVF index in auto mode",
+        "default": "2000000",
+        "required": False
+    },
+    "rag_shards": {
+        "env_name": "RAG_SHARDS",
+        "description": "Number of RAG storage shards for a new store (use 'pixella rag rebalance' to change it later)",
+        "default": "1",
+        "required": False
+    },
+    "rag_server_url": {
+        "env_name": "RAG_SERVER_URL",
+        "description": "URL of a shared Chroma server (e.g. http://localhost:8000); empty opens DB_PATH directly",
+        "default": "",
+        "required": False
+    },
+    "rag_collection": {
+        "env_name": "RAG_COLLECTION",
+        "description": "Default RAG collection for sessions without their own",
+        "default": "pixella",
+        "required": False
+    },
+    "rag_max_open_collections": {
+        "env_name": "RAG_MAX_OPEN_COLLECTIONS",
+        "description": "Maximum number of RAG collections kept open at once",
+        "default": "8",
+        "required": False
+    },
+    "rag_reembed_batch_size": {
+        "env_name": "RAG_REEMBED_BATCH_SIZE",
+        "description": "Chunks per request when re-embedding after an embedding model change",
+        "default": "100",
+        "required": False
+    },
+    "rag_reembed_delay": {
+        "env_name": "RAG_REEMBED_DELAY",
+        "description": "Seconds between re-embedding requests (rate limit)",
+        "default": "1.0",
+        "required": False
+    },
     "always_debug": {
         "env_name": "ALWAYS_DEBUG",
         "description": "Always show debug logs",
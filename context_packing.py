@@ -0,0 +1,175 @@
+"""
+Context Packing Module
+
+Fits retrieved passages into a token budget for the prompt. Hits that make
+it into the budget are widened with their neighbouring chunks (fetched in
+one batched lookup) when there is room left, so an answer cut in half by
+the chunk boundary comes back whole. Contiguous chunks are merged into
+single passages and the budget is filled greedily by value per token.
+
+"""
+
+import logging
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from chunking import estimate_tokens, truncate_tokens
+from retrieval import DocumentKey, chunk_range, document_key, merge_adjacent_chunks
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTEXT_TOKENS = 1500
+DEFAULT_CONTEXT_NEIGHBORS = 1
+# Tokens taken by the source header that format_context puts above each passage
+CONTEXT_HEADER_TOKENS = 16
+# Value of a neighbouring chunk relative to the hit it extends, per step away
+NEIGHBOR_DECAY = 0.5
+
+# Document (see retrieval.document_key) -> chunk indexes wanted from it
+NeighborRequests = Dict[DocumentKey, List[int]]
+NeighborFetcher = Callable[[NeighborRequests], List[Dict[str, Any]]]
+
+
+def _fill(units: List[Dict[str, Any]], budget: int) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Greedily select units by value per token. A neighbour unit only becomes
+    eligible once the unit between it and its hit has been selected.
+
+    Returns:
+        Tuple of (selected units, tokens used)
+    """
+    pending = sorted(units, key=lambda u: u["value"] / max(u["tokens"], 1), reverse=True)
+    covered: Dict[Optional[DocumentKey], set] = {}
+    selected: List[Dict[str, Any]] = []
+    used = 0
+    progress = True
+    while pending and progress:
+        progress = False
+        for unit in pending:
+            if used + unit["tokens"] > budget:
+                continue
+            group = covered.setdefault(unit["group"], set())
+            if unit["anchor"] is not None and unit["anchor"] not in group:
+                continue
+            selected.append(unit)
+            used += unit["tokens"]
+            first, last = unit["range"] or (None, None)
+            if first is not None:
+                group.update(range(first, last + 1))
+            pending.remove(unit)
+            progress = True
+            break
+    return selected, used
+
+
+def neighbor_requests(hits: List[Dict[str, Any]], window: int) -> NeighborRequests:
+    """
+    Chunk indexes adjacent to the hits that are not already among them
+
+    Args:
+        hits: Passages to extend
+        window: Chunks to add on each side
+
+    Returns:
+        Wanted chunk indexes per document
+    """
+    covered: Dict[DocumentKey, set] = {}
+    for hit in hits:
+        span, key = chunk_range(hit), document_key(hit)
+        if span is not None and key is not None:
+            covered.setdefault(key, set()).update(range(span[0], span[1] + 1))
+
+    requests: NeighborRequests = {}
+    for hit in hits:
+        span, key = chunk_range(hit), document_key(hit)
+        if span is None or key is None:
+            continue
+        wanted = [
+            index for step in range(1, window + 1) for index in (span[0] - step, span[1] + step)
+            if index >= 0 and index not in covered[key]
+        ]
+        if wanted:
+            requests.setdefault(key, [])
+            requests[key].extend(index for index in wanted if index not in requests[key])
+    return requests
+
+
+def pack_context(
+    hits: List[Dict[str, Any]],
+    budget: int,
+    fetch_neighbors: Optional[NeighborFetcher] = None,
+    window: int = DEFAULT_CONTEXT_NEIGHBORS
+) -> List[Dict[str, Any]]:
+    """
+    Select and extend passages to fill a token budget
+
+    Args:
+        hits: Retrieved passages, best first
+        budget: Token budget for the packed context (0 disables packing)
+        fetch_neighbors: Looks up chunks by document and chunk index, in one call
+        window: Neighbouring chunks considered on each side of a hit
+
+    Returns:
+        Passages to put into the prompt, best first
+    """
+    if budget <= 0 or not hits:
+        return hits
+
+    units = [
+        {
+            "hit": hit,
+            "value": hit.get("similarity", 0.0),
+            "tokens": estimate_tokens(hit.get("content") or "") + CONTEXT_HEADER_TOKENS,
+            "group": document_key(hit),
+            "range": chunk_range(hit),
+            "anchor": None,
+        }
+        for hit in hits
+    ]
+    selected, used = _fill(units, budget)
+
+    if not selected:
+        # Even the best hit is over budget: keep its beginning rather than nothing
+        best = hits[0]
+        content = truncate_tokens(best.get("content") or "", budget - CONTEXT_HEADER_TOKENS)
+        logger.debug("Best passage exceeds the %d token context budget, truncated", budget)
+        return [{**best, "content": content}] if content else []
+
+    # Only pay for the neighbour lookup when the selected hits leave room for it
+    neighbours: List[Dict[str, Any]] = []
+    if fetch_neighbors and window > 0 and used < budget:
+        requests = neighbor_requests([unit["hit"] for unit in selected], window)
+        if requests:
+            neighbours = fetch_neighbors(requests)
+
+    if neighbours:
+        for neighbour in neighbours:
+            span = chunk_range(neighbour)
+            key = document_key(neighbour)
+            if span is None or key is None:
+                continue
+            index = span[0]
+            # Value decays with the distance to the closest selected hit of the same document
+            parents = [
+                (min(abs(index - unit["range"][0]), abs(index - unit["range"][1])), unit)
+                for unit in selected if unit["group"] == key and unit["range"] is not None
+            ]
+            if not parents:
+                continue
+            distance, parent = min(parents, key=lambda item: (item[0], -item[1]["value"]))
+            units.append({
+                "hit": neighbour,
+                "value": parent["value"] * NEIGHBOR_DECAY ** distance,
+                "tokens": estimate_tokens(neighbour.get("content") or ""),
+                "group": key,
+                "range": span,
+                "anchor": index + 1 if index < parent["range"][0] else index - 1,
+            })
+        selected, used = _fill(units, budget)
+
+    ranked = sorted(selected, key=lambda unit: unit["value"], reverse=True)
+    passages = merge_adjacent_chunks([unit["hit"] for unit in ranked])
+    logger.debug(
+        "Packed %d of %d passages (%d neighbour chunks fetched) into %d/%d tokens",
+        len(passages), len(hits), len(neighbours), used, budget
+    )
+    return passages
@@ -0,0 +1,194 @@
+"""
+Embeddings Module
+
+Pluggable embedding providers for the RAG system. Google Generative AI
+embeddings are used for remote models; models prefixed with `local/` run
+entirely on the CPU with NumPy, need no API key and make no network calls,
+which also makes ingestion and retrieval benchmarkable offline.
+
+"""
+
+import re
+import hashlib
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, List, Dict, Optional
+
+import numpy as np
+from pydantic import SecretStr
+
+logger = logging.getLogger(__name__)
+
+LOCAL_MODEL_PREFIX = "local/"
+
+# Task type Google embeddings use for queries (documents default to RETRIEVAL_DOCUMENT)
+QUERY_TASK_TYPE = "RETRIEVAL_QUERY"
+
+# Local models and their descriptions, shown next to the Google models
+LOCAL_EMBEDDING_MODELS: Dict[str, str] = {
+    "local/hashing-384": "Offline hashing embeddings (384 dims, no API key, no network)",
+    "local/hashing-768": "Offline hashing embeddings (768 dims, no API key, no network)",
+}
+
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class EmbeddingProvider(ABC):
+    """
+    Interface shared by every embedding provider, matching the
+    LangChain embeddings API used throughout the RAG code
+    """
+
+    model: str = ""
+
+    @abstractmethod
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a batch of documents
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One embedding per text
+        """
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a single query
+
+        Args:
+            text: Query text
+
+        Returns:
+            The query embedding
+        """
+        return self.embed_documents([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed several queries, with the same semantics as `embed_query`
+
+        Args:
+            texts: Query texts
+
+        Returns:
+            One embedding per query
+        """
+        return [self.embed_query(text) for text in texts]
+
+
+class HashingEmbeddings(EmbeddingProvider):
+    """
+    Feature-hashing embeddings: word unigrams, word bigrams and character
+    trigrams are hashed into a fixed number of signed buckets, weighted by
+    sublinear term frequency and L2-normalized. Similar texts share features,
+    so cosine similarity behaves like a cheap TF-IDF-style lexical match.
+    """
+
+    def __init__(self, dimension: int = 384, model: Optional[str] = None):
+        """
+        Initialize the hashing embeddings
+
+        Args:
+            dimension: Number of hash buckets (embedding size)
+            model: Model name reported to callers
+        """
+        if dimension <= 0:
+            raise ValueError("Embedding dimension must be positive")
+        self.dimension = dimension
+        self.model = model or f"{LOCAL_MODEL_PREFIX}hashing-{dimension}"
+
+    @staticmethod
+    def _features(text: str) -> List[str]:
+        words = [word.lower() for word in _WORD_PATTERN.findall(text)]
+        features = list(words)
+        features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+        for word in words:
+            padded = f"<{word}>"
+            features.extend(f"#{padded[i:i + 3]}" for i in range(len(padded) - 2))
+        return features
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        features = self._features(text)
+        if not features:
+            return vector
+
+        digests = [hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest() for feature in features]
+        hashes = np.frombuffer(b"".join(digests), dtype=np.uint64)
+        buckets = (hashes % np.uint64(self.dimension)).astype(np.int64)
+        # The top hash bit decides the sign, so collisions cancel out on average
+        signs = np.where(hashes >> np.uint64(63), -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, buckets, signs)
+
+        # Sublinear term frequency keeps repeated words from dominating
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return np.vstack([self._embed(text) for text in texts]).tolist()
+
+
+def is_local_model(model_name: str) -> bool:
+    """
+    Check whether a model runs locally
+
+    Args:
+        model_name: Embedding model name
+
+    Returns:
+        True for `local/` models
+    """
+    return model_name.startswith(LOCAL_MODEL_PREFIX)
+
+
+def embed_queries(embeddings: Any, texts: List[str]) -> List[List[float]]:
+    """
+    Embed several queries in one batched request. A query is embedded
+    differently from a document by Google models, so the batch is sent with
+    the task type `embed_query` uses rather than the documents' default.
+
+    Args:
+        embeddings: An embedding provider (see `create_embeddings`)
+        texts: Query texts
+
+    Returns:
+        One embedding per query
+    """
+    if isinstance(embeddings, EmbeddingProvider):
+        return embeddings.embed_queries(texts)
+    return embeddings.embed_documents(texts, task_type=QUERY_TASK_TYPE)
+
+
+def create_embeddings(model_name: str, google_api_key: Optional[str] = None):
+    """
+    Create the embedding provider for a model name
+
+    Args:
+        model_name: A Google embedding model or a `local/` model
+        google_api_key: API key, required for Google models only
+
+    Returns:
+        An object with `embed_documents` and `embed_query`
+
+    Raises:
+        ValueError: If the model is unknown or the API key is missing
+    """
+    if is_local_model(model_name):
+        match = re.fullmatch(rf"{re.escape(LOCAL_MODEL_PREFIX)}hashing-(\d+)", model_name)
+        if not match:
+            raise ValueError(f"Unknown local embedding model: {model_name}")
+        return HashingEmbeddings(int(match.group(1)), model=model_name)
+
+    if not google_api_key:
+        raise ValueError("GOOGLE_API_KEY not found in config.")
+
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    return GoogleGenerativeAIEmbeddings(
+        model=model_name,
+        google_api_key=SecretStr(google_api_key)
+    )
@@ -21,7 +21,7 @@ from rich.console import Console
 from rich.panel import Panel
 from config import get_config, load_env, set_config, set_config_console # Import set_config_console
 from cli import set_cli_console # Import the setter function
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 
 # Fix sys.argv[0] to show 'pixella' instead of 'entrypoint.py'
@@ -517,5 +517,476 @@ def config(
         sys.exit(1)
 
 
+
+# RAG maintenance commands: pixella rag <command>
+rag_app = typer.Typer(help="Manage the RAG document store", no_args_is_help=True)
+app.add_typer(rag_app, name="rag")
+
+
+@rag_app.command("chunking-report")
+def rag_chunking_report(
+    files: List[Path] = typer.Argument(..., exists=True, dir_okay=False, help="Files to chunk and index"),
+    profile: List[str] = typer.Option(["auto", "legacy"], "--profile", "-p", help="Chunking profile to compare (repeatable)"),
+    query: List[str] = typer.Option([], "--query", "-q", help="Query to time (repeatable; defaults to each file's first line)"),
+):
+    """
+    Compare chunking profiles: chunk counts, chunk sizes and retrieval latency
+    """
+    from rich.table import Table
+    from chunking import CHUNKING_PROFILES, compare_profiles
+
+    unknown = [name for name in profile if name != "auto" and name not in CHUNKING_PROFILES]
+    if unknown:
+        console.print(f"[red]Unknown profile(s): {', '.join(unknown)}[/red]")
+        console.print(f"[dim]Available: auto, {', '.join(CHUNKING_PROFILES)}[/dim]")
+        raise typer.Exit(code=1)
+
+    with console.status("Indexing files with each profile..."):
+        rows = compare_profiles([str(path) for path in files], queries=query or None, profiles=profile)
+
+    table = Table(title="Chunking Profiles")
+    table.add_column("Profile", style="cyan")
+    table.add_column("Chunks", justify="right")
+    table.add_column("Avg tokens", justify="right")
+    table.add_column("Max tokens", justify="right")
+    table.add_column("Ingest (s)", justify="right")
+    table.add_column("Query (ms)", justify="right")
+    for row in rows:
+        table.add_row(
+            row["profile"],
+            str(row["chunks"]),
+            f"{row['avg_tokens']:.0f}",
+            str(row["max_tokens"]),
+            f"{row['ingest_seconds']:.2f}",
+            f"{row['query_ms']:.1f}",
+        )
+    console.print(table)
+    console.print("[dim]Indexed with offline hashing embeddings; ingest time excludes API latency.[/dim]")
+
+
+
+@rag_app.command("maintain")
+def rag_maintain(
+    collection: List[str] = typer.Option([], "--collection", "-c", help="Collection to clean (repeatable; default: all)"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Only report what would be removed"),
+    orphans: bool = typer.Option(False, "--orphans", help="Also remove chunks of imported files that no longer exist"),
+    no_dedupe: bool = typer.Option(False, "--no-dedupe", help="Keep chunks that differ from another only in case or whitespace"),
+    no_compact: bool = typer.Option(False, "--no-compact", help="Skip vacuuming and unused index cleanup"),
+    force: bool = typer.Option(False, "--force", help="Compact ChromaDB's database even while another Pixella process has it open"),
+):
+    """
+    Clean up the RAG store: orphaned and duplicate chunks, compaction, disk usage
+    """
+    from rich.table import Table
+    from maintenance import format_size, maintain
+
+    db_path = get_config().get("DB_PATH", "./db/chroma")
+    with console.status("Maintaining RAG store..."):
+        report = maintain(
+            db_path,
+            collections=collection or None,
+            remove_orphans=orphans,
+            dedupe=not no_dedupe,
+            compact=not no_compact,
+            dry_run=dry_run,
+            force=force
+        )
+
+    for name, entry in report["collections"].items():
+        table = Table(title=f"Collection '{name}'")
+        table.add_column("Source", style="cyan")
+        table.add_column("Chunks before", justify="right")
+        table.add_column("Chunks after", justify="right")
+        for source in sorted(set(entry["sources_before"]) | set(entry["sources_after"])):
+            table.add_row(
+                source,
+                str(entry["sources_before"].get(source, 0)),
+                str(entry["sources_after"].get(source, 0)),
+            )
+        console.print(table)
+        verb = "Would remove" if dry_run else "Removed"
+        console.print(
+            f"{verb} [yellow]{entry['orphans_removed']}[/yellow] chunks of "
+            f"{len(entry['missing_files'])} missing files and "
+            f"[yellow]{entry['duplicates_removed']}[/yellow] duplicate chunks "
+            f"(differing only in case or whitespace; identical chunks are never stored twice)"
+        )
+        for missing_file in entry["missing_files"]:
+            console.print(f"  [dim]missing: {missing_file}[/dim]")
+        if entry["unverifiable_paths"]:
+            console.print(
+                f"  [dim]kept {len(entry['unverifiable_paths'])} files imported by relative path; "
+                f"re-import them to have them checked[/dim]"
+            )
+
+    disk_before, disk_after = report["disk_before"], report["disk_after"]
+    table = Table(title=f"Disk usage ({db_path})")
+    table.add_column("Entry", style="cyan")
+    table.add_column("Before", justify="right")
+    table.add_column("After", justify="right")
+    for entry_name in sorted((set(disk_before) | set(disk_after)) - {"total"}):
+        table.add_row(
+            entry_name,
+            format_size(disk_before.get(entry_name, 0)),
+            format_size(disk_after.get(entry_name, 0)) if entry_name in disk_after else "removed",
+        )
+    table.add_row("[bold]Total[/bold]", format_size(disk_before["total"]), format_size(disk_after["total"]))
+    console.print(table)
+    if report["segment_dirs_removed"]:
+        verb = "Would remove" if dry_run else "Removed"
+        console.print(f"{verb} {len(report['segment_dirs_removed'])} unused index directories")
+    if report["store_in_use"]:
+        console.print(
+            "[yellow]The RAG store is open in another process (the web UI, an ingestion job or 'pixella rag serve'), "
+            "so ChromaDB's database was not compacted. Stop them and run again, or pass --force.[/yellow]"
+        )
+
+
+@rag_app.command("rerank-benchmark")
+def rag_rerank_benchmark(
+    collection: Optional[str] = typer.Option(None, "--collection", "-c", help="Collection to benchmark (default: configured collection)"),
+    reranker: List[str] = typer.Option(["none", "overlap", "bm25"], "--reranker", "-r", help="Reranker to compare (repeatable)"),
+    candidates: List[int] = typer.Option([10, 20, 40], "--candidates", "-n", help="Candidates fetched before reranking (repeatable)"),
+    top_k: List[int] = typer.Option([1, 2, 4], "--top-k", "-k", help="Chunks kept for the prompt (repeatable)"),
+    samples: int = typer.Option(50, "--samples", "-s", help="Number of sample queries"),
+):
+    """
+    Compare reranker settings: hit rate, latency and context size per query
+    """
+    from rich.table import Table
+    from chromadb_rag import get_rag
+    from reranking import benchmark_reranking, load_scorer, sample_queries
+
+    for name in reranker:
+        try:
+            load_scorer(name)
+        except ValueError as exc:
+            console.print(f"[red]{exc}[/red]")
+            raise typer.Exit(code=1)
+
+    rag = get_rag(collection)
+    if not rag or not rag.embeddings:
+        console.print("[red]RAG is not available (check EMBEDDING_MODEL and GOOGLE_API_KEY)[/red]")
+        raise typer.Exit(code=1)
+
+    queries = sample_queries(rag, count=samples)
+    if not queries:
+        console.print("[yellow]The collection is empty, import documents first[/yellow]")
+        raise typer.Exit(code=1)
+
+    with console.status(f"Running {len(queries)} queries per setting..."):
+        rows = benchmark_reranking(rag, queries, reranker, candidates, top_k)
+
+    table = Table(title=f"Reranking ({rag.collection_name}, {len(queries)} queries)")
+    table.add_column("Reranker", style="cyan")
+    table.add_column("N", justify="right")
+    table.add_column("k", justify="right")
+    table.add_column("Hit rate", justify="right")
+    table.add_column("Query (ms)", justify="right")
+    table.add_column("Context chars", justify="right")
+    for row in rows:
+        table.add_row(
+            row["reranker"],
+            str(row["candidates"]) if row["candidates"] else "-",
+            str(row["top_k"]),
+            f"{row['hit_rate']:.0%}",
+            f"{row['mean_ms']:.1f}",
+            f"{row['context_chars']:.0f}",
+        )
+    console.print(table)
+    console.print("[dim]Each query is a passage taken from a chunk; a hit means that chunk was returned.[/dim]")
+
+
+@rag_app.command("index-benchmark")
+def rag_index_benchmark(
+    collection: Optional[str] = typer.Option(None, "--collection", "-c", help="Collection to benchmark (default: configured collection)"),
+    samples: int = typer.Option(100, "--samples", "-s", help="Number of sample queries"),
+    top_k: int = typer.Option(10, "--top-k", "-k", help="Hits per query"),
+    nprobe: List[int] = typer.Option([], "--nprobe", help="Also benchmark the IVF index with this nprobe (repeatable)"),
+):
+    """
+    Compare ChromaDB and the in-process indexes: latency, recall and vectors scanned
+    """
+    from rich.table import Table
+    from chromadb_rag import get_rag
+    from vector_index import benchmark_vector_index
+
+    rag = get_rag(collection)
+    if not rag:
+        console.print("[red]RAG is not available (check EMBEDDING_MODEL and GOOGLE_API_KEY)[/red]")
+        raise typer.Exit(code=1)
+
+    with console.status("Benchmarking vector search..."):
+        report = benchmark_vector_index(rag, samples=samples, top_k=top_k, nprobes=nprobe)
+    if not report["chunks"]:
+        console.print("[yellow]The collection is empty, import documents first[/yellow]")
+        raise typer.Exit(code=1)
+
+    table = Table(title=f"Vector search ({rag.collection_name}, {report['chunks']} chunks, top {top_k})")
+    table.add_column("Backend", style="cyan")
+    table.add_column("Mean (ms)", justify="right")
+    table.add_column("p95 (ms)", justify="right")
+    table.add_column(f"Recall@{top_k}", justify="right")
+    table.add_row("chroma", f"{report['chroma']['mean_ms']:.2f}", f"{report['chroma']['p95_ms']:.2f}", f"{report['chroma_recall']:.1%}")
+    table.add_row("numpy", f"{report['numpy']['mean_ms']:.2f}", f"{report['numpy']['p95_ms']:.2f}", f"{report['numpy_recall']:.1%}")
+    for row in report["ivf"]:
+        table.add_row(
+            f"ivf nprobe={row['nprobe']} ({row['scanned']:.1%} scanned)",
+            f"{row['mean_ms']:.2f}",
+            f"{row['p95_ms']:.2f}",
+            f"{row['recall']:.1%}",
+        )
+    console.print(table)
+    if report["ivf"]:
+        console.print(f"[dim]IVF index with {report['ivf_cells']} cells loaded or built in {report['ivf_build_seconds']:.2f}s.[/dim]")
+    console.print(
+        f"[dim]NumPy index loaded or built in {report['build_seconds']:.2f}s; "
+        f"all {report['queries']} queries as one batch took {report['numpy_batch_ms']:.1f} ms. "
+        f"Recall is measured against an exact search over the full-precision vectors.[/dim]"
+    )
+
+
+@rag_app.command("shards")
+def rag_shards():
+    """
+    Show the chunks and disk usage of every RAG shard
+    """
+    from rich.table import Table
+    from maintenance import chroma_disk_usage, format_size
+    from sharding import read_shard_count, shard_paths, open_client
+
+    db_path = get_config().get("DB_PATH", "./db/chroma")
+    shard_count = read_shard_count(db_path)
+    if shard_count <= 1:
+        client = open_client(db_path, shard_count)
+        collections = {c.name: c.count() for c in client.list_collections()}
+        rows = [{
+            "shard": 0,
+            "path": db_path,
+            "collections": collections,
+            "chunks": sum(collections.values()),
+            "size": chroma_disk_usage(db_path),
+        }]
+    else:
+        rows = open_client(db_path, shard_count).stats()
+
+    table = Table(title=f"RAG shards ({len(shard_paths(db_path, shard_count))})")
+    table.add_column("Shard", justify="right", style="cyan")
+    table.add_column("Path")
+    table.add_column("Collections")
+    table.add_column("Chunks", justify="right")
+    table.add_column("Size", justify="right")
+    for row in rows:
+        table.add_row(
+            str(row["shard"]),
+            row["path"],
+            ", ".join(f"{name} ({count})" for name, count in sorted(row["collections"].items())),
+            str(row["chunks"]),
+            format_size(row["size"]),
+        )
+    console.print(table)
+
+
+@rag_app.command("rebalance")
+def rag_rebalance(
+    shards: int = typer.Option(..., "--shards", "-n", min=1, help="New number of shards"),
+):
+    """
+    Change the number of RAG shards, moving chunks to their new shard
+    """
+    from chromadb_rag import reset_rag
+    from sharding import read_shard_count, rebalance
+
+    config = get_config()
+    if config.get("RAG_SERVER_URL"):
+        console.print("[red]Sharding is not used in server mode; stop the server and unset RAG_SERVER_URL first[/red]")
+        raise typer.Exit(code=1)
+    db_path = config.get("DB_PATH", "./db/chroma")
+    current = read_shard_count(db_path)
+    if current == shards:
+        console.print(f"[yellow]The store already has {shards} shard(s)[/yellow]")
+        return
+
+    console.print("[dim]Make sure no other Pixella process is using the RAG store.[/dim]")
+    reset_rag()
+    with console.status(f"Rebalancing from {current} to {shards} shards..."):
+        moved = rebalance(db_path, shards)
+    for name, count in moved.items():
+        console.print(f"  {name}: moved [cyan]{count}[/cyan] chunks")
+    set_config("RAG_SHARDS", str(shards))
+    console.print(f"[green]✓ RAG store now has {shards} shard(s)[/green]")
+
+
+@rag_app.command("serve")
+def rag_serve(
+    host: str = typer.Option("localhost", "--host", help="Interface to listen on"),
+    port: int = typer.Option(8000, "--port", "-p", help="Port to listen on"),
+):
+    """
+    Run a Chroma server on the RAG store so all Pixella processes share one loaded index
+    """
+    from chroma_server import check_server, serve
+    from sharding import read_shard_count
+    from store_lock import hold_store
+
+    db_path = get_config().get("DB_PATH", "./db/chroma")
+    url = f"http://{host}:{port}"
+    if check_server(url) is not None:
+        console.print(f"[yellow]A Chroma server is already running at {url}[/yellow]")
+        raise typer.Exit(code=1)
+    if read_shard_count(db_path) > 1:
+        console.print("[red]The RAG store is sharded; run 'pixella rag rebalance --shards 1' before serving it[/red]")
+        raise typer.Exit(code=1)
+
+    hold_store(db_path) # The server has the store open until it stops
+    console.print(f"[green]Serving {db_path} at {url}[/green]")
+    console.print(f"[dim]Set RAG_SERVER_URL={url} so Pixella connects to it. Press Ctrl+C to stop.[/dim]")
+    try:
+        raise typer.Exit(code=serve(db_path, host, port))
+    except RuntimeError as exc:
+        console.print(f"[red]{exc}[/red]")
+        raise typer.Exit(code=1)
+
+
+
+@rag_app.command("train-gate")
+def rag_train_gate(
+    examples: Path = typer.Argument(..., exists=True, dir_okay=False, help="JSONL file of {\"text\": ..., \"label\": retrieve|reuse|skip} lines"),
+):
+    """
+    Train the local classifier that decides which chat messages need retrieval
+    """
+    from query_gate import GATE_MODEL_FILE, train_gate
+
+    model_path = Path(get_config().get("DB_PATH", "./db/chroma")) / GATE_MODEL_FILE
+    model_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        summary = train_gate(str(examples), str(model_path))
+    except (ValueError, KeyError, json.JSONDecodeError) as exc:
+        console.print(f"[red]Could not train the query gate: {exc}[/red]")
+        raise typer.Exit(code=1)
+
+    labels = ", ".join(f"{count} {label}" for label, count in sorted(summary["labels"].items()))
+    console.print(f"[green]Trained on {summary['examples']} messages ({labels}), training accuracy {summary['accuracy']:.0%}[/green]")
+    console.print(f"[dim]Saved to {model_path}. Set RAG_QUERY_GATE=classifier to use it.[/dim]")
+
+
+@rag_app.command("eval")
+def rag_eval(
+    queries: Optional[Path] = typer.Argument(None, exists=True, dir_okay=False, help="Labelled queries (JSONL); omit to sample queries from the collection"),
+    collection: Optional[str] = typer.Option(None, "--collection", "-c", help="Collection to evaluate (default: configured collection)"),
+    docs: List[Path] = typer.Option([], "--docs", exists=True, dir_okay=False, help="Evaluate a throwaway collection built from these files instead (repeatable)"),
+    embedding_model: str = typer.Option("local/hashing-384", "--embedding-model", help="Embedding model for --docs (the default works offline)"),
+    chunking: Optional[str] = typer.Option(None, "--chunking", help="Chunking profile for --docs"),
+    top_k: List[int] = typer.Option([1, 3, 5], "--top-k", "-k", help="Values of k to evaluate (repeatable)"),
+    threshold: float = typer.Option(0.5, "--threshold", "-t", help="Similarity threshold"),
+    mode: Optional[str] = typer.Option(None, "--mode", "-m", help="Search mode (default: RAG_SEARCH_MODE)"),
+    samples: int = typer.Option(50, "--samples", "-s", help="Number of sampled queries when no query file is given"),
+    output: Optional[Path] = typer.Option(None, "--output", "-o", help="Write the JSON report to this file"),
+    details: bool = typer.Option(False, "--details", help="Include per-query ranks in the JSON report"),
+    storage: List[str] = typer.Option([], "--storage", help="Also evaluate an in-process index with this vector storage, e.g. int8, float16, pca:128/int8 (repeatable)"),
+    storage_index: str = typer.Option("numpy", "--storage-index", help="Index the --storage settings are evaluated on: numpy or ivf"),
+):
+    """
+    Evaluate retrieval: recall@k, MRR, latency and prompt tokens per query
+    """
+    from rich.table import Table
+    from chromadb_rag import get_rag
+    from rag_eval import (
+        build_eval_collection,
+        compare_storage,
+        discard_eval_collection,
+        evaluate,
+        load_queries,
+        sample_eval_queries,
+    )
+
+    if storage_index not in ("numpy", "ivf"):
+        console.print(f"[red]Unknown --storage-index '{storage_index}', use numpy or ivf[/red]")
+        raise typer.Exit(code=1)
+
+    try:
+        labelled = load_queries(str(queries)) if queries else None
+    except (ValueError, json.JSONDecodeError) as exc:
+        console.print(f"[red]Invalid query file: {exc}[/red]")
+        raise typer.Exit(code=1)
+
+    eval_path = None
+    try:
+        if docs:
+            with console.status(f"Indexing {len(docs)} files with {embedding_model}..."):
+                rag, eval_path = build_eval_collection([str(path) for path in docs], embedding_model, chunking)
+        else:
+            rag = get_rag(collection)
+        if not rag or not rag.embeddings:
+            console.print("[red]RAG is not available (check EMBEDDING_MODEL and GOOGLE_API_KEY)[/red]")
+            raise typer.Exit(code=1)
+
+        eval_queries = labelled if labelled is not None else sample_eval_queries(rag, samples)
+        if not eval_queries:
+            console.print("[yellow]No queries to run: the collection is empty[/yellow]")
+            raise typer.Exit(code=1)
+
+        with console.status(f"Running {len(eval_queries)} queries per k..."):
+            report = evaluate(rag, eval_queries, top_k, threshold=threshold, mode=mode, details=details)
+        if storage:
+            with console.status(f"Comparing {len(storage)} vector storage settings..."):
+                report["storage"] = compare_storage(
+                    rag, eval_queries, storage, top_k, threshold=threshold, mode=mode, kind=storage_index
+                )
+    except ValueError as exc:
+        console.print(f"[red]{exc}[/red]")
+        raise typer.Exit(code=1)
+    finally:
+        if eval_path:
+            discard_eval_collection(eval_path)
+
+    table = Table(title=f"Retrieval evaluation ({report['collection']}, {report['chunks']} chunks, {report['queries']} queries)")
+    table.add_column("k", justify="right", style="cyan")
+    table.add_column("Recall", justify="right")
+    table.add_column("MRR", justify="right")
+    table.add_column("Mean (ms)", justify="right")
+    table.add_column("p95 (ms)", justify="right")
+    table.add_column("Prompt tokens", justify="right")
+    for row in report["results"]:
+        table.add_row(
+            str(row["top_k"]),
+            f"{row['recall']:.1%}",
+            f"{row['mrr']:.3f}",
+            f"{row['mean_ms']:.1f}",
+            f"{row['p95_ms']:.1f}",
+            f"{row['prompt_tokens']:.0f}",
+        )
+    console.print(table)
+    settings = ", ".join(f"{key}={value}" for key, value in report["settings"].items())
+    console.print(f"[dim]{settings}[/dim]")
+
+    if storage:
+        index_name = "NumPy" if storage_index == "numpy" else "IVF"
+        storage_table = Table(title=f"Vector storage ({index_name} index, exact rescoring of the best candidates)")
+        storage_table.add_column("Storage", style="cyan")
+        storage_table.add_column("Stored", justify="right")
+        storage_table.add_column("Scanned", justify="right")
+        for k in sorted(set(top_k)):
+            storage_table.add_column(f"Recall@{k}", justify="right")
+        storage_table.add_column("MRR", justify="right")
+        storage_table.add_column("Mean (ms)", justify="right")
+        for item in report["storage"]:
+            footprint = item["footprint"]
+            ratio = footprint["stored_bytes"] / footprint["full_bytes"] if footprint["full_bytes"] else 1.0
+            rows = item["results"]
+            storage_table.add_row(
+                item["storage"],
+                f"{footprint['stored_bytes'] / 1024:.0f} KB ({ratio:.0%})",
+                f"{footprint['scanned_bytes'] / 1024:.0f} KB",
+                *[f"{row['recall']:.1%}" for row in rows],
+                f"{rows[-1]['mrr']:.3f}",
+                f"{sum(row['mean_ms'] for row in rows) / len(rows):.1f}",
+            )
+        console.print(storage_table)
+    if output:
+        output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        console.print(f"[green]Report written to {output}[/green]")
+
 if __name__ == "__main__":
     app()
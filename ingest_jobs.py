@@ -0,0 +1,375 @@
+"""
+Ingestion Jobs Module
+
+Background ingestion for the RAG system. Front ends submit a file as a
+job and return immediately; a worker thread chunks, embeds and writes it
+while recording status (queued, running, done, failed) and chunk progress
+in a SQLite jobs table that the CLI and web UI poll. Several processes
+(the CLI next to the web UI, or several UI workers) share the table: a
+running job records its owner and a heartbeat, and the worker takes over
+jobs whose owner stopped beating, resuming them after the last batch of
+chunks they wrote.
+
+"""
+
+import os
+import time
+import uuid
+import queue
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+# A running job's owner renews its heartbeat this often; after INGEST_LEASE_SECONDS without one it is requeued
+INGEST_HEARTBEAT_SECONDS = 15.0
+INGEST_LEASE_SECONDS = 120.0
+
+
+class IngestJobQueue:
+    """
+    Persistent queue of ingestion jobs served by a single worker thread
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Initialize the job queue
+
+        Args:
+            db_path: Directory holding the RAG data (jobs and uploads live next to it)
+        """
+        Path(db_path).mkdir(parents=True, exist_ok=True)
+        self.db_path = Path(db_path) / "ingest_jobs.db"
+        self.upload_dir = (Path(db_path) / "uploads").resolve()
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._init_database()
+        self._requeue_unfinished()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_database(self):
+        """Create the jobs table"""
+        try:
+            conn = self._connect()
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    collection TEXT,
+                    source TEXT,
+                    path TEXT,
+                    is_upload INTEGER DEFAULT 0,
+                    status TEXT NOT NULL,
+                    chunks_done INTEGER DEFAULT 0,
+                    error TEXT,
+                    created_at TEXT,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    owner TEXT,
+                    heartbeat REAL,
+                    ingested_at REAL
+                )
+            """)
+            # Job tables created before running jobs had an owner
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in (("owner", "TEXT"), ("heartbeat", "REAL"), ("ingested_at", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+            conn.commit()
+            conn.close()
+        except Exception as exc: # Catching specific exception
+            logger.error("Error initializing ingestion jobs: %s", exc)
+            raise
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        try:
+            conn = self._connect()
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            conn.commit()
+            conn.close()
+        except Exception as exc: # Catching specific exception
+            logger.error("Error updating ingestion job %s: %s", job_id, exc)
+
+    def _claim(self, job_id: str) -> bool:
+        """Atomically move a queued job to running under this queue's ownership, so it is processed only once"""
+        now = time.time()
+        try:
+            conn = self._connect()
+            # A resumed job keeps the ingestion time of its first run, so its chunks stay one document
+            cursor = conn.execute("""
+                UPDATE jobs SET status = 'running', started_at = ?, owner = ?, heartbeat = ?,
+                    ingested_at = COALESCE(ingested_at, ?)
+                WHERE id = ? AND status = 'queued'
+            """, (datetime.now().isoformat(), self.owner, now, now, job_id))
+            conn.commit()
+            conn.close()
+            return cursor.rowcount == 1
+        except Exception as exc: # Catching specific exception
+            logger.error("Error claiming ingestion job %s: %s", job_id, exc)
+            return False
+
+    @staticmethod
+    def _release_stale(conn: sqlite3.Connection) -> List[str]:
+        """
+        Move running jobs whose owner's heartbeat is older than
+        INGEST_LEASE_SECONDS back to queued. They keep their chunk progress,
+        so the next run resumes after the last batch they wrote.
+
+        Returns:
+            IDs of the released jobs
+        """
+        cutoff = time.time() - INGEST_LEASE_SECONDS
+        stale = conn.execute("""
+            SELECT id FROM jobs WHERE status = 'running' AND (heartbeat IS NULL OR heartbeat < ?)
+        """, (cutoff,)).fetchall()
+        released = []
+        for row in stale:
+            # Another process may release (and claim) the same job first
+            cursor = conn.execute("""
+                UPDATE jobs SET status = 'queued', owner = NULL, heartbeat = NULL
+                WHERE id = ? AND status = 'running' AND (heartbeat IS NULL OR heartbeat < ?)
+            """, (row["id"], cutoff))
+            conn.commit()
+            if cursor.rowcount == 1:
+                released.append(row["id"])
+        return released
+
+    def _requeue_unfinished(self) -> None:
+        """
+        Queue jobs left over by processes that stopped: running jobs whose
+        owner stopped beating, and queued jobs. Jobs running in another live
+        process are left alone.
+        """
+        try:
+            conn = self._connect()
+            self._release_stale(conn)
+            rows = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at").fetchall()
+            conn.close()
+        except Exception as exc: # Catching specific exception
+            logger.error("Error restoring ingestion jobs: %s", exc)
+            return
+        for row in rows:
+            self._queue.put(row["id"])
+        if rows:
+            logger.info("Resuming %d unfinished ingestion jobs", len(rows))
+            self._ensure_worker()
+
+    def _requeue_stale(self) -> bool:
+        """
+        Take over the running jobs of processes that stopped since this
+        queue started, and report whether other processes still run jobs
+
+        Returns:
+            True if another process has a running job (that may yet stop)
+        """
+        try:
+            conn = self._connect()
+            released = self._release_stale(conn)
+            running = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'running' AND owner != ?", (self.owner,)
+            ).fetchone()[0]
+            conn.close()
+        except Exception as exc: # Catching specific exception
+            logger.error("Error checking ingestion job leases: %s", exc)
+            return False
+        for job_id in released:
+            self._queue.put(job_id)
+        if released:
+            logger.info("Resuming %d ingestion jobs of stopped processes", len(released))
+        return running > 0
+
+    def submit_file(self, file_path: str, collection: Optional[str] = None, source: Optional[str] = None) -> str:
+        """
+        Queue a file for ingestion
+
+        Args:
+            file_path: File to ingest
+            collection: Target collection (defaults to the configured collection)
+            source: Source label (defaults to the file name)
+
+        Returns:
+            The job ID
+        """
+        # Stored absolute, so a job resumed by a process with another working directory finds the file
+        path = Path(file_path).expanduser().resolve()
+        return self._submit(str(path), collection, source or path.name, is_upload=False)
+
+    def submit_upload(self, name: str, data: bytes, collection: Optional[str] = None) -> str:
+        """
+        Queue uploaded content for ingestion. The content is spooled to disk
+        first so the job survives restarts and large uploads are not kept in memory.
+
+        Args:
+            name: Original file name (selects the chunking profile)
+            data: Uploaded bytes
+            collection: Target collection (defaults to the configured collection)
+
+        Returns:
+            The job ID
+        """
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        spool_path = self.upload_dir / f"{uuid.uuid4().hex[:12]}_{Path(name).name}"
+        spool_path.write_bytes(data)
+        return self._submit(str(spool_path), collection, name, is_upload=True)
+
+    def _submit(self, path: str, collection: Optional[str], source: str, is_upload: bool) -> str:
+        job_id = uuid.uuid4().hex[:8]
+        conn = self._connect()
+        try:
+            conn.execute("""
+                INSERT INTO jobs (id, collection, source, path, is_upload, status, created_at)
+                VALUES (?, ?, ?, ?, ?, 'queued', ?)
+            """, (job_id, collection, source, path, int(is_upload), datetime.now().isoformat()))
+            conn.commit()
+        finally:
+            conn.close()
+        self._queue.put(job_id)
+        self._ensure_worker()
+        logger.debug("Queued ingestion job %s for %s", job_id, source)
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get one job
+
+        Args:
+            job_id: The job ID
+
+        Returns:
+            Job dict, or None if not found
+        """
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            conn.close()
+            return dict(row) if row else None
+        except Exception as exc: # Catching specific exception
+            logger.error("Error reading ingestion job %s: %s", job_id, exc)
+            return None
+
+    def list_jobs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        List the most recent jobs
+
+        Args:
+            limit: Maximum number of jobs
+
+        Returns:
+            Job dicts, newest first
+        """
+        try:
+            conn = self._connect()
+            rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+            conn.close()
+            return [dict(row) for row in rows]
+        except Exception as exc: # Catching specific exception
+            logger.error("Error listing ingestion jobs: %s", exc)
+            return []
+
+    def has_active_jobs(self) -> bool:
+        """Whether any job is queued or running"""
+        return any(job["status"] in ("queued", "running") for job in self.list_jobs())
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="rag-ingest", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        others_running = False
+        next_lease_check = 0.0
+        while True:
+            if time.monotonic() >= next_lease_check:
+                others_running = self._requeue_stale()
+                next_lease_check = time.monotonic() + INGEST_HEARTBEAT_SECONDS
+            try:
+                job_id = self._queue.get(timeout=5)
+            except queue.Empty:
+                # Exit when idle, unless a job running elsewhere may need taking over; the next submit starts a new worker
+                with self._lock:
+                    if self._queue.empty() and not others_running:
+                        self._worker = None
+                        return
+                continue
+            self._process(job_id)
+
+    def _process(self, job_id: str) -> None:
+        from chromadb_rag import get_rag
+
+        if not self._claim(job_id):
+            return
+        job = self.get_job(job_id)
+        if not job:
+            return
+        # Chunks before this offset were written by an earlier run that stopped
+        chunks_done = job["chunks_done"] or 0
+        finished = threading.Event()
+
+        def beat() -> None:
+            # Embedding calls can be slow; beat independently of progress so the job isn't taken for dead
+            while not finished.wait(INGEST_HEARTBEAT_SECONDS):
+                self._update(job_id, heartbeat=time.time())
+
+        threading.Thread(target=beat, name=f"rag-ingest-{job_id}-heartbeat", daemon=True).start()
+
+        def on_progress(added: int) -> None:
+            nonlocal chunks_done
+            chunks_done += added
+            self._update(job_id, chunks_done=chunks_done, heartbeat=time.time())
+
+        try:
+            rag = get_rag(job["collection"])
+            if not rag:
+                raise RuntimeError("RAG is not available")
+            if not rag.embeddings:
+                raise RuntimeError("Embeddings model not initialized")
+            rag.add_file(
+                job["path"],
+                source=job["source"],
+                # Uploads are spooled to a temporary file, so don't record its path
+                metadata={"type": "user_text"} if job["is_upload"] else None,
+                progress_callback=on_progress,
+                raise_errors=True,
+                start_chunk=chunks_done,
+                ingested_at=job["ingested_at"]
+            )
+            self._update(job_id, status="done", chunks_done=chunks_done, finished_at=datetime.now().isoformat())
+            logger.info("Ingestion job %s done: %d chunks from %s", job_id, chunks_done, job["source"])
+        except Exception as exc: # Catching specific exception
+            self._update(job_id, status="failed", error=str(exc), finished_at=datetime.now().isoformat())
+            logger.error("Ingestion job %s failed: %s", job_id, exc)
+        finally:
+            finished.set()
+            if job["is_upload"]:
+                Path(job["path"]).unlink(missing_ok=True)
+
+
+_JOB_QUEUE: Optional[IngestJobQueue] = None
+_JOB_QUEUE_LOCK = threading.Lock()
+
+
+def get_ingest_queue() -> IngestJobQueue:
+    """
+    Get or create the global ingestion job queue
+
+    Returns:
+        IngestJobQueue for DB_PATH
+    """
+    global _JOB_QUEUE
+    with _JOB_QUEUE_LOCK:
+        if _JOB_QUEUE is None:
+            from config import get_config
+            _JOB_QUEUE = IngestJobQueue(get_config().get("DB_PATH", "./db/chroma"))
+        return _JOB_QUEUE
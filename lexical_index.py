@@ -0,0 +1,426 @@
+"""
+Lexical Index Module
+
+Keyword (BM25) index over the same chunks stored in ChromaDB, backed by
+SQLite FTS5. Used by the RAG system for exact identifiers, error codes
+and names, and to answer keyword-like queries without an embedding call.
+
+"""
+
+import re
+import json
+import logging
+import sqlite3
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Constant added to ranks in reciprocal rank fusion (from the original RRF paper)
+RRF_K = 60
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+_QUESTION_WORDS = {
+    "what", "why", "how", "when", "where", "who", "which", "explain",
+    "describe", "summarize", "summarise", "compare", "should", "can", "could",
+}
+# Function words: never searched for, and a sign of a sentence rather than keywords
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "do", "does", "did", "i", "we",
+    "you", "me", "my", "our", "your", "it", "its", "of", "in", "on", "at", "to", "for", "with",
+    "by", "from", "and", "or", "not", "as", "if", "this", "that", "these", "those", "there",
+    "about", "into", "than", "then", "so", "please", "tell", "any", "some", "will", "would",
+    "can", "could", "should", "has", "have", "had",
+}
+# Longest query that can take the lexical-only path because it contains an identifier
+MAX_KEYWORD_QUERY_TOKENS = 5
+# Identifiers, error codes, versions, paths: things embeddings are bad at
+_IDENTIFIER_PATTERN = re.compile(
+    r"([A-Za-z]+_[A-Za-z0-9_]+"          # snake_case
+    r"|[a-z]+[A-Z][A-Za-z0-9]*"          # camelCase / CamelCase
+    r"|[A-Za-z]+\d+[A-Za-z0-9]*"         # E1234, http404
+    r"|\d+[A-Za-z]+[A-Za-z0-9]*"         # 0x1f, 3rd-party codes
+    r"|\w+\.\w+(\.\w+)*"                 # module.path / file.ext / 1.2.3
+    r"|\"[^\"]+\"|'[^']+'|`[^`]+`)"      # quoted phrases
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase word tokens
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of tokens
+    """
+    return [token.lower() for token in _TOKEN_PATTERN.findall(text)]
+
+
+def looks_like_keyword_query(query_text: str) -> bool:
+    """
+    Decide whether a query is keyword-like (identifiers, codes, a few terms)
+    rather than a natural-language question.
+
+    Args:
+        query_text: The user's query
+
+    Returns:
+        True if a lexical search alone is likely to answer it
+    """
+    text = query_text.strip()
+    if not text:
+        return False
+
+    tokens = tokenize(text)
+    if not tokens:
+        return False
+
+    # Questions and sentences go to the semantic search, even when they name an identifier
+    if text.endswith("?") or any(token in _QUESTION_WORDS or token in STOPWORDS for token in tokens):
+        return False
+
+    if _IDENTIFIER_PATTERN.search(text):
+        return len(tokens) <= MAX_KEYWORD_QUERY_TOKENS
+
+    return len(tokens) <= 3
+
+
+def content_tokens(text: str) -> List[str]:
+    """
+    Distinct tokens of a text without stopwords and question words, in
+    order of appearance. A text made only of those keeps all its tokens.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of tokens
+    """
+    tokens = list(dict.fromkeys(tokenize(text)))
+    kept = [token for token in tokens if token not in STOPWORDS and token not in _QUESTION_WORDS]
+    return kept or tokens
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = RRF_K) -> Dict[str, float]:
+    """
+    Fuse several ranked id lists with reciprocal rank fusion
+
+    Args:
+        rankings: Ranked lists of ids, best first
+        k: Rank constant; larger values flatten the contribution of top ranks
+
+    Returns:
+        Dictionary of id to fused score (higher is better)
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, 1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+class LexicalIndex:
+    """
+    SQLite FTS5 index of chunk text, ranked with BM25
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Initialize the lexical index
+
+        Args:
+            db_path: Directory holding the RAG data (the index lives next to ChromaDB)
+        """
+        Path(db_path).mkdir(parents=True, exist_ok=True)
+        self.db_path = Path(db_path) / "lexical.db"
+        self._init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.db_path), timeout=30)
+
+    def _init_database(self):
+        """Create the chunk table, its FTS5 index and the sync triggers"""
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    rowid INTEGER PRIMARY KEY,
+                    id TEXT NOT NULL,
+                    collection TEXT NOT NULL,
+                    source TEXT,
+                    chunk_index INTEGER,
+                    metadata TEXT,
+                    content TEXT,
+                    UNIQUE (collection, id)
+                )
+            """)
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                    content,
+                    content='chunks',
+                    content_rowid='rowid',
+                    tokenize='porter unicode61'
+                )
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+                    INSERT INTO chunks_fts(rowid, content) VALUES (new.rowid, new.content);
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+                    INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+                END
+            """)
+
+            conn.commit()
+            conn.close()
+            logger.debug("Lexical index initialized at %s", self.db_path)
+        except Exception as exc: # Catching specific exception
+            logger.error("Error initializing lexical index: %s", exc)
+            raise
+
+    def add(self, collection: str, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Index chunk records; records already indexed are ignored
+
+        Args:
+            collection: Name of the collection the records belong to
+            records: Record dicts with 'id', 'document' and 'metadata' keys
+
+        Returns:
+            Number of records newly indexed
+        """
+        rows = []
+        for record in records:
+            metadata = record.get("metadata") or {}
+            rows.append((
+                record["id"],
+                collection,
+                metadata.get("source"),
+                metadata.get("chunk_index"),
+                json.dumps(metadata),
+                record.get("document") or "",
+            ))
+        if not rows:
+            return 0
+
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT OR IGNORE INTO chunks (id, collection, source, chunk_index, metadata, content)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+            added = max(cursor.rowcount, 0)
+            conn.commit()
+            conn.close()
+            return added
+        except Exception as exc: # Catching specific exception
+            logger.error("Error adding to lexical index: %s", exc)
+            return 0
+
+    def delete(self, collection: str, ids: List[str]) -> None:
+        """
+        Remove chunks from the index
+
+        Args:
+            collection: Name of the collection
+            ids: Chunk ids to remove
+        """
+        if not ids:
+            return
+        try:
+            conn = self._connect()
+            conn.executemany(
+                "DELETE FROM chunks WHERE collection = ? AND id = ?",
+                [(collection, chunk_id) for chunk_id in ids]
+            )
+            conn.commit()
+            conn.close()
+        except Exception as exc: # Catching specific exception
+            logger.error("Error deleting from lexical index: %s", exc)
+
+    def clear(self, collection: str) -> None:
+        """
+        Remove every chunk of a collection from the index
+
+        Args:
+            collection: Name of the collection
+        """
+        try:
+            conn = self._connect()
+            conn.execute("DELETE FROM chunks WHERE collection = ?", (collection,))
+            conn.commit()
+            conn.close()
+        except Exception as exc: # Catching specific exception
+            logger.error("Error clearing lexical index: %s", exc)
+
+    def count(self, collection: str) -> int:
+        """
+        Count indexed chunks of a collection
+
+        Args:
+            collection: Name of the collection
+
+        Returns:
+            Number of indexed chunks
+        """
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT COUNT(*) FROM chunks WHERE collection = ?", (collection,)
+            ).fetchone()
+            conn.close()
+            return row[0] if row else 0
+        except Exception as exc: # Catching specific exception
+            logger.error("Error counting lexical index: %s", exc)
+            return 0
+
+    def search(
+        self,
+        collection: str,
+        query_text: str,
+        top_k: int = 3,
+        sources: Optional[List[str]] = None,
+        doc_type: Optional[str] = None,
+        path_prefix: Optional[str] = None,
+        ingested_after: Optional[float] = None,
+        ingested_before: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        BM25 keyword search, optionally restricted by chunk metadata
+
+        Args:
+            collection: Name of the collection to search
+            query_text: Text to query
+            top_k: Number of top results to return
+            sources: Only match chunks from these sources
+            doc_type: Only match chunks with this 'type' metadata
+            path_prefix: Only match chunks whose 'path' starts with this prefix
+            ingested_after: Only match chunks ingested at or after this Unix time
+            ingested_before: Only match chunks ingested at or before this Unix time
+
+        Returns:
+            List of dicts with 'id', 'content', 'metadata' and 'bm25' (lower is better)
+        """
+        tokens = content_tokens(query_text)
+        if not tokens:
+            return []
+
+        # Quote every token so FTS5 syntax characters in user input are literal
+        match_expr = " OR ".join(f'"{token}"' for token in tokens)
+
+        conditions = ["chunks_fts MATCH ?", "c.collection = ?"]
+        params: List[Any] = [match_expr, collection]
+        if sources:
+            conditions.append(f"c.source IN ({', '.join('?' for _ in sources)})")
+            params.extend(sources)
+        if doc_type:
+            conditions.append("json_extract(c.metadata, '$.type') = ?")
+            params.append(doc_type)
+        if path_prefix:
+            conditions.append("substr(json_extract(c.metadata, '$.path'), 1, ?) = ?")
+            params.extend([len(path_prefix), path_prefix])
+        if ingested_after is not None:
+            conditions.append("json_extract(c.metadata, '$.ingested_at') >= ?")
+            params.append(ingested_after)
+        if ingested_before is not None:
+            conditions.append("json_extract(c.metadata, '$.ingested_at') <= ?")
+            params.append(ingested_before)
+        params.append(top_k)
+
+        try:
+            conn = self._connect()
+            rows = conn.execute(f"""
+                SELECT c.id, c.content, c.metadata, bm25(chunks_fts) AS score
+                FROM chunks_fts
+                JOIN chunks c ON c.rowid = chunks_fts.rowid
+                WHERE {' AND '.join(conditions)}
+                ORDER BY score
+                LIMIT ?
+            """, params).fetchall()
+            conn.close()
+        except Exception as exc: # Catching specific exception
+            logger.error("Error searching lexical index: %s", exc)
+            return []
+
+        return [
+            {
+                "id": row[0],
+                "content": row[1],
+                "metadata": json.loads(row[2]) if row[2] else {},
+                "bm25": row[3],
+            }
+            for row in rows
+        ]
+
+    def list_sources(self, collection: str) -> Dict[str, int]:
+        """
+        List the sources of a collection with their chunk counts
+
+        Args:
+            collection: Name of the collection
+
+        Returns:
+            Dictionary of source to number of chunks
+        """
+        try:
+            conn = self._connect()
+            rows = conn.execute("""
+                SELECT source, COUNT(*) FROM chunks
+                WHERE collection = ?
+                GROUP BY source ORDER BY source
+            """, (collection,)).fetchall()
+            conn.close()
+            return {row[0] or "unknown": row[1] for row in rows}
+        except Exception as exc: # Catching specific exception
+            logger.error("Error listing lexical index sources: %s", exc)
+            return {}
+
+    def list_paths(self, collection: str, prefix: str = "") -> List[str]:
+        """
+        List the distinct file paths of a collection starting with a prefix
+
+        Args:
+            collection: Name of the collection
+            prefix: Path prefix to match
+
+        Returns:
+            Sorted list of matching paths
+        """
+        try:
+            conn = self._connect()
+            rows = conn.execute("""
+                SELECT DISTINCT json_extract(metadata, '$.path') AS path FROM chunks
+                WHERE collection = ? AND path IS NOT NULL AND substr(path, 1, ?) = ?
+                ORDER BY path
+            """, (collection, len(prefix), prefix)).fetchall()
+            conn.close()
+            return [row[0] for row in rows]
+        except Exception as exc: # Catching specific exception
+            logger.error("Error listing lexical index paths: %s", exc)
+            return []
+
+
+def query_coverage(query_text: str, content: str) -> float:
+    """
+    Fraction of distinct query tokens (stopwords aside) that occur in the
+    content. Used as the 0-1 similarity of keyword matches, since raw BM25
+    scores are unbounded and depend on corpus statistics.
+
+    Args:
+        query_text: The query
+        content: Matched chunk text
+
+    Returns:
+        Coverage in [0, 1]
+    """
+    query_tokens = set(content_tokens(query_text))
+    if not query_tokens:
+        return 0.0
+    return len(query_tokens & set(tokenize(content))) / len(query_tokens)
@@ -0,0 +1,338 @@
+"""
+Maintenance Module
+
+Housekeeping for the RAG store under DB_PATH: removes chunks whose source
+file no longer exists, drops chunks whose content duplicates another
+chunk up to case and whitespace, compacts the SQLite databases and deletes
+index directories left behind by deleted collections. ChromaDB's own
+database is only compacted while no other process has the store open.
+Reports per-source chunk counts and disk usage before and after, so the
+effect of every run is visible.
+
+"""
+
+import os
+import re
+import shutil
+import hashlib
+import logging
+import sqlite3
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_PAGE_SIZE = 1000
+# ChromaDB keeps one directory per vector segment, named after the segment id
+_SEGMENT_DIR_PATTERN = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+
+def disk_usage(db_path: str) -> Dict[str, int]:
+    """
+    Measure the on-disk size of everything under the RAG directory
+
+    Args:
+        db_path: Directory holding the RAG data
+
+    Returns:
+        Dictionary of top-level entry name to size in bytes, plus 'total'
+    """
+    usage: Dict[str, int] = {}
+    root = Path(db_path)
+    if not root.exists():
+        return {"total": 0}
+    for entry in root.iterdir():
+        if entry.is_dir():
+            size = sum(f.stat().st_size for f in entry.rglob("*") if f.is_file())
+        else:
+            size = entry.stat().st_size
+        usage[entry.name] = size
+    usage["total"] = sum(usage.values())
+    return usage
+
+
+def chroma_disk_usage(path: str) -> int:
+    """
+    Measure the size of the ChromaDB data in a directory (database and segment directories)
+
+    Args:
+        path: ChromaDB directory
+
+    Returns:
+        Size in bytes
+    """
+    root = Path(path)
+    size = (root / "chroma.sqlite3").stat().st_size if (root / "chroma.sqlite3").exists() else 0
+    for entry in root.iterdir() if root.exists() else []:
+        if entry.is_dir() and _SEGMENT_DIR_PATTERN.match(entry.name):
+            size += sum(f.stat().st_size for f in entry.rglob("*") if f.is_file())
+    return size
+
+
+def format_size(size: float) -> str:
+    """
+    Format a byte count for display
+
+    Args:
+        size: Size in bytes
+
+    Returns:
+        Human readable size, e.g. '1.5 MB'
+    """
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def normalize_content(text: str) -> str:
+    """
+    Normalize chunk text for duplicate detection (case and whitespace)
+
+    Args:
+        text: Chunk text
+
+    Returns:
+        Normalized text
+    """
+    return re.sub(r"\s+", " ", text or "").strip().casefold()
+
+
+def is_missing_file(path: str) -> bool:
+    """
+    Whether a recorded file path certainly no longer exists. Relative paths
+    (recorded before imports stored absolute paths) depend on the directory
+    they were imported from, and a path whose directory can't be read may be
+    on an unmounted drive, so neither counts as missing.
+
+    Args:
+        path: Path recorded with the chunks
+
+    Returns:
+        True only if the directory is readable and the file is not in it
+    """
+    if not os.path.isabs(path):
+        return False
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory) or not os.access(directory, os.R_OK | os.X_OK):
+        return False
+    return not os.path.lexists(path)
+
+
+def find_orphan_chunks(rag: Any) -> Tuple[Dict[str, List[str]], List[str]]:
+    """
+    Find chunks of imported files that no longer exist on disk
+
+    Args:
+        rag: ChromaDBRAG instance
+
+    Returns:
+        Tuple of (missing file path to the ids of its chunks,
+        recorded paths that can't be checked and are kept)
+    """
+    paths = rag.lexical_index.list_paths(rag.collection_name)
+    unverifiable = [path for path in paths if not os.path.isabs(path)]
+    orphans: Dict[str, List[str]] = {}
+    for path in paths:
+        if not is_missing_file(path):
+            continue
+        ids = rag.collection.get(where={"path": path}, include=[]).get("ids") or []
+        if ids:
+            orphans[path] = ids
+    return orphans, unverifiable
+
+
+def find_duplicate_chunks(rag: Any) -> List[str]:
+    """
+    Find chunks whose normalized content duplicates an earlier chunk,
+    from the same or from another source. The first ingested copy is kept.
+    Chunk ids are hashes of the exact content, so identical chunks are never
+    stored twice: the copies found differ only in case or whitespace.
+
+    Args:
+        rag: ChromaDBRAG instance
+
+    Returns:
+        Ids of the redundant copies
+    """
+    first_seen: Dict[str, tuple] = {} # content hash -> (ingested_at, id)
+    duplicates: List[str] = []
+    offset = 0
+    while True:
+        page = rag.collection.get(
+            limit=MAINTENANCE_PAGE_SIZE,
+            offset=offset,
+            include=["documents", "metadatas"]
+        )
+        ids = page.get("ids") or []
+        if not ids:
+            break
+        documents = page.get("documents") or [""] * len(ids)
+        metadatas = page.get("metadatas") or [{}] * len(ids)
+        for chunk_id, document, metadata in zip(ids, documents, metadatas):
+            key = hashlib.sha256(normalize_content(document).encode("utf-8")).hexdigest()
+            ingested_at = (metadata or {}).get("ingested_at", 0)
+            if key not in first_seen:
+                first_seen[key] = (ingested_at, chunk_id)
+            elif ingested_at < first_seen[key][0]:
+                duplicates.append(first_seen[key][1])
+                first_seen[key] = (ingested_at, chunk_id)
+            else:
+                duplicates.append(chunk_id)
+        offset += len(ids)
+    return duplicates
+
+
+def find_orphan_segment_dirs(db_path: str) -> List[Path]:
+    """
+    Find ChromaDB segment directories that belong to no segment anymore
+    (left behind when collections are deleted)
+
+    Args:
+        db_path: Directory holding the RAG data
+
+    Returns:
+        Paths of the unused directories
+    """
+    chroma_db = Path(db_path) / "chroma.sqlite3"
+    if not chroma_db.exists():
+        return []
+    try:
+        conn = sqlite3.connect(str(chroma_db), timeout=30)
+        segment_ids = {row[0] for row in conn.execute("SELECT id FROM segments")}
+        conn.close()
+    except Exception as exc: # Catching specific exception
+        logger.warning("Could not read ChromaDB segments, skipping directory cleanup: %s", exc)
+        return []
+    return [
+        entry for entry in Path(db_path).iterdir()
+        if entry.is_dir() and _SEGMENT_DIR_PATTERN.match(entry.name) and entry.name not in segment_ids
+    ]
+
+
+def vacuum_databases(db_path: str, include_chroma: bool = True) -> List[str]:
+    """
+    Compact every SQLite database under the RAG directory
+
+    Args:
+        db_path: Directory holding the RAG data
+        include_chroma: Also compact ChromaDB's own database
+
+    Returns:
+        Names of the databases that were compacted
+    """
+    compacted = []
+    chroma_databases = sorted(Path(db_path).glob("*.sqlite3")) if include_chroma else []
+    for database in chroma_databases + sorted(Path(db_path).glob("*.db")):
+        try:
+            conn = sqlite3.connect(str(database), timeout=30)
+            if database.name == "lexical.db":
+                # Merge the FTS5 index segments before reclaiming space
+                conn.execute("INSERT INTO chunks_fts(chunks_fts) VALUES ('optimize')")
+                conn.commit()
+            conn.execute("VACUUM")
+            conn.close()
+            compacted.append(database.name)
+        except Exception as exc: # Catching specific exception
+            logger.warning("Could not compact %s: %s", database.name, exc)
+    return compacted
+
+
+def maintain(
+    db_path: str,
+    collections: Optional[List[str]] = None,
+    remove_orphans: bool = False,
+    dedupe: bool = True,
+    compact: bool = True,
+    dry_run: bool = False,
+    force: bool = False
+) -> Dict[str, Any]:
+    """
+    Run maintenance on the RAG store
+
+    Args:
+        db_path: Directory holding the RAG data
+        collections: Collection names to clean (defaults to every registered collection)
+        remove_orphans: Remove chunks of files that no longer exist (off by default: it deletes data)
+        dedupe: Remove chunks whose content differs from another chunk's only in case or whitespace
+        compact: Vacuum the databases and delete unused segment directories
+        dry_run: Only report what would be removed
+        force: Compact ChromaDB's database even while another process has the store open
+
+    Returns:
+        Report with per-collection source counts and removals, disk usage before
+        and after, and 'store_in_use' when ChromaDB's database was left alone
+    """
+    from chromadb_rag import ChromaDBRAG
+    from collection_registry import CollectionRegistry
+    from rag_settings import get_default_collection_name, get_server_url
+    from sharding import read_shard_count, shard_paths
+    from store_lock import release_store, try_lock_store
+
+    if collections is None:
+        collections = [entry["name"] for entry in CollectionRegistry(db_path).list()]
+        if not collections:
+            collections = [get_default_collection_name()]
+
+    report: Dict[str, Any] = {
+        "disk_before": disk_usage(db_path),
+        "collections": {},
+        "dry_run": dry_run,
+    }
+
+    for name in collections:
+        rag = ChromaDBRAG(db_path, collection_name=name)
+        entry: Dict[str, Any] = {"sources_before": rag.list_sources()}
+
+        orphans, unverifiable = find_orphan_chunks(rag) if remove_orphans else ({}, [])
+        orphan_ids = [chunk_id for ids in orphans.values() for chunk_id in ids]
+        entry["missing_files"] = sorted(orphans)
+        entry["unverifiable_paths"] = unverifiable
+        entry["orphans_removed"] = len(orphan_ids)
+        if orphan_ids and not dry_run:
+            rag.delete_chunks(orphan_ids)
+
+        duplicate_ids = find_duplicate_chunks(rag) if dedupe else []
+        entry["duplicates_removed"] = len(duplicate_ids)
+        if duplicate_ids and not dry_run:
+            rag.delete_chunks(duplicate_ids)
+
+        entry["sources_after"] = rag.list_sources()
+        report["collections"][name] = entry
+        logger.info(
+            "Maintenance of '%s': %d orphan and %d duplicate chunks%s",
+            name, len(orphan_ids), len(duplicate_ids), " found" if dry_run else " removed"
+        )
+
+    # Every shard directory holds its own ChromaDB database and segments. A running
+    # Chroma server, or any other process with the store open (the web UI, an ingestion
+    # worker), may be reading or writing them, so only Pixella's own databases are compacted then.
+    server_mode = get_server_url() is not None
+    compact_chroma = compact and not server_mode
+    locked = False
+    if compact_chroma and not dry_run:
+        locked = try_lock_store(db_path)
+        if not locked and not force:
+            logger.warning("The RAG store is open in another process, leaving ChromaDB's database uncompacted")
+            compact_chroma = False
+    report["store_in_use"] = compact and not server_mode and not compact_chroma
+    try:
+        roots = shard_paths(db_path, read_shard_count(db_path)) if compact_chroma else []
+        orphan_dirs = [directory for root in roots for directory in find_orphan_segment_dirs(root)]
+        report["segment_dirs_removed"] = [entry.name for entry in orphan_dirs]
+        report["compacted"] = []
+        if compact and not dry_run:
+            for directory in orphan_dirs:
+                shutil.rmtree(directory, ignore_errors=True)
+            if not compact_chroma:
+                report["compacted"] = vacuum_databases(db_path, include_chroma=False)
+            for root in roots:
+                prefix = "" if root == db_path else f"{Path(root).relative_to(db_path)}/"
+                report["compacted"] += [prefix + name for name in vacuum_databases(root)]
+    finally:
+        if locked:
+            release_store(db_path)
+
+    report["disk_after"] = disk_usage(db_path)
+    return report
@@ -0,0 +1,317 @@
+"""
+Query Cache Module
+
+Bounded cache of RAG query results keyed on the normalized query, the
+query options and the collection version. Every write to a collection
+bumps its version, so cached results are never served for stale data.
+
+"""
+
+import re
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 256
+
+
+def normalize_query(query_text: str) -> str:
+    """
+    Normalize a query so trivially different spellings share a cache entry
+
+    Args:
+        query_text: The raw query
+
+    Returns:
+        Case-folded query with collapsed whitespace and no trailing punctuation
+    """
+    text = re.sub(r"\s+", " ", query_text.casefold()).strip()
+    return text.rstrip("?!. ")
+
+
+class QueryCache:
+    """
+    LRU cache of query results with exact, version-based invalidation.
+    Collection versions are always persisted so that every process sharing
+    the database sees the same version; cached results are persisted only
+    when `persistent` is set.
+    """
+
+    def __init__(self, db_path: str, max_entries: int = DEFAULT_CACHE_SIZE, persistent: bool = False):
+        """
+        Initialize the query cache
+
+        Args:
+            db_path: Directory holding the RAG data
+            max_entries: Maximum number of cached queries (0 disables caching)
+            persistent: Keep cached results on disk across restarts
+        """
+        Path(db_path).mkdir(parents=True, exist_ok=True)
+        self.db_path = Path(db_path) / "query_cache.db"
+        self.max_entries = max(max_entries, 0)
+        self.persistent = persistent
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.db_path), timeout=30)
+
+    def _init_database(self):
+        """Create the version and result tables"""
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS collection_versions (
+                    collection TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS query_results (
+                    key TEXT PRIMARY KEY,
+                    collection TEXT,
+                    version INTEGER,
+                    results TEXT,
+                    last_used REAL
+                )
+            """)
+            conn.commit()
+            conn.close()
+        except Exception as exc: # Catching specific exception
+            logger.error("Error initializing query cache: %s", exc)
+            raise
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get_version(self, collection: str) -> int:
+        """
+        Get the current version of a collection
+
+        Args:
+            collection: Name of the collection
+
+        Returns:
+            The collection version (0 if never written)
+        """
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT version FROM collection_versions WHERE collection = ?", (collection,)
+            ).fetchone()
+            conn.close()
+            return row[0] if row else 0
+        except Exception as exc: # Catching specific exception
+            logger.error("Error reading collection version: %s", exc)
+            return 0
+
+    def bump_version(self, collection: str) -> int:
+        """
+        Increment a collection's version, invalidating its cached results
+
+        Args:
+            collection: Name of the collection
+
+        Returns:
+            The new version
+        """
+        return self.bump_version_from(collection, None)[0]
+
+    def bump_version_from(self, collection: str, expected: Optional[int]) -> Tuple[int, bool]:
+        """
+        Increment a collection's version and report whether it was still
+        `expected` beforehand, in one transaction. A process that finds its
+        vector index at `expected` can apply its own write to the index
+        knowing that no other process wrote in between.
+
+        Args:
+            collection: Name of the collection
+            expected: Version the caller believes is current (None to skip the check)
+
+        Returns:
+            Tuple of (the new version, whether the previous version was `expected`)
+        """
+        try:
+            conn = self._connect()
+            conn.isolation_level = None
+            cursor = conn.cursor()
+            # Take the write lock before reading, so no other process can bump in between
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                row = cursor.execute(
+                    "SELECT version FROM collection_versions WHERE collection = ?", (collection,)
+                ).fetchone()
+                previous = row[0] if row else 0
+                cursor.execute("""
+                    INSERT INTO collection_versions (collection, version) VALUES (?, 1)
+                    ON CONFLICT(collection) DO UPDATE SET version = version + 1
+                """, (collection,))
+                cursor.execute("DELETE FROM query_results WHERE collection = ?", (collection,))
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+            version, current = previous + 1, expected is not None and previous == expected
+        except Exception as exc: # Catching specific exception
+            logger.error("Error bumping collection version: %s", exc)
+            version, current = -1, False
+
+        # Entries of older versions can never match again; drop them eagerly
+        with self._lock:
+            prefix = f"{collection}:"
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+        return version, current
+
+    def make_key(self, collection: str, version: int, query_text: str, **options: Any) -> str:
+        """
+        Build the cache key for a query
+
+        Args:
+            collection: Name of the collection
+            version: Current collection version
+            query_text: The raw query
+            **options: Every other argument that changes the result (top_k, filters, ...)
+
+        Returns:
+            Cache key string
+        """
+        payload = json.dumps(
+            {"query": normalize_query(query_text), "version": version, **options},
+            sort_keys=True,
+            default=str,
+        )
+        return f"{collection}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Look up cached results
+
+        Args:
+            key: Key from `make_key`
+
+        Returns:
+            A copy of the cached results, or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            results = self._entries.get(key)
+            if results is not None:
+                self._entries.move_to_end(key)
+
+        if results is None and self.persistent:
+            results = self._get_persisted(key)
+            if results is not None:
+                self._remember(key, results)
+
+        if results is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return [dict(result) for result in results]
+
+    def put(self, key: str, collection: str, version: int, results: List[Dict[str, Any]]) -> None:
+        """
+        Store query results
+
+        Args:
+            key: Key from `make_key`
+            collection: Name of the collection
+            version: Collection version the results were computed at
+            results: Query results
+        """
+        if not self.enabled:
+            return
+
+        stored = [dict(result) for result in results]
+        self._remember(key, stored)
+        if self.persistent:
+            self._put_persisted(key, collection, version, stored)
+
+    def _remember(self, key: str, results: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._entries[key] = results
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_persisted(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT results FROM query_results WHERE key = ?", (key,)).fetchone()
+            if row:
+                conn.execute("UPDATE query_results SET last_used = ? WHERE key = ?", (time.time(), key))
+                conn.commit()
+            conn.close()
+            return json.loads(row[0]) if row else None
+        except Exception as exc: # Catching specific exception
+            logger.error("Error reading query cache: %s", exc)
+            return None
+
+    def _put_persisted(self, key: str, collection: str, version: int, results: List[Dict[str, Any]]) -> None:
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT OR REPLACE INTO query_results (key, collection, version, results, last_used)
+                VALUES (?, ?, ?, ?, ?)
+            """, (key, collection, version, json.dumps(results, default=str), time.time()))
+            # Keep the on-disk cache bounded as well, evicting least recently used
+            cursor.execute("""
+                DELETE FROM query_results WHERE key IN (
+                    SELECT key FROM query_results ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            conn.commit()
+            conn.close()
+        except Exception as exc: # Catching specific exception
+            logger.error("Error writing query cache: %s", exc)
+
+    def clear(self) -> None:
+        """Drop every cached result and reset the statistics"""
+        with self._lock:
+            self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        try:
+            conn = self._connect()
+            conn.execute("DELETE FROM query_results")
+            conn.commit()
+            conn.close()
+        except Exception as exc: # Catching specific exception
+            logger.error("Error clearing query cache: %s", exc)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+
+        Returns:
+            Dictionary with hits, misses, hit rate, size and configuration
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "persistent": self.persistent,
+        }
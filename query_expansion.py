@@ -0,0 +1,192 @@
+"""
+Query Expansion Module
+
+Generates alternative phrasings of a query so short or ambiguous questions
+still find the right chunks. Variants come from cheap rewrite rules
+(question prefix removal, keyword-only form, identifier splitting) or from
+one LLM call whose answers are cached on disk. The RAG system embeds all
+variants in one batch, searches them in one call and fuses the rankings.
+
+"""
+
+import re
+import time
+import sqlite3
+import logging
+from pathlib import Path
+from typing import List, Optional
+
+from lexical_index import tokenize
+from query_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+EXPANSION_MODES = ("off", "rules", "llm")
+DEFAULT_EXPANSION_MODE = "off"
+DEFAULT_EXPANSION_VARIANTS = 3
+
+_QUESTION_PREFIX = re.compile(
+    r"^\s*(?:please\s+)?(?:can|could|would)?\s*(?:you\s+)?"
+    r"(?:what(?:'s| is| are| does| do)?|how (?:do|can|should|would) (?:i|we|you)|how to|how does|how is|"
+    r"tell me (?:about|how)|explain|describe|show me|why (?:does|is|are|do)|where (?:is|are|can i find)|"
+    r"who (?:is|are)|when (?:does|is|do|did))\s+",
+    re.IGNORECASE
+)
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "do", "does", "did", "i", "we", "you", "me",
+    "my", "our", "your", "it", "its", "of", "in", "on", "at", "to", "for", "with", "by", "from", "and",
+    "or", "what", "how", "why", "where", "when", "who", "which", "can", "could", "would", "should",
+    "please", "tell", "about", "there", "this", "that", "these", "those", "any", "some",
+}
+_IDENTIFIER_PARTS = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def rule_variants(query_text: str, max_variants: int = DEFAULT_EXPANSION_VARIANTS) -> List[str]:
+    """
+    Rewrite a query with simple rules
+
+    Args:
+        query_text: The query
+        max_variants: Maximum number of queries returned, including the original
+
+    Returns:
+        The original query followed by distinct rewrites
+    """
+    candidates = [query_text]
+    stripped = _QUESTION_PREFIX.sub("", query_text).strip(" ?!.")
+    candidates.append(stripped)
+    candidates.append(" ".join(token for token in tokenize(query_text) if token not in _STOPWORDS))
+    identifiers = [word for word in re.findall(r"\w+", query_text) if "_" in word or re.search(r"[a-z][A-Z]", word)]
+    if identifiers:
+        split = query_text
+        for word in identifiers:
+            split = split.replace(word, " ".join(part.lower() for part in _IDENTIFIER_PARTS.findall(word)))
+        candidates.append(split)
+    return _distinct(candidates, max_variants)
+
+
+def _distinct(candidates: List[str], max_variants: int) -> List[str]:
+    """Keep the first occurrence of every normalized, non-empty query"""
+    seen = set()
+    variants = []
+    for candidate in candidates:
+        key = normalize_query(candidate)
+        if key and key not in seen:
+            seen.add(key)
+            variants.append(candidate.strip())
+    return variants[:max(max_variants, 1)]
+
+
+class ExpansionCache:
+    """
+    On-disk cache of LLM-generated query variants, keyed on the normalized query and model
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Initialize the cache
+
+        Args:
+            db_path: Directory holding the RAG data
+        """
+        Path(db_path).mkdir(parents=True, exist_ok=True)
+        self.db_path = Path(db_path) / "query_expansion.db"
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS expansions (
+                query TEXT NOT NULL,
+                model TEXT NOT NULL,
+                variants TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (query, model)
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.db_path), timeout=30)
+
+    def get(self, query_text: str, model: str) -> Optional[List[str]]:
+        """
+        Look up the variants generated for a query
+
+        Args:
+            query_text: The query
+            model: Chat model that generated them
+
+        Returns:
+            The cached variants, or None
+        """
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT variants FROM expansions WHERE query = ? AND model = ?",
+            (normalize_query(query_text), model)
+        ).fetchone()
+        conn.close()
+        return row[0].split("\n") if row else None
+
+    def put(self, query_text: str, model: str, variants: List[str]) -> None:
+        """
+        Store the variants generated for a query
+
+        Args:
+            query_text: The query
+            model: Chat model that generated them
+            variants: The generated queries
+        """
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO expansions (query, model, variants, created_at) VALUES (?, ?, ?, ?)",
+            (normalize_query(query_text), model, "\n".join(variants), time.time())
+        )
+        conn.commit()
+        conn.close()
+
+
+def llm_variants(
+    query_text: str,
+    max_variants: int = DEFAULT_EXPANSION_VARIANTS,
+    cache: Optional[ExpansionCache] = None
+) -> List[str]:
+    """
+    Ask the chat model for alternative phrasings of a query (cached per query and model).
+    Falls back to the rewrite rules if the model is unavailable.
+
+    Args:
+        query_text: The query
+        max_variants: Maximum number of queries returned, including the original
+        cache: Cache of earlier answers
+
+    Returns:
+        The original query followed by distinct rewrites
+    """
+    try:
+        from chatbot import chatbot
+    except Exception as exc: # Catching specific exception
+        logger.warning("Chat model unavailable for query expansion: %s", exc)
+        chatbot = None
+    if chatbot is None or max_variants <= 1:
+        return rule_variants(query_text, max_variants)
+
+    if cache is not None:
+        cached = cache.get(query_text, chatbot.model)
+        if cached is not None:
+            return _distinct([query_text] + cached, max_variants)
+
+    prompt = (
+        f"Write {max_variants - 1} alternative search queries for finding documents that answer "
+        f"the question below. Use different wording and likely keywords. "
+        f"Reply with one query per line and nothing else.\n\nQuestion: {query_text}"
+    )
+    try:
+        reply = chatbot.llm.invoke(prompt)
+    except Exception as exc: # Catching specific exception
+        logger.warning("Query expansion call failed, using rewrite rules: %s", exc)
+        return rule_variants(query_text, max_variants)
+
+    rewrites = [re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", line).strip().strip('"') for line in str(reply).splitlines()]
+    rewrites = [line for line in rewrites if line]
+    if cache is not None:
+        cache.put(query_text, chatbot.model, rewrites)
+    return _distinct([query_text] + rewrites, max_variants)
@@ -0,0 +1,322 @@
+"""
+Query Gate Module
+
+Decides, before any embedding call, whether a chat message needs a RAG
+search. Small talk ("thanks", "hi") skips retrieval, requests to rework
+the previous answer ("shorter please") reuse the previous turn's context
+when they are about what it retrieved, and everything else retrieves. Word-list heuristics handle the clear
+cases; an optional naive Bayes classifier, trained locally on labelled
+messages, decides the rest.
+
+"""
+
+import json
+import math
+import logging
+from pathlib import Path
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple, TYPE_CHECKING
+
+from lexical_index import tokenize
+from retrieval import QueryFilters
+
+if TYPE_CHECKING:
+    from chromadb_rag import ChromaDBRAG
+    from retrieval import RetrievalResult
+
+logger = logging.getLogger(__name__)
+
+RETRIEVE = "retrieve"
+REUSE = "reuse"
+SKIP = "skip"
+GATE_ACTIONS = (RETRIEVE, REUSE, SKIP)
+GATE_MODES = ("off", "heuristic", "classifier")
+DEFAULT_GATE_MODE = "off"
+GATE_MODEL_FILE = "query_gate.json"
+# Classifier predictions less certain than this fall back to retrieving
+CLASSIFIER_MIN_CONFIDENCE = 0.7
+# Longer messages are assumed to carry a question of their own
+MAX_GATED_TOKENS = 10
+
+_SMALL_TALK = {
+    "hi", "hello", "hey", "yo", "hiya", "thanks", "thank", "thx", "ty", "cheers", "appreciate",
+    "ok", "okay", "k", "cool", "great", "nice", "awesome", "perfect", "good", "fine", "alright",
+    "bye", "goodbye", "morning", "evening", "night", "yes", "yeah", "yep", "no", "nope", "sure",
+    "lol", "haha", "wow", "got", "it", "sounds", "you", "so", "much", "very", "a", "lot", "all",
+    "that", "s", "is", "helpful", "i", "see", "understood", "welcome", "there", "again",
+}
+_REWORK = {
+    "shorter", "longer", "simpler", "briefer", "summarize", "summarise", "summary", "tldr",
+    "rephrase", "reword", "rewrite", "elaborate", "expand", "continue", "detail", "details",
+    "detailed", "clarify", "explain", "translate", "bullet", "bullets", "points", "list",
+    "table", "format", "example", "examples", "simplify", "shorten", "concise", "formal",
+    "casual", "repeat",
+}
+_FILLER = {
+    "it", "that", "this", "those", "these", "above", "previous", "last", "your", "answer",
+    "response", "reply", "please", "pls", "can", "could", "would", "you", "make", "give", "me",
+    "in", "a", "an", "the", "as", "to", "be", "more", "less", "bit", "little", "some", "again",
+    "with", "into", "and", "now", "one", "just", "same", "but", "of", "using", "so", "too",
+    "way", "much", "words", "sentences", "sentence", "paragraph", "english", "spanish", "french",
+    "german", "form", "version", "plain", "on", "for", "go", "keep", "going", "what", "about",
+}
+
+
+@dataclass
+class GateDecision:
+    """What to do about retrieval for one message"""
+    action: str   # retrieve, reuse or skip
+    reason: str
+
+
+class NaiveBayesGate:
+    """
+    Multinomial naive Bayes over message words, with add-one smoothing
+    """
+
+    def __init__(self, model: Dict[str, Any]):
+        """
+        Initialize the classifier
+
+        Args:
+            model: Trained parameters (see `train`)
+        """
+        self.labels: List[str] = model["labels"]
+        self.priors: Dict[str, float] = model["priors"]
+        self.counts: Dict[str, Dict[str, int]] = model["counts"]
+        self.totals: Dict[str, int] = model["totals"]
+        self.vocabulary_size: int = model["vocabulary_size"]
+
+    @classmethod
+    def train(cls, examples: List[Tuple[str, str]]) -> "NaiveBayesGate":
+        """
+        Train on labelled messages
+
+        Args:
+            examples: (message, action) pairs
+
+        Returns:
+            The trained classifier
+
+        Raises:
+            ValueError: If a label is not a gate action or there are no examples
+        """
+        if not examples:
+            raise ValueError("No training examples")
+        counts: Dict[str, Dict[str, int]] = {}
+        documents: Dict[str, int] = {}
+        vocabulary = set()
+        for text, label in examples:
+            if label not in GATE_ACTIONS:
+                raise ValueError(f"Unknown label '{label}', use one of {', '.join(GATE_ACTIONS)}")
+            documents[label] = documents.get(label, 0) + 1
+            label_counts = counts.setdefault(label, {})
+            for token in tokenize(text):
+                label_counts[token] = label_counts.get(token, 0) + 1
+                vocabulary.add(token)
+        labels = sorted(documents)
+        return cls({
+            "labels": labels,
+            "priors": {label: documents[label] / len(examples) for label in labels},
+            "counts": counts,
+            "totals": {label: sum(counts[label].values()) for label in labels},
+            "vocabulary_size": len(vocabulary),
+        })
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """
+        Classify a message
+
+        Args:
+            text: The message
+
+        Returns:
+            Tuple of (action, probability)
+        """
+        tokens = tokenize(text)
+        log_scores = {}
+        for label in self.labels:
+            denominator = self.totals[label] + self.vocabulary_size + 1
+            log_scores[label] = math.log(self.priors[label]) + sum(
+                math.log((self.counts[label].get(token, 0) + 1) / denominator) for token in tokens
+            )
+        best = max(log_scores, key=log_scores.get)
+        total = sum(math.exp(score - log_scores[best]) for score in log_scores.values())
+        return best, 1.0 / total
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "labels": self.labels,
+            "priors": self.priors,
+            "counts": self.counts,
+            "totals": self.totals,
+            "vocabulary_size": self.vocabulary_size,
+        }
+
+
+def heuristic_decision(message: str, has_previous: bool) -> Optional[GateDecision]:
+    """
+    Decide the clear cases from word lists
+
+    Args:
+        message: The user's message
+        has_previous: Whether a previous retrieval could be reused
+
+    Returns:
+        The decision, or None when the heuristics cannot tell
+    """
+    tokens = tokenize(message)
+    if not tokens:
+        return GateDecision(SKIP, "no words")
+    if len(tokens) > MAX_GATED_TOKENS:
+        return None
+    if all(token in _SMALL_TALK for token in tokens):
+        return GateDecision(SKIP, "small talk")
+    if any(token in _REWORK for token in tokens) and all(
+        token in _REWORK or token in _FILLER or token in _SMALL_TALK for token in tokens
+    ):
+        if has_previous:
+            return GateDecision(REUSE, "rework of the previous answer")
+        return GateDecision(SKIP, "rework of the previous answer, nothing to reuse")
+    return None
+
+
+class QueryGate:
+    """
+    Gate in front of retrieval: heuristics, then the optional classifier
+    """
+
+    def __init__(self, mode: str = DEFAULT_GATE_MODE, model_path: Optional[str] = None):
+        """
+        Initialize the gate
+
+        Args:
+            mode: 'off' (always retrieve), 'heuristic' or 'classifier'
+            model_path: Trained classifier file, used in 'classifier' mode
+        """
+        self.mode = mode
+        self.classifier: Optional[NaiveBayesGate] = None
+        if mode == "classifier" and model_path and Path(model_path).exists():
+            try:
+                self.classifier = NaiveBayesGate(json.loads(Path(model_path).read_text(encoding="utf-8")))
+            except Exception as exc: # Catching specific exception
+                logger.warning("Could not load query gate model %s, using heuristics: %s", model_path, exc)
+        elif mode == "classifier":
+            logger.warning("No query gate model at %s, using heuristics (train one with 'pixella rag train-gate')", model_path)
+
+    def decide(self, message: str, has_previous: bool = False) -> GateDecision:
+        """
+        Decide whether a message needs retrieval
+
+        Args:
+            message: The user's message
+            has_previous: Whether a previous retrieval could be reused
+
+        Returns:
+            GateDecision
+        """
+        if self.mode == "off":
+            return GateDecision(RETRIEVE, "gate disabled")
+        decision = heuristic_decision(message, has_previous)
+        if decision is not None:
+            return decision
+        if self.classifier is not None and len(tokenize(message)) <= MAX_GATED_TOKENS:
+            action, probability = self.classifier.predict(message)
+            if probability >= CLASSIFIER_MIN_CONFIDENCE:
+                if action == REUSE and not has_previous:
+                    action = SKIP
+                return GateDecision(action, f"classifier ({probability:.0%})")
+        return GateDecision(RETRIEVE, "needs retrieval")
+
+
+def train_gate(examples_path: str, model_path: str) -> Dict[str, Any]:
+    """
+    Train the gate classifier from a JSONL file of {"text": ..., "label": ...} lines
+    and save it
+
+    Args:
+        examples_path: Labelled messages; labels are retrieve, reuse or skip
+        model_path: Where to save the model
+
+    Returns:
+        Summary with per-label example counts and the training accuracy
+
+    Raises:
+        ValueError: If the file has no valid examples or an unknown label
+    """
+    examples: List[Tuple[str, str]] = []
+    with open(examples_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                examples.append((record["text"], record["label"]))
+    classifier = NaiveBayesGate.train(examples)
+    Path(model_path).write_text(json.dumps(classifier.to_dict()), encoding="utf-8")
+
+    correct = sum(classifier.predict(text)[0] == label for text, label in examples)
+    labels: Dict[str, int] = {}
+    for _, label in examples:
+        labels[label] = labels.get(label, 0) + 1
+    return {"examples": len(examples), "labels": labels, "accuracy": correct / len(examples)}
+
+
+def shares_terms(message: str, previous: "RetrievalResult") -> bool:
+    """
+    Whether a follow-up is about the previous retrieval: the message's own
+    terms (words beyond rework requests, filler and small talk) must appear
+    in the previous query or its hits. A bare "shorter please" has none.
+
+    Args:
+        message: The user's message
+        previous: The retrieval used for the previous turn
+
+    Returns:
+        True if the previous context can serve the message
+    """
+    terms = {
+        token for token in tokenize(message)
+        if token not in _REWORK and token not in _FILLER and token not in _SMALL_TALK
+    }
+    if not terms:
+        return True
+    previous_terms = set(tokenize(previous.query))
+    for hit in previous.hits:
+        previous_terms.update(tokenize(hit.get("content") or ""))
+    return bool(terms & previous_terms)
+
+
+def retrieve_if_needed(
+    rag: "ChromaDBRAG",
+    message: str,
+    previous: Optional["RetrievalResult"] = None,
+    **retrieve_kwargs: Any
+) -> Tuple[Optional["RetrievalResult"], GateDecision]:
+    """
+    Run the gate and retrieve only when the decision calls for it. The
+    previous retrieval is only reused for the same collection and scope.
+
+    Args:
+        rag: RAG instance to search
+        message: The user's message
+        previous: The retrieval used for the previous turn, if any
+        **retrieve_kwargs: Passed on to ChromaDBRAG.retrieve
+
+    Returns:
+        Tuple of (retrieval to use for this turn or None, decision)
+    """
+    filters = retrieve_kwargs.get("filters") or QueryFilters()
+    reusable = (
+        previous is not None
+        and previous.collection == rag.collection_name
+        and previous.filters == filters.to_dict()
+        and bool(previous.hits)
+    )
+    decision = rag.query_gate.decide(message, has_previous=reusable)
+    if decision.action == REUSE and not shares_terms(message, previous):
+        decision = GateDecision(RETRIEVE, "follow-up shares no terms with the previous retrieval")
+    logger.debug("Query gate: %s (%s)", decision.action, decision.reason)
+    if decision.action == RETRIEVE:
+        return rag.retrieve(message, **retrieve_kwargs), decision
+    if decision.action == REUSE:
+        return previous, decision
+    return None, decision
@@ -0,0 +1,350 @@
+"""
+RAG Evaluation Module
+
+Measures retrieval quality and cost on a labelled query set: recall@k,
+MRR, mean and p95 query latency and prompt tokens per query. Runs against
+an existing collection, or against a throwaway collection built from a set
+of files with an offline embedding model, and produces a JSON report so
+chunking, top_k, threshold and model settings can be compared across runs.
+`compare_storage` repeats the evaluation for reduced and quantized vector
+storage, to show the recall each setting costs.
+
+"""
+
+import json
+import time
+import shutil
+import logging
+import tempfile
+from datetime import datetime
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple
+
+from chunking import estimate_tokens
+from query_cache import normalize_query
+from vector_index import VECTOR_PRECISIONS, parse_codec
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVAL_TOP_KS = [1, 3, 5]
+DEFAULT_EVAL_EMBEDDING_MODEL = "local/hashing-384"
+
+
+@dataclass
+class EvalQuery:
+    """A query and the chunks, sources or passages that answer it"""
+    query: str
+    ids: List[str] = field(default_factory=list)
+    sources: List[str] = field(default_factory=list)
+    texts: List[str] = field(default_factory=list)
+
+    def expected(self) -> List[Tuple[str, str]]:
+        return (
+            [("id", value) for value in self.ids]
+            + [("source", value) for value in self.sources]
+            + [("text", value) for value in self.texts]
+        )
+
+
+def _as_list(value: Any) -> List[str]:
+    if value is None:
+        return []
+    return [str(item) for item in value] if isinstance(value, list) else [str(value)]
+
+
+def load_queries(path: str) -> List[EvalQuery]:
+    """
+    Read a labelled query set: one JSON object per line with a 'query' and
+    any of 'expected_id(s)' (chunk ids), 'expected_source(s)' (source names
+    or file paths) and 'expected_text' (a passage the answer contains)
+
+    Args:
+        path: JSONL file
+
+    Returns:
+        The queries
+
+    Raises:
+        ValueError: If a line has no query or nothing expected
+    """
+    queries: List[EvalQuery] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            item = EvalQuery(
+                query=str(record.get("query") or ""),
+                ids=_as_list(record.get("expected_ids", record.get("expected_id"))),
+                sources=_as_list(record.get("expected_sources", record.get("expected_source"))),
+                texts=_as_list(record.get("expected_text")),
+            )
+            if not item.query or not item.expected():
+                raise ValueError(f"Line {number}: needs a 'query' and at least one expected id, source or text")
+            queries.append(item)
+    return queries
+
+
+def is_relevant(hit: Dict[str, Any], kind: str, value: str) -> bool:
+    """
+    Whether a retrieved passage matches an expected chunk id, source or text
+
+    Args:
+        hit: Retrieved passage
+        kind: 'id', 'source' or 'text'
+        value: The expected value
+
+    Returns:
+        True if the passage matches
+    """
+    if kind == "id":
+        return value in (hit.get("merged_ids") or [hit.get("id")])
+    if kind == "source":
+        metadata = hit.get("metadata") or {}
+        return value in (metadata.get("source"), metadata.get("path"))
+    return normalize_query(value) in normalize_query(hit.get("content") or "")
+
+
+def sample_eval_queries(rag: Any, count: int = 50, seed: int = 0) -> List[EvalQuery]:
+    """
+    Build an unlabelled-corpus query set: each query is a run of words taken
+    from a chunk, which is expected back
+
+    Args:
+        rag: ChromaDBRAG instance
+        count: Number of queries
+        seed: Random seed (for repeatable runs)
+
+    Returns:
+        The queries
+    """
+    from reranking import sample_queries
+
+    return [EvalQuery(query=item["query"], ids=[item["expected"]]) for item in sample_queries(rag, count, seed=seed)]
+
+
+def describe_settings(rag: Any) -> Dict[str, Any]:
+    """
+    The retrieval settings of a RAG instance, recorded with every report
+
+    Args:
+        rag: ChromaDBRAG instance
+
+    Returns:
+        Dictionary of setting name to value
+    """
+    return {
+        "embedding_model": rag.embedding_model,
+        "chunking_profile": rag.chunking_profile,
+        "search_mode": rag.resolve_search_mode(),
+        "mmr_lambda": rag.mmr_lambda,
+        "reranker": rag.reranker_name,
+        "rerank_candidates": rag.rerank_candidates,
+        "query_expansion": rag.query_expansion,
+        "context_tokens": rag.context_tokens,
+        "vector_index": rag.vector_indexes.mode,
+        "vector_reduction": rag.vector_indexes.reduction,
+        "vector_precision": rag.vector_indexes.precision,
+    }
+
+
+def evaluate(
+    rag: Any,
+    queries: List[EvalQuery],
+    top_ks: Optional[List[int]] = None,
+    threshold: float = 0.5,
+    mode: Optional[str] = None,
+    details: bool = False
+) -> Dict[str, Any]:
+    """
+    Run every query at every top_k and score the results
+
+    Args:
+        rag: ChromaDBRAG instance
+        queries: Labelled queries (see `load_queries`)
+        top_ks: Values of k to evaluate
+        threshold: Similarity threshold passed to the search
+        mode: Search mode (defaults to RAG_SEARCH_MODE)
+        details: Include the ranks found for every query
+
+    Returns:
+        Report with the settings and, per k, recall, MRR, hit rate,
+        mean and p95 latency and prompt tokens per query
+    """
+    top_ks = sorted(set(top_ks or DEFAULT_EVAL_TOP_KS))
+    saved_cache_size = rag.query_cache.max_entries
+    rag.query_cache.max_entries = 0 # Measure real searches
+    results = []
+    try:
+        for top_k in top_ks:
+            recall, reciprocal_ranks, hits, latencies, prompt_tokens = 0.0, 0.0, 0, [], 0
+            per_query = []
+            for item in queries:
+                started = time.perf_counter()
+                retrieval = rag.retrieve(item.query, top_k=top_k, threshold=threshold, mode=mode)
+                latencies.append((time.perf_counter() - started) * 1000)
+                prompt_tokens += estimate_tokens(retrieval.context)
+
+                expected = item.expected()
+                found = [
+                    next((rank for rank, hit in enumerate(retrieval.hits, 1) if is_relevant(hit, kind, value)), None)
+                    for kind, value in expected
+                ]
+                ranks = [rank for rank in found if rank is not None]
+                recall += len(ranks) / len(expected)
+                reciprocal_ranks += 1 / min(ranks) if ranks else 0.0
+                hits += bool(ranks)
+                if details:
+                    per_query.append({"query": item.query, "ranks": found})
+
+            ordered = sorted(latencies)
+            row: Dict[str, Any] = {
+                "top_k": top_k,
+                "recall": recall / len(queries) if queries else 0.0,
+                "mrr": reciprocal_ranks / len(queries) if queries else 0.0,
+                "hit_rate": hits / len(queries) if queries else 0.0,
+                "mean_ms": sum(latencies) / len(latencies) if latencies else 0.0,
+                "p95_ms": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] if ordered else 0.0,
+                "prompt_tokens": prompt_tokens / len(queries) if queries else 0.0,
+            }
+            if details:
+                row["queries"] = per_query
+            results.append(row)
+    finally:
+        rag.query_cache.max_entries = saved_cache_size
+
+    return {
+        "collection": rag.collection_name,
+        "chunks": rag.collection.count(),
+        "queries": len(queries),
+        "threshold": threshold,
+        "settings": describe_settings(rag),
+        "results": results,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def parse_storage(spec: str) -> Tuple[str, str]:
+    """
+    Split a storage setting such as 'int8', 'pca:128/int8' or 'truncate:256'
+
+    Args:
+        spec: Reduction and/or precision, separated by '/'
+
+    Returns:
+        Tuple of (reduction, precision)
+
+    Raises:
+        ValueError: If the setting is invalid
+    """
+    reduction, precision = "none", "float32"
+    for part in spec.strip().lower().split("/"):
+        if part in VECTOR_PRECISIONS:
+            precision = part
+        elif part:
+            reduction = part
+    parse_codec(reduction, precision) # Validates both
+    return reduction, precision
+
+
+def compare_storage(
+    rag: Any,
+    queries: List[EvalQuery],
+    storages: List[str],
+    top_ks: Optional[List[int]] = None,
+    threshold: float = 0.5,
+    mode: Optional[str] = None,
+    kind: str = "numpy"
+) -> List[Dict[str, Any]]:
+    """
+    Evaluate an in-process index with full-precision vectors and with each
+    reduced or quantized storage setting. Indexes built only for the
+    comparison are removed afterwards.
+
+    Args:
+        rag: ChromaDBRAG instance
+        queries: Labelled queries (see `load_queries`)
+        storages: Storage settings (see `parse_storage`)
+        top_ks: Values of k to evaluate
+        threshold: Similarity threshold passed to the search
+        mode: Search mode (defaults to RAG_SEARCH_MODE)
+        kind: Index to evaluate ('numpy' or 'ivf')
+
+    Returns:
+        One report per setting, full precision first, each with its
+        'storage' name, 'index' and the bytes of vectors stored and scanned
+
+    Raises:
+        ValueError: If a storage setting is invalid
+    """
+    settings = [("float32", ("none", "float32"))]
+    for spec in storages:
+        parsed = parse_storage(spec)
+        if parsed not in [setting for _, setting in settings]:
+            settings.append((spec, parsed))
+    manager = rag.vector_indexes
+    saved = (manager.mode, manager.reduction, manager.precision, manager.index)
+    reports = []
+    try:
+        for name, (reduction, precision) in settings:
+            manager.mode, manager.reduction, manager.precision = kind, reduction, precision
+            manager.reset()
+            codec = parse_codec(reduction, precision)
+            existed = manager.path(kind, codec).exists()
+            index = manager.get(wait=True)
+            if kind == "numpy" and index.codec is not None and not index.codec.fitted and index.count:
+                index.fit_codec() # Small collections are encoded too, so the comparison means something
+            report = evaluate(rag, queries, top_ks, threshold=threshold, mode=mode)
+            report["storage"] = name
+            report["index"] = kind
+            report["footprint"] = index.footprint
+            reports.append(report)
+            if not existed:
+                index.clear()
+            logger.info("Evaluated vector storage %s: %s", name, report["footprint"])
+    finally:
+        manager.mode, manager.reduction, manager.precision, manager.index = saved
+    return reports
+
+
+def build_eval_collection(
+    files: List[str],
+    embedding_model: str = DEFAULT_EVAL_EMBEDDING_MODEL,
+    chunking_profile: Optional[str] = None
+) -> Tuple[Any, str]:
+    """
+    Index files into a throwaway collection, so settings can be evaluated
+    without touching the real store. The default model works offline.
+
+    Args:
+        files: Files to index
+        embedding_model: Embedding model for the collection
+        chunking_profile: Chunking profile (defaults to RAG_CHUNKING_PROFILE)
+
+    Returns:
+        Tuple of (ChromaDBRAG instance, its temporary directory; remove it with `discard_eval_collection`)
+    """
+    from chromadb_rag import ChromaDBRAG
+    from config import get_config
+    from embeddings import create_embeddings
+
+    db_path = tempfile.mkdtemp(prefix="pixella_eval_")
+    rag = ChromaDBRAG(db_path, collection_name="eval")
+    rag.embeddings = create_embeddings(embedding_model, get_config().get("GOOGLE_API_KEY"))
+    rag.registry.set_alias("eval", rag.physical_name, embedding_model, rag.collection_version)
+    if chunking_profile:
+        rag.chunking_profile = chunking_profile
+    for file_path in files:
+        rag.add_file(file_path)
+    logger.info("Indexed %d files into %d chunks for evaluation", len(files), rag.collection.count())
+    return rag, db_path
+
+
+def discard_eval_collection(db_path: str) -> None:
+    """
+    Remove a collection created by `build_eval_collection`
+
+    Args:
+        db_path: Its temporary directory
+    """
+    shutil.rmtree(db_path, ignore_errors=True)
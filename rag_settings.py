@@ -0,0 +1,294 @@
+"""
+RAG Settings Module
+
+Reads the RAG_* settings from the config: collection routing, chunking,
+search, caching, reranking, query expansion and gating, context packing,
+vector index backends and storage, the shared server and sharding. Invalid
+values are logged and replaced by the defaults of the module using them.
+
+"""
+
+import logging
+from typing import Optional
+
+from config import get_config
+from context_packing import DEFAULT_CONTEXT_NEIGHBORS, DEFAULT_CONTEXT_TOKENS
+from query_cache import DEFAULT_CACHE_SIZE
+from query_expansion import DEFAULT_EXPANSION_MODE, DEFAULT_EXPANSION_VARIANTS, EXPANSION_MODES
+from query_gate import DEFAULT_GATE_MODE, GATE_MODES
+from reembed import DEFAULT_REEMBED_BATCH_SIZE, DEFAULT_REEMBED_DELAY
+from reranking import DEFAULT_RERANK_CANDIDATES, DEFAULT_RERANKER
+from vector_index import (
+    DEFAULT_IVF_MIN_CHUNKS,
+    DEFAULT_IVF_NPROBE,
+    DEFAULT_NUMPY_INDEX_MAX_CHUNKS,
+    VECTOR_INDEX_MODES,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COLLECTION = "pixella"
+DEFAULT_MAX_OPEN_COLLECTIONS = 8
+
+
+def get_default_collection_name() -> str:
+    """
+    Get the default RAG collection name from config.
+    
+    Returns:
+        The default collection name
+    """
+    config = get_config()
+    return config.get("RAG_COLLECTION", DEFAULT_COLLECTION) or DEFAULT_COLLECTION
+
+
+def get_max_open_collections() -> int:
+    """
+    Get the maximum number of RAG collection handles kept open.
+    
+    Returns:
+        Size of the open-collection LRU (at least 1)
+    """
+    config = get_config()
+    try:
+        return max(int(config.get("RAG_MAX_OPEN_COLLECTIONS", DEFAULT_MAX_OPEN_COLLECTIONS)), 1)
+    except ValueError:
+        return DEFAULT_MAX_OPEN_COLLECTIONS
+
+
+def get_chunking_profile() -> str:
+    """
+    Get the chunking profile from config.
+    
+    Returns:
+        'auto' to pick a profile per file type, or a profile name to force it
+    """
+    config = get_config()
+    return config.get("RAG_CHUNKING_PROFILE", "legacy").lower() or "legacy"
+
+
+def get_search_mode() -> str:
+    """
+    Get the default RAG search mode from config.
+    
+    Returns:
+        One of 'auto', 'hybrid', 'vector' or 'lexical'
+    """
+    config = get_config()
+    return config.get("RAG_SEARCH_MODE", "vector")
+
+
+def get_query_cache_settings() -> tuple[int, bool]:
+    """
+    Get the query result cache settings from config.
+    
+    Returns:
+        Tuple of (maximum cached queries, whether the cache is persisted)
+    """
+    config = get_config()
+    try:
+        size = int(config.get("RAG_QUERY_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+    except ValueError:
+        logger.warning("Invalid RAG_QUERY_CACHE_SIZE, using %d", DEFAULT_CACHE_SIZE)
+        size = DEFAULT_CACHE_SIZE
+    persistent = config.get("RAG_QUERY_CACHE_PERSIST", "false").lower() == "true"
+    return size, persistent
+
+
+def get_reembed_settings() -> tuple[int, float]:
+    """
+    Get the background re-embedding settings from config.
+    
+    Returns:
+        Tuple of (chunks per embedding request, seconds between requests)
+    """
+    config = get_config()
+    try:
+        batch_size = max(int(config.get("RAG_REEMBED_BATCH_SIZE", DEFAULT_REEMBED_BATCH_SIZE)), 1)
+        delay = max(float(config.get("RAG_REEMBED_DELAY", str(DEFAULT_REEMBED_DELAY))), 0.0)
+    except ValueError:
+        logger.warning("Invalid re-embedding settings, using defaults")
+        batch_size, delay = DEFAULT_REEMBED_BATCH_SIZE, DEFAULT_REEMBED_DELAY
+    return batch_size, delay
+
+
+def get_mmr_lambda() -> float:
+    """
+    Get the MMR relevance/diversity trade-off from config.
+    
+    Returns:
+        Lambda in [0, 1]; 1.0 disables diversification
+    """
+    config = get_config()
+    try:
+        value = float(config.get("RAG_MMR_LAMBDA", "1.0"))
+    except ValueError:
+        logger.warning("Invalid RAG_MMR_LAMBDA, using 1.0")
+        value = 1.0
+    return min(max(value, 0.0), 1.0)
+
+
+def get_rerank_settings() -> tuple:
+    """
+    Get the local reranker settings from config.
+    
+    Returns:
+        Tuple of (reranker name, number of candidates fetched for reranking)
+    """
+    config = get_config()
+    reranker = config.get("RAG_RERANKER", DEFAULT_RERANKER).strip() or "none"
+    try:
+        candidates = int(config.get("RAG_RERANK_CANDIDATES", str(DEFAULT_RERANK_CANDIDATES)))
+    except ValueError:
+        logger.warning("Invalid RAG_RERANK_CANDIDATES, using %d", DEFAULT_RERANK_CANDIDATES)
+        candidates = DEFAULT_RERANK_CANDIDATES
+    return reranker, max(candidates, 1)
+
+
+def get_rag_top_k() -> int:
+    """
+    Get the number of chunks put into the prompt from config.
+    
+    Returns:
+        Number of chunks (at least 1)
+    """
+    config = get_config()
+    try:
+        return max(int(config.get("RAG_TOP_K", "2")), 1)
+    except ValueError:
+        logger.warning("Invalid RAG_TOP_K, using 2")
+        return 2
+
+
+def get_query_expansion_settings() -> tuple:
+    """
+    Get the query expansion settings from config.
+    
+    Returns:
+        Tuple of (mode, number of queries searched including the original)
+    """
+    config = get_config()
+    mode = config.get("RAG_QUERY_EXPANSION", DEFAULT_EXPANSION_MODE).strip().lower()
+    if mode not in EXPANSION_MODES:
+        logger.warning("Unknown RAG_QUERY_EXPANSION '%s', using %s", mode, DEFAULT_EXPANSION_MODE)
+        mode = DEFAULT_EXPANSION_MODE
+    try:
+        variants = int(config.get("RAG_EXPANSION_VARIANTS", str(DEFAULT_EXPANSION_VARIANTS)))
+    except ValueError:
+        logger.warning("Invalid RAG_EXPANSION_VARIANTS, using %d", DEFAULT_EXPANSION_VARIANTS)
+        variants = DEFAULT_EXPANSION_VARIANTS
+    return mode, max(variants, 1)
+
+
+def get_query_gate_mode() -> str:
+    """
+    Get the query gate mode from config.
+    
+    Returns:
+        One of GATE_MODES
+    """
+    config = get_config()
+    mode = config.get("RAG_QUERY_GATE", DEFAULT_GATE_MODE).strip().lower()
+    if mode not in GATE_MODES:
+        logger.warning("Unknown RAG_QUERY_GATE '%s', using %s", mode, DEFAULT_GATE_MODE)
+        return DEFAULT_GATE_MODE
+    return mode
+
+
+def get_context_settings() -> tuple:
+    """
+    Get the context packing settings from config.
+    
+    Returns:
+        Tuple of (context token budget, 0 for unlimited; neighbouring chunks added on each side of a hit)
+    """
+    config = get_config()
+    try:
+        tokens = int(config.get("RAG_CONTEXT_TOKENS", str(DEFAULT_CONTEXT_TOKENS)))
+    except ValueError:
+        logger.warning("Invalid RAG_CONTEXT_TOKENS, using %d", DEFAULT_CONTEXT_TOKENS)
+        tokens = DEFAULT_CONTEXT_TOKENS
+    try:
+        neighbors = int(config.get("RAG_CONTEXT_NEIGHBORS", str(DEFAULT_CONTEXT_NEIGHBORS)))
+    except ValueError:
+        logger.warning("Invalid RAG_CONTEXT_NEIGHBORS, using %d", DEFAULT_CONTEXT_NEIGHBORS)
+        neighbors = DEFAULT_CONTEXT_NEIGHBORS
+    return max(tokens, 0), max(neighbors, 0)
+
+
+def get_vector_index_settings() -> tuple:
+    """
+    Get the vector index backend settings from config.
+    
+    Returns:
+        Tuple of (mode, largest collection served by the NumPy index in auto mode)
+    """
+    config = get_config()
+    mode = config.get("RAG_VECTOR_INDEX", "chroma").strip().lower()
+    if mode not in VECTOR_INDEX_MODES:
+        logger.warning("Unknown RAG_VECTOR_INDEX '%s', using chroma", mode)
+        mode = "chroma"
+    try:
+        max_chunks = int(config.get("RAG_NUMPY_INDEX_MAX_CHUNKS", str(DEFAULT_NUMPY_INDEX_MAX_CHUNKS)))
+    except ValueError:
+        logger.warning("Invalid RAG_NUMPY_INDEX_MAX_CHUNKS, using %d", DEFAULT_NUMPY_INDEX_MAX_CHUNKS)
+        max_chunks = DEFAULT_NUMPY_INDEX_MAX_CHUNKS
+    return mode, max_chunks
+
+
+def get_vector_storage_settings() -> tuple:
+    """
+    Get the encoding of the vectors stored by the in-process indexes from config.
+    
+    Returns:
+        Tuple of (reduction: 'none', 'pca:N' or 'truncate:N'; precision: 'float32', 'float16' or 'int8')
+    """
+    config = get_config()
+    reduction = config.get("RAG_VECTOR_REDUCTION", "none").strip().lower() or "none"
+    precision = config.get("RAG_VECTOR_PRECISION", "float32").strip().lower() or "float32"
+    return reduction, precision
+
+
+def get_server_url() -> Optional[str]:
+    """
+    Get the URL of the shared Chroma server from config.
+    
+    Returns:
+        Server URL, or None to open the store at DB_PATH directly
+    """
+    url = get_config().get("RAG_SERVER_URL", "").strip()
+    return url or None
+
+
+def get_shard_count() -> int:
+    """
+    Get the number of shards for a new RAG store from config.
+    
+    Returns:
+        Number of shards (at least 1)
+    """
+    config = get_config()
+    try:
+        return max(int(config.get("RAG_SHARDS", "1")), 1)
+    except ValueError:
+        logger.warning("Invalid RAG_SHARDS, using 1")
+        return 1
+
+
+def get_ivf_settings() -> tuple:
+    """
+    Get the IVF index settings from config.
+    
+    Returns:
+        Tuple of (number of cells, 0 for automatic; cells probed per query;
+        smallest collection served by the IVF index in auto mode)
+    """
+    config = get_config()
+    try:
+        nlist = max(int(config.get("RAG_IVF_NLIST", "0")), 0)
+        nprobe = max(int(config.get("RAG_IVF_NPROBE", str(DEFAULT_IVF_NPROBE))), 1)
+        min_chunks = int(config.get("RAG_IVF_MIN_CHUNKS", str(DEFAULT_IVF_MIN_CHUNKS)))
+    except ValueError:
+        logger.warning("Invalid IVF settings, using defaults")
+        nlist, nprobe, min_chunks = 0, DEFAULT_IVF_NPROBE, DEFAULT_IVF_MIN_CHUNKS
+    return nlist, nprobe, min_chunks
@@ -0,0 +1,433 @@
+"""
+Re-embedding Module
+
+Moves a RAG collection to a new embedding model without downtime. The
+documents are copied page by page into a new versioned ChromaDB
+collection and embedded with the new model in a background thread,
+while queries keep running against the current collection. Progress is
+recorded after every batch, so an interrupted job resumes where it
+stopped. When the copy is complete the collection name is switched over
+atomically and the old collection is deleted. A job is leased to one
+worker at a time, kept alive by a heartbeat, so several processes opening
+the same collection never embed it twice; other processes follow the swap
+through the collection registry.
+
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+from typing import List, Dict, Any, Optional
+
+from collection_registry import sanitize_collection_name
+from config import get_config
+from embeddings import create_embeddings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REEMBED_BATCH_SIZE = 100
+DEFAULT_REEMBED_DELAY = 1.0
+MAX_RETRIES = 5
+# A job whose heartbeat is older than this is taken over by the next process opening the collection
+REEMBED_LEASE_SECONDS = 120.0
+
+
+class ReembedWorker(threading.Thread):
+    """
+    Background thread re-embedding one collection into a new versioned collection
+    """
+
+    def __init__(
+        self,
+        rag: Any,
+        target_model: str,
+        embeddings: Any,
+        batch_size: int = DEFAULT_REEMBED_BATCH_SIZE,
+        delay: float = DEFAULT_REEMBED_DELAY
+    ):
+        """
+        Initialize the worker
+
+        Args:
+            rag: The ChromaDBRAG instance whose collection is re-embedded
+            target_model: Name of the new embedding model
+            embeddings: Embedding provider for the new model
+            batch_size: Chunks embedded per request
+            delay: Seconds to wait between requests (rate limit)
+        """
+        super().__init__(name=f"reembed-{rag.collection_name}", daemon=True)
+        self.rag = rag
+        self.target_model = target_model
+        self.embeddings = embeddings
+        self.batch_size = max(batch_size, 1)
+        self.delay = max(delay, 0.0)
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        """Ask the worker to stop after the current batch; progress is kept"""
+        self._stop_event.set()
+
+    def claim(self) -> bool:
+        """
+        Take the lease of the collection's job (recording a new job if there is none)
+
+        Returns:
+            False if a live worker of another process holds it
+        """
+        version = self.rag.collection_version + 1
+        self._new_job = {
+            "name": self.rag.collection_name,
+            "target_name": sanitize_collection_name(f"{self.rag.collection_name}_v{version}"),
+            "target_model": self.target_model,
+            "version": version,
+            "position": 0,
+            "owner": self.owner,
+        }
+        return self.rag.registry.claim_reembed_job(self._new_job, self.owner, REEMBED_LEASE_SECONDS)
+
+    def _load_job(self) -> Dict[str, Any]:
+        job = self.rag.registry.get_reembed_job(self.rag.collection_name)
+        if job and job["target_model"] == self.target_model:
+            if job["position"]:
+                logger.info(
+                    "Resuming re-embedding of '%s' at chunk %d", self.rag.collection_name, job["position"]
+                )
+            return job
+
+        if job:
+            # A job for another model was left behind; its partial collection is useless now
+            drop_physical_collection(self.rag, job["target_name"])
+        return dict(self._new_job)
+
+    def _embed(self, documents: List[str]) -> List[List[float]]:
+        """Embed a batch, backing off exponentially on errors"""
+        for attempt in range(MAX_RETRIES):
+            try:
+                return self.embeddings.embed_documents(documents)
+            except Exception as exc: # Catching specific exception
+                if attempt == MAX_RETRIES - 1:
+                    raise
+                wait = self.delay * 2 ** attempt + 1
+                logger.warning("Embedding batch failed (%s), retrying in %.1fs", exc, wait)
+                if self._stop_event.wait(wait):
+                    raise
+        return []
+
+    def _copy(self, target: Any, ids: List[str], documents: List[str], metadatas: List[Any]) -> None:
+        target.upsert(
+            ids=ids,
+            embeddings=self._embed(documents),
+            documents=documents,
+            metadatas=metadatas
+        )
+
+    def _catch_up(self, target: Any, job: Dict[str, Any]) -> None:
+        """
+        Make the new collection match the old one exactly: copy chunks added
+        during the run and drop chunks deleted during it. Runs under the
+        write lock, so no writes can slip in before the swap.
+        """
+        source = self.rag.collection
+        offset = 0
+        while True:
+            self.rag.registry.save_reembed_job(job) # Heartbeat
+            page = source.get(limit=self.batch_size, offset=offset, include=["documents", "metadatas"])
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            present = set(target.get(ids=ids, include=[]).get("ids") or [])
+            missing = [i for i, chunk_id in enumerate(ids) if chunk_id not in present]
+            if missing:
+                documents = page.get("documents") or [""] * len(ids)
+                metadatas = page.get("metadatas") or [None] * len(ids)
+                self._copy(
+                    target,
+                    [ids[i] for i in missing],
+                    [documents[i] for i in missing],
+                    [metadatas[i] for i in missing]
+                )
+            offset += len(ids)
+
+        offset = 0
+        while True:
+            ids = target.get(limit=self.batch_size, offset=offset, include=[]).get("ids") or []
+            if not ids:
+                break
+            present = set(source.get(ids=ids, include=[]).get("ids") or [])
+            stale = [chunk_id for chunk_id in ids if chunk_id not in present]
+            if stale:
+                target.delete(ids=stale)
+            offset += len(ids) - len(stale)
+
+    def run(self) -> None:
+        registry = self.rag.registry
+        job = self._load_job()
+        job["owner"] = self.owner
+        job["status"] = "running"
+        job["error"] = None
+        source = self.rag.collection
+        job["total"] = source.count()
+        if not registry.save_reembed_job(job):
+            logger.info("Re-embedding of '%s' was taken over by another process", job["name"])
+            return
+        started = time.perf_counter()
+
+        try:
+            target = self.rag.client.get_or_create_collection(
+                name=job["target_name"],
+                metadata={"hnsw:space": "cosine"}
+            )
+            while not self._stop_event.is_set():
+                page = source.get(
+                    limit=self.batch_size,
+                    offset=job["position"],
+                    include=["documents", "metadatas"]
+                )
+                ids = page.get("ids") or []
+                if not ids:
+                    break
+                documents = page.get("documents") or [""] * len(ids)
+                metadatas = page.get("metadatas") or [None] * len(ids)
+                self._copy(target, ids, documents, metadatas)
+
+                job["position"] += len(ids)
+                job["total"] = max(source.count(), job["position"])
+                if not registry.save_reembed_job(job):
+                    # Heartbeats stopped for too long (e.g. the machine slept) and another process took over
+                    logger.warning("Re-embedding of '%s' was taken over by another process", job["name"])
+                    return
+                logger.debug("Re-embedded %d/%d chunks of '%s'", job["position"], job["total"], job["name"])
+                self._stop_event.wait(self.delay)
+
+            if self._stop_event.is_set():
+                job["status"] = "paused"
+                registry.save_reembed_job(job)
+                registry.release_reembed_job(job["name"], self.owner)
+                logger.info("Re-embedding of '%s' paused at chunk %d", job["name"], job["position"])
+                return
+
+            with self.rag.write_lock:
+                self._catch_up(target, job)
+                swap_collection(self.rag, job["target_name"], self.embeddings, self.target_model, job["version"])
+                registry.delete_reembed_job(job["name"])
+            logger.info(
+                "Re-embedded %d chunks of '%s' with %s in %.1fs",
+                job["position"], job["name"], self.target_model, time.perf_counter() - started
+            )
+        except Exception as exc: # Catching specific exception
+            job["status"] = "failed"
+            job["error"] = str(exc)
+            registry.save_reembed_job(job)
+            registry.release_reembed_job(job["name"], self.owner)
+            logger.error("Re-embedding of '%s' failed at chunk %d: %s", job["name"], job["position"], exc)
+
+
+def ensure_embedding_model(
+    rag: Any,
+    model_name: str,
+    batch_size: int = DEFAULT_REEMBED_BATCH_SIZE,
+    delay: float = DEFAULT_REEMBED_DELAY
+) -> bool:
+    """
+    Move a collection to another embedding model.
+    Empty collections switch immediately; otherwise the documents are
+    re-embedded into a new versioned collection in the background while
+    queries keep using the current one, which is swapped out at the end.
+
+    Args:
+        rag: The ChromaDBRAG instance of the collection
+        model_name: The embedding model to use
+        batch_size: Chunks embedded per request
+        delay: Seconds to wait between requests (rate limit)
+
+    Returns:
+        True if a background re-embedding is running for the model
+
+    Raises:
+        ValueError: If the model cannot be initialized (e.g. missing API key)
+    """
+    worker = rag.reembed_worker
+    if worker is not None and worker.is_alive():
+        if worker.target_model == model_name:
+            return True
+        worker.stop()
+        worker.join()
+    rag.reembed_worker = None
+
+    refresh_alias(rag) # Another process may have finished a re-embedding meanwhile
+    registry = rag.registry
+    job = registry.get_reembed_job(rag.collection_name)
+    owner = f"{os.getpid()}-{threading.get_ident()}"
+    if job and not registry.claim_reembed_job(job, owner, REEMBED_LEASE_SECONDS):
+        # Only the process holding the lease works on (or cancels) the job
+        logger.info("Collection '%s' is being re-embedded by another process", rag.collection_name)
+        return job["target_model"] == model_name
+    if model_name == rag.embedding_model:
+        if job:
+            # Switched back before the previous re-embedding finished
+            drop_physical_collection(rag, job["target_name"])
+            registry.delete_reembed_job(rag.collection_name)
+        return False
+
+    embeddings = create_embeddings(model_name, get_config().get("GOOGLE_API_KEY"))
+    if rag.collection.count() == 0:
+        with rag.write_lock:
+            registry.set_alias(rag.collection_name, rag.physical_name, model_name, rag.collection_version)
+            rag.embeddings = embeddings
+            rag.query_cache.bump_version(rag.collection_name)
+        if job:
+            drop_physical_collection(rag, job["target_name"])
+            registry.delete_reembed_job(rag.collection_name)
+        logger.info("Collection '%s' switched to %s", rag.collection_name, model_name)
+        return False
+
+    if job:
+        registry.release_reembed_job(rag.collection_name, owner) # The worker claims it for itself
+    worker = ReembedWorker(rag, model_name, embeddings, batch_size=batch_size, delay=delay)
+    if not worker.claim():
+        logger.info("Collection '%s' is being re-embedded by another process", rag.collection_name)
+        return True
+    rag.reembed_worker = worker
+    worker.start()
+    return True
+
+
+def refresh_alias(rag: Any, version: Optional[int] = None) -> bool:
+    """
+    Follow a collection swap made by another process: when the registry
+    points the collection name at another physical collection, reopen it
+    with the embedding model recorded for it
+
+    Args:
+        rag: The ChromaDBRAG instance of the collection
+        version: Collection version just read by the caller. Every swap bumps
+                 it after updating the registry, so the registry is only read
+                 when the version changed since the last check
+
+    Returns:
+        True if the collection was reopened
+    """
+    if version is not None:
+        if version == rag.alias_version:
+            return False
+        rag.alias_version = version
+    alias = rag.registry.get_alias(rag.collection_name)
+    if not alias or alias["physical_name"] == rag.physical_name:
+        return False
+    with rag.write_lock:
+        rag.collection = rag.client.get_or_create_collection(
+            name=alias["physical_name"],
+            metadata={"hnsw:space": "cosine"}
+        )
+        rag.physical_name = alias["physical_name"]
+        rag.collection_version = alias["version"]
+        rag.vector_indexes.reset()
+        if alias["embedding_model"]:
+            try:
+                rag.embeddings = create_embeddings(alias["embedding_model"], get_config().get("GOOGLE_API_KEY"))
+            except Exception as exc: # Catching specific exception
+                logger.warning("Failed to initialize embeddings: %s", exc)
+                rag.embeddings = None
+    logger.info("Collection '%s' is now served by '%s'", rag.collection_name, rag.physical_name)
+    return True
+
+
+def swap_collection(rag: Any, physical_name: str, embeddings: Any, embedding_model: str, version: int) -> None:
+    """
+    Atomically switch a collection name to another physical collection
+    and retire the previous one
+
+    Args:
+        rag: The ChromaDBRAG instance of the collection
+        physical_name: ChromaDB collection that now serves the name
+        embeddings: Embedding provider of the new collection
+        embedding_model: Model name of the new collection
+        version: Version number of the new collection
+    """
+    with rag.write_lock:
+        previous = rag.physical_name
+        collection = rag.client.get_collection(name=physical_name)
+        rag.registry.set_alias(rag.collection_name, physical_name, embedding_model, version)
+        rag.collection = collection
+        rag.physical_name = physical_name
+        rag.collection_version = version
+        rag.embeddings = embeddings
+        rag.query_cache.bump_version(rag.collection_name)
+    logger.info("Collection '%s' now served by '%s' (%s)", rag.collection_name, physical_name, embedding_model)
+    drop_physical_collection(rag, previous)
+
+
+def drop_physical_collection(rag: Any, physical_name: str) -> None:
+    """
+    Delete a ChromaDB collection, and its in-process indexes, that no longer serves any name
+
+    Args:
+        rag: The ChromaDBRAG instance the collection belonged to
+        physical_name: ChromaDB collection to delete (the one serving the name now is kept)
+    """
+    if physical_name == rag.physical_name:
+        return
+    rag.vector_indexes.remove(physical_name)
+    try:
+        rag.client.delete_collection(name=physical_name)
+        logger.info("Retired collection '%s'", physical_name)
+    except Exception as exc: # Catching specific exception
+        logger.warning("Could not delete collection '%s': %s", physical_name, exc)
+
+
+def cancel_reembedding(rag: Any) -> None:
+    """
+    Stop a collection's re-embedding and discard its partial collection
+
+    Args:
+        rag: The ChromaDBRAG instance of the collection
+    """
+    worker = rag.reembed_worker
+    if worker is not None and worker.is_alive():
+        worker.stop()
+        worker.join()
+    job = rag.registry.get_reembed_job(rag.collection_name)
+    if job:
+        drop_physical_collection(rag, job["target_name"])
+        rag.registry.delete_reembed_job(rag.collection_name)
+
+
+def reembed_status(rag: Any) -> Optional[Dict[str, Any]]:
+    """
+    Get the progress of a collection's background re-embedding, if any
+
+    Args:
+        rag: The ChromaDBRAG instance of the collection
+
+    Returns:
+        Job dict with target_model, position, total and status, or None
+    """
+    job = rag.registry.get_reembed_job(rag.collection_name)
+    if job and rag.reembed_worker is not None and rag.reembed_worker.is_alive():
+        job["status"] = "running"
+    elif job and job.get("status") == "running" and (job.get("heartbeat") or 0) < time.time() - REEMBED_LEASE_SECONDS:
+        job["status"] = "interrupted" # Its process died; the next process opening the collection resumes it
+    return job
+
+
+def format_reembed_status(job: Optional[Dict[str, Any]]) -> str:
+    """
+    Describe re-embedding progress for status displays
+
+    Args:
+        job: Job dict from `reembed_status`
+
+    Returns:
+        Short description, or an empty string when no job exists
+    """
+    if not job:
+        return ""
+    total = job.get("total") or 0
+    percent = f" ({job['position'] / total:.0%})" if total else ""
+    status = f"{job['position']}/{total} chunks{percent} to {job['target_model']}, {job.get('status') or 'pending'}"
+    if job.get("error"):
+        status += f": {job['error']}"
+    return status
@@ -0,0 +1,226 @@
+"""
+Reranking Module
+
+Cheap CPU-only reranking of retrieved candidates. The RAG search
+over-fetches candidates, rescores them against the query with lexical
+overlap, BM25 over the candidate set or a user-supplied scoring hook, and
+keeps only the best few for the prompt, so fewer chunks (and tokens) are
+needed for the same recall.
+
+"""
+
+import time
+import random
+import logging
+import importlib
+from typing import List, Dict, Any, Callable, Optional
+
+import numpy as np
+
+from lexical_index import query_coverage, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Scorer signature: (query_text, candidate texts) -> one score per candidate (higher is better)
+Scorer = Callable[[str, List[str]], List[float]]
+
+RERANKERS = ("none", "overlap", "bm25")
+DEFAULT_RERANKER = "none"
+DEFAULT_RERANK_CANDIDATES = 20
+# Share of the final score that comes from the reranker (the rest is retrieval similarity)
+RERANK_WEIGHT = 0.6
+
+
+def overlap_scores(query_text: str, documents: List[str]) -> List[float]:
+    """
+    Fraction of query terms found in each document
+
+    Args:
+        query_text: The query
+        documents: Candidate texts
+
+    Returns:
+        One score in [0, 1] per document
+    """
+    return [query_coverage(query_text, document) for document in documents]
+
+
+def bm25_scores(query_text: str, documents: List[str], k1: float = 1.5, b: float = 0.75) -> List[float]:
+    """
+    BM25 with term statistics taken from the candidate set itself
+
+    Args:
+        query_text: The query
+        documents: Candidate texts
+        k1: Term frequency saturation
+        b: Length normalization
+
+    Returns:
+        One BM25 score per document
+    """
+    query_terms = list(dict.fromkeys(tokenize(query_text)))
+    if not query_terms or not documents:
+        return [0.0] * len(documents)
+
+    doc_tokens = [tokenize(document) for document in documents]
+    term_index = {term: i for i, term in enumerate(query_terms)}
+    tf = np.zeros((len(documents), len(query_terms)), dtype=np.float32)
+    for row, tokens in enumerate(doc_tokens):
+        for token in tokens:
+            column = term_index.get(token)
+            if column is not None:
+                tf[row, column] += 1
+
+    lengths = np.array([len(tokens) for tokens in doc_tokens], dtype=np.float32)
+    avg_length = float(lengths.mean()) or 1.0
+    doc_freq = (tf > 0).sum(axis=0)
+    idf = np.log(1 + (len(documents) - doc_freq + 0.5) / (doc_freq + 0.5))
+    norm = k1 * (1 - b + b * lengths / avg_length)
+    scores = (tf * (k1 + 1) / (tf + norm[:, None]) * idf).sum(axis=1)
+    return scores.tolist()
+
+
+def load_scorer(name: str) -> Optional[Scorer]:
+    """
+    Resolve a reranker name to a scoring function
+
+    Args:
+        name: 'none', 'overlap', 'bm25', or a 'module:function' hook
+
+    Returns:
+        The scorer, or None when reranking is disabled
+
+    Raises:
+        ValueError: If the name is unknown or the hook cannot be imported
+    """
+    if not name or name == "none":
+        return None
+    if name == "overlap":
+        return overlap_scores
+    if name == "bm25":
+        return bm25_scores
+    if ":" in name:
+        module_name, _, function_name = name.partition(":")
+        try:
+            scorer = getattr(importlib.import_module(module_name), function_name)
+        except (ImportError, AttributeError) as exc:
+            raise ValueError(f"Cannot load reranker hook '{name}': {exc}") from exc
+        if not callable(scorer):
+            raise ValueError(f"Reranker hook '{name}' is not callable")
+        return scorer
+    raise ValueError(f"Unknown reranker '{name}', use one of {', '.join(RERANKERS)} or module:function")
+
+
+def rerank(
+    query_text: str,
+    candidates: List[Dict[str, Any]],
+    scorer: Scorer,
+    weight: float = RERANK_WEIGHT
+) -> List[Dict[str, Any]]:
+    """
+    Rescore candidates and sort them best first.
+    Scorer output is scaled to [0, 1] and blended with the retrieval similarity;
+    the blend is stored as 'rerank_score'.
+
+    Args:
+        query_text: The query
+        candidates: Candidate results with 'content' and 'similarity'
+        scorer: Scoring function
+        weight: Share of the reranker in the final score
+
+    Returns:
+        The candidates, sorted by 'rerank_score'
+    """
+    if not candidates:
+        return candidates
+    scores = np.asarray(scorer(query_text, [c.get("content") or "" for c in candidates]), dtype=np.float32)
+    if len(scores) != len(candidates):
+        logger.warning("Reranker returned %d scores for %d candidates, skipping", len(scores), len(candidates))
+        return candidates
+    top = float(scores.max())
+    if top > 0:
+        scores = scores / top
+    for candidate, score in zip(candidates, scores):
+        candidate["rerank_score"] = weight * float(score) + (1 - weight) * candidate.get("similarity", 0.0)
+    return sorted(candidates, key=lambda c: c["rerank_score"], reverse=True)
+
+
+def sample_queries(rag: Any, count: int = 50, words: int = 12, seed: int = 0) -> List[Dict[str, str]]:
+    """
+    Build self-retrieval queries from the collection: a run of words taken
+    from a random chunk, which should retrieve that chunk
+
+    Args:
+        rag: ChromaDBRAG instance
+        count: Number of queries
+        words: Words per query
+        seed: Random seed (for repeatable benchmarks)
+
+    Returns:
+        List of dicts with 'query' and the 'expected' chunk id
+    """
+    total = rag.collection.count()
+    if not total:
+        return []
+    rng = random.Random(seed)
+    queries = []
+    for offset in rng.sample(range(total), min(count, total)):
+        page = rag.collection.get(limit=1, offset=offset, include=["documents"])
+        tokens = (page.get("documents") or [""])[0].split()
+        if len(tokens) < 3:
+            continue
+        start = rng.randrange(max(len(tokens) - words, 0) + 1)
+        queries.append({"query": " ".join(tokens[start:start + words]), "expected": page["ids"][0]})
+    return queries
+
+
+def benchmark_reranking(
+    rag: Any,
+    queries: List[Dict[str, str]],
+    rerankers: List[str],
+    candidate_counts: List[int],
+    top_ks: List[int]
+) -> List[Dict[str, Any]]:
+    """
+    Measure hit rate, latency and prompt size for reranker settings
+
+    Args:
+        rag: ChromaDBRAG instance
+        queries: Dicts with 'query' and 'expected' chunk id (see `sample_queries`)
+        rerankers: Reranker names to compare
+        candidate_counts: Values of N (candidates fetched before reranking)
+        top_ks: Values of k (chunks kept for the prompt)
+
+    Returns:
+        One row per setting with hit_rate, mean_ms and context_chars
+    """
+    saved = (rag.reranker, rag.reranker_name, rag.rerank_candidates, rag.query_cache.max_entries)
+    rag.query_cache.max_entries = 0 # Measure real searches
+    rows = []
+    try:
+        for reranker_name in rerankers:
+            rag.reranker_name = reranker_name
+            rag.reranker = load_scorer(reranker_name)
+            counts = candidate_counts if rag.reranker else [0]
+            for candidates in counts:
+                rag.rerank_candidates = candidates
+                for top_k in top_ks:
+                    hits, latencies, context_chars = 0, [], 0
+                    for item in queries:
+                        started = time.perf_counter()
+                        results = rag.query(item["query"], top_k=top_k, threshold=0.0)
+                        latencies.append((time.perf_counter() - started) * 1000)
+                        returned = {chunk_id for r in results for chunk_id in r.get("merged_ids") or [r["id"]]}
+                        hits += item["expected"] in returned
+                        context_chars += sum(len(r["content"]) for r in results)
+                    rows.append({
+                        "reranker": reranker_name,
+                        "candidates": candidates,
+                        "top_k": top_k,
+                        "hit_rate": hits / len(queries) if queries else 0.0,
+                        "mean_ms": sum(latencies) / len(latencies) if latencies else 0.0,
+                        "context_chars": context_chars / len(queries) if queries else 0.0,
+                    })
+    finally:
+        rag.reranker, rag.reranker_name, rag.rerank_candidates, rag.query_cache.max_entries = saved
+    return rows
@@ -0,0 +1,522 @@
+"""
+Retrieval Pipeline Module
+
+Single-pass retrieval for the RAG system. A query runs through explicit,
+individually timed stages (embed -> search -> filter -> rerank -> format)
+and returns both the structured hits and the formatted LLM context, so
+callers never have to query twice.
+
+"""
+
+import time
+import logging
+from datetime import datetime
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Any, Optional, Sequence, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from lexical_index import looks_like_keyword_query, reciprocal_rank_fusion
+
+if TYPE_CHECKING:
+    from chromadb_rag import ChromaDBRAG
+
+logger = logging.getLogger(__name__)
+
+# Keyword matches must contain this fraction of the query's terms (stopwords aside)
+MIN_KEYWORD_COVERAGE = 0.6
+
+
+@dataclass
+class RetrievalResult:
+    """Outcome of one pass through the retrieval pipeline"""
+    query: str
+    hits: List[Dict[str, Any]] = field(default_factory=list)
+    context: str = ""
+    timings: Dict[str, float] = field(default_factory=dict)  # stage -> seconds
+    cached: bool = False
+    collection: str = ""
+    filters: Dict[str, Any] = field(default_factory=dict)  # QueryFilters.to_dict() of the search
+
+    @property
+    def total_time(self) -> float:
+        return sum(self.timings.values())
+
+    def describe_timings(self) -> str:
+        """Human-readable per-stage timings, for debug logs"""
+        stages = ", ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in self.timings.items())
+        return f"{stages} (total {self.total_time * 1000:.1f}ms{', cached' if self.cached else ''})"
+
+
+@dataclass
+class QueryFilters:
+    """Metadata restrictions applied before scoring"""
+    sources: List[str] = field(default_factory=list)
+    doc_type: Optional[str] = None           # 'file', 'user_text', ...
+    path_prefix: Optional[str] = None
+    ingested_after: Optional[float] = None   # Unix timestamp
+    ingested_before: Optional[float] = None  # Unix timestamp
+
+    def is_empty(self) -> bool:
+        return not (
+            self.sources or self.doc_type or self.path_prefix
+            or self.ingested_after is not None or self.ingested_before is not None
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def describe(self) -> str:
+        """Human-readable summary of the active filters"""
+        if self.is_empty():
+            return "all documents"
+        parts = []
+        if self.sources:
+            parts.append(f"sources: {', '.join(self.sources)}")
+        if self.doc_type:
+            parts.append(f"type: {self.doc_type}")
+        if self.path_prefix:
+            parts.append(f"path: {self.path_prefix}*")
+        if self.ingested_after is not None:
+            parts.append(f"since: {datetime.fromtimestamp(self.ingested_after).date().isoformat()}")
+        if self.ingested_before is not None:
+            parts.append(f"until: {datetime.fromtimestamp(self.ingested_before).date().isoformat()}")
+        return "; ".join(parts)
+
+    @classmethod
+    def parse(cls, text: str) -> "QueryFilters":
+        """
+        Parse filters from command text such as
+        'notes.md guide.md type:file path:/docs since:2024-01-01 until:2024-06-30'.
+        Bare words are source names.
+
+        Args:
+            text: Filter specification
+
+        Returns:
+            QueryFilters
+
+        Raises:
+            ValueError: If a date cannot be parsed
+        """
+        filters = cls()
+        for token in text.split():
+            key, _, value = token.partition(":")
+            if value and key == "type":
+                filters.doc_type = value
+            elif value and key == "path":
+                filters.path_prefix = value
+            elif value and key == "since":
+                filters.ingested_after = datetime.fromisoformat(value).timestamp()
+            elif value and key == "until":
+                # Inclusive: a bare date covers the whole day
+                until = datetime.fromisoformat(value)
+                if len(value) == 10:
+                    until = until.replace(hour=23, minute=59, second=59)
+                filters.ingested_before = until.timestamp()
+            else:
+                filters.sources.extend(source for source in token.split(",") if source)
+        return filters
+
+
+def format_context(hits: List[Dict[str, Any]]) -> str:
+    """
+    Format retrieved hits as context for the LLM
+
+    Args:
+        hits: Retrieved results
+
+    Returns:
+        Formatted context string (empty if there are no hits)
+    """
+    if not hits:
+        return ""
+
+    context = "## Retrieved Context:\n\n"
+    for i, result in enumerate(hits, 1):
+        source = result.get("metadata", {}).get("source", "unknown")
+        similarity = result.get("similarity", 0)
+        context += f"### Source {i}: {source} (Relevance: {similarity:.2%})\n"
+        context += f"{result['content']}\n\n"
+
+    return context
+
+
+def mmr_select(
+    candidates: List[Dict[str, Any]],
+    embeddings: Sequence[Sequence[float]],
+    top_k: int,
+    lambda_mult: float = 0.7
+) -> List[Dict[str, Any]]:
+    """
+    Maximal marginal relevance selection.
+    Repeatedly picks the candidate maximising
+    lambda * relevance - (1 - lambda) * (max similarity to already selected).
+
+    Args:
+        candidates: Candidates best first, each with a 'rerank_score' or 'similarity' relevance score
+        embeddings: One embedding per candidate
+        top_k: Number of candidates to select
+        lambda_mult: 1.0 ranks purely by relevance, lower values favour diversity
+
+    Returns:
+        Selected candidates, in selection order
+    """
+    if len(candidates) <= 1 or lambda_mult >= 1.0:
+        return candidates[:top_k]
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1.0, norms)
+    pairwise = vectors @ vectors.T
+    relevance = np.array(
+        [c.get("rerank_score", c.get("similarity", 0.0)) for c in candidates], dtype=np.float32
+    )
+
+    selected: List[int] = []
+    # Highest similarity of each candidate to anything selected so far
+    redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    remaining = np.ones(len(candidates), dtype=bool)
+
+    while len(selected) < min(top_k, len(candidates)):
+        penalty = np.where(np.isinf(redundancy), 0.0, redundancy)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * penalty
+        scores[~remaining] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        remaining[best] = False
+        redundancy = np.maximum(redundancy, pairwise[best])
+
+    return [candidates[i] for i in selected]
+
+
+def _overlap_length(left: str, right: str, max_overlap: int) -> int:
+    """Length of the longest suffix of `left` that is a prefix of `right`"""
+    for size in range(min(len(left), len(right), max_overlap), 0, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+# Identifies the document a chunk came from, as (metadata field, value) pairs
+DocumentKey = Tuple[Tuple[str, Any], ...]
+
+
+def document_key(hit: Dict[str, Any]) -> Optional[DocumentKey]:
+    """
+    Identify the document a chunk belongs to: by its 'doc_id', or for chunks
+    ingested before doc ids were recorded, by source, path and ingestion time
+
+    Args:
+        hit: Result with metadata
+
+    Returns:
+        The metadata fields that single out the document, or None if they can't
+        (a legacy chunk with neither path nor ingestion time)
+    """
+    metadata = hit.get("metadata") or {}
+    if metadata.get("doc_id"):
+        return (("doc_id", metadata["doc_id"]),)
+    if metadata.get("path") is None and metadata.get("ingested_at") is None:
+        return None
+    return tuple(
+        (name, metadata[name]) for name in ("source", "path", "ingested_at") if metadata.get(name) is not None
+    )
+
+
+def chunk_range(hit: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """
+    First and last chunk index covered by a hit (a merged passage covers several)
+
+    Args:
+        hit: Result with metadata
+
+    Returns:
+        Tuple of (first, last) chunk index, or None if the hit has no chunk index
+    """
+    metadata = hit.get("metadata") or {}
+    if metadata.get("chunk_index") is None:
+        return None
+    span = metadata.get("chunk_span")
+    if span:
+        first, _, last = str(span).partition("-")
+        return int(first), int(last)
+    index = int(metadata["chunk_index"])
+    return index, index
+
+
+def merge_adjacent_chunks(hits: List[Dict[str, Any]], max_overlap: int = 200) -> List[Dict[str, Any]]:
+    """
+    Merge hits that are consecutive chunks of the same document into single
+    passages, dropping the text the chunks share through the splitter overlap.
+
+    Args:
+        hits: Selected hits, best first
+        max_overlap: Longest shared text searched for between neighbouring chunks
+
+    Returns:
+        Passages, ordered by their best-ranked member
+    """
+    groups: Dict[Any, List[int]] = {}
+    for rank, hit in enumerate(hits):
+        key = document_key(hit)
+        if chunk_range(hit) is None or key is None:
+            groups[("unmergeable", rank)] = [rank]
+        else:
+            groups.setdefault(key, []).append(rank)
+
+    passages = []  # (best rank, passage)
+    for ranks in groups.values():
+        ranks.sort(key=lambda r: chunk_range(hits[r])[0])
+        run = [ranks[0]]
+        for rank in ranks[1:]:
+            if chunk_range(hits[rank])[0] == chunk_range(hits[run[-1]])[1] + 1:
+                run.append(rank)
+            else:
+                passages.append((min(run), _merge_run([hits[r] for r in run], max_overlap)))
+                run = [rank]
+        passages.append((min(run), _merge_run([hits[r] for r in run], max_overlap)))
+
+    passages.sort(key=lambda item: item[0])
+    return [passage for _, passage in passages]
+
+
+def _merge_run(run: List[Dict[str, Any]], max_overlap: int) -> Dict[str, Any]:
+    """Merge a run of consecutive chunks or passages (in chunk order) into one passage"""
+    if len(run) == 1:
+        return run[0]
+
+    content = run[0]["content"]
+    for hit in run[1:]:
+        overlap = _overlap_length(content, hit["content"], max_overlap)
+        separator = "" if overlap else "\n"
+        content += separator + hit["content"][overlap:]
+
+    best = max(run, key=lambda h: h.get("similarity", 0.0))
+    first_index = chunk_range(run[0])[0]
+    last_index = chunk_range(run[-1])[1]
+    return {
+        **best,
+        "content": content,
+        "metadata": {**run[0]["metadata"], "chunk_index": first_index, "chunk_span": f"{first_index}-{last_index}"},
+        "merged_ids": [chunk_id for h in run for chunk_id in h.get("merged_ids") or [h["id"]]],
+    }
+
+
+def filter_results(candidates: List[Dict[str, Any]], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Drop weak matches: vector matches below the similarity threshold,
+    keyword matches containing less than MIN_KEYWORD_COVERAGE of the
+    query's terms, and hybrid matches that fail both tests.
+
+    Args:
+        candidates: Candidate results
+        threshold: Similarity threshold (0-1)
+
+    Returns:
+        Remaining candidates, in order
+    """
+    kept = []
+    for result in candidates:
+        retriever = result.get("retriever")
+        strong_vector = retriever in ("vector", "hybrid") and result["similarity"] >= threshold
+        strong_keyword = retriever in ("lexical", "hybrid") and result.get("coverage", 0.0) >= MIN_KEYWORD_COVERAGE
+        if retriever in ("vector", "lexical", "hybrid") and not (strong_vector or strong_keyword):
+            logger.debug(
+                "Skipping %s result with similarity %f, keyword coverage %f",
+                retriever, result["similarity"], result.get("coverage", 0.0)
+            )
+            continue
+        kept.append(result)
+    return kept
+
+
+def fuse_results(rankings: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Fuse ranked result lists with reciprocal rank fusion
+
+    Args:
+        rankings: Result lists, each ordered best first
+
+    Returns:
+        All results ordered by fused score, each with a 'score' key
+    """
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for result in ranking:
+            known = by_id.get(result["id"])
+            if known is None:
+                # The first (vector) version of a result has the real similarity
+                by_id[result["id"]] = dict(result)
+            elif result.get("retriever") != known.get("retriever"):
+                # Found by both retrievers: keep the vector similarity and the keyword coverage
+                known["retriever"] = "hybrid"
+                known["coverage"] = max(known.get("coverage", 0.0), result.get("coverage", 0.0))
+                if result["similarity"] > known["similarity"] and result.get("retriever") == "vector":
+                    known.update(similarity=result["similarity"], distance=result["distance"])
+            elif result["similarity"] > known["similarity"]:
+                # Found again by another query variant: keep its best similarity
+                known.update(similarity=result["similarity"], distance=result["distance"])
+
+    scores = reciprocal_rank_fusion([r["id"] for r in ranking] for ranking in rankings)
+    fused = sorted(by_id.values(), key=lambda r: scores[r["id"]], reverse=True)
+    return [{**result, "score": scores[result["id"]]} for result in fused]
+
+
+class RetrievalPipeline:
+    """
+    Runs a query through the retrieval stages of a ChromaDBRAG instance
+    """
+
+    STAGES = ("cache", "expand", "embed", "search", "filter", "rerank", "pack", "format")
+
+    def __init__(self, rag: "ChromaDBRAG"):
+        """
+        Initialize the pipeline
+
+        Args:
+            rag: The RAG instance providing the indexes and stage implementations
+        """
+        self.rag = rag
+
+    def run(
+        self,
+        query_text: str,
+        top_k: int = 3,
+        threshold: float = 0.5,
+        mode: Optional[str] = None,
+        filters: Optional[QueryFilters] = None,
+        context_tokens: Optional[int] = None,
+        version: Optional[int] = None
+    ) -> RetrievalResult:
+        """
+        Retrieve hits and formatted context in a single pass
+
+        Args:
+            query_text: Text to query
+            top_k: Number of hits to return
+            threshold: Similarity threshold (0-1), applied to vector matches
+            mode: Search mode (see ChromaDBRAG.query)
+            filters: Metadata filters restricting the searched chunks
+            context_tokens: Token budget of the context (None uses the RAG's setting)
+            version: Collection version already read for this query (None reads it)
+
+        Returns:
+            RetrievalResult with hits, context and per-stage timings
+        """
+        rag = self.rag
+        result = RetrievalResult(query=query_text, collection=rag.collection_name)
+        mode = rag.resolve_search_mode(mode)
+        filters = filters or QueryFilters()
+        result.filters = filters.to_dict()
+
+        with self._timed(result, "cache"):
+            if version is None:
+                version = rag.query_cache.get_version(rag.collection_name)
+            cache_key = rag.query_cache.make_key(
+                rag.collection_name, version, query_text,
+                top_k=top_k, threshold=threshold, mode=mode,
+                embedding_model=getattr(rag.embeddings, "model", None),
+                mmr_lambda=rag.mmr_lambda,
+                reranker=rag.reranker_name,
+                rerank_candidates=rag.rerank_candidates,
+                expansion=(rag.query_expansion, rag.expansion_variants),
+                filters=filters.to_dict()
+            )
+            cached = rag.query_cache.get(cache_key)
+
+        if cached is not None:
+            logger.debug("Query cache hit for '%s'", query_text)
+            result.hits = cached
+            result.cached = True
+        else:
+            result.hits = self._retrieve(result, query_text, top_k, threshold, mode, filters, version)
+            rag.query_cache.put(cache_key, rag.collection_name, version, result.hits)
+
+        with self._timed(result, "pack"):
+            passages = rag.pack_context(result.hits, context_tokens)
+
+        with self._timed(result, "format"):
+            result.context = format_context(passages)
+
+        logger.debug("Retrieved %d hits for query: %s", len(result.hits), result.describe_timings())
+        return result
+
+    def _retrieve(
+        self,
+        result: RetrievalResult,
+        query_text: str,
+        top_k: int,
+        threshold: float,
+        mode: str,
+        filters: QueryFilters,
+        version: int
+    ) -> List[Dict[str, Any]]:
+        rag = self.rag
+        fetch_k = rag.candidate_count(top_k, mode)
+        candidates: List[Dict[str, Any]] = []
+
+        # Fast path: keyword-like queries are answered without an embedding call
+        if mode == "lexical" or (mode == "auto" and looks_like_keyword_query(query_text)):
+            with self._timed(result, "search"):
+                candidates = rag.search_candidates(query_text, None, fetch_k, "lexical", filters)
+            if candidates or mode == "lexical":
+                logger.debug("Answered query from lexical index (%d results)", len(candidates))
+                return self._rank(result, query_text, candidates, top_k, threshold)
+            mode = "hybrid"
+
+        with self._timed(result, "expand"):
+            variants = rag.expand_query(query_text)
+
+        variant_embeddings: List[List[float]] = []
+        with self._timed(result, "embed"):
+            if len(variants) > 1:
+                # One batched request for the query and all of its variants
+                embeddings = rag.embed_queries(variants)
+                query_embedding = embeddings[0] if embeddings else None
+                variant_embeddings = list(embeddings[1:]) if embeddings else []
+            else:
+                query_embedding = rag.embed_query(query_text)
+
+        with self._timed(result, "search"):
+            candidates = rag.search_candidates(
+                query_text, query_embedding, fetch_k, mode, filters, variant_embeddings, version
+            )
+
+        return self._rank(result, query_text, candidates, top_k, threshold)
+
+    def _rank(
+        self,
+        result: RetrievalResult,
+        query_text: str,
+        candidates: List[Dict[str, Any]],
+        top_k: int,
+        threshold: float
+    ) -> List[Dict[str, Any]]:
+        with self._timed(result, "filter"):
+            candidates = filter_results(candidates, threshold)
+
+        with self._timed(result, "rerank"):
+            return self.rag.rerank_results(query_text, candidates, top_k)
+
+    @staticmethod
+    def _timed(result: RetrievalResult, stage: str) -> "_StageTimer":
+        return _StageTimer(result, stage)
+
+
+class _StageTimer:
+    """Context manager adding the elapsed time of a stage to a result"""
+
+    def __init__(self, result: RetrievalResult, stage: str):
+        self.result = result
+        self.stage = stage
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        self.result.timings[self.stage] = self.result.timings.get(self.stage, 0.0) + elapsed
+        return False
@@ -0,0 +1,439 @@
+"""
+Sharding Module
+
+Hash-partitioned RAG storage. With more than one shard, chunks are spread
+over several ChromaDB PersistentClient directories by a stable hash of
+their id: shard 0 is DB_PATH itself and shard i lives in DB_PATH/shards/i.
+`ShardedClient` and `ShardedCollection` mirror the parts of the ChromaDB
+client and collection API the RAG system uses, so `ChromaDBRAG` works on
+them unchanged: writes go to the owning shards in parallel, and queries
+fan out to every shard concurrently and are merged by distance.
+
+The shard count is recorded in DB_PATH/shards.json; `rebalance` moves
+chunks when it changes.
+
+"""
+
+import json
+import shutil
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable, Sequence
+
+import chromadb
+
+from maintenance import chroma_disk_usage
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_FILE = "shards.json"
+REBALANCE_PAGE_SIZE = 1000
+_RESULT_FIELDS = ("embeddings", "documents", "metadatas", "distances")
+
+
+def shard_of(chunk_id: str, shard_count: int) -> int:
+    """
+    Shard that owns a chunk (stable across processes and restarts)
+
+    Args:
+        chunk_id: Chunk id
+        shard_count: Number of shards
+
+    Returns:
+        Shard number
+    """
+    digest = hashlib.blake2b(chunk_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shard_count
+
+
+def shard_paths(db_path: str, shard_count: int) -> List[str]:
+    """
+    Directories of the shards
+
+    Args:
+        db_path: Directory holding the RAG data
+        shard_count: Number of shards
+
+    Returns:
+        One directory per shard; shard 0 is db_path itself
+    """
+    return [db_path] + [str(Path(db_path) / "shards" / str(i)) for i in range(1, shard_count)]
+
+
+def read_shard_count(db_path: str, default: int = 1) -> int:
+    """
+    Read the shard count the store was laid out with.
+    A new, empty store takes `default`; an existing store without a layout
+    file is a single unsharded directory.
+
+    Args:
+        db_path: Directory holding the RAG data
+        default: Shard count for a new store
+
+    Returns:
+        Number of shards
+    """
+    layout_path = Path(db_path) / LAYOUT_FILE
+    if layout_path.exists():
+        try:
+            return max(int(json.loads(layout_path.read_text(encoding="utf-8"))["shards"]), 1)
+        except (ValueError, KeyError, OSError) as exc:
+            logger.error("Invalid shard layout %s, assuming one shard: %s", layout_path, exc)
+            return 1
+    if (Path(db_path) / "chroma.sqlite3").exists():
+        return 1
+    if default > 1:
+        write_shard_count(db_path, default)
+    return max(default, 1)
+
+
+def write_shard_count(db_path: str, shard_count: int) -> None:
+    """
+    Record the shard count of the store
+
+    Args:
+        db_path: Directory holding the RAG data
+        shard_count: Number of shards
+    """
+    Path(db_path).mkdir(parents=True, exist_ok=True)
+    (Path(db_path) / LAYOUT_FILE).write_text(json.dumps({"shards": shard_count}), encoding="utf-8")
+
+
+class ShardedCollection:
+    """
+    One logical collection spread over the same-named collection in every shard
+    """
+
+    def __init__(self, client: "ShardedClient", shards: List[Any]):
+        """
+        Initialize the collection
+
+        Args:
+            client: The sharded client (provides the thread pool)
+            shards: ChromaDB collection of every shard, in shard order
+        """
+        self.client = client
+        self.shards = shards
+        self.name = shards[0].name
+
+    @property
+    def metadata(self) -> Optional[Dict[str, Any]]:
+        return self.shards[0].metadata
+
+    def _partition(self, ids: Sequence[str]) -> Dict[int, List[int]]:
+        """Group positions in `ids` by owning shard"""
+        groups: Dict[int, List[int]] = {}
+        for position, chunk_id in enumerate(ids):
+            groups.setdefault(shard_of(chunk_id, len(self.shards)), []).append(position)
+        return groups
+
+    def _write(self, method: str, ids: Sequence[str], **columns: Any) -> None:
+        """Send each shard its part of a write, all shards in parallel"""
+        def write_shard(shard: int, positions: List[int]) -> None:
+            sliced = {
+                name: [values[p] for p in positions]
+                for name, values in columns.items() if values is not None
+            }
+            getattr(self.shards[shard], method)(ids=[ids[p] for p in positions], **sliced)
+
+        self.client.map(lambda item: write_shard(*item), list(self._partition(ids).items()))
+
+    def add(self, ids: Sequence[str], embeddings: Any = None, documents: Any = None, metadatas: Any = None) -> None:
+        self._write("add", ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def upsert(self, ids: Sequence[str], embeddings: Any = None, documents: Any = None, metadatas: Any = None) -> None:
+        self._write("upsert", ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        if ids is not None:
+            self._write("delete", ids)
+        else:
+            self.client.map(lambda shard: shard.delete(where=where), self.shards)
+
+    def count(self) -> int:
+        return sum(self.client.map(lambda shard: shard.count(), self.shards))
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Get chunks by id, or page through the shards in shard order
+
+        Returns:
+            Merged result with the same keys as ChromaDB's `get`
+        """
+        kwargs: Dict[str, Any] = {"where": where}
+        if include is not None:
+            kwargs["include"] = include
+
+        if ids is not None:
+            groups = self._partition(ids)
+            parts = self.client.map(
+                lambda item: self.shards[item[0]].get(ids=[ids[p] for p in item[1]], **kwargs),
+                list(groups.items())
+            )
+            return _merge_get_results(parts)
+
+        if not limit and not offset:
+            return _merge_get_results(self.client.map(lambda shard: shard.get(**kwargs), self.shards))
+
+        # Map the global offset onto the shards, using their (filtered) sizes
+        if where is None:
+            sizes = self.client.map(lambda shard: shard.count(), self.shards)
+        else:
+            sizes = self.client.map(lambda shard: len(shard.get(where=where, include=[])["ids"]), self.shards)
+        skip = offset or 0
+        remaining = limit if limit else sum(sizes)
+        parts = []
+        for shard, size in zip(self.shards, sizes):
+            if remaining <= 0:
+                break
+            if skip >= size:
+                skip -= size
+                continue
+            part = shard.get(limit=remaining, offset=skip, **kwargs)
+            parts.append(part)
+            remaining -= len(part["ids"])
+            skip = 0
+        return _merge_get_results(parts)
+
+    def query(
+        self,
+        query_embeddings: Any,
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Query every shard concurrently and merge the hits by distance
+
+        Returns:
+            Merged result with the same keys as ChromaDB's `query`
+        """
+        include = list(include or ["documents", "metadatas", "distances"])
+        if "distances" not in include:
+            include.append("distances")
+
+        def query_shard(shard: Any) -> Optional[Dict[str, Any]]:
+            size = shard.count()
+            if not size:
+                return None
+            return shard.query(
+                query_embeddings=query_embeddings,
+                n_results=min(n_results, size),
+                where=where,
+                include=include
+            )
+
+        parts = [part for part in self.client.map(query_shard, self.shards) if part is not None]
+        merged: Dict[str, Any] = {"ids": []}
+        for field in _RESULT_FIELDS:
+            merged[field] = [] if field in include else None
+        for q in range(len(query_embeddings)):
+            hits = [
+                (part["distances"][q][i], part, i)
+                for part in parts for i in range(len(part["ids"][q]))
+            ]
+            hits.sort(key=lambda hit: hit[0])
+            hits = hits[:n_results]
+            merged["ids"].append([part["ids"][q][i] for _, part, i in hits])
+            for field in _RESULT_FIELDS:
+                if merged[field] is not None:
+                    merged[field].append([part[field][q][i] for _, part, i in hits])
+        return merged
+
+
+def _merge_get_results(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Concatenate `get` results of several shards"""
+    merged: Dict[str, Any] = {"ids": []}
+    for field in ("embeddings", "documents", "metadatas"):
+        merged[field] = None
+    for part in parts:
+        merged["ids"].extend(part["ids"])
+        for field in ("embeddings", "documents", "metadatas"):
+            values = part.get(field)
+            if values is not None:
+                merged[field] = (merged[field] or []) + list(values)
+    return merged
+
+
+class ShardedClient:
+    """
+    Stands in for a ChromaDB client over several shard directories
+    """
+
+    def __init__(self, db_path: str, shard_count: int):
+        """
+        Open every shard
+
+        Args:
+            db_path: Directory holding the RAG data
+            shard_count: Number of shards
+        """
+        self.db_path = db_path
+        self.paths = shard_paths(db_path, shard_count)
+        self.clients = []
+        for path in self.paths:
+            Path(path).mkdir(parents=True, exist_ok=True)
+            self.clients.append(chromadb.PersistentClient(path=path))
+        self._executor = ThreadPoolExecutor(max_workers=shard_count, thread_name_prefix="rag-shard")
+        logger.debug("Opened %d RAG shards under %s", shard_count, db_path)
+
+    def map(self, function: Callable[[Any], Any], items: Sequence[Any]) -> List[Any]:
+        """Run a function over items on the shard thread pool, keeping order"""
+        if len(items) <= 1:
+            return [function(item) for item in items]
+        return list(self._executor.map(function, items))
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> ShardedCollection:
+        shards = self.map(lambda client: client.get_or_create_collection(name=name, metadata=metadata), self.clients)
+        return ShardedCollection(self, shards)
+
+    def get_collection(self, name: str) -> ShardedCollection:
+        return ShardedCollection(self, self.map(lambda client: client.get_collection(name=name), self.clients))
+
+    def delete_collection(self, name: str) -> None:
+        deleted = 0
+        for client in self.clients:
+            try:
+                client.delete_collection(name=name)
+                deleted += 1
+            except Exception as exc: # Catching specific exception
+                logger.debug("Collection '%s' not in shard: %s", name, exc)
+        if not deleted:
+            raise ValueError(f"Collection {name} does not exist")
+
+    def list_collections(self) -> List[Any]:
+        return self.clients[0].list_collections()
+
+    def get_max_batch_size(self) -> int:
+        return min(client.get_max_batch_size() for client in self.clients)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        Per-shard statistics
+
+        Returns:
+            One dict per shard with shard, path, chunks per collection, total chunks and size in bytes
+        """
+        rows = []
+        for shard, (path, client) in enumerate(zip(self.paths, self.clients)):
+            collections = {c.name: c.count() for c in client.list_collections()}
+            rows.append({
+                "shard": shard,
+                "path": path,
+                "collections": collections,
+                "chunks": sum(collections.values()),
+                "size": chroma_disk_usage(path),
+            })
+        return rows
+
+
+_CLIENTS: Dict[tuple, ShardedClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def open_client(db_path: str, default_shards: int = 1) -> Any:
+    """
+    Open the ChromaDB client for the RAG store: a plain PersistentClient
+    for an unsharded store, or a (shared) ShardedClient
+
+    Args:
+        db_path: Directory holding the RAG data
+        default_shards: Shard count for a new store
+
+    Returns:
+        Client object
+    """
+    shard_count = read_shard_count(db_path, default_shards)
+    if default_shards != shard_count:
+        logger.warning(
+            "RAG store has %d shard(s) but RAG_SHARDS is %d; run 'pixella rag rebalance' to change it",
+            shard_count, default_shards
+        )
+    if shard_count <= 1:
+        return chromadb.PersistentClient(path=db_path)
+    key = (str(Path(db_path).resolve()), shard_count)
+    with _CLIENTS_LOCK:
+        if key not in _CLIENTS:
+            _CLIENTS[key] = ShardedClient(db_path, shard_count)
+        return _CLIENTS[key]
+
+
+def rebalance(db_path: str, shard_count: int, page_size: int = REBALANCE_PAGE_SIZE) -> Dict[str, int]:
+    """
+    Move chunks to their owners under a new shard count.
+    Run it while nothing else is writing to the store.
+
+    Args:
+        db_path: Directory holding the RAG data
+        shard_count: New number of shards
+        page_size: Chunks read per request
+
+    Returns:
+        Number of chunks moved per collection
+    """
+    shard_count = max(shard_count, 1)
+    old_paths = shard_paths(db_path, read_shard_count(db_path))
+    new_paths = shard_paths(db_path, shard_count)
+    clients: Dict[str, Any] = {}
+    for path in dict.fromkeys(old_paths + new_paths):
+        Path(path).mkdir(parents=True, exist_ok=True)
+        clients[path] = chromadb.PersistentClient(path=path)
+
+    names: Dict[str, Optional[Dict[str, Any]]] = {}
+    for path in old_paths:
+        for collection in clients[path].list_collections():
+            names.setdefault(collection.name, collection.metadata)
+
+    moved: Dict[str, int] = {}
+    for name, metadata in names.items():
+        targets = [clients[path].get_or_create_collection(name=name, metadata=metadata) for path in new_paths]
+        moved[name] = 0
+        for path in old_paths:
+            try:
+                source = clients[path].get_collection(name=name)
+            except Exception: # Catching specific exception
+                continue # Collection missing from this shard
+            offset = 0
+            while True:
+                page = source.get(limit=page_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+                ids = page["ids"]
+                if not ids:
+                    break
+                groups: Dict[int, List[int]] = {}
+                for position, chunk_id in enumerate(ids):
+                    owner = shard_of(chunk_id, shard_count)
+                    if new_paths[owner] != path:
+                        groups.setdefault(owner, []).append(position)
+                for owner, positions in groups.items():
+                    targets[owner].upsert(
+                        ids=[ids[p] for p in positions],
+                        embeddings=[page["embeddings"][p] for p in positions],
+                        documents=[page["documents"][p] for p in positions],
+                        metadatas=[page["metadatas"][p] for p in positions]
+                    )
+                leaving = [ids[p] for positions in groups.values() for p in positions]
+                if leaving:
+                    source.delete(ids=leaving)
+                moved[name] += len(leaving)
+                offset += len(ids) - len(leaving)
+        logger.info("Rebalanced '%s': moved %d chunks", name, moved[name])
+
+    write_shard_count(db_path, shard_count)
+    for path in old_paths:
+        if path not in new_paths:
+            shutil.rmtree(path, ignore_errors=True)
+    if shard_count == 1:
+        shutil.rmtree(Path(db_path) / "shards", ignore_errors=True)
+    with _CLIENTS_LOCK:
+        _CLIENTS.clear()
+    return moved
@@ -0,0 +1,89 @@
+"""
+Store Lock Module
+
+Cross-process lock on the RAG store under DB_PATH. Every process that opens
+the store (the CLI, the web UI and its ingestion worker, `pixella rag serve`)
+holds the lock shared for as long as it runs. Maintenance that must not run
+while other processes have the databases open, such as compacting ChromaDB's
+database, takes it exclusively and so finds out whether anyone else is using
+the store. On platforms without `fcntl` (Windows) the store always counts as
+in use.
+
+"""
+
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, IO
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+STORE_LOCK_FILE = "store.lock"
+
+# One open lock file per store and process: flock locks taken through the same
+# file are converted between shared and exclusive instead of conflicting
+_LOCK_FILES: Dict[str, IO] = {}
+_LOCK_FILES_LOCK = threading.Lock()
+
+
+def _lock_file(db_path: str) -> IO:
+    path = Path(db_path).resolve()
+    key = str(path)
+    with _LOCK_FILES_LOCK:
+        if key not in _LOCK_FILES:
+            path.mkdir(parents=True, exist_ok=True)
+            _LOCK_FILES[key] = open(path / STORE_LOCK_FILE, "a+b")
+        return _LOCK_FILES[key]
+
+
+def hold_store(db_path: str) -> None:
+    """
+    Mark the store as used by this process until it exits
+
+    Args:
+        db_path: Directory holding the RAG data
+    """
+    if fcntl is None:
+        return
+    try:
+        fcntl.flock(_lock_file(db_path), fcntl.LOCK_SH)
+    except OSError as exc:
+        logger.warning("Could not lock the RAG store at %s: %s", db_path, exc)
+
+
+def try_lock_store(db_path: str) -> bool:
+    """
+    Take the store exclusively if no other process uses it.
+    Release it with `release_store` once done.
+
+    Args:
+        db_path: Directory holding the RAG data
+
+    Returns:
+        True if the store is now locked by this process only
+    """
+    if fcntl is None:
+        return False
+    lock_file = _lock_file(db_path)
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        # A failed conversion may have dropped the shared lock this process held
+        hold_store(db_path)
+        return False
+
+
+def release_store(db_path: str) -> None:
+    """
+    Go back from the exclusive lock to using the store like every other process
+
+    Args:
+        db_path: Directory holding the RAG data
+    """
+    hold_store(db_path)
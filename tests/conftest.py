@@ -0,0 +1,60 @@
+"""
+Shared fixtures: every test gets its own config and RAG store under a
+temporary directory, with offline hashing embeddings (no API key, no network)
+"""
+
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import config  # noqa: E402
+
+
+@pytest.fixture
+def settings(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Callable[..., Dict[str, str]]:
+    """
+    Point the config at a private .env file
+
+    Returns:
+        Function updating settings in that file (e.g. settings(RAG_SEARCH_MODE="auto"))
+    """
+    values = {
+        "DB_PATH": str(tmp_path / "db"),
+        "MEMORY_PATH": str(tmp_path / "memory"),
+        "EMBEDDING_MODEL": "local/hashing-384",
+    }
+    env_path = tmp_path / ".env"
+    monkeypatch.setattr(config, "ENV_PATH", env_path)
+
+    def update(**changes: str) -> Dict[str, str]:
+        values.update(changes)
+        env_path.write_text("".join(f"{key}={value}\n" for key, value in values.items()), encoding="utf-8")
+        return values
+
+    update()
+    return update
+
+
+@pytest.fixture
+def db_path(settings: Callable[..., Dict[str, str]]) -> str:
+    """Directory of the test's RAG store"""
+    return settings()["DB_PATH"]
+
+
+@pytest.fixture
+def make_rag(db_path: str) -> Iterator[Callable[..., Any]]:
+    """
+    Yields:
+        Function opening a ChromaDBRAG on the test's store (settings are read when it is called)
+    """
+    from chromadb_rag import ChromaDBRAG, reset_rag
+
+    def make(collection_name: str = "pixella") -> ChromaDBRAG:
+        return ChromaDBRAG(db_path, collection_name=collection_name)
+
+    yield make
+    reset_rag()
@@ -0,0 +1,38 @@
+"""Tests for the shared Chroma server mode"""
+
+import chromadb
+import pytest
+
+import chromadb_rag
+from chroma_server import DEFAULT_SERVER_PORT, parse_server_url
+
+
+def test_parse_server_url():
+    assert parse_server_url("http://localhost:8001") == ("localhost", 8001, False)
+    assert parse_server_url("localhost") == ("localhost", DEFAULT_SERVER_PORT, False)
+    assert parse_server_url("https://chroma.example") == ("chroma.example", 443, True)
+    with pytest.raises(ValueError):
+        parse_server_url("http://")
+
+
+@pytest.fixture
+def server_rag(settings, db_path, make_rag, monkeypatch):
+    """A RAG in server mode, with a local client standing in for the server"""
+    server = chromadb.PersistentClient(path=db_path)
+    monkeypatch.setattr(chromadb_rag, "get_server_client", lambda url: server)
+    settings(RAG_SERVER_URL="http://localhost:8000", RAG_VECTOR_INDEX="numpy", RAG_QUERY_CACHE_PERSIST="true")
+    return make_rag()
+
+
+def test_server_mode_searches_the_server_and_keeps_no_private_copies(server_rag):
+    rag = server_rag
+    rag.add_text("The event loop schedules coroutines.", source="asyncio")
+
+    assert rag.vector_indexes.mode == "chroma"
+    assert rag.vector_indexes.get() is None
+    assert not rag.vector_indexes.directory().exists()
+    assert not rag.query_cache.enabled
+
+    first = rag.retrieve("event loop coroutines", mode="vector", threshold=0)
+    second = rag.retrieve("event loop coroutines", mode="vector", threshold=0)
+    assert first.hits and not second.cached
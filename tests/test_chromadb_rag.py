@@ -0,0 +1,63 @@
+"""Tests for streaming ingestion into ChromaDBRAG and warming it up"""
+
+import time
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter, TextSplitter
+
+import chromadb_rag
+from chromadb_rag import FILE_READ_BLOCK_SIZE, HARD_SPLIT_SIZE, MAX_CARRY_OVER
+
+
+def blocks_of(text, size):
+    return (text[start:start + size] for start in range(0, len(text), size))
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_streamed_chunks_match_splitting_the_whole_text(make_rag):
+    rag = make_rag()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50, separators=["\n\n", "\n", " ", ""])
+    text = "\n\n".join(f"Paragraph {i}. " + "Some words about the topic. " * (i % 7 + 1) for i in range(300))
+
+    streamed = list(rag._split_stream(blocks_of(text, 4096), splitter))
+
+    assert all(len(chunk) <= 500 for chunk in streamed)
+    assert set(streamed) == set(splitter.split_text(text))
+
+
+def test_a_single_huge_line_is_cut_without_growing_the_buffer(make_rag):
+    rag = make_rag()
+    seen = []
+
+    class WholeTextSplitter(TextSplitter):
+        """Never cuts its input, like a records splitter given one long record"""
+
+        def split_text(self, text):
+            seen.append(len(text))
+            return [text] if text else []
+
+    line = "x" * (3 * FILE_READ_BLOCK_SIZE + 123)
+
+    chunks = list(rag._split_stream(blocks_of(line, FILE_READ_BLOCK_SIZE), WholeTextSplitter()))
+
+    assert "".join(chunks) == line
+    assert max(len(chunk) for chunk in chunks) == HARD_SPLIT_SIZE
+    assert max(seen) <= FILE_READ_BLOCK_SIZE + MAX_CARRY_OVER
+
+
+def test_warm_up_opens_the_collection_in_the_background(settings, make_rag):
+    settings(RAG_VECTOR_INDEX="numpy")
+    make_rag().add_text("The event loop schedules coroutines.", source="asyncio")
+
+    chromadb_rag.start_warm_up()
+    assert wait_for(lambda: chromadb_rag.get_warm_up_status()["state"] != "running")
+
+    assert chromadb_rag.get_warm_up_status()["state"] == "done"
+    rag = chromadb_rag.get_rag()
+    assert rag.vector_indexes.index is not None
+    assert rag.get_collection_info()["warm_up"]["seconds"] >= 0
@@ -0,0 +1,78 @@
+"""Tests for the per-type chunking profiles"""
+
+import json
+
+import pytest
+
+import chromadb_rag
+from chunking import JsonRecordSplitter, compare_profiles, select_profile
+from rag_settings import get_chunking_profile
+
+
+def blocks_of(text, size):
+    return (text[start:start + size] for start in range(0, len(text), size))
+
+
+@pytest.mark.parametrize("name, profile", [
+    ("notes.md", "markdown"),
+    ("main.py", "code"),
+    ("deploy.sh", "prose"),
+    ("table.csv", "records"),
+    ("data.json", "records"),
+    ("events.jsonl", "records"),
+    ("notes.txt", "prose"),
+])
+def test_profiles_are_selected_by_extension(name, profile):
+    assert select_profile(name, "auto").name == profile
+
+
+def test_legacy_chunking_unless_configured(settings):
+    assert get_chunking_profile() == "legacy"
+    settings(RAG_CHUNKING_PROFILE="auto")
+    assert get_chunking_profile() == "auto"
+
+
+def test_json_arrays_and_objects_are_split_into_records():
+    items = [{"id": i, "text": f"item {i} " * 20, "tags": ["a", "b"]} for i in range(40)]
+    document = json.dumps(items, indent=2)
+    splitter = select_profile("data.json", "auto").create_splitter("data.json", document[:100])
+    assert isinstance(splitter, JsonRecordSplitter)
+
+    chunks = splitter.split_text(document)
+
+    assert len(chunks) > 1
+    assert [json.loads(line) for chunk in chunks for line in chunk.splitlines()] == items
+
+    config = {"name": "pixella", "limits": {"tokens": 4096}, "models": ["a", "b"]}
+    splitter = select_profile("config.json", "auto").create_splitter("config.json", json.dumps(config))
+    records = splitter.split_text(json.dumps(config, indent=4))
+    assert [json.loads(line) for line in records[0].splitlines()] == [{key: value} for key, value in config.items()]
+
+
+def test_streamed_json_matches_splitting_the_whole_document(make_rag):
+    items = [{"id": i, "value": i * 1.5, "text": "word " * (i % 30)} for i in range(300)]
+    document = json.dumps(items, indent=1)
+    splitter = select_profile("data.json", "auto").create_splitter("data.json", document[:64])
+
+    streamed = list(make_rag()._split_stream(blocks_of(document, 1000), splitter))
+
+    assert streamed == splitter.split_text(document)
+
+
+def test_json_that_does_not_parse_is_split_by_lines():
+    splitter = JsonRecordSplitter("[", chunk_size=1000)
+    assert splitter.split_text('[{"id": 1}, oops\n{"id": 2}') == ['{"id": 1}', ', oops\n{"id": 2}']
+
+
+def test_compare_profiles_never_loads_the_configured_model(tmp_path, settings, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("the configured embedding model was loaded")
+
+    monkeypatch.setattr(chromadb_rag, "create_embeddings", fail)
+    path = tmp_path / "notes.md"
+    path.write_text("# Event loop\n\nThe event loop schedules coroutines.\n", encoding="utf-8")
+
+    rows = compare_profiles([str(path)], repeats=1)
+
+    assert [row["profile"] for row in rows] == ["auto", "legacy"]
+    assert all(row["chunks"] == 1 for row in rows)
@@ -0,0 +1,74 @@
+"""Tests for streaming collection exports and imports"""
+
+import json
+
+import pytest
+
+from collection_io import EXPORT_FORMAT, iter_export_batches, read_export_header
+
+TEXTS = {
+    "asyncio": "The event loop schedules coroutines.",
+    "generators": "Generators yield values lazily.",
+    "typing": "Type hints document the expected types.",
+}
+
+
+@pytest.fixture
+def filled_rag(make_rag):
+    rag = make_rag()
+    for source, text in TEXTS.items():
+        rag.add_text(text, source=source)
+    return rag
+
+
+@pytest.mark.parametrize("name", ["export.jsonl", "export.parquet"])
+def test_exports_are_written_page_by_page_with_a_header(filled_rag, tmp_path, name):
+    path = str(tmp_path / name)
+    if name.endswith(".parquet"):
+        pytest.importorskip("pyarrow")
+
+    assert filled_rag.export_collection(path, include_embeddings=True)
+
+    header = read_export_header(path)
+    assert header["format"] == EXPORT_FORMAT
+    assert header["count"] == len(TEXTS)
+    assert header["embedding_model"] == filled_rag.embedding_model
+    records = [record for batch in iter_export_batches(path, batch_size=2) for record in batch]
+    assert sorted(record["metadata"]["source"] for record in records) == sorted(TEXTS)
+    assert all(len(record["embedding"]) == header["dimension"] for record in records)
+
+
+def test_the_original_json_format_is_kept_for_json_files(filled_rag, tmp_path):
+    path = tmp_path / "export.json"
+
+    assert filled_rag.export_collection(str(path))
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["count"] == len(TEXTS)
+    assert read_export_header(str(path))["include_embeddings"] is False
+
+
+def test_imports_write_the_stored_embeddings_without_embedding_again(filled_rag, make_rag, tmp_path, monkeypatch):
+    path = str(tmp_path / "export.jsonl")
+    filled_rag.export_collection(path, include_embeddings=True)
+    target = make_rag("restored")
+    monkeypatch.setattr(target.embeddings, "embed_documents", pytest.fail)
+
+    assert target.import_collection(path) == len(TEXTS)
+
+    assert target.collection.count() == len(TEXTS)
+    assert target.lexical_index.count("restored") == len(TEXTS)
+    monkeypatch.undo()
+    assert target.query("event loop coroutines", mode="vector", threshold=0)[0]["metadata"]["source"] == "asyncio"
+
+
+def test_exports_without_usable_embeddings_are_reembedded_only_on_request(filled_rag, make_rag, tmp_path):
+    path = str(tmp_path / "export.jsonl")
+    filled_rag.export_collection(path)
+    target = make_rag("restored")
+
+    with pytest.raises(ValueError):
+        target.import_collection(path)
+    assert target.collection.count() == 0
+
+    assert target.import_collection(path, reembed=True) == len(TEXTS)
@@ -0,0 +1,62 @@
+"""Tests for named RAG collections and their routing per session"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import chromadb_rag
+from collection_registry import CollectionRegistry, sanitize_collection_name, session_collection_name
+
+
+@pytest.mark.parametrize("name, sanitized", [
+    ("Team Docs", "Team_Docs"),
+    ("--notes--", "notes"),
+    ("a", "col_a"),
+    ("", "col_default"),
+])
+def test_labels_become_valid_collection_names(name, sanitized):
+    assert sanitize_collection_name(name) == sanitized
+
+
+def test_registry_lists_collections_most_recently_used_first(tmp_path):
+    registry = CollectionRegistry(str(tmp_path))
+    registry.touch("first", "First project")
+    registry.touch("second")
+    registry.touch("first", "ignored on later touches")
+
+    entries = registry.list()
+
+    assert [entry["name"] for entry in entries] == ["first", "second"]
+    assert entries[0]["description"] == "First project"
+    registry.remove("first")
+    assert [entry["name"] for entry in registry.list()] == ["second"]
+
+
+@pytest.fixture
+def open_rags(settings):
+    yield settings
+    chromadb_rag.reset_rag()
+
+
+def test_sessions_are_routed_to_their_collection(open_rags):
+    session = SimpleNamespace(context={"rag_collection": session_collection_name("abc")})
+
+    routed = chromadb_rag.get_rag_for_session(session)
+    default = chromadb_rag.get_rag_for_session(None)
+
+    assert routed.collection_name == "session_abc"
+    assert default.collection_name == "pixella"
+    assert chromadb_rag.get_rag("session_abc") is routed
+
+
+def test_open_handles_are_kept_in_an_lru(open_rags):
+    open_rags(RAG_MAX_OPEN_COLLECTIONS="2")
+    first = chromadb_rag.get_rag("first")
+    chromadb_rag.get_rag("second")
+    chromadb_rag.get_rag("first")
+    chromadb_rag.get_rag("third")
+
+    listed = {entry["name"]: entry["open"] for entry in chromadb_rag.list_rag_collections()}
+
+    assert listed == {"first": True, "second": False, "third": True}
+    assert chromadb_rag.get_rag("first") is first
@@ -0,0 +1,50 @@
+"""Tests for packing retrieved passages into the context token budget"""
+
+from chunking import estimate_tokens
+from context_packing import CONTEXT_HEADER_TOKENS, neighbor_requests, pack_context
+
+
+def chunk(doc_id, index, words, similarity=0.0):
+    return {
+        "id": f"{doc_id}-{index}",
+        "content": " ".join(f"{doc_id}{index}word{i}" for i in range(words)),
+        "similarity": similarity,
+        "metadata": {"source": "notes", "doc_id": doc_id, "chunk_index": index},
+    }
+
+
+def test_the_budget_keeps_the_most_valuable_passages():
+    hits = [chunk("a", 0, 40, 0.9), chunk("b", 0, 40, 0.8), chunk("c", 0, 40, 0.7)]
+
+    packed = pack_context(hits, budget=2 * (40 + CONTEXT_HEADER_TOKENS))
+
+    assert [passage["id"] for passage in packed] == ["a-0", "b-0"]
+    assert pack_context(hits, budget=0) == hits
+
+
+def test_an_oversized_best_hit_is_truncated_rather_than_dropped():
+    packed = pack_context([chunk("a", 0, 500, 0.9)], budget=100)
+
+    assert len(packed) == 1
+    assert estimate_tokens(packed[0]["content"]) == 100 - CONTEXT_HEADER_TOKENS
+
+
+def test_neighbours_fill_the_room_left_and_are_merged_into_their_hit():
+    document = {index: chunk("a", index, 20) for index in range(5)}
+    requested = []
+
+    def fetch(requests):
+        requested.append(requests)
+        return [document[index] for indices in requests.values() for index in indices]
+
+    packed = pack_context([chunk("a", 2, 20, 0.9)], budget=1000, fetch_neighbors=fetch, window=1)
+
+    assert requested == [{(("doc_id", "a"),): [1, 3]}]
+    assert len(packed) == 1
+    assert packed[0]["metadata"]["chunk_span"] == "1-3"
+
+
+def test_neighbours_already_retrieved_are_not_requested():
+    hits = [chunk("a", 2, 5), chunk("a", 3, 5), {"id": "legacy", "content": "x", "metadata": {}}]
+
+    assert neighbor_requests(hits, window=1) == {(("doc_id", "a"),): [1, 4]}
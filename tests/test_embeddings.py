@@ -0,0 +1,35 @@
+"""Tests for the pluggable embedding providers"""
+
+import numpy as np
+import pytest
+
+from embeddings import HashingEmbeddings, create_embeddings, is_local_model
+
+
+def test_local_models_need_no_api_key():
+    embeddings = create_embeddings("local/hashing-768")
+
+    assert isinstance(embeddings, HashingEmbeddings)
+    assert embeddings.model == "local/hashing-768"
+    assert len(embeddings.embed_query("hello")) == 768
+    assert is_local_model("local/hashing-768") and not is_local_model("models/text-embedding-004")
+
+
+@pytest.mark.parametrize("model, api_key", [("local/unknown", None), ("models/text-embedding-004", None)])
+def test_unusable_models_are_rejected(model, api_key):
+    with pytest.raises(ValueError):
+        create_embeddings(model, api_key)
+
+
+def test_hashing_embeddings_are_normalized_and_match_similar_texts():
+    embeddings = HashingEmbeddings(384)
+    query, related, unrelated = np.array(embeddings.embed_documents([
+        "how does the event loop schedule coroutines",
+        "The event loop schedules coroutines and callbacks.",
+        "Bananas are a yellow fruit.",
+    ]))
+
+    assert np.linalg.norm(query) == pytest.approx(1.0, abs=1e-5)
+    assert query @ related > query @ unrelated
+    assert embeddings.embed_query("same text") == embeddings.embed_query("same text")
+    assert not any(embeddings.embed_query("  "))
@@ -0,0 +1,119 @@
+"""Tests for the background ingestion job queue"""
+
+import sqlite3
+import time
+
+import pytest
+
+from ingest_jobs import INGEST_LEASE_SECONDS, IngestJobQueue
+
+
+@pytest.fixture
+def idle_queues(monkeypatch):
+    """Queues that record jobs without starting a worker thread"""
+    monkeypatch.setattr(IngestJobQueue, "_ensure_worker", lambda self: None)
+
+
+def set_heartbeat(queue, job_id, heartbeat):
+    conn = sqlite3.connect(str(queue.db_path))
+    conn.execute("UPDATE jobs SET heartbeat = ? WHERE id = ?", (heartbeat, job_id))
+    conn.commit()
+    conn.close()
+
+
+def test_jobs_running_in_a_live_process_are_not_requeued(tmp_path, idle_queues):
+    first = IngestJobQueue(str(tmp_path))
+    job_id = first._submit("/data/notes.txt", None, "notes.txt", is_upload=False)
+    assert first._claim(job_id)
+
+    # A second process starting up must not take the job over
+    second = IngestJobQueue(str(tmp_path))
+
+    job = second.get_job(job_id)
+    assert job["status"] == "running"
+    assert job["owner"] == first.owner
+    assert second._queue.empty()
+    assert not second._claim(job_id)
+
+
+def test_jobs_of_a_stopped_process_are_requeued(tmp_path, idle_queues):
+    first = IngestJobQueue(str(tmp_path))
+    job_id = first._submit("/data/notes.txt", None, "notes.txt", is_upload=False)
+    assert first._claim(job_id)
+    # The owner stopped beating
+    set_heartbeat(first, job_id, time.time() - INGEST_LEASE_SECONDS - 10)
+
+    second = IngestJobQueue(str(tmp_path))
+
+    job = second.get_job(job_id)
+    assert job["status"] == "queued"
+    assert job["owner"] is None
+    assert list(second._queue.queue) == [job_id]
+    assert second._claim(job_id)
+    assert second.get_job(job_id)["owner"] == second.owner
+
+
+def test_the_worker_takes_over_jobs_of_processes_that_stop_later(tmp_path, idle_queues):
+    first = IngestJobQueue(str(tmp_path))
+    second = IngestJobQueue(str(tmp_path))
+    job_id = first._submit("/data/notes.txt", None, "notes.txt", is_upload=False)
+    assert first._claim(job_id)
+    first._update(job_id, chunks_done=40)
+
+    # Checked periodically by the worker loop: the job is alive, so the worker keeps watching it
+    assert second._requeue_stale()
+    assert second._queue.empty()
+
+    set_heartbeat(first, job_id, time.time() - INGEST_LEASE_SECONDS - 10)
+    assert not second._requeue_stale()
+
+    job = second.get_job(job_id)
+    assert job["status"] == "queued"
+    assert job["chunks_done"] == 40
+    assert list(second._queue.queue) == [job_id]
+
+
+def test_a_resumed_job_continues_after_its_last_written_chunk(tmp_path, db_path, make_rag, idle_queues):
+    path = tmp_path / "notes.txt"
+    path.write_text("\n\n".join(f"Paragraph {i}: " + f"word{i} " * 150 for i in range(4)), encoding="utf-8")
+    queue = IngestJobQueue(db_path)
+    job_id = queue.submit_file(str(path))
+    assert queue._claim(job_id)
+    ingested_at = queue.get_job(job_id)["ingested_at"]
+    # The first run wrote two chunks, then its process stopped
+    queue._update(job_id, status="queued", chunks_done=2, owner=None, heartbeat=None)
+
+    queue._process(job_id)
+
+    job = queue.get_job(job_id)
+    assert job["status"] == "done", job["error"]
+    assert job["chunks_done"] > 2
+    stored = make_rag().collection.get(include=["metadatas"])["metadatas"]
+    assert sorted(meta["chunk_index"] for meta in stored) == list(range(2, job["chunks_done"]))
+    assert all(meta["ingested_at"] == pytest.approx(ingested_at) for meta in stored)
+
+
+def test_submitted_paths_are_stored_absolute(tmp_path, idle_queues, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    queue = IngestJobQueue(str(tmp_path / "db"))
+
+    job = queue.get_job(queue.submit_file("notes.txt"))
+
+    assert job["path"] == str(tmp_path / "notes.txt")
+    assert job["source"] == "notes.txt"
+
+
+def test_worker_ingests_a_submitted_file(tmp_path, db_path, make_rag):
+    path = tmp_path / "notes.txt"
+    path.write_text("The event loop schedules coroutines in asyncio.", encoding="utf-8")
+    queue = IngestJobQueue(db_path)
+
+    job_id = queue.submit_file(str(path))
+    deadline = time.time() + 30
+    while queue.get_job(job_id)["status"] in ("queued", "running") and time.time() < deadline:
+        time.sleep(0.1)
+
+    job = queue.get_job(job_id)
+    assert job["status"] == "done", job["error"]
+    assert job["chunks_done"] == 1
+    assert make_rag().collection.count() == 1
@@ -0,0 +1,72 @@
+"""Tests for the keyword index and keyword query detection"""
+
+import pytest
+
+from lexical_index import LexicalIndex, looks_like_keyword_query, query_coverage, reciprocal_rank_fusion
+from rag_settings import get_search_mode
+
+
+def record(chunk_id, text, **metadata):
+    return {"id": chunk_id, "document": text, "metadata": {"source": "docs", "chunk_index": 0, **metadata}}
+
+
+@pytest.mark.parametrize("query", ["E1234", "clear_cache", "read_config error", "asyncio python 3.11"])
+def test_identifiers_and_short_term_lists_are_keyword_queries(query):
+    assert looks_like_keyword_query(query)
+
+
+@pytest.mark.parametrize("query", [
+    "How does asyncio work in Python 3.11?",
+    "tell me about the weather in Paris",
+    "what is clear_cache",
+    "",
+])
+def test_questions_and_sentences_are_not_keyword_queries(query):
+    assert not looks_like_keyword_query(query)
+
+
+def test_query_coverage_ignores_stopwords():
+    assert query_coverage("tell me about the weather in Paris", "Paris in spring") == 0.5
+    assert query_coverage("the of", "nothing shared here") == 0.0
+
+
+def test_reciprocal_rank_fusion_favours_ids_found_by_both_rankings():
+    scores = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]])
+    assert max(scores, key=scores.get) == "c"
+    assert scores["a"] > scores["d"]
+
+
+def test_search_ranks_matches_and_scopes_by_collection(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    index.add("docs", [
+        record("1", "the cache is cleared by clear_cache", path="/src/cache.py"),
+        record("2", "unrelated text about gardening", path="/notes/garden.md"),
+    ])
+    index.add("other", [record("3", "clear_cache in another collection")])
+
+    hits = index.search("docs", "clear_cache", top_k=5)
+
+    assert [hit["id"] for hit in hits] == ["1"]
+    assert hits[0]["metadata"]["path"] == "/src/cache.py"
+    assert index.count("docs") == 2
+    assert index.list_paths("docs", "/src/") == ["/src/cache.py"]
+
+
+def test_delete_and_clear_keep_the_fts_index_in_sync(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    index.add("docs", [record("1", "alpha beta"), record("2", "alpha gamma")])
+    # Re-adding an indexed chunk is a no-op
+    assert index.add("docs", [record("1", "alpha beta")]) == 0
+
+    index.delete("docs", ["1"])
+    assert [hit["id"] for hit in index.search("docs", "alpha", 5)] == ["2"]
+
+    index.clear("docs")
+    assert index.search("docs", "alpha", 5) == []
+    assert index.list_sources("docs") == {}
+
+
+def test_search_stays_vector_only_unless_configured(settings):
+    assert get_search_mode() == "vector"
+    settings(RAG_SEARCH_MODE="auto")
+    assert get_search_mode() == "auto"
@@ -0,0 +1,100 @@
+"""Tests for RAG store maintenance: orphan detection and deduplication"""
+
+import os
+import subprocess
+import sys
+
+from maintenance import find_duplicate_chunks, is_missing_file, maintain
+
+# Holds the store open like another Pixella process until its stdin closes
+HOLD_STORE = "import sys; from store_lock import hold_store; hold_store(sys.argv[1]); print('holding', flush=True); sys.stdin.read()"
+
+
+def test_only_absolute_paths_in_readable_directories_can_be_missing(tmp_path):
+    present = tmp_path / "present.txt"
+    present.write_text("x", encoding="utf-8")
+
+    assert is_missing_file(str(tmp_path / "deleted.txt"))
+    assert not is_missing_file(str(present))
+    assert not is_missing_file("deleted.txt")
+    # The directory itself is gone (e.g. an unmounted drive)
+    assert not is_missing_file("/nonexistent_mount/deleted.txt")
+
+
+def test_orphans_are_found_by_absolute_path_whatever_the_working_directory(tmp_path, db_path, make_rag, monkeypatch):
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+    (work_dir / "notes.txt").write_text("Notes about asyncio coroutines.", encoding="utf-8")
+    (work_dir / "old.txt").write_text("Notes about sqlite transactions.", encoding="utf-8")
+    monkeypatch.chdir(work_dir)
+    rag = make_rag()
+    rag.add_file("notes.txt")
+    # Recorded before imports stored absolute paths
+    rag.add_file("old.txt", metadata={"type": "file", "path": "old.txt"})
+    monkeypatch.chdir(tmp_path)
+
+    report = maintain(db_path, remove_orphans=True, dedupe=False, compact=False)["collections"]["pixella"]
+    assert report["missing_files"] == []
+    assert report["unverifiable_paths"] == ["old.txt"]
+    assert report["orphans_removed"] == 0
+
+    os.remove(work_dir / "notes.txt")
+    os.remove(work_dir / "old.txt")
+
+    report = maintain(db_path, remove_orphans=True, dedupe=False, compact=False)["collections"]["pixella"]
+    assert report["missing_files"] == [str(work_dir / "notes.txt")]
+    assert report["orphans_removed"] == 1
+    # The legacy chunk can't be checked, so it is kept
+    assert report["sources_after"] == {"old.txt": 1}
+
+
+def test_dry_run_reports_without_removing(tmp_path, db_path, make_rag):
+    path = tmp_path / "notes.txt"
+    path.write_text("Notes about asyncio coroutines.", encoding="utf-8")
+    rag = make_rag()
+    rag.add_file(str(path))
+    os.remove(path)
+
+    report = maintain(db_path, remove_orphans=True, compact=False, dry_run=True)["collections"]["pixella"]
+
+    assert report["orphans_removed"] == 1
+    assert make_rag().collection.count() == 1
+
+
+def test_duplicates_keep_the_first_ingested_copy(make_rag):
+    rag = make_rag()
+    rag.add_text("Asyncio runs coroutines on an event loop.", source="first")
+    rag.add_text("asyncio runs   coroutines on an event loop.", source="second")
+    rag.add_text("Generators yield values lazily.", source="third")
+
+    duplicates = find_duplicate_chunks(rag)
+
+    assert len(duplicates) == 1
+    stored = rag.collection.get(ids=duplicates, include=["metadatas"])
+    assert stored["metadatas"][0]["source"] == "second"
+
+
+def test_chroma_is_not_compacted_while_another_process_has_the_store_open(db_path, make_rag):
+    make_rag().add_text("Asyncio runs coroutines on an event loop.", source="first")
+    holder = subprocess.Popen(
+        [sys.executable, "-c", HOLD_STORE, db_path],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        stdout=subprocess.PIPE, stdin=subprocess.PIPE, text=True
+    )
+    try:
+        assert holder.stdout.readline().strip() == "holding"
+
+        report = maintain(db_path)
+        assert report["store_in_use"]
+        assert "chroma.sqlite3" not in report["compacted"]
+        assert "lexical.db" in report["compacted"]
+
+        report = maintain(db_path, force=True)
+        assert not report["store_in_use"]
+        assert "chroma.sqlite3" in report["compacted"]
+    finally:
+        holder.communicate("")
+
+    report = maintain(db_path)
+    assert not report["store_in_use"]
+    assert "chroma.sqlite3" in report["compacted"]
@@ -0,0 +1,98 @@
+"""Tests for the query result cache and collection versions"""
+
+import pytest
+
+from query_cache import QueryCache, normalize_query
+
+
+def test_normalized_queries_share_a_key(tmp_path):
+    cache = QueryCache(str(tmp_path))
+    assert normalize_query("  What IS   asyncio? ") == normalize_query("what is asyncio")
+    assert cache.make_key("docs", 1, "What is asyncio?", top_k=3) == cache.make_key("docs", 1, "what is asyncio", top_k=3)
+    assert cache.make_key("docs", 1, "asyncio", top_k=3) != cache.make_key("docs", 2, "asyncio", top_k=3)
+
+
+def test_bump_version_from_reports_whether_the_caller_was_in_sync(tmp_path):
+    cache = QueryCache(str(tmp_path))
+
+    assert cache.bump_version_from("docs", 0) == (1, True)
+    # Another writer bumped in between: the caller's view is stale
+    assert cache.bump_version_from("docs", 0) == (2, False)
+    assert cache.bump_version_from("docs", None) == (3, False)
+    assert cache.bump_version("docs") == 4
+    assert cache.get_version("docs") == 4
+    assert cache.get_version("other") == 0
+
+
+def test_versions_are_shared_between_instances(tmp_path):
+    first = QueryCache(str(tmp_path))
+    second = QueryCache(str(tmp_path))
+
+    first.bump_version("docs")
+
+    assert second.get_version("docs") == 1
+    assert second.bump_version_from("docs", 1) == (2, True)
+
+
+def test_a_bump_drops_the_collections_cached_results(tmp_path):
+    cache = QueryCache(str(tmp_path), persistent=True)
+    key = cache.make_key("docs", 0, "asyncio")
+    cache.put(key, "docs", 0, [{"id": "a"}])
+    assert cache.get(key) == [{"id": "a"}]
+
+    cache.bump_version("docs")
+
+    assert cache.get(key) is None
+    assert QueryCache(str(tmp_path), persistent=True).get(key) is None
+
+
+def test_persistent_results_survive_a_restart(tmp_path):
+    cache = QueryCache(str(tmp_path), persistent=True)
+    key = cache.make_key("docs", 0, "asyncio")
+    cache.put(key, "docs", 0, [{"id": "a", "similarity": 0.5}])
+
+    assert QueryCache(str(tmp_path), persistent=True).get(key) == [{"id": "a", "similarity": 0.5}]
+    assert QueryCache(str(tmp_path), persistent=False).get(key) is None
+
+
+def test_writes_invalidate_cached_retrievals(make_rag):
+    rag = make_rag()
+    rag.add_text("The event loop schedules coroutines in asyncio.", source="asyncio")
+
+    assert not rag.retrieve("event loop coroutines", mode="vector", threshold=0).cached
+    assert rag.retrieve("event loop coroutines", mode="vector", threshold=0).cached
+
+    rag.add_text("Coroutines are awaited by the event loop.", source="more")
+
+    result = rag.retrieve("event loop coroutines", mode="vector", threshold=0)
+    assert not result.cached
+    assert {hit["metadata"]["source"] for hit in result.hits} == {"asyncio", "more"}
+
+
+def test_only_real_writes_invalidate_cached_retrievals(make_rag):
+    rag = make_rag()
+    rag.add_text("The event loop schedules coroutines in asyncio.", source="asyncio")
+    version = rag.query_cache.get_version(rag.collection_name)
+
+    # Identical chunks hash to ids that are stored already
+    assert rag.add_text("The event loop schedules coroutines in asyncio.", source="asyncio") == 0
+    assert rag.delete_chunks(["doc_missing"]) == 0
+
+    assert rag.query_cache.get_version(rag.collection_name) == version
+
+
+def test_the_collection_version_is_read_once_per_query(settings, make_rag, monkeypatch):
+    settings(RAG_VECTOR_INDEX="numpy")
+    rag = make_rag()
+    rag.add_text("The event loop schedules coroutines in asyncio.", source="asyncio")
+    rag.vector_indexes.get(wait=True)
+    rag.retrieve("warm up", mode="vector", threshold=0)
+    reads = []
+    get_version = rag.query_cache.get_version
+    monkeypatch.setattr(rag.query_cache, "get_version", lambda name: reads.append(name) or get_version(name))
+    monkeypatch.setattr(rag.registry, "get_alias", lambda name: pytest.fail("registry read although no swap happened"))
+
+    result = rag.retrieve("event loop coroutines", mode="vector", threshold=0)
+
+    assert result.hits and not result.cached
+    assert reads == [rag.collection_name]
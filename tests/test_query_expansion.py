@@ -0,0 +1,38 @@
+"""Tests for query expansion"""
+
+from embeddings import QUERY_TASK_TYPE, HashingEmbeddings, embed_queries
+from query_expansion import ExpansionCache, rule_variants
+
+
+def test_rule_variants_strip_the_question_and_split_identifiers():
+    variants = rule_variants("How do I use read_config in Python?", max_variants=5)
+
+    assert variants[0] == "How do I use read_config in Python?"
+    assert "use read_config in Python" in variants
+    assert "How do I use read config in Python?" in variants
+
+
+def test_rule_variants_are_distinct_and_capped():
+    assert rule_variants("asyncio", max_variants=5) == ["asyncio"]
+    assert rule_variants("What is clearCache?", max_variants=5) == ["What is clearCache?", "clearCache", "What is clear cache?"]
+    assert len(rule_variants("How do I use read_config in Python?", max_variants=2)) == 2
+    assert rule_variants("How do I use read_config in Python?", max_variants=0) == ["How do I use read_config in Python?"]
+
+
+def test_expansion_cache_is_keyed_on_the_normalized_query_and_model(tmp_path):
+    cache = ExpansionCache(str(tmp_path))
+    cache.put("What is asyncio?", "model-a", ["asyncio event loop", "python coroutines"])
+
+    assert cache.get("  what is ASYNCIO ", "model-a") == ["asyncio event loop", "python coroutines"]
+    assert cache.get("What is asyncio?", "model-b") is None
+    assert ExpansionCache(str(tmp_path)).get("what is asyncio", "model-a") == ["asyncio event loop", "python coroutines"]
+
+
+def test_query_variants_are_embedded_as_queries():
+    class GoogleLikeEmbeddings:
+        def embed_documents(self, texts, task_type=None):
+            return [[1.0 if task_type == QUERY_TASK_TYPE else 0.0] for text in texts]
+
+    assert embed_queries(GoogleLikeEmbeddings(), ["a", "b"]) == [[1.0], [1.0]]
+    local = HashingEmbeddings(16)
+    assert embed_queries(local, ["asyncio event loop"]) == [local.embed_query("asyncio event loop")]
@@ -0,0 +1,92 @@
+"""Tests for the gate deciding whether a message needs retrieval"""
+
+import json
+
+import pytest
+
+from query_gate import (
+    RETRIEVE, REUSE, SKIP, NaiveBayesGate, QueryGate, heuristic_decision, retrieve_if_needed, shares_terms, train_gate
+)
+from retrieval import QueryFilters
+
+
+@pytest.mark.parametrize("message", ["thanks!", "ok cool", "Hello there", "   "])
+def test_small_talk_skips_retrieval(message):
+    assert heuristic_decision(message, has_previous=True).action == SKIP
+
+
+def test_rework_reuses_the_previous_retrieval_when_there_is_one():
+    assert heuristic_decision("make it shorter please", has_previous=True).action == REUSE
+    assert heuristic_decision("make it shorter please", has_previous=False).action == SKIP
+
+
+@pytest.mark.parametrize("message", [
+    "How do I configure the embedding model?",
+    "explain the retry policy of the ingestion queue",
+    "thanks " * 11,
+])
+def test_heuristics_leave_real_questions_undecided(message):
+    assert heuristic_decision(message, has_previous=True) is None
+
+
+def test_gate_modes():
+    assert QueryGate("off").decide("thanks").action == RETRIEVE
+    assert QueryGate("heuristic").decide("thanks").action == SKIP
+    assert QueryGate("heuristic").decide("What is asyncio?").action == RETRIEVE
+
+
+def test_trained_classifier_round_trips_through_its_model_file(tmp_path):
+    examples = [("what does the config say about timeouts", RETRIEVE)] * 5 + [("lovely weather today", SKIP)] * 5
+    examples_path = tmp_path / "examples.jsonl"
+    examples_path.write_text("".join(json.dumps({"text": t, "label": l}) + "\n" for t, l in examples), encoding="utf-8")
+    model_path = tmp_path / "query_gate.json"
+
+    summary = train_gate(str(examples_path), str(model_path))
+
+    assert summary["labels"] == {RETRIEVE: 5, SKIP: 5}
+    assert summary["accuracy"] == 1.0
+    gate = QueryGate("classifier", str(model_path))
+    assert gate.classifier is not None
+    assert gate.decide("lovely weather").action == SKIP
+    assert gate.decide("config timeouts").action == RETRIEVE
+
+
+def test_classifier_rejects_unknown_labels():
+    with pytest.raises(ValueError):
+        NaiveBayesGate.train([("hello", "maybe")])
+    with pytest.raises(ValueError):
+        NaiveBayesGate.train([])
+
+
+def test_gate_is_off_unless_configured(settings, make_rag):
+    assert make_rag().query_gate.decide("thanks").action == RETRIEVE
+    settings(RAG_QUERY_GATE="heuristic")
+    assert make_rag().query_gate.decide("thanks").action == SKIP
+
+
+def test_a_follow_up_reuses_only_a_retrieval_it_is_about(settings, make_rag):
+    settings(RAG_QUERY_GATE="heuristic")
+    rag = make_rag()
+    rag.add_text("The event loop schedules coroutines.", source="asyncio")
+    previous = rag.retrieve("event loop", mode="vector", threshold=0)
+
+    retrieval, gate = retrieve_if_needed(rag, "shorter please", previous, mode="vector", threshold=0)
+    assert gate.action == REUSE and retrieval is previous
+
+    # Another scope was searched for the previous turn
+    scope = QueryFilters(sources=["asyncio"])
+    retrieval, gate = retrieve_if_needed(rag, "shorter please", previous, mode="vector", threshold=0, filters=scope)
+    assert gate.action == SKIP and retrieval is None
+
+
+def test_a_follow_up_with_new_terms_retrieves(make_rag):
+    rag = make_rag()
+    rag.add_text("The event loop schedules coroutines.", source="asyncio")
+    previous = rag.retrieve("event loop", mode="vector", threshold=0)
+    rag.query_gate = QueryGate("heuristic")
+    rag.query_gate.classifier = NaiveBayesGate.train([("explain it again", REUSE), ("explain generators", REUSE)])
+
+    assert shares_terms("explain the event loop again", previous)
+    assert not shares_terms("explain generators", previous)
+    retrieval, gate = retrieve_if_needed(rag, "explain generators", previous, mode="vector", threshold=0)
+    assert gate.action == RETRIEVE and retrieval is not previous
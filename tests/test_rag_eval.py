@@ -0,0 +1,70 @@
+"""Tests for the retrieval evaluation harness"""
+
+import json
+
+import pytest
+
+from rag_eval import EvalQuery, evaluate, is_relevant, load_queries, parse_storage
+
+
+def test_load_queries_accepts_ids_sources_and_texts(tmp_path):
+    path = tmp_path / "queries.jsonl"
+    lines = [
+        {"query": "event loop", "expected_source": "asyncio"},
+        {"query": "lazy values", "expected_ids": ["a", "b"], "expected_text": "yield values"},
+    ]
+    path.write_text("\n".join(json.dumps(line) for line in lines) + "\n\n", encoding="utf-8")
+
+    queries = load_queries(str(path))
+
+    assert [item.expected() for item in queries] == [
+        [("source", "asyncio")],
+        [("id", "a"), ("id", "b"), ("text", "yield values")],
+    ]
+
+    path.write_text(json.dumps({"query": "nothing expected"}), encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_queries(str(path))
+
+
+def test_is_relevant_matches_merged_passages_paths_and_text():
+    passage = {
+        "id": "a",
+        "merged_ids": ["a", "b"],
+        "content": "Generators  YIELD values lazily.",
+        "metadata": {"source": "notes.md", "path": "/docs/notes.md"},
+    }
+
+    assert is_relevant(passage, "id", "b")
+    assert is_relevant(passage, "source", "/docs/notes.md")
+    assert is_relevant(passage, "text", "yield values")
+    assert not is_relevant(passage, "source", "other.md")
+
+
+def test_evaluate_scores_every_top_k_without_the_query_cache(make_rag):
+    rag = make_rag()
+    rag.add_text("The event loop schedules coroutines.", source="asyncio")
+    rag.add_text("Bananas are a yellow fruit.", source="fruit")
+    queries = [EvalQuery("event loop coroutines", sources=["asyncio"]), EvalQuery("yellow bananas", sources=["fruit"])]
+
+    report = evaluate(rag, queries, top_ks=[1, 2], threshold=0, mode="vector", details=True)
+
+    assert [row["top_k"] for row in report["results"]] == [1, 2]
+    assert report["results"][0]["recall"] == 1.0 and report["results"][0]["mrr"] == 1.0
+    assert report["results"][0]["queries"][0] == {"query": "event loop coroutines", "ranks": [1]}
+    assert report["chunks"] == 2
+    assert rag.query_cache.stats()["size"] == 0
+
+
+@pytest.mark.parametrize("spec, parsed", [
+    ("int8", ("none", "int8")),
+    ("pca:128/int8", ("pca:128", "int8")),
+    ("truncate:256", ("truncate:256", "float32")),
+])
+def test_parse_storage(spec, parsed):
+    assert parse_storage(spec) == parsed
+
+
+def test_parse_storage_rejects_unknown_settings():
+    with pytest.raises(ValueError):
+        parse_storage("zip:4")
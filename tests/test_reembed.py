@@ -0,0 +1,91 @@
+"""Tests for moving a collection to another embedding model"""
+
+import sqlite3
+import time
+
+import pytest
+
+TEXT = " ".join(f"word{i} sentence number {i}." for i in range(1500))
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def reembed_settings(settings):
+    return settings(RAG_REEMBED_BATCH_SIZE="20", RAG_REEMBED_DELAY="0.2")
+
+
+def test_empty_collection_switches_immediately(reembed_settings, make_rag):
+    rag = make_rag()
+
+    assert rag.ensure_embedding_model("local/hashing-768") is False
+
+    assert rag.reembed_worker is None
+    assert rag.embedding_model == "local/hashing-768"
+    assert len(rag.embed_query("x")) == 768
+    assert make_rag().embedding_model == "local/hashing-768"
+
+
+def test_other_processes_follow_the_swap(reembed_settings, settings, make_rag):
+    first = make_rag()
+    first.add_text(TEXT, source="big")
+    chunks = first.collection.count()
+    second = make_rag() # Stands in for another process
+    settings(EMBEDDING_MODEL="local/hashing-768")
+
+    assert first.ensure_embedding_model("local/hashing-768") is True
+    owner = first.reembed_worker.owner
+
+    # Only the process holding the lease works on the job
+    assert second.ensure_embedding_model("local/hashing-768") is True
+    assert second.reembed_worker is None
+    assert wait_for(lambda: second.reembed_status()["position"] > 0)
+    status = second.reembed_status()
+    assert status["status"] == "running" and status["owner"] == owner
+
+    first.reembed_worker.join(timeout=60)
+    assert first.physical_name == "pixella_v2"
+    assert first.embedding_model == "local/hashing-768"
+    assert first.reembed_status() is None
+
+    # Queries keep working while the second instance still points at the old collection
+    hits = second.query("word42", mode="vector", threshold=0)
+    assert hits
+    assert second.physical_name == "pixella_v2"
+    assert len(second.embed_query("x")) == 768
+    assert second.collection.count() == chunks
+
+
+def test_a_dead_owners_lease_is_taken_over(reembed_settings, settings, make_rag):
+    first = make_rag()
+    first.add_text(TEXT, source="big")
+    chunks = first.collection.count()
+    second = make_rag()
+    settings(EMBEDDING_MODEL="local/hashing-768")
+    first.ensure_embedding_model("local/hashing-768")
+    first.reembed_worker.stop()
+    first.reembed_worker.join()
+    assert first.reembed_status()["status"] == "paused"
+
+    # The owner died mid-run: its lease is honoured until the heartbeat expires
+    conn = sqlite3.connect(str(first.registry.db_path))
+    conn.execute("UPDATE reembed_jobs SET owner = 'dead', status = 'running', heartbeat = ?", (time.time(),))
+    conn.commit()
+    assert second.ensure_embedding_model("local/hashing-768") is True
+    assert second.reembed_worker is None
+
+    conn.execute("UPDATE reembed_jobs SET heartbeat = ?", (time.time() - 1000,))
+    conn.commit()
+    conn.close()
+    assert second.reembed_status()["status"] == "interrupted"
+
+    assert second.ensure_embedding_model("local/hashing-768") is True
+    assert second.reembed_worker is not None
+    second.reembed_worker.join(timeout=60)
+    assert second.physical_name == "pixella_v2"
+    assert second.collection.count() == chunks
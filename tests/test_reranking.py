@@ -0,0 +1,60 @@
+"""Tests for candidate reranking"""
+
+import pytest
+
+from reranking import bm25_scores, load_scorer, overlap_scores, rerank
+
+
+def test_load_scorer_resolves_builtin_names_and_hooks():
+    assert load_scorer("none") is None
+    assert load_scorer("") is None
+    assert load_scorer("overlap") is overlap_scores
+    assert load_scorer("bm25") is bm25_scores
+    assert load_scorer("reranking:overlap_scores") is overlap_scores
+
+
+@pytest.mark.parametrize("name", ["cross-encoder", "reranking:missing", "no_such_module:score"])
+def test_load_scorer_rejects_unknown_rerankers(name):
+    with pytest.raises(ValueError):
+        load_scorer(name)
+
+
+def test_bm25_prefers_documents_with_the_rare_query_terms():
+    documents = [
+        "the cache is stale, run clear_cache",
+        "the cache stores results",
+        "gardening in spring",
+    ]
+
+    scores = bm25_scores("clear_cache stale cache", documents)
+
+    assert scores[0] > scores[1] > scores[2] == 0.0
+    assert bm25_scores("", documents) == [0.0, 0.0, 0.0]
+
+
+def test_rerank_blends_scores_and_sorts_best_first():
+    candidates = [
+        {"id": "vector-only", "content": "unrelated text", "similarity": 0.6},
+        {"id": "keyword", "content": "run clear_cache when the cache is stale", "similarity": 0.5},
+    ]
+
+    ranked = rerank("clear_cache stale", candidates, overlap_scores, weight=0.5)
+
+    assert [candidate["id"] for candidate in ranked] == ["keyword", "vector-only"]
+    assert ranked[0]["rerank_score"] == pytest.approx(0.5 * 1.0 + 0.5 * 0.5)
+    assert ranked[1]["rerank_score"] == pytest.approx(0.5 * 0.6)
+
+
+def test_rerank_keeps_the_order_when_the_scorer_misbehaves():
+    candidates = [{"id": "a", "content": "x", "similarity": 0.1}, {"id": "b", "content": "y", "similarity": 0.9}]
+
+    ranked = rerank("x", candidates, lambda query, documents: [1.0])
+
+    assert [candidate["id"] for candidate in ranked] == ["a", "b"]
+    assert "rerank_score" not in ranked[0]
+
+
+def test_reranking_is_off_unless_configured(settings, make_rag):
+    assert make_rag().reranker is None
+    settings(RAG_RERANKER="bm25")
+    assert make_rag().reranker is bm25_scores
@@ -0,0 +1,157 @@
+"""Tests for the retrieval pipeline: thresholds, fusion, neighbour grouping and context packing"""
+
+from rag_settings import get_mmr_lambda
+from retrieval import (
+    MIN_KEYWORD_COVERAGE, QueryFilters, filter_results, fuse_results, merge_adjacent_chunks, mmr_select
+)
+
+DOCS = {
+    "errors.md": "# Error codes\n\nE1234 means the cache is stale. Run clear_cache to rebuild it.\n",
+    "asyncio.md": "# Asyncio\n\nThe event loop schedules coroutines and awaits futures in Python 3.11.\n",
+}
+
+
+def hit(chunk_id, retriever, similarity, coverage=None):
+    result = {"id": chunk_id, "retriever": retriever, "similarity": similarity, "distance": 1 - similarity}
+    if coverage is not None:
+        result["coverage"] = coverage
+    return result
+
+
+def test_filter_results_applies_the_threshold_per_retriever():
+    candidates = [
+        hit("strong-vector", "vector", 0.8),
+        hit("weak-vector", "vector", 0.3),
+        hit("strong-keyword", "lexical", 0.2, coverage=MIN_KEYWORD_COVERAGE),
+        hit("weak-keyword", "lexical", 0.9, coverage=0.2),
+        hit("hybrid-keyword", "hybrid", 0.1, coverage=1.0),
+        hit("neighbor", "neighbor", 0.0),
+    ]
+
+    kept = filter_results(candidates, threshold=0.5)
+
+    assert [result["id"] for result in kept] == ["strong-vector", "strong-keyword", "hybrid-keyword", "neighbor"]
+
+
+def test_fuse_results_merges_hits_found_by_both_retrievers():
+    vector = [hit("a", "vector", 0.9), hit("b", "vector", 0.7)]
+    lexical = [hit("b", "lexical", 1.0, coverage=1.0), hit("c", "lexical", 0.5, coverage=0.5)]
+
+    fused = fuse_results([vector, lexical])
+
+    assert fused[0]["id"] == "b"
+    assert fused[0]["retriever"] == "hybrid"
+    # The vector similarity is kept, the keyword coverage is added
+    assert fused[0]["similarity"] == 0.7 and fused[0]["coverage"] == 1.0
+    assert {result["id"] for result in fused} == {"a", "b", "c"}
+
+
+def test_auto_mode_returns_nothing_for_an_off_topic_question(make_rag, tmp_path):
+    rag = make_rag()
+    for name, text in DOCS.items():
+        path = tmp_path / name
+        path.write_text(text, encoding="utf-8")
+        rag.add_file(str(path))
+
+    result = rag.retrieve("tell me about the weather in Paris", top_k=3, threshold=0.5, mode="auto")
+
+    assert result.hits == []
+    assert result.context == ""
+
+
+def test_auto_mode_answers_keyword_queries_from_the_lexical_index(make_rag, tmp_path):
+    rag = make_rag()
+    for name, text in DOCS.items():
+        path = tmp_path / name
+        path.write_text(text, encoding="utf-8")
+        rag.add_file(str(path))
+
+    result = rag.retrieve("E1234 clear_cache", top_k=3, threshold=0.5, mode="auto")
+
+    assert [hit["metadata"]["source"] for hit in result.hits] == ["errors.md"]
+    assert result.hits[0]["retriever"] == "lexical"
+    assert "embed" not in result.timings
+
+
+def test_filters_restrict_vector_and_keyword_search(make_rag, tmp_path):
+    rag = make_rag()
+    for name, text in DOCS.items():
+        path = tmp_path / name
+        path.write_text(text, encoding="utf-8")
+        rag.add_file(str(path))
+    rag.add_text("The cache of the event loop is never stale.", source="notes")
+
+    for filters, sources in [
+        (QueryFilters(sources=["asyncio.md"]), {"asyncio.md"}),
+        (QueryFilters(path_prefix=str(tmp_path / "err")), {"errors.md"}),
+        (QueryFilters(doc_type="user_text"), {"notes"}),
+        (QueryFilters(path_prefix=str(tmp_path / "missing")), set()),
+    ]:
+        result = rag.retrieve("event loop cache stale", top_k=5, threshold=0, mode="hybrid", filters=filters)
+        assert {hit["metadata"]["source"] for hit in result.hits} == sources
+
+
+def test_filters_are_parsed_from_command_text():
+    filters = QueryFilters.parse("notes.md guide.md type:file path:/docs since:2024-01-01")
+
+    assert filters.sources == ["notes.md", "guide.md"]
+    assert (filters.doc_type, filters.path_prefix) == ("file", "/docs")
+    assert filters.describe().startswith("sources: notes.md, guide.md; type: file; path: /docs*; since: 2024-01-01")
+    assert QueryFilters.parse("").is_empty()
+
+
+def colliding_documents(rag):
+    alpha = "\n\n".join(f"alpha paragraph {i} " + "apples are red fruit " * 40 for i in range(4))
+    beta = "\n\n".join(f"beta paragraph {i} " + "bananas are yellow fruit " * 40 for i in range(4))
+    # Both texts get the default 'user_input' source
+    rag.add_text(alpha)
+    rag.add_text(beta)
+
+    page = rag.collection.get(include=["documents", "metadatas"])
+    hits = [
+        {"id": chunk_id, "content": document, "metadata": metadata, "similarity": 0.9}
+        for chunk_id, document, metadata in zip(page["ids"], page["documents"], page["metadatas"])
+    ]
+    first_alpha = next(h for h in hits if h["metadata"]["chunk_index"] == 0 and "apples" in h["content"])
+    second_beta = next(h for h in hits if h["metadata"]["chunk_index"] == 1 and "bananas" in h["content"])
+    return hits, first_alpha, second_beta
+
+
+def test_chunks_are_merged_per_document_when_sources_collide(make_rag):
+    hits, first_alpha, second_beta = colliding_documents(make_rag())
+
+    assert len({hit["metadata"]["doc_id"] for hit in hits}) == 2
+    # Chunks 0 and 1 of different documents are not adjacent
+    assert len(merge_adjacent_chunks([first_alpha, second_beta])) == 2
+
+
+def test_neighbours_are_fetched_from_the_same_document_only(make_rag):
+    rag = make_rag()
+    rag.context_neighbors = 1
+    _, first_alpha, _ = colliding_documents(rag)
+
+    packed = rag.pack_context([first_alpha], 5000)
+
+    assert [passage["metadata"].get("chunk_span") for passage in packed] == ["0-1"]
+    assert all("banana" not in passage["content"] for passage in packed)
+
+
+def test_legacy_chunks_without_document_identity_are_not_merged():
+    first = {"id": "x", "content": "x", "metadata": {"source": "user_input", "chunk_index": 0}}
+    second = {"id": "y", "content": "y", "metadata": {"source": "user_input", "chunk_index": 1}}
+
+    assert len(merge_adjacent_chunks([first, second])) == 2
+
+
+def test_mmr_skips_near_duplicates_when_enabled():
+    candidates = [hit("a", "vector", 0.9), hit("a-copy", "vector", 0.89), hit("b", "vector", 0.7)]
+    embeddings = [[1.0, 0.0], [0.99, 0.01], [0.0, 1.0]]
+
+    assert [c["id"] for c in mmr_select(candidates, embeddings, 2, lambda_mult=0.7)] == ["a", "b"]
+    assert [c["id"] for c in mmr_select(candidates, embeddings, 2, lambda_mult=1.0)] == ["a", "a-copy"]
+
+
+def test_diversification_is_off_unless_configured(settings):
+    assert get_mmr_lambda() == 1.0
+    settings(RAG_MMR_LAMBDA="0.7")
+    assert get_mmr_lambda() == 0.7
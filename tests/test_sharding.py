@@ -0,0 +1,72 @@
+"""Tests for the sharded RAG store"""
+
+import pytest
+
+from sharding import ShardedClient, read_shard_count, rebalance, shard_of, shard_paths, write_shard_count
+
+TOPICS = ["asyncio coroutines", "sqlite transactions", "numpy broadcasting", "git rebasing", "http caching"]
+
+
+def test_shard_of_is_stable_and_in_range():
+    owners = [shard_of(f"chunk-{i}", 4) for i in range(200)]
+
+    assert owners == [shard_of(f"chunk-{i}", 4) for i in range(200)]
+    assert set(owners) == {0, 1, 2, 3}
+    assert all(shard_of(f"chunk-{i}", 1) == 0 for i in range(20))
+
+
+def test_shard_zero_is_the_store_itself(tmp_path):
+    assert shard_paths(str(tmp_path), 3) == [str(tmp_path), str(tmp_path / "shards" / "1"), str(tmp_path / "shards" / "2")]
+
+
+def test_layout_is_recorded_for_new_stores_only(tmp_path):
+    new_store = tmp_path / "new"
+    assert read_shard_count(str(new_store), default=4) == 4
+    # The layout is fixed once written, later defaults do not change it
+    assert read_shard_count(str(new_store), default=2) == 4
+
+    old_store = tmp_path / "old"
+    old_store.mkdir()
+    (old_store / "chroma.sqlite3").touch()
+    assert read_shard_count(str(old_store), default=4) == 1
+
+    write_shard_count(str(old_store), 2)
+    assert read_shard_count(str(old_store)) == 2
+
+
+@pytest.fixture
+def sharded_rag(settings, make_rag):
+    settings(RAG_SHARDS="2")
+    rag = make_rag()
+    for topic in TOPICS:
+        rag.add_text(f"Notes on {topic}. " * 5, source=topic)
+    return rag
+
+
+def test_chunks_are_spread_over_the_shards_and_searched_together(sharded_rag):
+    rag = sharded_rag
+    assert isinstance(rag.client, ShardedClient)
+    stats = rag.client.stats()
+
+    assert len(stats) == 2
+    assert sum(row["chunks"] for row in stats) == rag.collection.count() == len(TOPICS)
+    assert all(row["chunks"] > 0 for row in stats)
+    for topic in TOPICS:
+        hits = rag.retrieve(f"Notes on {topic}", top_k=1, threshold=0, mode="vector").hits
+        assert hits[0]["metadata"]["source"] == topic
+
+
+def test_rebalance_moves_every_chunk_to_its_new_owner(sharded_rag, settings, make_rag):
+    from chromadb_rag import reset_rag
+
+    db_path = sharded_rag.db_path
+    reset_rag()
+
+    moved = rebalance(db_path, 1)
+
+    assert moved["pixella"] > 0
+    assert read_shard_count(db_path) == 1
+    settings(RAG_SHARDS="1")
+    rag = make_rag()
+    assert not isinstance(rag.client, ShardedClient)
+    assert rag.collection.count() == len(TOPICS)
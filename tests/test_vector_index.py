@@ -0,0 +1,197 @@
+"""Tests for the in-process vector indexes, their codecs and the index manager"""
+
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from vector_index import (
+    CODEC_MIN_FIT_ROWS, IVFVectorIndex, NumpyVectorIndex, benchmark_vector_index, normalize_vectors, parse_codec, rescore
+)
+
+COUNT, DIMENSIONS, CLUSTERS = 2000, 64, 20
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(CLUSTERS, DIMENSIONS))
+    vectors = normalize_vectors(centers[rng.integers(0, CLUSTERS, COUNT)] + 0.6 * rng.normal(size=(COUNT, DIMENSIONS)))
+    ids = [f"c{i}" for i in range(COUNT)]
+    queries = normalize_vectors(vectors[rng.integers(0, COUNT, 50)] + 0.05 * rng.normal(size=(50, DIMENSIONS)))
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :10]
+    store = dict(zip(ids, vectors))
+
+    class Corpus:
+        def pages(self):
+            for start in range(0, COUNT, 700):
+                yield ids[start:start + 700], vectors[start:start + 700]
+
+        def fetch(self, wanted):
+            return {chunk_id: store[chunk_id] for chunk_id in wanted if chunk_id in store}
+
+        def recall(self, hits):
+            return np.mean([
+                len({hit[0] for hit in found} & {ids[j] for j in best}) / 10 for found, best in zip(hits, exact)
+            ])
+
+    corpus = Corpus()
+    corpus.ids, corpus.vectors, corpus.queries = ids, vectors, queries
+    return corpus
+
+
+def test_full_precision_index_is_exact(corpus, tmp_path):
+    index = NumpyVectorIndex(str(tmp_path))
+    assert index.rebuild(corpus.pages, 1) == COUNT
+
+    assert corpus.recall(index.search(corpus.queries, 10)) == 1.0
+
+
+@pytest.mark.parametrize("reduction, precision, min_recall", [
+    ("none", "float16", 0.99),
+    ("none", "int8", 0.95),
+    ("pca:16", "int8", 0.5),
+    ("truncate:32", "float16", 0.5),
+])
+def test_encoded_index_round_trips_through_disk(corpus, tmp_path, reduction, precision, min_recall):
+    index = NumpyVectorIndex(str(tmp_path), codec=parse_codec(reduction, precision), fetch=corpus.fetch)
+    index.rebuild(corpus.pages, 1)
+    hits = index.search(corpus.queries, 10)
+
+    # Only the compact codes are stored, the full vectors stay in ChromaDB
+    assert sorted(os.listdir(tmp_path)) == ["codec.npz", "codes.npy", "index.db"]
+    assert index.footprint["stored_bytes"] < index.footprint["full_bytes"]
+    assert corpus.recall(hits) >= min_recall
+    # Rescored similarities are exact cosines of the full vectors
+    best_id, similarity, _ = hits[0][0]
+    assert similarity == pytest.approx(float(corpus.vectors[corpus.ids.index(best_id)] @ corpus.queries[0]), abs=1e-5)
+
+    reloaded = NumpyVectorIndex(str(tmp_path), codec=parse_codec(reduction, precision), fetch=corpus.fetch)
+    assert reloaded.encoded and reloaded.count == COUNT and reloaded.version == 1
+    assert [[hit[0] for hit in found] for found in reloaded.search(corpus.queries, 10)] == \
+        [[hit[0] for hit in found] for found in hits]
+
+
+def test_codec_is_fitted_once_enough_rows_are_staged(corpus, tmp_path):
+    index = NumpyVectorIndex(str(tmp_path), codec=parse_codec("none", "int8"), fetch=corpus.fetch)
+
+    index.add(corpus.ids[:CODEC_MIN_FIT_ROWS - 24], corpus.vectors[:CODEC_MIN_FIT_ROWS - 24])
+    assert not index.encoded
+    assert sorted(os.listdir(tmp_path)) == ["index.db", "vectors.npy"]
+
+    index.add(corpus.ids[CODEC_MIN_FIT_ROWS - 24:1100], corpus.vectors[CODEC_MIN_FIT_ROWS - 24:1100])
+    assert index.encoded
+    assert sorted(os.listdir(tmp_path)) == ["codec.npz", "codes.npy", "index.db"]
+
+    index.add(corpus.ids[1100:], corpus.vectors[1100:])
+    index.delete(corpus.ids[:10])
+    assert index.count == COUNT - 10
+    found = {hit[0] for hits in index.search(corpus.queries, 10) for hit in hits}
+    assert not found & set(corpus.ids[:10])
+
+
+def test_rescoring_needs_the_full_vectors(corpus):
+    queries = corpus.queries[:1]
+    with pytest.raises(ValueError):
+        rescore(queries, [corpus.ids[:5]], None, 3)
+
+    hits = rescore(queries, [corpus.ids[:5] + ["deleted"]], corpus.fetch, 3)
+    assert len(hits[0]) == 3
+    assert [hit[1] for hit in hits[0]] == sorted((hit[1] for hit in hits[0]), reverse=True)
+
+
+@pytest.mark.parametrize("reduction, precision", [(None, None), ("none", "int8")])
+def test_ivf_index_searches_full_and_encoded_vectors(corpus, tmp_path, reduction, precision):
+    def codec():
+        return parse_codec(reduction, precision) if reduction else None
+
+    index = IVFVectorIndex(str(tmp_path), nlist=CLUSTERS, nprobe=8, codec=codec(), fetch=corpus.fetch)
+    index.rebuild(corpus.pages, 1)
+    recall = corpus.recall(index.search(corpus.queries, 10))
+    assert recall >= 0.9
+
+    reloaded = IVFVectorIndex(str(tmp_path), nlist=CLUSTERS, nprobe=8, codec=codec(), fetch=corpus.fetch)
+    assert reloaded.encoded == (reduction is not None)
+    assert corpus.recall(reloaded.search(corpus.queries, 10)) == recall
+
+
+def test_manager_keeps_the_index_in_sync_with_writes(settings, make_rag):
+    settings(RAG_VECTOR_INDEX="numpy")
+    rag = make_rag()
+    rag.add_text("The event loop schedules coroutines.", source="asyncio")
+    manager = rag.vector_indexes
+
+    index = manager.get(wait=True)
+    assert index is not None and index.count == rag.collection.count()
+
+    # A write by this instance is applied to the index, no rebuild needed
+    rag.add_text("Generators yield values lazily.", source="generators")
+    assert index.version == rag.query_cache.get_version(rag.collection_name)
+    assert index.count == rag.collection.count()
+    assert manager.get() is index
+
+
+def test_manager_rebuilds_an_index_left_behind_by_another_writer(settings, make_rag):
+    settings(RAG_VECTOR_INDEX="numpy")
+    rag = make_rag()
+    rag.add_text("The event loop schedules coroutines.", source="asyncio")
+    manager = rag.vector_indexes
+    index = manager.get(wait=True)
+
+    # Another process wrote to the collection: searches go to ChromaDB until the rebuild finishes
+    rag.query_cache.bump_version(rag.collection_name)
+    assert manager.get() is None
+    manager._rebuild_thread.join(timeout=30)
+
+    assert manager.get() is index
+    assert index.version == rag.query_cache.get_version(rag.collection_name)
+
+
+def test_rebuild_lets_writers_in_and_replays_their_writes(settings, make_rag):
+    settings(RAG_VECTOR_INDEX="numpy")
+    rag = make_rag()
+    rag.add_text("The event loop schedules coroutines.", source="asyncio")
+    manager = rag.vector_indexes
+    read_pages = manager._iter_pages
+    reads, writers = [], []
+
+    def pages():
+        reads.append(1)
+        yield from read_pages()
+        if not writers:
+            # Ingestion goes on while the pages are read
+            writer = threading.Thread(target=rag.add_text, args=("Generators yield values lazily.",))
+            writers.append(writer)
+            writer.start()
+            writer.join(timeout=30)
+
+    manager._iter_pages = pages
+    index = manager.get(wait=True)
+
+    assert not writers[0].is_alive()
+    assert len(reads) == 1
+    assert index.version == rag.query_cache.get_version(rag.collection_name)
+    assert index.count == rag.collection.count()
+
+
+def test_chroma_answers_vector_searches_unless_configured(make_rag):
+    rag = make_rag()
+    rag.add_text("The event loop schedules coroutines.", source="asyncio")
+
+    assert rag.vector_indexes.get() is None
+    assert not rag.vector_indexes.directory().exists()
+
+
+def test_benchmark_measures_an_encoded_index_against_the_full_vectors(settings, make_rag):
+    settings(RAG_VECTOR_INDEX="numpy", RAG_VECTOR_REDUCTION="truncate:4", RAG_VECTOR_PRECISION="int8")
+    rag = make_rag()
+    vectors = normalize_vectors(np.random.default_rng(2).normal(size=(CODEC_MIN_FIT_ROWS + 100, DIMENSIONS)))
+    rag.collection.add(ids=[f"c{i}" for i in range(len(vectors))], embeddings=vectors.tolist())
+
+    report = benchmark_vector_index(rag, samples=20, top_k=10)
+
+    assert rag.vector_indexes.index.encoded
+    assert report["chunks"] == len(vectors)
+    assert report["numpy_recall"] < 1.0
+    assert report["chroma_recall"] > 0.5
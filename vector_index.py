@@ -0,0 +1,1466 @@
+"""
+Vector Index Module
+
+In-process vector search backends for RAG collections. The flat index
+keeps the normalized float32 embeddings of a small or medium collection in
+a memory-mapped `.npy` matrix and answers a query exactly with one matrix
+multiply and an argpartition top-k, which beats ChromaDB's HNSW query path
+at these sizes. The IVF index is meant for corpora of millions of chunks:
+vectors are grouped into k-means cells stored as separate memory-mapped
+files, and a query only scans the `nprobe` cells closest to it.
+Both can store the vectors in a compact encoding (PCA-reduced or truncated,
+as float16 or int8) instead of float32; a query then scans the encoded
+vectors and rescores the best candidates against the full-precision
+vectors read back from ChromaDB, which keeps them anyway.
+ChromaDB stays the store of record for documents and metadata; an index
+is kept in sync on every write and rebuilt from ChromaDB when it falls
+behind.
+
+"""
+
+import os
+import time
+import shutil
+import logging
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable, Iterable, Sequence, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTOR_INDEX_MODES = ("auto", "chroma", "numpy", "ivf")
+DEFAULT_NUMPY_INDEX_MAX_CHUNKS = 100000
+DEFAULT_IVF_MIN_CHUNKS = 2000000
+DEFAULT_IVF_NPROBE = 8
+MIN_CAPACITY = 1024
+MIN_CELL_CAPACITY = 64
+KMEANS_ITERATIONS = 20
+# Training vectors sampled per cell (capped by KMEANS_MAX_SAMPLE)
+KMEANS_SAMPLE_PER_CELL = 64
+KMEANS_MAX_SAMPLE = 200000
+ASSIGN_BATCH_SIZE = 10000
+VECTOR_REDUCTIONS = ("none", "pca", "truncate")
+VECTOR_PRECISIONS = ("float32", "float16", "int8")
+# Compact scores pick top_k * RESCORE_FACTOR candidates (at least RESCORE_MIN_CANDIDATES) for exact rescoring
+RESCORE_FACTOR = 4
+RESCORE_MIN_CANDIDATES = 32
+# Vectors needed before a codec is fitted; it is refitted when the index grows CODEC_REFIT_GROWTH times
+CODEC_MIN_FIT_ROWS = 1024
+CODEC_REFIT_GROWTH = 4
+CODEC_FIT_SAMPLE = 50000
+SCAN_BLOCK_ROWS = 65536
+# Chunks read from ChromaDB per page when an index is rebuilt
+REBUILD_PAGE_SIZE = 1000
+
+# (chunk id, cosine similarity, normalized vector)
+IndexHit = Tuple[str, float, np.ndarray]
+# Returns a fresh iterator over (ids, embeddings) pages of a whole collection
+PageSource = Callable[[], Iterable[Tuple[List[str], Any]]]
+# Returns the stored embeddings of chunk ids (ids no longer in the collection are left out)
+VectorFetcher = Callable[[List[str]], Dict[str, Any]]
+
+
+def normalize_vectors(vectors: Any) -> np.ndarray:
+    """
+    Convert embeddings to a float32 matrix of unit-length rows
+
+    Args:
+        vectors: One embedding or a sequence of embeddings
+
+    Returns:
+        2-D float32 array
+    """
+    matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+class VectorCodec:
+    """
+    Compact encoding of normalized vectors: optional dimensionality reduction
+    (uncentred PCA fitted on the corpus, or keeping a prefix of the dimensions
+    for models trained to support it) followed by float16 or per-dimension
+    int8 scalar quantization. Dot products of encoded vectors with a prepared
+    query approximate cosine similarity.
+    """
+
+    def __init__(self, reduction: str = "none", dimensions: int = 0, precision: str = "float32"):
+        """
+        Initialize an unfitted codec
+
+        Args:
+            reduction: 'none', 'pca' or 'truncate'
+            dimensions: Dimensions kept by the reduction
+            precision: 'float32', 'float16' or 'int8'
+
+        Raises:
+            ValueError: If the reduction or precision is unknown
+        """
+        if reduction not in VECTOR_REDUCTIONS:
+            raise ValueError(f"Unknown vector reduction '{reduction}', use one of {', '.join(VECTOR_REDUCTIONS)}")
+        if precision not in VECTOR_PRECISIONS:
+            raise ValueError(f"Unknown vector precision '{precision}', use one of {', '.join(VECTOR_PRECISIONS)}")
+        if reduction != "none" and dimensions <= 0:
+            raise ValueError(f"Vector reduction '{reduction}' needs a number of dimensions, e.g. {reduction}:128")
+        self.reduction = reduction
+        self.dimensions = dimensions if reduction != "none" else 0
+        self.precision = precision
+        self.components: Optional[np.ndarray] = None # (dimension, reduced) projection for PCA
+        self.scale: Optional[np.ndarray] = None      # Per-dimension int8 step
+        self.fit_rows = 0
+
+    @property
+    def spec(self) -> str:
+        """Short name of the encoding, e.g. 'pca128-int8'"""
+        reduction = "" if self.reduction == "none" else f"{self.reduction}{self.dimensions}-"
+        return f"{reduction}{self.precision}"
+
+    @property
+    def dtype(self) -> Any:
+        return {"float32": np.float32, "float16": np.float16, "int8": np.int8}[self.precision]
+
+    @property
+    def fitted(self) -> bool:
+        return self.fit_rows > 0
+
+    @property
+    def adaptive(self) -> bool:
+        """Whether the encoding depends on the vectors it was fitted on (and should follow the corpus as it grows)"""
+        return self.reduction == "pca" or self.precision == "int8"
+
+    def code_dimension(self, dimension: int) -> int:
+        """Dimensions of an encoded vector for input vectors of `dimension`"""
+        return min(self.dimensions, dimension) if self.reduction != "none" else dimension
+
+    def _reduce(self, vectors: np.ndarray) -> np.ndarray:
+        if self.reduction == "pca":
+            reduced = vectors @ self.components
+        elif self.reduction == "truncate":
+            reduced = vectors[:, :self.dimensions]
+        else:
+            return vectors
+        return normalize_vectors(reduced)
+
+    def fit(self, sample: np.ndarray) -> None:
+        """
+        Fit the projection and quantization steps on a sample of the corpus
+
+        Args:
+            sample: Normalized vectors
+        """
+        if self.reduction == "pca":
+            # Uncentred PCA keeps dot products (and the mean direction) meaningful
+            covariance = sample.T.astype(np.float64) @ sample.astype(np.float64)
+            _, eigenvectors = np.linalg.eigh(covariance)
+            keep = min(self.dimensions, sample.shape[1])
+            self.components = np.ascontiguousarray(eigenvectors[:, ::-1][:, :keep], dtype=np.float32)
+        if self.precision == "int8":
+            peak = np.abs(self._reduce(sample)).max(axis=0)
+            self.scale = (np.where(peak == 0, 1.0, peak) / 127).astype(np.float32)
+        self.fit_rows = len(sample)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Encode normalized vectors
+
+        Args:
+            vectors: Normalized vectors
+
+        Returns:
+            Encoded vectors
+        """
+        reduced = self._reduce(vectors)
+        if self.precision == "int8":
+            return np.clip(np.rint(reduced / self.scale), -127, 127).astype(np.int8)
+        return reduced.astype(self.dtype)
+
+    def prepare(self, queries: np.ndarray) -> np.ndarray:
+        """
+        Turn normalized queries into vectors to multiply with encoded vectors
+
+        Args:
+            queries: Normalized query vectors
+
+        Returns:
+            float32 query vectors
+        """
+        reduced = self._reduce(queries)
+        return reduced * self.scale if self.precision == "int8" else reduced
+
+    def save(self, path: Path) -> None:
+        np.savez(
+            str(path),
+            components=self.components if self.components is not None else np.zeros(0, dtype=np.float32),
+            scale=self.scale if self.scale is not None else np.zeros(0, dtype=np.float32),
+            fit_rows=np.array(self.fit_rows),
+        )
+
+    def load(self, path: Path) -> None:
+        with np.load(str(path)) as data:
+            self.components = data["components"] if data["components"].size else None
+            self.scale = data["scale"] if data["scale"].size else None
+            self.fit_rows = int(data["fit_rows"])
+
+
+def parse_codec(reduction: str = "none", precision: str = "float32") -> Optional[VectorCodec]:
+    """
+    Build a codec from config values
+
+    Args:
+        reduction: 'none', 'pca:<dimensions>' or 'truncate:<dimensions>'
+        precision: 'float32', 'float16' or 'int8'
+
+    Returns:
+        The codec, or None for full-precision vectors without reduction
+
+    Raises:
+        ValueError: If a value is invalid
+    """
+    name, _, dimensions = (reduction or "none").strip().lower().partition(":")
+    precision = (precision or "float32").strip().lower()
+    if name == "none" and precision == "float32":
+        return None
+    if dimensions and not dimensions.isdigit():
+        raise ValueError(f"Invalid number of dimensions in vector reduction '{reduction}'")
+    return VectorCodec(name, int(dimensions or 0), precision)
+
+
+def sample_pages(pages: PageSource, size: int, rng: np.random.Generator) -> Tuple[Optional[np.ndarray], int]:
+    """
+    Reservoir-sample normalized vectors from a whole collection in one pass
+
+    Args:
+        pages: Source of (ids, embeddings) pages covering the whole collection
+        size: Maximum sample size
+        rng: Random generator
+
+    Returns:
+        Tuple of (sample, or None for an empty collection; number of vectors seen)
+    """
+    reservoir: Optional[np.ndarray] = None
+    seen = 0
+    for _, embeddings in pages():
+        vectors = normalize_vectors(embeddings)
+        if reservoir is None:
+            reservoir = np.empty((0, vectors.shape[1]), dtype=np.float32)
+        fill = min(size - len(reservoir), len(vectors))
+        if fill > 0:
+            reservoir = np.concatenate([reservoir, vectors[:fill]])
+        rest = vectors[max(fill, 0):]
+        if len(rest):
+            # Vector number i replaces a random slot with probability size / (i + 1)
+            slots = rng.integers(0, np.arange(seen + len(vectors) - len(rest), seen + len(vectors)) + 1)
+            keep = slots < size
+            reservoir[slots[keep]] = rest[keep]
+        seen += len(vectors)
+    return reservoir, seen
+
+
+def rescore_candidates(top_k: int) -> int:
+    """Number of candidates picked by compact scores for exact rescoring"""
+    return max(top_k * RESCORE_FACTOR, RESCORE_MIN_CANDIDATES)
+
+
+def rescore(
+    queries: np.ndarray, candidates: List[List[str]], fetch: Optional[VectorFetcher], top_k: int
+) -> List[List[IndexHit]]:
+    """
+    Exact cosine top-k among the candidates of each query, with the full
+    vectors of all candidates fetched in one call
+
+    Args:
+        queries: Normalized query vectors
+        candidates: Candidate chunk ids of each query
+        fetch: Source of the full vectors
+        top_k: Number of hits per query
+
+    Returns:
+        One list of (id, similarity, vector) per query, best first
+
+    Raises:
+        ValueError: If there is no source of full vectors
+    """
+    if fetch is None:
+        raise ValueError("An encoded vector index needs the full vectors to rescore its candidates")
+    wanted = list(dict.fromkeys(chunk_id for ids in candidates for chunk_id in ids))
+    stored = fetch(wanted) if wanted else {}
+    results = []
+    for query, ids in zip(queries, candidates):
+        ids = [chunk_id for chunk_id in dict.fromkeys(ids) if chunk_id in stored]
+        if not ids:
+            results.append([])
+            continue
+        vectors = normalize_vectors([stored[chunk_id] for chunk_id in ids])
+        exact = vectors @ query
+        best = np.argsort(-exact)[:top_k]
+        results.append([(ids[j], float(exact[j]), vectors[j]) for j in best])
+    return results
+
+
+class NumpyVectorIndex:
+    """
+    Exact cosine index over a memory-mapped embedding matrix.
+    Row positions are kept dense: a deleted row is filled with the last row.
+    With a codec the matrix holds encoded vectors (codes.npy) instead of the
+    full ones: queries scan it and the best candidates are rescored against
+    the full vectors fetched from the collection, so no full-precision copy
+    is kept. Until there are enough vectors to fit the codec the full vectors
+    are kept and searched exactly.
+    """
+
+    def __init__(
+        self, index_dir: str, codec: Optional[VectorCodec] = None, fetch: Optional[VectorFetcher] = None
+    ):
+        """
+        Open (or prepare) the index stored in a directory
+
+        Args:
+            index_dir: Directory holding vectors.npy (or codes.npy) and index.db
+            codec: Compact encoding stored instead of the full vectors (None keeps the full vectors)
+            fetch: Source of the full vectors of the candidates to rescore (needed with a codec)
+        """
+        self.index_dir = Path(index_dir)
+        self.vectors_path = self.index_dir / "vectors.npy"
+        self.codes_path = self.index_dir / "codes.npy"
+        self.codec_path = self.index_dir / "codec.npz"
+        self.db_path = self.index_dir / "index.db"
+        self.codec = codec
+        self.fetch = fetch
+        self._lock = threading.RLock()
+        self.reload()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("CREATE TABLE IF NOT EXISTS rows (row INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE)")
+        return conn
+
+    def _set_meta(self, conn: sqlite3.Connection, **values: Any) -> None:
+        conn.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [(key, str(value)) for key, value in values.items()]
+        )
+
+    @property
+    def encoded(self) -> bool:
+        """Whether the matrix holds encoded vectors"""
+        return self.codec is not None and self.codec.fitted
+
+    @property
+    def needs_rebuild(self) -> bool:
+        """Whether the collection outgrew the sample the codec was fitted on, so it should be refitted"""
+        return (
+            self.encoded
+            and self.codec.adaptive
+            and self.count >= CODEC_REFIT_GROWTH * max(self._fitted_count, CODEC_MIN_FIT_ROWS)
+        )
+
+    def reload(self) -> None:
+        """Load the index from disk, picking up writes made by other processes"""
+        with self._lock:
+            self.version = -1
+            self.dimension = 0
+            self.count = 0
+            self._fitted_count = 0
+            self._ids: List[str] = []
+            self._rows: Dict[str, int] = {}
+            self._matrix: Optional[np.ndarray] = None
+            if self.codec is not None:
+                self.codec.fit_rows = 0
+            if not self.db_path.exists():
+                return
+            try:
+                conn = self._connect()
+                meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+                self._ids = [row[0] for row in conn.execute("SELECT id FROM rows ORDER BY row")]
+                conn.close()
+                if self.codec is not None and self.codec_path.exists():
+                    self.codec.load(self.codec_path)
+                    self.vectors_path.unlink(missing_ok=True) # Left over if encoding was interrupted
+                matrix_path = self.codes_path if self.encoded else self.vectors_path
+                if matrix_path.exists():
+                    self._matrix = np.load(str(matrix_path), mmap_mode="r+")
+                elif self._ids:
+                    raise FileNotFoundError(matrix_path)
+            except Exception as exc: # Catching specific exception
+                logger.warning("Could not load vector index %s, it will be rebuilt: %s", self.index_dir, exc)
+                self._ids, self._matrix = [], None
+                if self.codec is not None:
+                    self.codec.fit_rows = 0
+                return
+            self.count = len(self._ids)
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+            self.dimension = int(meta.get("dimension", 0))
+            self.version = int(meta.get("version", -1))
+            self._fitted_count = int(meta.get("fitted_count", 0))
+
+    def _row_layout(self) -> Tuple[Any, int]:
+        """dtype and width of the matrix rows"""
+        if self.encoded:
+            return self.codec.dtype, self.codec.code_dimension(self.dimension)
+        return np.float32, self.dimension
+
+    def _ensure_capacity(self, rows: int, filled: int) -> None:
+        """Grow the memory-mapped matrix (doubling) so it holds at least `rows` rows, keeping the first `filled`"""
+        if self._matrix is None or self._matrix.shape[0] < rows:
+            capacity = max(rows, MIN_CAPACITY, 2 * (self._matrix.shape[0] if self._matrix is not None else 0))
+            dtype, width = self._row_layout()
+            path = self.codes_path if self.encoded else self.vectors_path
+            self._matrix = self._grow(path, self._matrix, capacity, filled, dtype, width)
+
+    def _grow(
+        self, path: Path, matrix: Optional[np.ndarray], capacity: int, filled: int, dtype: Any, dimension: int
+    ) -> np.ndarray:
+        """Copy the first `filled` rows of a memory-mapped matrix into a larger one at the same path"""
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(path.stem + ".tmp.npy")
+        grown = np.lib.format.open_memmap(str(temp_path), mode="w+", dtype=dtype, shape=(capacity, dimension))
+        if matrix is not None and filled:
+            grown[:filled] = matrix[:filled]
+        grown.flush()
+        del grown, matrix
+        os.replace(temp_path, path)
+        return np.load(str(path), mmap_mode="r+")
+
+    def _record_fit(self) -> None:
+        """Persist the fitted codec and the number of vectors it was fitted for"""
+        conn = self._connect()
+        self._set_meta(conn, fitted_count=self._fitted_count)
+        conn.commit()
+        conn.close()
+        self.codec.save(self.codec_path)
+
+    def fit_codec(self) -> None:
+        """Fit the codec on a sample of the full vectors kept so far, encode them and drop the full copy"""
+        with self._lock:
+            if self.encoded or not self.count:
+                return
+            full = self._matrix
+            rng = np.random.default_rng(0)
+            rows = np.sort(rng.choice(self.count, min(self.count, CODEC_FIT_SAMPLE), replace=False))
+            self.codec.fit(np.asarray(full[rows]))
+            dtype, width = self._row_layout()
+            codes = self._grow(self.codes_path, None, full.shape[0], 0, dtype, width)
+            for start in range(0, self.count, SCAN_BLOCK_ROWS):
+                stop = min(start + SCAN_BLOCK_ROWS, self.count)
+                codes[start:stop] = self.codec.encode(np.asarray(full[start:stop]))
+            codes.flush()
+            self._fitted_count = self.count
+            self._record_fit()
+            self._matrix = codes
+            del full
+            self.vectors_path.unlink(missing_ok=True)
+            logger.info("Encoded %d vectors of %s as %s", self.count, self.index_dir, self.codec.spec)
+
+    def add(self, ids: Sequence[str], embeddings: Any) -> None:
+        """
+        Insert or overwrite vectors
+
+        Args:
+            ids: Chunk ids
+            embeddings: One embedding per id
+
+        Raises:
+            ValueError: If the embedding dimension differs from the index
+        """
+        if not len(ids):
+            return
+        vectors = normalize_vectors(embeddings)
+        with self._lock:
+            if not self.count:
+                self.dimension = vectors.shape[1]
+                if self._matrix is not None and self._matrix.shape[1] != self._row_layout()[1]:
+                    self._matrix = None
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index ({self.dimension})")
+
+            filled = self.count
+            rows = []
+            appended = []
+            for chunk_id in ids:
+                row = self._rows.get(chunk_id)
+                if row is None:
+                    row = self.count
+                    self._rows[chunk_id] = row
+                    self._ids.append(chunk_id)
+                    self.count += 1
+                    appended.append((row, chunk_id))
+                rows.append(row)
+
+            self._ensure_capacity(self.count, filled)
+            self._matrix[rows] = self.codec.encode(vectors) if self.encoded else vectors
+            self._matrix.flush()
+
+            conn = self._connect()
+            conn.executemany("INSERT INTO rows (row, id) VALUES (?, ?)", appended)
+            self._set_meta(conn, dimension=self.dimension)
+            conn.commit()
+            conn.close()
+
+            if self.codec is not None and not self.encoded and self.count >= CODEC_MIN_FIT_ROWS:
+                self.fit_codec()
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """
+        Remove vectors; the last row is moved into each freed row
+
+        Args:
+            ids: Chunk ids to remove
+
+        Returns:
+            Number of vectors removed
+        """
+        removed = 0
+        with self._lock:
+            if not self.count:
+                return 0
+            matrix = self._matrix
+            conn = self._connect()
+            for chunk_id in ids:
+                row = self._rows.pop(chunk_id, None)
+                if row is None:
+                    continue
+                last = self.count - 1
+                conn.execute("DELETE FROM rows WHERE id = ?", (chunk_id,))
+                if row != last:
+                    moved_id = self._ids[last]
+                    matrix[row] = matrix[last]
+                    self._ids[row] = moved_id
+                    self._rows[moved_id] = row
+                    conn.execute("UPDATE rows SET row = ? WHERE id = ?", (row, moved_id))
+                self._ids.pop()
+                self.count -= 1
+                removed += 1
+            conn.commit()
+            conn.close()
+            if removed:
+                matrix.flush()
+        return removed
+
+    def set_version(self, version: int) -> None:
+        """
+        Record the collection version the index is in sync with
+
+        Args:
+            version: Collection version
+        """
+        with self._lock:
+            conn = self._connect()
+            self._set_meta(conn, version=version)
+            conn.commit()
+            conn.close()
+            self.version = version
+
+    def clear(self) -> None:
+        """Delete the index files"""
+        with self._lock:
+            self._matrix = None
+            shutil.rmtree(self.index_dir, ignore_errors=True)
+            self.reload()
+
+    def rebuild(self, pages: PageSource, version: int) -> int:
+        """
+        Rebuild the index from scratch. With a codec, a first pass samples the
+        collection to fit it, so the vectors are encoded as they are added.
+
+        Args:
+            pages: Source of (ids, embeddings) pages covering the whole collection
+            version: Collection version the pages were read at
+
+        Returns:
+            Number of vectors indexed
+        """
+        with self._lock:
+            self.clear()
+            if self.codec is not None:
+                sample, seen = sample_pages(pages, CODEC_FIT_SAMPLE, np.random.default_rng(0))
+                if seen >= CODEC_MIN_FIT_ROWS:
+                    self.codec.fit(sample)
+                    self.dimension = sample.shape[1]
+                    self._fitted_count = seen
+                    self._record_fit()
+            for ids, embeddings in pages():
+                self.add(ids, embeddings)
+            self.set_version(version)
+            logger.info("Built vector index with %d vectors in %s", self.count, self.index_dir)
+            return self.count
+
+    def search(self, query_embeddings: Any, top_k: int) -> List[List[IndexHit]]:
+        """
+        Cosine top-k for one or more queries: exact, or from the codec's
+        candidates rescored against the full vectors
+
+        Args:
+            query_embeddings: One query embedding or a sequence of them
+            top_k: Number of hits per query
+
+        Returns:
+            One list of (id, similarity, vector) per query, best first
+        """
+        queries = normalize_vectors(query_embeddings)
+        with self._lock:
+            if not self.count or top_k <= 0:
+                return [[] for _ in range(len(queries))]
+            if self.encoded:
+                return self._search_codes(queries, top_k)
+            matrix = self._matrix[:self.count]
+            scores = queries @ matrix.T
+            top = _top_rows(scores, top_k)
+            return [
+                [(self._ids[row], float(scores[i, row]), np.array(matrix[row])) for row in top[i]]
+                for i in range(len(queries))
+            ]
+
+    def _search_codes(self, queries: np.ndarray, top_k: int) -> List[List[IndexHit]]:
+        """Scan the encoded vectors block by block, then rescore the best candidates exactly"""
+        prepared = self.codec.prepare(queries)
+        approximate = np.empty((len(queries), self.count), dtype=np.float32)
+        for start in range(0, self.count, SCAN_BLOCK_ROWS):
+            stop = min(start + SCAN_BLOCK_ROWS, self.count)
+            approximate[:, start:stop] = prepared @ self._matrix[start:stop].astype(np.float32).T
+        candidates = _top_rows(approximate, rescore_candidates(top_k))
+        return rescore(queries, [[self._ids[row] for row in rows] for rows in candidates], self.fetch, top_k)
+
+    @property
+    def footprint(self) -> Dict[str, int]:
+        """Bytes of the vectors stored, of those scanned per query, and of full-precision float32 vectors"""
+        width, itemsize = (self._matrix.shape[1], self._matrix.itemsize) if self._matrix is not None else (0, 0)
+        stored = self.count * width * itemsize
+        return {"stored_bytes": stored, "scanned_bytes": stored, "full_bytes": self.count * self.dimension * 4}
+
+
+def _top_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """Row numbers of the k best scores of every query, best first"""
+    count = scores.shape[1]
+    k = min(k, count)
+    if k < count:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        top = np.tile(np.arange(count), (len(scores), 1))
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def assign_cells(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Find the nearest centroid (by cosine) of every vector
+
+    Args:
+        vectors: Normalized vectors
+        centroids: Normalized centroids
+
+    Returns:
+        Cell number of every vector
+    """
+    cells = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_BATCH_SIZE):
+        batch = vectors[start:start + ASSIGN_BATCH_SIZE]
+        cells[start:start + len(batch)] = np.argmax(batch @ centroids.T, axis=1)
+    return cells
+
+
+def train_kmeans(vectors: np.ndarray, nlist: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means: centroids are kept at unit length so cells follow cosine similarity
+
+    Args:
+        vectors: Normalized training vectors
+        nlist: Number of cells
+        iterations: Lloyd iterations
+        seed: Random seed
+
+    Returns:
+        Normalized centroids, one row per cell
+    """
+    rng = np.random.default_rng(seed)
+    nlist = max(min(nlist, len(vectors)), 1)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        cells = assign_cells(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, cells, vectors)
+        empty = np.bincount(cells, minlength=nlist) == 0
+        if empty.any():
+            # Re-seed empty cells with random vectors
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = normalize_vectors(sums)
+    return centroids
+
+
+def default_nlist(count: int) -> int:
+    """
+    Number of IVF cells for a collection size (about 4 * sqrt(count))
+
+    Args:
+        count: Number of vectors
+
+    Returns:
+        Number of cells
+    """
+    return int(min(max(4 * np.sqrt(max(count, 1)), 1), 65536))
+
+
+class IVFVectorIndex:
+    """
+    Inverted-file index: vectors are assigned to k-means cells, each cell is
+    a memory-mapped `.npy` file, and a query scans only the `nprobe` cells
+    whose centroids are closest to it. Only the centroids, cell sizes and the
+    probed cells are touched per query; chunk ids stay in SQLite. With a
+    codec the cells hold encoded vectors, fitted on the training sample, and
+    the best candidates of the probed cells are rescored with the full vectors.
+    """
+
+    def __init__(
+        self,
+        index_dir: str,
+        nlist: int = 0,
+        nprobe: int = DEFAULT_IVF_NPROBE,
+        codec: Optional[VectorCodec] = None,
+        fetch: Optional[VectorFetcher] = None
+    ):
+        """
+        Open (or prepare) the index stored in a directory
+
+        Args:
+            index_dir: Directory holding centroids.npy, the cells and index.db
+            nlist: Number of cells to train (0 picks one from the collection size)
+            nprobe: Number of cells scanned per query
+            codec: Compact encoding stored in the cells (None keeps the full vectors)
+            fetch: Source of the full vectors of the candidates to rescore (needed with a codec)
+        """
+        self.index_dir = Path(index_dir)
+        self.cells_dir = self.index_dir / "cells"
+        self.centroids_path = self.index_dir / "centroids.npy"
+        self.codec_path = self.index_dir / "codec.npz"
+        self.db_path = self.index_dir / "index.db"
+        self.nlist = nlist
+        self.nprobe = max(nprobe, 1)
+        self.codec = codec
+        self.fetch = fetch
+        # The codec is fitted with the cells and kept as long as they are
+        self.needs_rebuild = False
+        self.last_scanned = 0 # Vectors scanned by the last search
+        self._lock = threading.RLock()
+        self.reload()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rows (
+                id TEXT PRIMARY KEY,
+                cell INTEGER NOT NULL,
+                row INTEGER NOT NULL
+            )
+        """)
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_rows_cell ON rows (cell, row)")
+        conn.execute("CREATE TABLE IF NOT EXISTS cells (cell INTEGER PRIMARY KEY, count INTEGER NOT NULL)")
+        return conn
+
+    def reload(self) -> None:
+        """Load centroids and cell sizes from disk"""
+        with self._lock:
+            self.version = -1
+            self.dimension = 0
+            self.centroids: Optional[np.ndarray] = None
+            self.cell_counts = np.zeros(0, dtype=np.int64)
+            if self.codec is not None:
+                self.codec.fit_rows = 0
+            if not self.db_path.exists() or not self.centroids_path.exists():
+                return
+            try:
+                conn = self._connect()
+                meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+                cell_rows = conn.execute("SELECT cell, count FROM cells").fetchall()
+                conn.close()
+                self.centroids = np.load(str(self.centroids_path))
+                if self.codec is not None:
+                    self.codec.load(self.codec_path)
+            except Exception as exc: # Catching specific exception
+                logger.warning("Could not load IVF index %s, it will be rebuilt: %s", self.index_dir, exc)
+                self.centroids = None
+                if self.codec is not None:
+                    self.codec.fit_rows = 0
+                return
+            self.cell_counts = np.zeros(len(self.centroids), dtype=np.int64)
+            for cell, count in cell_rows:
+                self.cell_counts[cell] = count
+            self.dimension = self.centroids.shape[1]
+            self.version = int(meta.get("version", -1))
+
+    @property
+    def count(self) -> int:
+        """Number of indexed vectors"""
+        return int(self.cell_counts.sum())
+
+    @property
+    def encoded(self) -> bool:
+        """Whether the cells hold encoded vectors"""
+        return self.codec is not None and self.codec.fitted
+
+    def _row_layout(self) -> Tuple[Any, int]:
+        """dtype and width of the cell rows"""
+        if self.encoded:
+            return self.codec.dtype, self.codec.code_dimension(self.dimension)
+        return np.float32, self.dimension
+
+    def _cell_path(self, cell: int) -> Path:
+        return self.cells_dir / f"{cell}.npy"
+
+    def _open_cell(self, cell: int, capacity: int = 0) -> np.ndarray:
+        """Memory-map a cell, growing it (doubling) to at least `capacity` rows"""
+        path = self._cell_path(cell)
+        vectors = np.load(str(path), mmap_mode="r+") if path.exists() else None
+        if vectors is not None and vectors.shape[0] >= capacity:
+            return vectors
+        size = max(capacity, MIN_CELL_CAPACITY, 2 * (vectors.shape[0] if vectors is not None else 0))
+        self.cells_dir.mkdir(parents=True, exist_ok=True)
+        temp_path = self.cells_dir / f"{cell}.tmp.npy"
+        dtype, width = self._row_layout()
+        grown = np.lib.format.open_memmap(str(temp_path), mode="w+", dtype=dtype, shape=(size, width))
+        filled = int(self.cell_counts[cell])
+        if vectors is not None and filled:
+            grown[:filled] = vectors[:filled]
+        grown.flush()
+        del grown, vectors
+        os.replace(temp_path, path)
+        return np.load(str(path), mmap_mode="r+")
+
+    def train(self, sample: np.ndarray, nlist: Optional[int] = None) -> None:
+        """
+        Train the cells (and fit the codec, if any) on a sample of the
+        collection; drops all indexed vectors
+
+        Args:
+            sample: Normalized sample vectors
+            nlist: Number of cells (defaults to the index setting, or one derived from the sample size)
+        """
+        with self._lock:
+            self.clear()
+            self.centroids = train_kmeans(sample, nlist or self.nlist or default_nlist(len(sample)))
+            self.dimension = self.centroids.shape[1]
+            self.cell_counts = np.zeros(len(self.centroids), dtype=np.int64)
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            if self.codec is not None:
+                self.codec.fit(sample)
+                self.codec.save(self.codec_path)
+            np.save(str(self.centroids_path), self.centroids)
+            conn = self._connect()
+            conn.commit()
+            conn.close()
+
+    def add(self, ids: Sequence[str], embeddings: Any) -> None:
+        """
+        Insert or overwrite vectors, each in the cell of its nearest centroid
+
+        Args:
+            ids: Chunk ids
+            embeddings: One embedding per id
+
+        Raises:
+            ValueError: If the index is not trained or the dimension differs
+        """
+        if not len(ids):
+            return
+        vectors = normalize_vectors(embeddings)
+        with self._lock:
+            if self.centroids is None:
+                raise ValueError("IVF index is not trained")
+            if vectors.shape[1] != self.dimension:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index ({self.dimension})")
+            # Later duplicates win, like an upsert
+            latest = {chunk_id: i for i, chunk_id in enumerate(ids)}
+            self.delete(list(latest))
+            ids = list(latest)
+            vectors = vectors[list(latest.values())]
+            cells = assign_cells(vectors, self.centroids)
+
+            conn = self._connect()
+            for cell in np.unique(cells):
+                members = np.flatnonzero(cells == cell)
+                start = int(self.cell_counts[cell])
+                cell_vectors = self._open_cell(int(cell), start + len(members))
+                cell_vectors[start:start + len(members)] = (
+                    self.codec.encode(vectors[members]) if self.encoded else vectors[members]
+                )
+                cell_vectors.flush()
+                conn.executemany(
+                    "INSERT INTO rows (id, cell, row) VALUES (?, ?, ?)",
+                    [(ids[i], int(cell), start + n) for n, i in enumerate(members)]
+                )
+                self.cell_counts[cell] = start + len(members)
+                conn.execute(
+                    "INSERT OR REPLACE INTO cells (cell, count) VALUES (?, ?)", (int(cell), int(self.cell_counts[cell]))
+                )
+            conn.commit()
+            conn.close()
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """
+        Remove vectors; the last row of a cell is moved into each freed row
+
+        Args:
+            ids: Chunk ids to remove
+
+        Returns:
+            Number of vectors removed
+        """
+        removed = 0
+        with self._lock:
+            if self.centroids is None:
+                return 0
+            conn = self._connect()
+            for chunk_id in ids:
+                found = conn.execute("SELECT cell, row FROM rows WHERE id = ?", (chunk_id,)).fetchone()
+                if not found:
+                    continue
+                cell, row = found
+                last = int(self.cell_counts[cell]) - 1
+                conn.execute("DELETE FROM rows WHERE id = ?", (chunk_id,))
+                if row != last:
+                    cell_vectors = self._open_cell(cell)
+                    cell_vectors[row] = cell_vectors[last]
+                    cell_vectors.flush()
+                    conn.execute("UPDATE rows SET row = ? WHERE cell = ? AND row = ?", (row, cell, last))
+                self.cell_counts[cell] = last
+                conn.execute("INSERT OR REPLACE INTO cells (cell, count) VALUES (?, ?)", (cell, last))
+                removed += 1
+            conn.commit()
+            conn.close()
+        return removed
+
+    def set_version(self, version: int) -> None:
+        """
+        Record the collection version the index is in sync with
+
+        Args:
+            version: Collection version
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (str(version),))
+            conn.commit()
+            conn.close()
+            self.version = version
+
+    def clear(self) -> None:
+        """Delete the index files"""
+        with self._lock:
+            shutil.rmtree(self.index_dir, ignore_errors=True)
+            self.reload()
+
+    def rebuild(self, pages: PageSource, version: int, seed: int = 0) -> int:
+        """
+        Train the cells on a random sample of the collection, then index every vector
+
+        Args:
+            pages: Source of (ids, embeddings) pages covering the whole collection
+            version: Collection version the pages were read at
+            seed: Random seed for sampling and training
+
+        Returns:
+            Number of vectors indexed
+        """
+        started = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        with self._lock:
+            # First pass: reservoir-sample training vectors
+            reservoir, seen = sample_pages(pages, KMEANS_MAX_SAMPLE, rng)
+            if reservoir is None:
+                self.clear()
+                self.set_version(version)
+                return 0
+            nlist = self.nlist or default_nlist(seen)
+            sample_size = min(nlist * KMEANS_SAMPLE_PER_CELL, len(reservoir))
+            self.train(reservoir[rng.choice(len(reservoir), sample_size, replace=False)], nlist)
+
+            # Second pass: assign every vector to its cell
+            for ids, embeddings in pages():
+                self.add(ids, embeddings)
+            self.set_version(version)
+            logger.info(
+                "Built IVF index with %d vectors in %d cells in %.1fs",
+                self.count, len(self.cell_counts), time.perf_counter() - started
+            )
+            return self.count
+
+    def search(self, query_embeddings: Any, top_k: int, nprobe: Optional[int] = None) -> List[List[IndexHit]]:
+        """
+        Approximate cosine top-k, scanning the `nprobe` nearest cells of each query
+
+        Args:
+            query_embeddings: One query embedding or a sequence of them
+            top_k: Number of hits per query
+            nprobe: Cells scanned per query (defaults to the index setting)
+
+        Returns:
+            One list of (id, similarity, vector) per query, best first
+        """
+        queries = normalize_vectors(query_embeddings)
+        with self._lock:
+            if self.centroids is None or not self.count or top_k <= 0:
+                return [[] for _ in range(len(queries))]
+            nprobe = min(nprobe or self.nprobe, len(self.centroids))
+            probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :nprobe]
+            # Encoded cells give approximate scores: keep more candidates and rescore them
+            encoded = self.encoded
+            prepared = self.codec.prepare(queries) if encoded else queries
+            keep = rescore_candidates(top_k) if encoded else top_k
+            open_cells: Dict[int, np.ndarray] = {}
+            self.last_scanned = 0
+            found: List[List[Tuple[float, int, int, np.ndarray]]] = []
+            for query, cells in zip(prepared, probes):
+                hits: List[Tuple[float, int, int, np.ndarray]] = []
+                for cell in cells:
+                    size = int(self.cell_counts[cell])
+                    if not size:
+                        continue
+                    if cell not in open_cells:
+                        open_cells[cell] = self._open_cell(int(cell))[:size]
+                    cell_vectors = open_cells[cell]
+                    scores = cell_vectors.astype(np.float32) @ query if encoded else cell_vectors @ query
+                    self.last_scanned += size
+                    k = min(keep, size)
+                    best = np.argpartition(-scores, k - 1)[:k] if k < size else np.arange(size)
+                    hits.extend((float(scores[row]), int(cell), int(row), cell_vectors[row]) for row in best)
+                hits.sort(key=lambda hit: hit[0], reverse=True)
+                found.append(hits[:keep])
+
+            conn = self._connect()
+            results = []
+            for hits in found:
+                resolved = []
+                for score, cell, row, vector in hits:
+                    chunk = conn.execute("SELECT id FROM rows WHERE cell = ? AND row = ?", (cell, row)).fetchone()
+                    if chunk:
+                        resolved.append((chunk[0], score, np.array(vector)))
+                results.append(resolved)
+            conn.close()
+            if encoded:
+                return rescore(queries, [[hit[0] for hit in hits] for hits in results], self.fetch, top_k)
+            return results
+
+    @property
+    def footprint(self) -> Dict[str, int]:
+        """Bytes of the vectors stored, of those scanned by the last search, and of full-precision float32 vectors"""
+        dtype, width = self._row_layout()
+        row_bytes = width * np.dtype(dtype).itemsize
+        return {
+            "stored_bytes": self.count * row_bytes,
+            "scanned_bytes": self.last_scanned * row_bytes,
+            "full_bytes": self.count * self.dimension * 4,
+        }
+
+
+VectorIndex = Union[NumpyVectorIndex, IVFVectorIndex]
+
+
+class VectorIndexManager:
+    """
+    Keeps the in-process vector index of a RAG collection: picks the backend
+    for the configured mode and the collection size, rebuilds a missing or
+    stale index from ChromaDB in a background thread, and applies writes to
+    it while it is in sync with the collection version
+    """
+
+    def __init__(
+        self,
+        rag: Any,
+        mode: str = "auto",
+        numpy_max_chunks: int = DEFAULT_NUMPY_INDEX_MAX_CHUNKS,
+        nlist: int = 0,
+        nprobe: int = DEFAULT_IVF_NPROBE,
+        ivf_min_chunks: int = DEFAULT_IVF_MIN_CHUNKS,
+        reduction: str = "none",
+        precision: str = "float32"
+    ):
+        """
+        Initialize the manager
+
+        Args:
+            rag: The ChromaDBRAG instance whose collection is indexed
+            mode: One of VECTOR_INDEX_MODES
+            numpy_max_chunks: Largest collection served by the NumPy index in auto mode
+            nlist: IVF cells, 0 for automatic
+            nprobe: IVF cells probed per query
+            ivf_min_chunks: Smallest collection served by the IVF index in auto mode
+            reduction: Vector reduction ('none', 'pca:N' or 'truncate:N')
+            precision: Vector precision ('float32', 'float16' or 'int8')
+        """
+        self.rag = rag
+        self.mode = mode
+        self.numpy_max_chunks = numpy_max_chunks
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.ivf_min_chunks = ivf_min_chunks
+        self.reduction = reduction
+        self.precision = precision
+        self.index: Optional[VectorIndex] = None
+        self._rebuild_thread: Optional[threading.Thread] = None
+        self._size_cache = (-1, 0) # (collection version, chunk count)
+        self._pending: Optional[List[Tuple[Any, Any]]] = None # Writes made while a rebuild reads the pages
+
+    def get(
+        self,
+        kind: Optional[str] = None,
+        wait: bool = False,
+        version: Optional[int] = None
+    ) -> Optional[VectorIndex]:
+        """
+        Get the index serving vector searches. When it is missing or behind
+        the collection it is rebuilt from ChromaDB in a background thread,
+        and searches go to ChromaDB until the rebuild finishes.
+
+        Args:
+            kind: Index to use ('numpy' or 'ivf'), overriding the mode and collection size
+            wait: Rebuild in the calling thread and return the rebuilt index
+            version: Collection version the caller read for this search (None reads it);
+                     an index that has caught up with a later write serves it too
+
+        Returns:
+            The index, or None when searches should go to ChromaDB
+        """
+        rag = self.rag
+        if version is None:
+            version = rag.query_cache.get_version(rag.collection_name)
+        kind = kind or self.select_kind(version)
+        if kind is None:
+            self.index = None
+            return None
+
+        rebuilding = self._rebuild_thread is not None and self._rebuild_thread.is_alive()
+        if rebuilding and not wait:
+            return None
+
+        codec = self.codec()
+        index_dir = self.path(kind, codec)
+        index = self.index
+        if index is None or index.index_dir != index_dir:
+            if kind == "ivf":
+                index = IVFVectorIndex(
+                    str(index_dir), nlist=self.nlist, nprobe=self.nprobe, codec=codec, fetch=self.fetch_embeddings
+                )
+            else:
+                index = NumpyVectorIndex(str(index_dir), codec=codec, fetch=self.fetch_embeddings)
+        elif index.version < version and not rebuilding:
+            index.reload() # Another process may have written and synced it
+        self.index = index
+
+        if index.version >= version and not index.needs_rebuild:
+            return index
+        if wait:
+            if rebuilding:
+                self._rebuild_thread.join()
+            self._rebuild(index)
+            return index
+
+        self._rebuild_thread = threading.Thread(
+            target=self._rebuild,
+            args=(index,),
+            name=f"vector-index-{rag.collection_name}",
+            daemon=True
+        )
+        self._rebuild_thread.start()
+        return None
+
+    def _rebuild(self, index: VectorIndex) -> None:
+        """
+        Rebuild an index from ChromaDB without blocking writers for the whole
+        rebuild: the version is read under the collection's write lock, the
+        pages are read outside it while `commit_write` journals the writes made
+        meanwhile, and the lock is taken again only to replay those writes and
+        record the version. If another process wrote in between, or the pages
+        shifted under the reads, the index is rebuilt once more under the lock.
+
+        Args:
+            index: The index to rebuild
+        """
+        rag = self.rag
+        try:
+            with rag.write_lock:
+                if self.index is not index:
+                    return # Replaced while waiting for the lock (collection swapped or deleted)
+                version = rag.query_cache.get_version(rag.collection_name)
+                if index.version == version and not index.needs_rebuild:
+                    return
+                self._pending = []
+
+            index.rebuild(self._iter_pages, version)
+
+            with rag.write_lock:
+                pending, self._pending = self._pending or [], None
+                if self.index is not index:
+                    return
+                for upserted, deleted in pending:
+                    if upserted:
+                        index.add(*upserted)
+                    if deleted:
+                        index.delete(deleted)
+                current = rag.query_cache.get_version(rag.collection_name)
+                if current == version + len(pending) and index.count == rag.collection.count():
+                    index.set_version(current)
+                else:
+                    logger.debug("Collection changed during the vector index rebuild, rebuilding it again")
+                    index.rebuild(self._iter_pages, current)
+        except Exception as exc: # Catching specific exception
+            logger.warning("Vector index rebuild failed, searching ChromaDB: %s", exc)
+        finally:
+            self._pending = None
+
+    def fetch_embeddings(self, ids: List[str]) -> Dict[str, Any]:
+        """
+        Read the stored embeddings of chunks, for rescoring the candidates of an encoded index
+
+        Args:
+            ids: Chunk ids
+
+        Returns:
+            Dictionary of chunk id to embedding (chunks deleted meanwhile are missing)
+        """
+        stored = self.rag.collection.get(ids=ids, include=["embeddings"])
+        embeddings = stored.get("embeddings")
+        if embeddings is None:
+            return {}
+        return dict(zip(stored.get("ids") or [], embeddings))
+
+    def path(self, kind: str, codec: Optional[VectorCodec] = None) -> Path:
+        """
+        Directory of an index of the current physical collection
+
+        Args:
+            kind: 'numpy' or 'ivf'
+            codec: Encoding of the compact vectors, if any (each encoding has its own index)
+
+        Returns:
+            The index directory
+        """
+        return self.directory() / (f"{kind}-{codec.spec}" if codec is not None else kind)
+
+    def directory(self, physical_name: Optional[str] = None) -> Path:
+        """
+        Directory holding the indexes of a physical collection
+
+        Args:
+            physical_name: ChromaDB collection (defaults to the one serving the collection now)
+
+        Returns:
+            The directory
+        """
+        return Path(self.rag.db_path) / "vector_index" / (physical_name or self.rag.physical_name)
+
+    def codec(self) -> Optional[VectorCodec]:
+        """Codec for the configured reduction and precision, None for full-precision vectors"""
+        try:
+            return parse_codec(self.reduction, self.precision)
+        except ValueError as exc:
+            logger.warning("%s, storing full-precision vectors", exc)
+            return None
+
+    def select_kind(self, version: int) -> Optional[str]:
+        """
+        Pick the index for the configured mode and the collection size
+
+        Args:
+            version: Current collection version
+
+        Returns:
+            'numpy', 'ivf', or None when ChromaDB serves the searches
+        """
+        if self.mode == "chroma":
+            return None
+        if self.mode != "auto":
+            return self.mode
+        count = self._collection_size(version)
+        if count <= self.numpy_max_chunks:
+            return "numpy"
+        if count >= self.ivf_min_chunks:
+            return "ivf"
+        return None
+
+    def _collection_size(self, version: int) -> int:
+        """Number of chunks, read from the in-sync index or counted once per version"""
+        index = self.index
+        if index is not None and index.version == version:
+            return index.count
+        if self._size_cache[0] != version:
+            self._size_cache = (version, self.rag.collection.count())
+        return self._size_cache[1]
+
+    def _iter_pages(self) -> Iterable[Tuple[List[str], Any]]:
+        """Yield (ids, embeddings) pages of the whole collection"""
+        offset = 0
+        while True:
+            page = self.rag.collection.get(limit=REBUILD_PAGE_SIZE, offset=offset, include=["embeddings"])
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            yield ids, page["embeddings"]
+            offset += len(ids)
+
+    def commit_write(
+        self,
+        upserted: Optional[Tuple[List[str], Any]] = None,
+        deleted: Optional[List[str]] = None
+    ) -> None:
+        """
+        Finish a write to the collection: bump its version, invalidating cached
+        results, and apply the write to the index if that is in sync
+
+        Args:
+            upserted: (ids, embeddings) written to the collection
+            deleted: Ids deleted from the collection
+        """
+        rag = self.rag
+        pending = self._pending
+        if pending is not None:
+            # A rebuild is reading the collection, it replays the write once the pages are read
+            rag.query_cache.bump_version(rag.collection_name)
+            pending.append((upserted, deleted))
+            return
+        index = self.index
+        # The check and the bump are one transaction: if another process wrote
+        # since the index was synced, its rows are missing and the index is rebuilt instead
+        expected = index.version if index is not None else None
+        version, in_sync = rag.query_cache.bump_version_from(rag.collection_name, expected)
+        if not in_sync or version <= 0:
+            return
+        try:
+            if upserted:
+                index.add(*upserted)
+            if deleted:
+                index.delete(deleted)
+            index.set_version(version)
+        except Exception as exc: # Catching specific exception
+            logger.warning("Vector index update failed, it will be rebuilt: %s", exc)
+
+    def reset(self) -> None:
+        """Forget the open index, e.g. after the collection was swapped or deleted"""
+        self.index = None
+
+    def remove(self, physical_name: Optional[str] = None) -> None:
+        """
+        Delete the indexes of a physical collection from disk
+
+        Args:
+            physical_name: ChromaDB collection (defaults to the one serving the collection now)
+        """
+        if physical_name is None or physical_name == self.rag.physical_name:
+            self.index = None
+        shutil.rmtree(self.directory(physical_name), ignore_errors=True)
+
+
+def benchmark_vector_index(
+    rag: Any,
+    samples: int = 100,
+    top_k: int = 10,
+    noise: float = 0.05,
+    seed: int = 0,
+    nprobes: Optional[List[int]] = None
+) -> Dict[str, Any]:
+    """
+    Compare ChromaDB's HNSW search with the in-process indexes on a collection.
+    Queries are stored vectors with a little noise added, so no embedding
+    calls are made; recall is measured against an exact search over the
+    full-precision float32 vectors, so an encoded index is measured too.
+
+    Args:
+        rag: ChromaDBRAG instance
+        samples: Number of queries
+        top_k: Hits per query
+        noise: Standard deviation of the noise added to each query vector
+        seed: Random seed (for repeatable benchmarks)
+        nprobes: IVF nprobe values to measure (IVF is skipped when empty)
+
+    Returns:
+        Report with chunk count, index build times, mean and p95 latency per
+        backend, NumPy batch latency, HNSW and NumPy recall@k and, per nprobe,
+        IVF latency, recall and share of vectors scanned
+    """
+    total = rag.collection.count()
+    if not total:
+        return {"chunks": 0}
+    rng = np.random.default_rng(seed)
+    offsets = rng.choice(total, size=min(samples, total), replace=False)
+    stored = [
+        rag.collection.get(limit=1, offset=int(offset), include=["embeddings"])["embeddings"][0]
+        for offset in offsets
+    ]
+    queries = normalize_vectors(stored)
+    queries = normalize_vectors(queries + rng.normal(0, noise, queries.shape).astype(np.float32))
+
+    def timed(search: Callable[[np.ndarray], List[str]]) -> Tuple[List[List[str]], Dict[str, float]]:
+        results, latencies = [], []
+        for query in queries:
+            started = time.perf_counter()
+            results.append(search(query))
+            latencies.append((time.perf_counter() - started) * 1000)
+        ordered = sorted(latencies)
+        return results, {
+            "mean_ms": sum(ordered) / len(ordered),
+            "p95_ms": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)],
+        }
+
+    def recall(found: List[List[str]], exact: List[List[str]]) -> float:
+        scores = [len(set(f) & set(e)) / len(e) for f, e in zip(found, exact) if e]
+        return sum(scores) / len(scores) if scores else 0.0
+
+    # Ground truth from the uncompressed vectors, whatever codec the configured index uses
+    with tempfile.TemporaryDirectory() as reference_dir:
+        reference = NumpyVectorIndex(reference_dir)
+        reference.rebuild(rag.vector_indexes._iter_pages, 0)
+        exact_ids = [[hit[0] for hit in hits] for hits in reference.search(queries, top_k)]
+        del reference
+
+    started = time.perf_counter()
+    index = rag.vector_indexes.get(kind="numpy", wait=True)
+    build_seconds = time.perf_counter() - started
+
+    chroma_ids, chroma_stats = timed(lambda q: rag.collection.query(
+        query_embeddings=[q.tolist()], n_results=top_k, include=["distances"]
+    )["ids"][0])
+    numpy_ids, numpy_stats = timed(lambda q: [hit[0] for hit in index.search(q, top_k)[0]])
+
+    started = time.perf_counter()
+    index.search(queries, top_k)
+    batch_ms = (time.perf_counter() - started) * 1000
+
+    report: Dict[str, Any] = {
+        "chunks": total,
+        "queries": len(queries),
+        "top_k": top_k,
+        "build_seconds": build_seconds,
+        "chroma": chroma_stats,
+        "numpy": numpy_stats,
+        "numpy_batch_ms": batch_ms,
+        "chroma_recall": recall(chroma_ids, exact_ids),
+        "numpy_recall": recall(numpy_ids, exact_ids),
+        "ivf": [],
+    }
+
+    if nprobes:
+        started = time.perf_counter()
+        ivf = rag.vector_indexes.get(kind="ivf", wait=True)
+        report["ivf_build_seconds"] = time.perf_counter() - started
+        report["ivf_cells"] = len(ivf.cell_counts)
+        for nprobe in nprobes:
+            scanned = []
+
+            def search_ivf(query: np.ndarray) -> List[str]:
+                hits = ivf.search(query, top_k, nprobe=nprobe)[0]
+                scanned.append(ivf.last_scanned)
+                return [hit[0] for hit in hits]
+
+            ivf_ids, ivf_stats = timed(search_ivf)
+            report["ivf"].append({
+                "nprobe": nprobe,
+                **ivf_stats,
+                "recall": recall(ivf_ids, exact_ids),
+                "scanned": sum(scanned) / len(scanned) / max(ivf.count, 1),
+            })
+    return report